@@ -105,6 +105,7 @@ class NewsletterAdmin(admin.ModelAdmin):
         colors = {
             'brouillon': 'gray',
             'planifiee': 'blue',
+            'en_cours': 'orange',
             'envoyee': 'green'
         }
         color = colors.get(obj.statut, 'gray')
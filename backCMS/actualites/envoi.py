@@ -0,0 +1,161 @@
+"""
+Actualités - Moteur d'envoi des newsletters
+
+- Les abonnés actifs sont lus par lots, par id croissant (pagination par
+  clé : la mémoire dépend de la taille des lots, pas du nombre d'abonnés).
+- Chaque lot réutilise une seule connexion SMTP (send_messages).
+- Le débit est limité à NEWSLETTER_DEBIT emails par seconde.
+- La progression (curseur_envoi, nombre_destinataires) est enregistrée en
+  base : un envoi interrompu reprend après le dernier abonné traité.
+
+Avant l'envoi d'un lot, le curseur est avancé à la fin du lot ; il est
+ramené au dernier email accepté si le serveur SMTP échoue. Après un arrêt
+brutal du worker, la reprise saute donc le reste du lot en cours plutôt que
+d'envoyer deux fois le même email.
+
+Un seul envoi à la fois par newsletter : le bail (bail_envoi) est renouvelé
+à chaque lot, ainsi que le verrou de la tâche (taches.file.prolonger, pour
+qu'un long envoi ne soit pas remis en file comme orphelin). Un autre envoi
+de la même newsletter est refusé (EnvoiEnCours) tant que le bail date de
+moins de TACHES_DELAI_VERROU secondes.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import F
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.html import escape, linebreaks, strip_tags
+
+from taches.file import prolonger
+
+from .models import AbonneNewsletter, Newsletter
+from .suivi import url_pixel
+
+
+class LimiteurDebit:
+    """Espace les envois pour ne pas dépasser `debit` emails par seconde"""
+
+    def __init__(self, debit, horloge=time.monotonic, attendre=time.sleep):
+        self.intervalle = 1 / debit if debit else 0
+        self.horloge = horloge
+        self.attendre = attendre
+        self.prochain = None
+
+    def __call__(self):
+        if not self.intervalle:
+            return
+        maintenant = self.horloge()
+        if self.prochain is not None and maintenant < self.prochain:
+            self.attendre(self.prochain - maintenant)
+            maintenant = self.prochain
+        self.prochain = maintenant + self.intervalle
+
+
+class EnvoiEnCours(Exception):
+    """La newsletter est en cours d'envoi par un autre worker (bail non expiré)"""
+
+
+def _demarrer(newsletter_id):
+    """
+    Prend le bail d'envoi et passe la newsletter « en cours » (première
+    exécution) ; None si déjà envoyée, EnvoiEnCours si le bail est pris
+    """
+    maintenant = timezone.now()
+    with transaction.atomic():
+        newsletter = Newsletter.objects.select_for_update().select_related('commune').get(id=newsletter_id)
+        if newsletter.statut == Newsletter.Statut.ENVOYEE:
+            return None
+        expiration = maintenant - timedelta(seconds=getattr(settings, 'TACHES_DELAI_VERROU', 900))
+        if newsletter.statut == Newsletter.Statut.EN_COURS and newsletter.bail_envoi and newsletter.bail_envoi > expiration:
+            raise EnvoiEnCours(f'Newsletter {newsletter_id} en cours d\'envoi depuis un autre worker')
+        champs = ['bail_envoi']
+        if newsletter.statut != Newsletter.Statut.EN_COURS:
+            newsletter.statut = Newsletter.Statut.EN_COURS
+            newsletter.curseur_envoi = 0
+            newsletter.nombre_destinataires = 0
+            champs += ['statut', 'curseur_envoi', 'nombre_destinataires']
+        newsletter.bail_envoi = maintenant
+        newsletter.save(update_fields=champs)
+    return newsletter
+
+
+def construire_message(newsletter, abonne, connexion=None):
+    """
+    Email d'un abonné : version texte et version HTML (avec le pixel de
+    suivi des ouvertures), lien de désinscription personnel
+    """
+    lien = settings.BACKEND_URL + reverse(
+        'api:newsletter_unsubscribe', args=[abonne['token_desinscription']]
+    )
+    contenu = newsletter.contenu
+    if strip_tags(contenu) == contenu:
+        html = linebreaks(contenu, autoescape=True)
+    else:
+        html, contenu = contenu, strip_tags(contenu)
+    pied = f"Newsletter de {newsletter.commune.nom}. Se désinscrire : {lien}"
+    message = EmailMultiAlternatives(
+        newsletter.titre, f"{contenu}\n\n--\n{pied}", to=[abonne['email']],
+        connection=connexion, headers={'List-Unsubscribe': f'<{lien}>'},
+    )
+    message.attach_alternative(
+        f'{html}<hr><p>{escape(pied)}</p>'
+        f'<img src="{url_pixel(newsletter.id, abonne["id"])}" width="1" height="1" alt="">',
+        'text/html',
+    )
+    return message
+
+
+def envoyer_newsletter(newsletter_id, taille_lot=None, debit=None, limiteur=None):
+    """
+    Envoie (ou reprend l'envoi d') une newsletter à ses abonnés actifs.
+    Retourne le nombre total de destinataires.
+    """
+    taille_lot = taille_lot or getattr(settings, 'NEWSLETTER_TAILLE_LOT', 200)
+    if limiteur is None:
+        limiteur = LimiteurDebit(getattr(settings, 'NEWSLETTER_DEBIT', 0) if debit is None else debit)
+
+    newsletter = _demarrer(newsletter_id)
+    if newsletter is None:
+        return Newsletter.objects.values_list('nombre_destinataires', flat=True).get(id=newsletter_id)
+
+    abonnes = AbonneNewsletter.objects.filter(
+        commune_id=newsletter.commune_id, est_actif=True
+    ).order_by('id').values('id', 'email', 'token_desinscription')
+    curseur = newsletter.curseur_envoi
+
+    try:
+        while True:
+            lot = list(abonnes.filter(id__gt=curseur)[:taille_lot])
+            if not lot:
+                break
+            prolonger()
+            Newsletter.objects.filter(id=newsletter.id).update(curseur_envoi=lot[-1]['id'], bail_envoi=timezone.now())
+
+            envoyes, dernier = 0, curseur
+            connexion = get_connection()
+            try:
+                connexion.open()
+                for abonne in lot:
+                    limiteur()
+                    envoyes += connexion.send_messages([construire_message(newsletter, abonne, connexion)])
+                    dernier = abonne['id']
+            finally:
+                connexion.close()
+                Newsletter.objects.filter(id=newsletter.id).update(
+                    curseur_envoi=dernier,
+                    nombre_destinataires=F('nombre_destinataires') + envoyes,
+                )
+            curseur = dernier
+    except Exception:
+        # Envoi interrompu : la reprise n'attend pas l'expiration du bail
+        Newsletter.objects.filter(id=newsletter.id).update(bail_envoi=None)
+        raise
+
+    Newsletter.objects.filter(id=newsletter.id).update(
+        statut=Newsletter.Statut.ENVOYEE, date_envoi=timezone.now(), bail_envoi=None
+    )
+    return Newsletter.objects.values_list('nombre_destinataires', flat=True).get(id=newsletter.id)
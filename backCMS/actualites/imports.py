@@ -0,0 +1,160 @@
+"""
+Actualités - Import en masse des abonnés newsletter
+Lecture CSV en flux, normalisation des emails, insertion par lots
+
+La mémoire utilisée dépend de la taille des lots, pas de celle du fichier :
+les lignes sont lues une à une et seul le lot courant est gardé en mémoire.
+Les doublons (déjà abonnés, quelle que soit la casse, ou répétés dans le
+fichier) sont écartés avant l'insertion ; les inscriptions concurrentes le
+sont par unique_together (commune, email) via bulk_create(ignore_conflicts=True).
+"""
+import csv
+import re
+import uuid
+from dataclasses import dataclass, field
+
+from django.core.exceptions import ValidationError
+from django.core.validators import EmailValidator
+from django.db.models.functions import Lower
+
+from .models import AbonneNewsletter
+
+
+TAILLE_LOT_IMPORT = 1000
+# Nombre de lignes invalides rapportées (les suivantes sont seulement comptées)
+MAX_LIGNES_INVALIDES = 20
+
+COLONNES_EMAIL = {'email', 'e-mail', 'mail', 'courriel', 'adresse email'}
+COLONNES_NOM = {'nom', 'name', 'nom complet'}
+
+# « Nom <adresse> » ou « mailto:adresse »
+FORMAT_ADRESSE = re.compile(r'^(?:.*<(?P<chevrons>[^>]*)>|mailto:(?P<mailto>.*))$', re.IGNORECASE)
+
+valider_email = EmailValidator()
+
+
+@dataclass
+class ResultatImport:
+    """Bilan d'un import"""
+    lignes: int = 0
+    inseres: int = 0
+    doublons: int = 0
+    invalides: int = 0
+    lignes_invalides: list = field(default_factory=list)
+
+    def as_dict(self):
+        return {
+            'lignes': self.lignes,
+            'inseres': self.inseres,
+            'doublons': self.doublons,
+            'invalides': self.invalides,
+            'lignes_invalides': self.lignes_invalides,
+        }
+
+
+def normaliser_email(valeur):
+    """
+    Forme canonique d'une adresse (minuscules, sans espaces ni décor).
+    Retourne None si l'adresse est invalide.
+    """
+    valeur = (valeur or '').strip()
+    correspondance = FORMAT_ADRESSE.match(valeur)
+    if correspondance:
+        valeur = correspondance.group('chevrons') or correspondance.group('mailto') or ''
+    email = valeur.strip().strip('"\'').lower()
+    if not email or len(email) > AbonneNewsletter._meta.get_field('email').max_length:
+        return None
+    try:
+        valider_email(email)
+    except ValidationError:
+        return None
+    return email
+
+
+def _colonnes(entete):
+    """Positions (email, nom) si la ligne est un en-tête, sinon None"""
+    noms = [cellule.strip().lower() for cellule in entete]
+    position_email = next((i for i, nom in enumerate(noms) if nom in COLONNES_EMAIL), None)
+    if position_email is None:
+        return None
+    position_nom = next((i for i, nom in enumerate(noms) if nom in COLONNES_NOM), None)
+    return position_email, position_nom
+
+
+def importer_abonnes(commune, lignes, taille_lot=TAILLE_LOT_IMPORT):
+    """
+    Importe les abonnés d'un CSV (itérable de lignes de texte) dans la commune.
+    Colonnes repérées par l'en-tête (email / nom), à défaut email puis nom.
+    Retourne un ResultatImport.
+    """
+    resultat = ResultatImport()
+    longueur_nom = AbonneNewsletter._meta.get_field('nom').max_length
+    lecteur = csv.reader(lignes)
+    position_email, position_nom = 0, 1
+    premiere_ligne = True
+    lot = {}
+
+    for numero, ligne in enumerate(lecteur, start=1):
+        if not any(cellule.strip() for cellule in ligne):
+            continue
+        # En-tête éventuel : première ligne non vide (lignes blanches en tête de fichier)
+        if premiere_ligne:
+            premiere_ligne = False
+            colonnes = _colonnes(ligne)
+            if colonnes is not None:
+                position_email, position_nom = colonnes
+                continue
+
+        resultat.lignes += 1
+        email = normaliser_email(ligne[position_email] if position_email < len(ligne) else '')
+        if email is None:
+            resultat.invalides += 1
+            if len(resultat.lignes_invalides) < MAX_LIGNES_INVALIDES:
+                resultat.lignes_invalides.append(numero)
+            continue
+        if email in lot:
+            resultat.doublons += 1
+            continue
+
+        nom = ''
+        if position_nom is not None and position_nom < len(ligne):
+            nom = ligne[position_nom].strip()[:longueur_nom]
+        lot[email] = nom
+        if len(lot) >= taille_lot:
+            _inserer(commune, lot, resultat)
+            lot = {}
+
+    if lot:
+        _inserer(commune, lot, resultat)
+    return resultat
+
+
+def _inserer(commune, lot, resultat):
+    """Insère un lot ; les adresses déjà abonnées (quelle que soit leur casse) sont comptées comme doublons"""
+    existants = set(
+        AbonneNewsletter.objects.filter(commune=commune)
+        .annotate(email_minuscules=Lower('email'))
+        .filter(email_minuscules__in=list(lot))
+        .values_list('email_minuscules', flat=True)
+    )
+    nouveaux = [
+        AbonneNewsletter(
+            commune=commune, email=email, nom=nom,
+            # save() n'est pas appelé par bulk_create : token généré ici
+            token_desinscription=uuid.uuid4().hex,
+        )
+        for email, nom in lot.items() if email not in existants
+    ]
+    if not nouveaux:
+        resultat.doublons += len(lot)
+        return
+    # ignore_conflicts couvre les inscriptions concurrentes entre SELECT et INSERT :
+    # les lignes réellement insérées sont relues par leur token
+    AbonneNewsletter.objects.bulk_create(nouveaux, ignore_conflicts=True)
+    inseres = AbonneNewsletter.objects.filter(
+        commune=commune,
+        email__in=[abonne.email for abonne in nouveaux],
+        token_desinscription__in=[abonne.token_desinscription for abonne in nouveaux],
+    ).count()
+    resultat.inseres += inseres
+    resultat.doublons += len(lot) - inseres
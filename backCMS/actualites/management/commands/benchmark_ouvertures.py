@@ -0,0 +1,70 @@
+"""
+Commande de benchmark du pixel de suivi des ouvertures
+Simule une rafale d'ouvertures juste après un envoi et compare l'écriture
+par lots à une écriture en base par ouverture
+"""
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory
+
+from actualites.models import Newsletter
+from actualites.suivi import jeton_ouverture, tampon
+from api.views import NewsletterOuvertureView
+from communes.models import Commune
+
+
+SLUG_BENCHMARK = 'benchmark-ouvertures'
+
+
+class Command(BaseCommand):
+    help = "Mesure le débit du pixel de suivi lors d'une rafale d'ouvertures"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ouvertures', type=int, default=50000, help="Nombre d'ouvertures simulées")
+
+    def handle(self, *args, **options):
+        total = options['ouvertures']
+        commune, _ = Commune.objects.get_or_create(
+            slug=SLUG_BENCHMARK, defaults={'nom': 'Commune Benchmark Ouvertures'}
+        )
+        newsletter = Newsletter.objects.create(
+            commune=commune, titre='Benchmark', contenu='...', statut=Newsletter.Statut.ENVOYEE,
+        )
+        factory = APIRequestFactory()
+        vue = NewsletterOuvertureView.as_view()
+        # Une ouverture sur cinq est une réouverture (ignorée)
+        requetes = [
+            factory.get(f'/api/v1/newsletter/ouverture/{jeton_ouverture(newsletter.id, numero % (total * 4 // 5))}.gif')
+            for numero in range(total)
+        ]
+        try:
+            self.stdout.write(self.style.NOTICE(f'📨 {total} ouvertures (pixel avec écriture par lots)...'))
+            cache.clear()
+            with CaptureQueriesContext(connection) as requetes_sql:
+                debut = time.monotonic()
+                for requete in requetes:
+                    vue(requete, jeton=requete.path.rsplit('/', 1)[1][:-4])
+                tampon.vider()
+                duree_lots = time.monotonic() - debut
+            newsletter.refresh_from_db()
+
+            self.stdout.write(self.style.NOTICE(f'📨 {total} écritures unitaires (une requête par ouverture)...'))
+            debut = time.monotonic()
+            for _ in range(total):
+                Newsletter.objects.filter(id=newsletter.id).update(nombre_ouvertures=F('nombre_ouvertures') + 1)
+            duree_unitaire = time.monotonic() - debut
+        finally:
+            newsletter.delete()
+            commune.delete()
+
+        self.stdout.write(
+            f'  Pixel    : {total / duree_lots:,.0f} ouvertures/s ({duree_lots:.2f}s, '
+            f'{len(requetes_sql)} requête(s) SQL, {newsletter.nombre_ouvertures} ouvertures uniques)'
+        )
+        self.stdout.write(f'  Unitaire : {total / duree_unitaire:,.0f} écritures/s ({duree_unitaire:.2f}s)')
+        self.stdout.write(self.style.SUCCESS(f'✅ Accélération x{duree_unitaire / duree_lots:.1f}'))
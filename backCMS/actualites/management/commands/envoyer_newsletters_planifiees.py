@@ -0,0 +1,46 @@
+"""
+Commande qui lance l'envoi des newsletters planifiées arrivées à échéance
+Passage unique (cron) :
+    * * * * * cd /app && python manage.py envoyer_newsletters_planifiees
+En boucle (service dédié) :
+    python manage.py envoyer_newsletters_planifiees --boucle --intervalle 60
+"""
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from actualites.planification import lancer_envois_planifies
+
+
+class Command(BaseCommand):
+    help = 'Met en file l\'envoi des newsletters planifiées dont la date est passée'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--boucle', action='store_true', help='Vérifie les échéances en continu')
+        parser.add_argument(
+            '--intervalle', type=float, default=60,
+            help='Attente (s) entre deux vérifications en mode boucle',
+        )
+
+    def handle(self, *args, **options):
+        arret = threading.Event()
+        if options['boucle']:
+            for signal_arret in (signal.SIGINT, signal.SIGTERM):
+                signal.signal(signal_arret, lambda signum, frame: arret.set())
+            self.stdout.write(self.style.NOTICE(
+                f"🕒 Planificateur des newsletters : vérification toutes les {options['intervalle']:g}s"
+            ))
+
+        while True:
+            close_old_connections()
+            lancees = lancer_envois_planifies()
+            if lancees:
+                self.stdout.write(self.style.SUCCESS(
+                    f"📨 {len(lancees)} newsletter(s) mise(s) en file : {', '.join(map(str, lancees))}"
+                ))
+            elif not options['boucle']:
+                self.stdout.write('Aucune newsletter planifiée à envoyer')
+            if not options['boucle'] or arret.wait(options['intervalle']):
+                break
@@ -0,0 +1,53 @@
+"""
+Commande pour importer la liste d'abonnés newsletter d'une commune depuis un CSV
+Exemple :
+    python manage.py importer_abonnes yaounde-1 abonnes.csv
+    cat abonnes.csv | python manage.py importer_abonnes yaounde-1 -
+"""
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from actualites.imports import TAILLE_LOT_IMPORT, importer_abonnes
+from communes.models import Commune
+
+
+class Command(BaseCommand):
+    help = 'Importe des abonnés newsletter depuis un CSV (colonnes email, nom), en flux et par lots'
+
+    def add_arguments(self, parser):
+        parser.add_argument('commune', help='Slug de la commune')
+        parser.add_argument('fichier', help='Chemin du CSV (« - » pour l\'entrée standard)')
+        parser.add_argument(
+            '--taille-lot', type=int, default=TAILLE_LOT_IMPORT,
+            help='Adresses insérées par requête',
+        )
+        parser.add_argument('--encodage', default='utf-8-sig', help='Encodage du fichier')
+
+    def handle(self, *args, **options):
+        try:
+            commune = Commune.objects.get(slug=options['commune'])
+        except Commune.DoesNotExist:
+            raise CommandError(f"Commune introuvable : {options['commune']}")
+
+        self.stdout.write(self.style.NOTICE(f'📥 Import des abonnés de {commune.nom}...'))
+        if options['fichier'] == '-':
+            sys.stdin.reconfigure(encoding=options['encodage'], errors='replace', newline='')
+            resultat = importer_abonnes(commune, sys.stdin, options['taille_lot'])
+        else:
+            try:
+                with open(options['fichier'], encoding=options['encodage'], errors='replace', newline='') as fichier:
+                    resultat = importer_abonnes(commune, fichier, options['taille_lot'])
+            except OSError as erreur:
+                raise CommandError(f'Lecture impossible : {erreur}')
+
+        self.stdout.write(
+            f'  {resultat.lignes} ligne(s) : {resultat.inseres} insérée(s), '
+            f'{resultat.doublons} doublon(s), {resultat.invalides} invalide(s)'
+        )
+        if resultat.lignes_invalides:
+            self.stdout.write(
+                '  Lignes invalides : ' + ', '.join(str(numero) for numero in resultat.lignes_invalides)
+                + (' ...' if resultat.invalides > len(resultat.lignes_invalides) else '')
+            )
+        self.stdout.write(self.style.SUCCESS('✅ Import terminé'))
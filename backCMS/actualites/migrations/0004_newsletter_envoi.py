@@ -0,0 +1,27 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('actualites', '0003_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newsletter',
+            name='curseur_envoi',
+            field=models.PositiveBigIntegerField(default=0, editable=False, verbose_name="Curseur d'envoi"),
+        ),
+        migrations.AlterField(
+            model_name='newsletter',
+            name='statut',
+            field=models.CharField(choices=[('brouillon', 'Brouillon'), ('planifiee', 'Planifiée'), ('en_cours', 'Envoi en cours'), ('envoyee', 'Envoyée')], default='brouillon', max_length=20, verbose_name='Statut'),
+        ),
+        migrations.AddIndex(
+            model_name='abonnenewsletter',
+            index=models.Index(fields=['commune', 'est_actif', 'id'], name='abonne_envoi_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('actualites', '0004_newsletter_envoi'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='newsletter',
+            index=models.Index(fields=['statut', 'date_envoi'], name='newsletter_planif_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:01
+
+from django.db import migrations, models
+import medias.stockage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('actualites', '0005_newsletter_planif_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='actualite',
+            name='image_principale',
+            field=models.ImageField(blank=True, null=True, storage=medias.stockage.stockage_contenu, upload_to='actualites/', verbose_name='Image principale'),
+        ),
+        migrations.AlterField(
+            model_name='pagecms',
+            name='image_bandeau',
+            field=models.ImageField(blank=True, null=True, storage=medias.stockage.stockage_contenu, upload_to='pages/', verbose_name='Image bandeau'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 14:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('actualites', '0006_stockage_contenu'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='newsletter',
+            name='bail_envoi',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name="Bail d'envoi"),
+        ),
+    ]
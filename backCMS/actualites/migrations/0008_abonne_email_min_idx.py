@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 14:34
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('actualites', '0007_newsletter_bail_envoi'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='abonnenewsletter',
+            index=models.Index(models.F('commune'), django.db.models.functions.text.Lower('email'), name='abonne_email_min_idx'),
+        ),
+    ]
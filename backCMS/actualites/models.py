@@ -2,9 +2,12 @@
 Actualités - Articles, communiqués, pages CMS et FAQ
 """
 from django.db import models
+from django.db.models.functions import Lower
 from django.conf import settings
 from django.utils.text import slugify
 
+from medias.stockage import stockage_contenu
+
 
 class Actualite(models.Model):
     """Articles et communiqués de presse"""
@@ -36,7 +39,7 @@ class Actualite(models.Model):
     resume = models.TextField('Résumé', max_length=500, blank=True)
     contenu = models.TextField('Contenu')
     
-    image_principale = models.ImageField('Image principale', upload_to='actualites/', blank=True, null=True)
+    image_principale = models.ImageField('Image principale', upload_to='actualites/', blank=True, null=True, storage=stockage_contenu)
     
     categorie = models.CharField('Catégorie', max_length=50, choices=Categorie.choices, default=Categorie.NOUVELLE)
     tags = models.CharField('Tags', max_length=255, blank=True, help_text='Tags séparés par des virgules')
@@ -98,7 +101,7 @@ class PageCMS(models.Model):
     meta_description = models.CharField('Meta description', max_length=160, blank=True)
     
     # Image
-    image_bandeau = models.ImageField('Image bandeau', upload_to='pages/', blank=True, null=True)
+    image_bandeau = models.ImageField('Image bandeau', upload_to='pages/', blank=True, null=True, storage=stockage_contenu)
     
     # Dates
     date_creation = models.DateTimeField('Date création', auto_now_add=True)
@@ -151,6 +154,7 @@ class Newsletter(models.Model):
     class Statut(models.TextChoices):
         BROUILLON = 'brouillon', 'Brouillon'
         PLANIFIEE = 'planifiee', 'Planifiée'
+        EN_COURS = 'en_cours', 'Envoi en cours'
         ENVOYEE = 'envoyee', 'Envoyée'
     
     commune = models.ForeignKey(
@@ -170,10 +174,19 @@ class Newsletter(models.Model):
     nombre_destinataires = models.PositiveIntegerField('Destinataires', default=0)
     nombre_ouvertures = models.PositiveIntegerField('Ouvertures', default=0)
     
+    # Reprise de l'envoi : id du dernier abonné traité (abonnés parcourus par id croissant)
+    curseur_envoi = models.PositiveBigIntegerField('Curseur d\'envoi', default=0, editable=False)
+    # Envoi en cours par un worker : renouvelé à chaque lot (voir actualites.envoi)
+    bail_envoi = models.DateTimeField('Bail d\'envoi', null=True, blank=True, editable=False)
+    
     class Meta:
         verbose_name = 'Newsletter'
         verbose_name_plural = 'Newsletters'
         ordering = ['-date_creation']
+        indexes = [
+            # Recherche des newsletters planifiées arrivées à échéance
+            models.Index(fields=['statut', 'date_envoi'], name='newsletter_planif_idx'),
+        ]
     
     def __str__(self):
         return f"{self.titre} - {self.commune.nom}"
@@ -199,6 +212,12 @@ class AbonneNewsletter(models.Model):
         verbose_name = 'Abonné newsletter'
         verbose_name_plural = 'Abonnés newsletter'
         unique_together = ['commune', 'email']
+        indexes = [
+            # Parcours des abonnés actifs par id croissant lors des envois
+            models.Index(fields=['commune', 'est_actif', 'id'], name='abonne_envoi_idx'),
+            # Recherche des adresses déjà abonnées sans tenir compte de la casse (import)
+            models.Index('commune', Lower('email'), name='abonne_email_min_idx'),
+        ]
     
     def __str__(self):
         return f"{self.email} - {self.commune.nom}"
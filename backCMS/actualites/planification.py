@@ -0,0 +1,41 @@
+"""
+Actualités - Envoi des newsletters planifiées
+
+Une newsletter PLANIFIEE est envoyée à partir de sa date_envoi. Le
+planificateur la fait passer « en cours » par un UPDATE conditionnel
+(WHERE statut = 'planifiee') et met l'envoi en file dans la même
+transaction : si plusieurs planificateurs tournent en même temps, un seul
+voit sa mise à jour aboutir, la newsletter n'est donc envoyée qu'une fois.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Newsletter
+from .taches import envoyer_newsletter
+
+# Newsletters examinées par passage
+TAILLE_LOT_PLANIFICATION = 100
+
+
+def newsletters_dues(maintenant=None):
+    """Newsletters planifiées dont la date d'envoi est passée (index newsletter_planif_idx)"""
+    return Newsletter.objects.filter(
+        statut=Newsletter.Statut.PLANIFIEE,
+        date_envoi__lte=maintenant or timezone.now(),
+    ).order_by('date_envoi')
+
+
+def lancer_envois_planifies(maintenant=None):
+    """Met en file l'envoi des newsletters dues ; retourne les ids pris en charge"""
+    lancees = []
+    for newsletter_id in newsletters_dues(maintenant).values_list('id', flat=True)[:TAILLE_LOT_PLANIFICATION]:
+        with transaction.atomic():
+            prise = Newsletter.objects.filter(
+                id=newsletter_id, statut=Newsletter.Statut.PLANIFIEE
+            ).update(statut=Newsletter.Statut.EN_COURS, curseur_envoi=0, nombre_destinataires=0)
+            if not prise:
+                # Déjà prise en charge par un autre planificateur
+                continue
+            envoyer_newsletter.differer(cle=f'newsletter-{newsletter_id}', newsletter_id=newsletter_id)
+        lancees.append(newsletter_id)
+    return lancees
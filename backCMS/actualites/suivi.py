@@ -0,0 +1,142 @@
+"""
+Actualités - Suivi des ouvertures de newsletters (pixel de suivi)
+
+Chaque email contient une image 1×1 dont l'URL signée identifie la
+newsletter et l'abonné. Une ouverture n'écrit rien en base :
+- la première ouverture d'un abonné est retenue via cache.add (clé
+  expirant après NEWSLETTER_OUVERTURES_RETENTION), les suivantes ignorées ;
+- les ouvertures retenues sont comptées en mémoire par newsletter puis
+  reportées par lots (une requête UPDATE ... + n par newsletter) dès que
+  NEWSLETTER_OUVERTURES_LOT ouvertures sont en attente, et au plus tard
+  NEWSLETTER_OUVERTURES_DELAI secondes après la première ouverture en
+  attente (minuteur, indépendant des ouvertures suivantes).
+
+Avec plusieurs processus, la déduplication suppose un cache partagé
+(Redis, Memcached) ; chaque processus vide son propre tampon, les compteurs
+en base ont donc au plus NEWSLETTER_OUVERTURES_DELAI secondes de retard.
+"""
+import atexit
+import base64
+import logging
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F
+from django.urls import reverse
+
+from .models import Newsletter
+
+
+logger = logging.getLogger(__name__)
+
+# GIF transparent 1×1 (43 octets), servi tel quel à chaque ouverture
+PIXEL_GIF = base64.b64decode('R0lGODlhAQABAIAAAAAAAP///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7')
+
+SEL_SIGNATURE = 'actualites.ouverture'
+
+
+def jeton_ouverture(newsletter_id, abonne_id):
+    """Jeton signé (newsletter, abonné) placé dans l'URL du pixel"""
+    return signing.Signer(salt=SEL_SIGNATURE).sign(f'{newsletter_id}.{abonne_id}')
+
+
+def lire_jeton(jeton):
+    """(newsletter_id, abonne_id) ou None si le jeton est invalide"""
+    try:
+        valeur = signing.Signer(salt=SEL_SIGNATURE).unsign(jeton)
+        newsletter_id, abonne_id = valeur.split('.')
+        return int(newsletter_id), int(abonne_id)
+    except (signing.BadSignature, ValueError):
+        return None
+
+
+def url_pixel(newsletter_id, abonne_id):
+    return settings.BACKEND_URL + reverse(
+        'api:newsletter_ouverture', args=[jeton_ouverture(newsletter_id, abonne_id)]
+    )
+
+
+class TamponOuvertures:
+    """Compteurs d'ouvertures en attente d'écriture, par newsletter"""
+
+    def __init__(self):
+        self._verrou = threading.Lock()
+        self._compteurs = Counter()
+        self._en_attente = 0
+        self._minuteur = None
+
+    def enregistrer(self, newsletter_id, abonne_id):
+        """Compte une ouverture (une seule par abonné) ; retourne True si elle est nouvelle"""
+        retention = getattr(settings, 'NEWSLETTER_OUVERTURES_RETENTION', 90 * 24 * 3600)
+        if not cache.add(f'newsletter:ouverture:{newsletter_id}:{abonne_id}', 1, retention):
+            return False
+        with self._verrou:
+            self._compteurs[newsletter_id] += 1
+            self._en_attente += 1
+            a_vider = self._en_attente >= getattr(settings, 'NEWSLETTER_OUVERTURES_LOT', 500)
+            if not a_vider:
+                self._armer()
+        if a_vider:
+            self.vider()
+        return True
+
+    def _armer(self):
+        """Programme l'écriture des ouvertures en attente (verrou tenu)"""
+        if self._minuteur is None:
+            self._minuteur = threading.Timer(
+                getattr(settings, 'NEWSLETTER_OUVERTURES_DELAI', 10), self._vider_minuteur
+            )
+            self._minuteur.daemon = True
+            self._minuteur.start()
+
+    def _vider_minuteur(self):
+        try:
+            self.vider()
+        except Exception:
+            # Compteurs remis dans le tampon par vider(), minuteur réarmé
+            logger.exception('Écriture des ouvertures de newsletters impossible')
+        finally:
+            # Connexion propre au thread du minuteur
+            connection.close()
+
+    def vider(self):
+        """Reporte les compteurs en base ; retourne le nombre d'ouvertures écrites"""
+        with self._verrou:
+            compteurs, self._compteurs = self._compteurs, Counter()
+            self._en_attente = 0
+            if self._minuteur is not None:
+                self._minuteur.cancel()
+                self._minuteur = None
+        ecrites = 0
+        try:
+            for newsletter_id, nombre in compteurs.items():
+                Newsletter.objects.filter(id=newsletter_id).update(
+                    nombre_ouvertures=F('nombre_ouvertures') + nombre
+                )
+                compteurs[newsletter_id] = 0
+                ecrites += nombre
+        finally:
+            # Écriture interrompue : les compteurs restants repartent dans le tampon
+            reste = +compteurs
+            if reste:
+                with self._verrou:
+                    self._compteurs.update(reste)
+                    self._en_attente += sum(reste.values())
+                    self._armer()
+        return ecrites
+
+
+tampon = TamponOuvertures()
+
+
+@atexit.register
+def _vider_a_l_arret():
+    try:
+        tampon.vider()
+    except Exception:
+        # Base déjà fermée à l'arrêt de l'interpréteur : compteurs perdus
+        pass
@@ -0,0 +1,16 @@
+"""
+Actualités - Tâches de fond : envoi des newsletters
+"""
+from taches.models import Tache
+from taches.registre import tache
+
+from . import envoi
+
+
+@tache('actualites.envoyer_newsletter', priorite=Tache.Priorite.BASSE, max_tentatives=10)
+def envoyer_newsletter(newsletter_id):
+    """
+    Envoie une newsletter aux abonnés actifs de sa commune.
+    Un nouvel essai reprend après le dernier abonné traité.
+    """
+    return {'destinataires': envoi.envoyer_newsletter(newsletter_id)}
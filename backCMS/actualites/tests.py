@@ -1,7 +1,13 @@
 """
 Tests pour le module Actualités et CMS
 """
-from django.test import TestCase
+import socketserver
+import threading
+from datetime import timedelta
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend as LocmemBackend
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 from rest_framework.test import APITestCase, APIClient
@@ -9,7 +15,14 @@ from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
 
 from communes.models import Region, Departement, Commune
+from actualites.envoi import LimiteurDebit, envoyer_newsletter
+from actualites.imports import importer_abonnes, normaliser_email
+from actualites.planification import lancer_envois_planifies
+from actualites.suivi import TamponOuvertures, jeton_ouverture, lire_jeton
 from actualites.models import Actualite, PageCMS, FAQ, Newsletter, AbonneNewsletter
+from actualites import taches as taches_actualites
+from taches.file import executer, recuperer_orphelines, reserver
+from taches.models import Tache
 
 Utilisateur = get_user_model()
 
@@ -175,6 +188,385 @@ class NewsletterTest(TestCase):
             )
 
 
+class ImportAbonnesTest(TestCase):
+    """Tests pour l'import CSV des abonnés"""
+    
+    def setUp(self):
+        self.commune = Commune.objects.create(nom='Test Commune', slug='test-commune')
+        AbonneNewsletter.objects.create(commune=self.commune, email='deja@test.cm')
+    
+    def test_normaliser_email(self):
+        """Test forme canonique des adresses"""
+        self.assertEqual(normaliser_email('  Jean.Dupont@Test.CM '), 'jean.dupont@test.cm')
+        self.assertEqual(normaliser_email('Jean <jean@test.cm>'), 'jean@test.cm')
+        self.assertEqual(normaliser_email('mailto:JEAN@test.cm'), 'jean@test.cm')
+        self.assertIsNone(normaliser_email('pas-un-email'))
+        self.assertIsNone(normaliser_email(''))
+    
+    def test_import_avec_entete(self):
+        """Test import : insérés, doublons (base et fichier), invalides"""
+        lignes = [
+            'Nom;Email\n'.replace(';', ','),
+            'Awa,awa@test.cm\n',
+            'Awa bis,AWA@test.cm\n',
+            'Ancien,Deja@test.cm\n',
+            'Sans email,\n',
+            '\n',
+            'Paul,paul@test\n',
+            'Marie,marie@test.cm\n',
+        ]
+        resultat = importer_abonnes(self.commune, lignes)
+        self.assertEqual(
+            (resultat.lignes, resultat.inseres, resultat.doublons, resultat.invalides), (6, 2, 2, 2)
+        )
+        self.assertEqual(resultat.lignes_invalides, [5, 7])
+        awa = AbonneNewsletter.objects.get(email='awa@test.cm')
+        self.assertEqual(awa.nom, 'Awa')
+        self.assertEqual(len(awa.token_desinscription), 32)
+        self.assertEqual(AbonneNewsletter.objects.filter(commune=self.commune).count(), 3)
+    
+    def test_entete_apres_lignes_vides(self):
+        """Test en-tête reconnu sur la première ligne non vide"""
+        lignes = ['\n', '  ,  \n', 'nom,courriel\n', 'Awa,awa@test.cm\n']
+        resultat = importer_abonnes(self.commune, lignes)
+        self.assertEqual((resultat.lignes, resultat.inseres, resultat.invalides), (1, 1, 0))
+        self.assertEqual(AbonneNewsletter.objects.get(email='awa@test.cm').nom, 'Awa')
+    
+    def test_import_par_lots_en_flux(self):
+        """Test lecture en flux : un SELECT et au plus un INSERT par lot"""
+        lignes = (f'abonne{i % 250}@test.cm\n' for i in range(500))
+        # 5 lots : SELECT, INSERT et comptage des insérés ; les deux derniers ne
+        # contiennent que des doublons (SELECT seul)
+        with self.assertNumQueries(11):
+            resultat = importer_abonnes(self.commune, lignes, taille_lot=100)
+        self.assertEqual((resultat.inseres, resultat.doublons), (250, 250))
+        tokens = AbonneNewsletter.objects.values_list('token_desinscription', flat=True)
+        self.assertEqual(len(set(tokens)), 251)
+    
+    def test_doublon_casse_differente_en_base(self):
+        """Test adresse déjà abonnée avec une autre casse : doublon, pas de seconde ligne"""
+        AbonneNewsletter.objects.create(commune=self.commune, email='Marie.Curie@Test.CM')
+        resultat = importer_abonnes(self.commune, ['marie.curie@test.cm\n', 'MARIE.CURIE@test.cm\n'])
+        self.assertEqual((resultat.inseres, resultat.doublons), (0, 2))
+        self.assertEqual(AbonneNewsletter.objects.filter(email__iexact='marie.curie@test.cm').count(), 1)
+    
+    def test_commande_importer_abonnes(self):
+        """Test commande de gestion sur un fichier"""
+        import os
+        import tempfile
+        from io import StringIO
+        from django.core.management import call_command
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', encoding='utf-8-sig', delete=False) as fichier:
+            fichier.write('email,nom\nnouveau@test.cm,Nouveau\ndeja@test.cm,Ancien\n')
+        self.addCleanup(os.remove, fichier.name)
+        sortie = StringIO()
+        call_command('importer_abonnes', 'test-commune', fichier.name, stdout=sortie)
+        self.assertIn('1 insérée(s), 1 doublon(s), 0 invalide(s)', sortie.getvalue())
+        self.assertTrue(AbonneNewsletter.objects.filter(email='nouveau@test.cm').exists())
+
+
+class ServeurSMTPLocal(socketserver.ThreadingTCPServer):
+    """
+    Serveur SMTP minimal pour les tests : enregistre les connexions et les
+    destinataires ; refuse les messages au-delà de `refuser_apres`.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, refuser_apres=None):
+        super().__init__(('127.0.0.1', 0), GestionnaireSMTP)
+        self.refuser_apres = refuser_apres
+        self.connexions = 0
+        self.destinataires = []
+        self.verrou = threading.Lock()
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+    def reglages(self):
+        return override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1', EMAIL_PORT=self.server_address[1],
+            EMAIL_USE_TLS=False, EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='',
+        )
+
+
+class GestionnaireSMTP(socketserver.StreamRequestHandler):
+    def repondre(self, ligne):
+        self.wfile.write(ligne.encode() + b'\r\n')
+
+    def handle(self):
+        serveur = self.server
+        with serveur.verrou:
+            serveur.connexions += 1
+        destinataires = []
+        self.repondre('220 test ESMTP')
+        for ligne in self.rfile:
+            commande = ligne.decode().strip()
+            verbe = commande[:4].upper()
+            if verbe in ('EHLO', 'HELO'):
+                self.repondre('250 test')
+            elif verbe == 'MAIL':
+                destinataires = []
+                self.repondre('250 OK')
+            elif verbe == 'RCPT':
+                destinataires.append(commande.split(':', 1)[1].strip('<> '))
+                self.repondre('250 OK')
+            elif verbe == 'DATA':
+                self.repondre('354 Fin par <CRLF>.<CRLF>')
+                for donnees in self.rfile:
+                    if donnees.rstrip(b'\r\n') == b'.':
+                        break
+                with serveur.verrou:
+                    refuse = (serveur.refuser_apres is not None
+                              and len(serveur.destinataires) >= serveur.refuser_apres)
+                    if not refuse:
+                        serveur.destinataires.extend(destinataires)
+                self.repondre('451 Réessayez plus tard' if refuse else '250 OK')
+            elif verbe == 'QUIT':
+                self.repondre('221 Bye')
+                return
+            else:
+                self.repondre('250 OK')
+
+
+class BackendRecuperationOrphelines(LocmemBackend):
+    """
+    Backend de test : au `apres`-ième email, le verrou de la tâche d'envoi
+    a expiré (envoi plus long que TACHES_DELAI_VERROU), elle est remise en
+    file et un second worker l'exécute
+    """
+    apres = None
+    envoyes = 0
+    
+    def send_messages(self, messages):
+        envoyes = super().send_messages(messages)
+        type(self).envoyes += envoyes
+        if type(self).envoyes == self.apres:
+            Tache.objects.update(date_verrouillage=timezone.now() - timedelta(hours=2))
+            if recuperer_orphelines():
+                for tache in reserver('worker-2'):
+                    executer(tache)
+        return envoyes
+
+
+class EnvoiNewsletterTest(TestCase):
+    """Tests du moteur d'envoi des newsletters"""
+    
+    def setUp(self):
+        self.commune = Commune.objects.create(nom='Test Commune', slug='test-commune')
+        AbonneNewsletter.objects.bulk_create([
+            AbonneNewsletter(commune=self.commune, email=f'abonne{i}@test.cm', token_desinscription=f'token{i}')
+            for i in range(25)
+        ])
+        AbonneNewsletter.objects.create(commune=self.commune, email='inactif@test.cm', est_actif=False)
+        self.newsletter = Newsletter.objects.create(
+            commune=self.commune, titre='Info', contenu='Bonjour', statut=Newsletter.Statut.BROUILLON
+        )
+    
+    def test_envoi_par_lots_smtp(self):
+        """Test une connexion SMTP par lot, abonnés actifs uniquement"""
+        with ServeurSMTPLocal() as serveur, serveur.reglages():
+            total = envoyer_newsletter(self.newsletter.id, taille_lot=10, debit=0)
+        
+        self.assertEqual(total, 25)
+        self.assertEqual(serveur.connexions, 3)
+        self.assertEqual(sorted(serveur.destinataires), sorted(f'abonne{i}@test.cm' for i in range(25)))
+        self.newsletter.refresh_from_db()
+        self.assertEqual(self.newsletter.statut, Newsletter.Statut.ENVOYEE)
+        self.assertEqual(self.newsletter.nombre_destinataires, 25)
+        self.assertIsNotNone(self.newsletter.date_envoi)
+    
+    def test_reprise_sans_doublon(self):
+        """Test un échec SMTP puis reprise après le dernier email accepté"""
+        with ServeurSMTPLocal(refuser_apres=13) as serveur, serveur.reglages():
+            with self.assertRaises(Exception):
+                envoyer_newsletter(self.newsletter.id, taille_lot=10, debit=0)
+            self.newsletter.refresh_from_db()
+            self.assertEqual(self.newsletter.statut, Newsletter.Statut.EN_COURS)
+            self.assertEqual(self.newsletter.nombre_destinataires, 13)
+            
+            serveur.refuser_apres = None
+            self.assertEqual(envoyer_newsletter(self.newsletter.id, taille_lot=10, debit=0), 25)
+        
+        self.assertEqual(len(serveur.destinataires), 25)
+        self.assertEqual(len(set(serveur.destinataires)), 25)
+    
+    def test_arret_brutal_saute_le_lot_en_cours(self):
+        """Test la reprise après un arrêt brutal n'envoie pas deux fois"""
+        ids = list(AbonneNewsletter.objects.filter(est_actif=True).order_by('id').values_list('id', flat=True))
+        # Worker tué pendant le 2e lot : curseur avancé à la fin de ce lot
+        Newsletter.objects.filter(id=self.newsletter.id).update(
+            statut=Newsletter.Statut.EN_COURS, curseur_envoi=ids[19], nombre_destinataires=10
+        )
+        self.assertEqual(envoyer_newsletter(self.newsletter.id, taille_lot=10, debit=0), 15)
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), sorted(f'abonne{i}@test.cm' for i in range(20, 25)))
+    
+    @override_settings(
+        EMAIL_BACKEND='actualites.tests.BackendRecuperationOrphelines',
+        NEWSLETTER_TAILLE_LOT=10, NEWSLETTER_DEBIT=0,
+    )
+    def test_recuperation_orpheline_pendant_envoi(self):
+        """Test une tâche d'envoi remise en file pendant l'envoi : aucun abonné ne reçoit deux fois"""
+        BackendRecuperationOrphelines.apres, BackendRecuperationOrphelines.envoyes = 15, 0
+        tache = taches_actualites.envoyer_newsletter.differer(newsletter_id=self.newsletter.id)
+        self.assertFalse(executer(reserver('worker-1')[0]))
+        
+        # Second worker refusé (bail d'envoi pris) ; le premier s'arrête à la fin de son lot
+        self.assertEqual(len(mail.outbox), 20)
+        tache.refresh_from_db()
+        self.assertEqual(tache.statut, Tache.Statut.EN_ATTENTE)
+        self.assertIn('EnvoiEnCours', tache.derniere_erreur)
+        
+        Tache.objects.update(executer_apres=timezone.now())
+        self.assertTrue(executer(reserver('worker-3')[0]))
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), sorted(f'abonne{i}@test.cm' for i in range(25)))
+        self.newsletter.refresh_from_db()
+        self.assertEqual(self.newsletter.statut, Newsletter.Statut.ENVOYEE)
+        self.assertEqual(self.newsletter.nombre_destinataires, 25)
+    
+    def test_lien_desinscription(self):
+        """Test chaque email contient le lien de désinscription de l'abonné"""
+        envoyer_newsletter(self.newsletter.id, debit=0)
+        message = next(m for m in mail.outbox if m.to == ['abonne3@test.cm'])
+        self.assertIn('/api/v1/newsletter/unsubscribe/token3/', message.body)
+        self.assertIn('token3', message.extra_headers['List-Unsubscribe'])
+    
+    def test_deja_envoyee(self):
+        """Test une newsletter envoyée n'est pas renvoyée"""
+        envoyer_newsletter(self.newsletter.id, debit=0)
+        envoyer_newsletter(self.newsletter.id, debit=0)
+        self.assertEqual(len(mail.outbox), 25)
+    
+    def test_limiteur_debit(self):
+        """Test espacement des envois"""
+        horloge = [0.0]
+        attentes = []
+        def attendre(duree):
+            attentes.append(round(duree, 3))
+            horloge[0] += duree
+        limiteur = LimiteurDebit(4, horloge=lambda: horloge[0], attendre=attendre)
+        for _ in range(3):
+            limiteur()
+        self.assertEqual(attentes, [0.25, 0.25])
+
+
+class PlanificationNewsletterTest(TestCase):
+    """Tests de l'envoi des newsletters planifiées"""
+    
+    def setUp(self):
+        self.commune = Commune.objects.create(nom='Test Commune', slug='test-commune')
+        AbonneNewsletter.objects.create(commune=self.commune, email='abonne@test.cm')
+        maintenant = timezone.now()
+        self.due = Newsletter.objects.create(
+            commune=self.commune, titre='Due', contenu='...',
+            statut=Newsletter.Statut.PLANIFIEE, date_envoi=maintenant - timezone.timedelta(minutes=5),
+        )
+        self.future = Newsletter.objects.create(
+            commune=self.commune, titre='Future', contenu='...',
+            statut=Newsletter.Statut.PLANIFIEE, date_envoi=maintenant + timezone.timedelta(days=1),
+        )
+        Newsletter.objects.create(
+            commune=self.commune, titre='Brouillon', contenu='...',
+            date_envoi=maintenant - timezone.timedelta(days=1),
+        )
+    
+    def test_une_seule_prise_en_charge(self):
+        """Test seules les newsletters dues sont lancées, une seule fois"""
+        from taches.models import Tache
+        self.assertEqual(lancer_envois_planifies(), [self.due.id])
+        self.assertEqual(lancer_envois_planifies(), [])
+        self.due.refresh_from_db()
+        self.assertEqual(self.due.statut, Newsletter.Statut.EN_COURS)
+        self.assertEqual(Tache.objects.filter(cle=f'newsletter-{self.due.id}').count(), 1)
+        self.assertFalse(Tache.objects.filter(cle=f'newsletter-{self.future.id}').exists())
+    
+    def test_commande_puis_worker(self):
+        """Test commande planifiée puis envoi par le worker"""
+        from io import StringIO
+        from django.core.management import call_command
+        sortie = StringIO()
+        call_command('envoyer_newsletters_planifiees', stdout=sortie)
+        self.assertIn('1 newsletter(s) mise(s) en file', sortie.getvalue())
+        
+        call_command('run_worker', '--une-fois', '--concurrence', '1', stdout=StringIO())
+        self.due.refresh_from_db()
+        self.assertEqual(self.due.statut, Newsletter.Statut.ENVOYEE)
+        self.assertEqual(self.due.nombre_destinataires, 1)
+        self.assertEqual([m.subject for m in mail.outbox], ['Due'])
+
+
+class SuiviOuverturesTest(TestCase):
+    """Tests du comptage des ouvertures"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.commune = Commune.objects.create(nom='Test Commune', slug='test-commune')
+        self.newsletter = Newsletter.objects.create(commune=self.commune, titre='Info', contenu='...')
+    
+    def test_jeton_signe(self):
+        """Test jeton du pixel : lecture et falsification"""
+        jeton = jeton_ouverture(self.newsletter.id, 42)
+        self.assertEqual(lire_jeton(jeton), (self.newsletter.id, 42))
+        self.assertIsNone(lire_jeton(jeton.replace('.42', '.43')))
+        self.assertIsNone(lire_jeton('n-importe-quoi'))
+    
+    @override_settings(NEWSLETTER_OUVERTURES_LOT=100, NEWSLETTER_OUVERTURES_DELAI=3600)
+    def test_ecriture_par_lots_dedupliquee(self):
+        """Test une ouverture par abonné, une requête par lot"""
+        tampon = TamponOuvertures()
+        with self.assertNumQueries(0):
+            for abonne_id in range(99):
+                tampon.enregistrer(self.newsletter.id, abonne_id)
+            self.assertFalse(tampon.enregistrer(self.newsletter.id, 5))
+        with self.assertNumQueries(1):
+            self.assertTrue(tampon.enregistrer(self.newsletter.id, 99))
+        self.newsletter.refresh_from_db()
+        self.assertEqual(self.newsletter.nombre_ouvertures, 100)
+        
+        tampon.enregistrer(self.newsletter.id, 100)
+        self.assertEqual(tampon.vider(), 1)
+        self.newsletter.refresh_from_db()
+        self.assertEqual(self.newsletter.nombre_ouvertures, 101)
+    
+    def test_pixel_dans_email(self):
+        """Test version HTML avec pixel de suivi"""
+        AbonneNewsletter.objects.create(commune=self.commune, email='abonne@test.cm')
+        envoyer_newsletter(self.newsletter.id, debit=0)
+        html, type_mime = mail.outbox[0].alternatives[0]
+        self.assertEqual(type_mime, 'text/html')
+        self.assertIn('/api/v1/newsletter/ouverture/', html)
+
+
+class SuiviOuverturesMinuteurTest(TransactionTestCase):
+    """Tests de l'écriture des ouvertures par minuteur"""
+    
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        commune = Commune.objects.create(nom='Test Commune', slug='test-commune')
+        self.newsletter = Newsletter.objects.create(commune=commune, titre='Info', contenu='...')
+    
+    @override_settings(NEWSLETTER_OUVERTURES_LOT=100, NEWSLETTER_OUVERTURES_DELAI=0.05)
+    def test_ecriture_sans_nouvelle_ouverture(self):
+        """Test ouvertures écrites après le délai sans attendre d'autre ouverture"""
+        tampon = TamponOuvertures()
+        with self.assertNumQueries(0):
+            tampon.enregistrer(self.newsletter.id, 1)
+            tampon.enregistrer(self.newsletter.id, 2)
+        minuteur = tampon._minuteur
+        minuteur.join(5)
+        self.newsletter.refresh_from_db()
+        self.assertEqual(self.newsletter.nombre_ouvertures, 2)
+        self.assertIsNone(tampon._minuteur)
+
+
 class ActualiteAPITest(APITestCase):
     """Tests pour l'API des actualités"""
     
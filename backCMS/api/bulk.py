@@ -0,0 +1,302 @@
+"""
+API Bulk - E-CMS
+Création et mise à jour en lot pour l'ingestion de contenus (migration d'anciens sites)
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.text import slugify
+from drf_spectacular.utils import extend_schema
+from rest_framework import serializers, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+from communes.models import Commune
+from recherche.indexation import indexer_lot
+
+
+# Nombre maximal d'éléments par requête
+TAILLE_MAX_LOT = 500
+# Lignes par INSERT / UPDATE
+TAILLE_LOT_SQL = 100
+# Préfixes de slug par requête (profondeur d'expression limitée sous SQLite)
+TAILLE_LOT_SLUGS = 200
+# Place réservée au suffixe de déduplication (-2, -3, ...)
+LONGUEUR_SUFFIXE_SLUG = 6
+# Écritures rejouées quand un slug est pris entre la vérification et l'INSERT
+TENTATIVES_SLUGS = 3
+
+
+class CommuneEnLotField(serializers.PrimaryKeyRelatedField):
+    """Commune résolue depuis un dictionnaire préchargé : une requête pour tout le lot"""
+
+    def __init__(self, communes, **kwargs):
+        self.communes = communes
+        super().__init__(queryset=Commune.objects.all(), **kwargs)
+
+    def to_internal_value(self, data):
+        try:
+            return self.communes[int(data)]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+
+
+class ListeEnLotSerializer(serializers.ListSerializer):
+    """Valide toute la liste en une passe ; en mise à jour chaque élément est lié à son instance"""
+
+    def __init__(self, *args, instances=None, **kwargs):
+        self.instances = instances or {}
+        super().__init__(*args, **kwargs)
+
+    def run_child_validation(self, data):
+        self.child.instance = self.instances.get(data.get('id')) if isinstance(data, dict) else None
+        self.child.initial_data = data
+        return super().run_child_validation(data)
+
+
+def _communes_referencees(elements):
+    ids = set()
+    for element in elements:
+        if isinstance(element, dict):
+            try:
+                ids.add(int(element.get('commune')))
+            except (TypeError, ValueError):
+                pass
+    return Commune.objects.in_bulk(ids)
+
+
+def resoudre_slugs(modele, objets, champ_source, exclure=()):
+    """
+    Attribue un slug unique par commune aux objets qui n'en ont pas et
+    vérifie les slugs fournis, avec une requête par lot de préfixes au lieu
+    d'une requête par objet.
+    Retourne les index des objets dont le slug fourni est déjà pris.
+    """
+    longueur_max = modele._meta.get_field('slug').max_length - LONGUEUR_SUFFIXE_SLUG
+    bases = {}
+    for position, objet in enumerate(objets):
+        if not objet.slug:
+            bases[position] = (
+                slugify(getattr(objet, champ_source))[:longueur_max].strip('-')
+                or modele._meta.model_name
+            )
+
+    prefixes = sorted({
+        (objet.commune_id, bases.get(position) or objet.slug)
+        for position, objet in enumerate(objets)
+    })
+    pris = set()
+    for debut in range(0, len(prefixes), TAILLE_LOT_SLUGS):
+        condition = Q()
+        for commune_id, prefixe in prefixes[debut:debut + TAILLE_LOT_SLUGS]:
+            condition |= Q(commune_id=commune_id, slug__startswith=prefixe)
+        pris.update(
+            modele.objects.filter(condition).exclude(pk__in=exclure).values_list('commune_id', 'slug')
+        )
+
+    conflits = []
+    for position, objet in enumerate(objets):
+        if position in bases:
+            continue
+        if (objet.commune_id, objet.slug) in pris:
+            conflits.append(position)
+        pris.add((objet.commune_id, objet.slug))
+
+    for position, base in bases.items():
+        objet = objets[position]
+        slug, numero = base, 2
+        while (objet.commune_id, slug) in pris:
+            slug = f'{base}-{numero}'
+            numero += 1
+        objet.slug = slug
+        pris.add((objet.commune_id, slug))
+    return conflits
+
+
+class BulkMixin:
+    """
+    Ajoute POST / PATCH .../bulk/ à un ViewSet : création ou mise à jour
+    d'une liste d'éléments (au plus TAILLE_MAX_LOT).
+
+    Toute la liste est validée en une passe (communes préchargées), puis les
+    slugs sont résolus en lot et l'écriture se fait par bulk_create /
+    bulk_update dans une seule transaction : tout ou rien. Un slug pris entre
+    la vérification et l'écriture (IntegrityError) fait rejouer la
+    transaction. Les erreurs sont renvoyées élément par élément avec leur
+    position dans la liste.
+    """
+    # Champ d'où est tiré le slug (None si le modèle n'a pas de slug)
+    bulk_champ_slug = None
+
+    def get_bulk_valeurs_creation(self):
+        """Attributs imposés à chaque élément créé (équivalent de perform_create)"""
+        return {}
+
+    @extend_schema(
+        summary='Création / mise à jour en lot',
+        description=(
+            f'POST : liste d\'éléments à créer. PATCH : liste d\'éléments partiels avec leur `id`. '
+            f'Au plus {TAILLE_MAX_LOT} éléments, écriture tout ou rien.'
+        ),
+    )
+    @action(detail=False, methods=['post', 'patch'])
+    def bulk(self, request):
+        """Création (POST) ou mise à jour (PATCH) d'une liste d'éléments"""
+        elements = request.data
+        if not isinstance(elements, list) or not elements:
+            return Response(
+                {'error': 'Une liste non vide d\'éléments est attendue'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(elements) > TAILLE_MAX_LOT:
+            return Response(
+                {'error': f'Au plus {TAILLE_MAX_LOT} éléments par requête'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        creation = request.method == 'POST'
+        erreurs = [{} for _ in elements]
+        instances = {} if creation else self._instances_bulk(elements, erreurs)
+
+        serializer = self._get_bulk_serializer(elements, instances, partiel=not creation)
+        if not serializer.is_valid():
+            for position, erreur in enumerate(serializer.errors):
+                erreurs[position].update(erreur)
+        if any(erreurs):
+            return self._reponse_erreurs(erreurs, status.HTTP_400_BAD_REQUEST)
+
+        modele = self.queryset.model
+        if creation:
+            valeurs = self.get_bulk_valeurs_creation()
+            objets = [modele(**donnees, **valeurs) for donnees in serializer.validated_data]
+        else:
+            objets = []
+            for element, donnees in zip(elements, serializer.validated_data):
+                objet = instances[element['id']]
+                for champ, valeur in donnees.items():
+                    setattr(objet, champ, valeur)
+                objets.append(objet)
+
+        interdits = [
+            position for position, objet in enumerate(objets)
+            if not request.user.peut_gerer_commune(objet.commune_id)
+        ]
+        if interdits:
+            return self._reponse_erreurs(
+                {position: {'commune': ['Vous ne pouvez pas gérer cette commune.']} for position in interdits},
+                status.HTTP_403_FORBIDDEN
+            )
+
+        exclure = [objet.pk for objet in objets if objet.pk]
+        slugs_generes = [
+            position for position, objet in enumerate(objets) if self.bulk_champ_slug and not objet.slug
+        ]
+        for essai in range(TENTATIVES_SLUGS):
+            try:
+                with transaction.atomic():
+                    # Dans la transaction de l'écriture : vérification et INSERT au plus près
+                    if self.bulk_champ_slug:
+                        conflits = resoudre_slugs(modele, objets, self.bulk_champ_slug, exclure=exclure)
+                        if conflits:
+                            return self._reponse_erreurs(
+                                {
+                                    position: {'slug': ['Ce slug est déjà utilisé dans cette commune.']}
+                                    for position in conflits
+                                },
+                                status.HTTP_400_BAD_REQUEST
+                            )
+                    if creation:
+                        modele.objects.bulk_create(objets, batch_size=TAILLE_LOT_SQL)
+                    else:
+                        modele.objects.bulk_update(
+                            objets, self._champs_modifies(modele, objets, serializer.validated_data),
+                            batch_size=TAILLE_LOT_SQL
+                        )
+                    # bulk_create / bulk_update n'émettent pas post_save
+                    indexer_lot(objets)
+                break
+            except IntegrityError:
+                # Slug pris par une écriture concurrente : nouvelle vérification (slug fourni
+                # signalé en 400) ou nouveau suffixe (slug généré)
+                if not self.bulk_champ_slug or essai == TENTATIVES_SLUGS - 1:
+                    raise
+                for position in slugs_generes:
+                    objets[position].slug = ''
+                if creation:
+                    for objet in objets:
+                        objet.pk = None
+
+        return Response(
+            {
+                'nombre': len(objets),
+                'resultats': [
+                    {'index': position, 'id': objet.pk, **({'slug': objet.slug} if self.bulk_champ_slug else {})}
+                    for position, objet in enumerate(objets)
+                ],
+            },
+            status=status.HTTP_201_CREATED if creation else status.HTTP_200_OK
+        )
+
+    def _instances_bulk(self, elements, erreurs):
+        """Charge en une requête les instances visées par une mise à jour"""
+        ids = {}
+        for position, element in enumerate(elements):
+            if not isinstance(element, dict):
+                continue
+            try:
+                ids[position] = int(element['id'])
+            except KeyError:
+                erreurs[position]['id'] = ['Ce champ est obligatoire.']
+            except (TypeError, ValueError):
+                erreurs[position]['id'] = ['Identifiant invalide.']
+
+        instances = self.get_queryset().in_bulk(set(ids.values()))
+        for position, pk in ids.items():
+            if pk not in instances:
+                erreurs[position]['id'] = ['Élément introuvable.']
+            else:
+                # Clé telle qu'envoyée, pour ListeEnLotSerializer
+                instances[elements[position]['id']] = instances[pk]
+        return instances
+
+    def _get_bulk_serializer(self, elements, instances, partiel):
+        enfant = self.get_serializer_class()(context=self.get_serializer_context(), partial=partiel)
+        champ_commune = enfant.fields.get('commune')
+        if champ_commune is not None and not champ_commune.read_only:
+            enfant.fields['commune'] = CommuneEnLotField(
+                _communes_referencees(elements), required=champ_commune.required
+            )
+        # Unicité (commune, slug) vérifiée en lot par resoudre_slugs
+        enfant.validators = []
+        return ListeEnLotSerializer(
+            child=enfant, data=elements, instances=instances, partial=partiel,
+            context=self.get_serializer_context()
+        )
+
+    @staticmethod
+    def _champs_modifies(modele, objets, donnees):
+        champs = set()
+        for valeurs in donnees:
+            champs.update(valeurs)
+        # auto_now n'est pas appliqué par bulk_update
+        maintenant = timezone.now()
+        for champ in modele._meta.concrete_fields:
+            if getattr(champ, 'auto_now', False):
+                champs.add(champ.name)
+                for objet in objets:
+                    setattr(objet, champ.attname, maintenant)
+        return sorted(champs)
+
+    @staticmethod
+    def _reponse_erreurs(erreurs, code):
+        if isinstance(erreurs, list):
+            erreurs = dict(enumerate(erreurs))
+        return Response(
+            {'erreurs': [
+                {'index': position, 'erreurs': erreur}
+                for position, erreur in sorted(erreurs.items()) if erreur
+            ]},
+            status=code
+        )
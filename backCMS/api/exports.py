@@ -0,0 +1,130 @@
+"""
+API Exports - E-CMS
+Exports CSV / NDJSON en streaming pour les administrateurs de commune
+"""
+import csv
+import json
+import re
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, extend_schema
+from rest_framework import permissions, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
+
+
+# Nombre de lignes lues par aller-retour avec la base
+TAILLE_LOT_EXPORT = 2000
+
+FORMATS_EXPORT = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class PeutExporter(permissions.BasePermission):
+    """Permission: super admin, ou admin d'une commune (limité à sa commune)"""
+
+    def has_permission(self, request, view):
+        user = request.user
+        if not user or not user.is_authenticated:
+            return False
+        return user.is_super_admin() or (user.is_admin_commune() and user.commune_id is not None)
+
+
+class Echo:
+    """Pseudo-fichier : csv.writer écrit une ligne et on la renvoie telle quelle"""
+
+    def write(self, value):
+        return value
+
+
+# Débuts de cellule interprétés comme formules par les tableurs
+DEBUTS_FORMULE = ('=', '+', '-', '@', '\t', '\r')
+
+# Nombres et numéros de téléphone (-12.5, +237 6 99 00 00 00) : laissés tels quels
+NOMBRE = re.compile(r'[+-]?\d[\d\s.]*')
+
+
+def _valeur(valeur):
+    if isinstance(valeur, (dict, list)):
+        valeur = json.dumps(valeur, ensure_ascii=False)
+    elif hasattr(valeur, 'isoformat'):
+        return valeur.isoformat()
+    if valeur is None:
+        return ''
+    if isinstance(valeur, str) and valeur.startswith(DEBUTS_FORMULE) and not NOMBRE.fullmatch(valeur):
+        return "'" + valeur
+    return valeur
+
+
+def lignes_csv(champs, lignes):
+    writer = csv.writer(Echo())
+    # BOM pour l'ouverture directe dans Excel
+    yield '\ufeff' + writer.writerow(champs)
+    for ligne in lignes:
+        yield writer.writerow([_valeur(valeur) for valeur in ligne])
+
+
+def lignes_ndjson(champs, lignes):
+    for ligne in lignes:
+        yield json.dumps(dict(zip(champs, ligne)), ensure_ascii=False, cls=DjangoJSONEncoder) + '\n'
+
+
+class ExportMixin:
+    """
+    Ajoute l'action GET .../export/?format_export=csv|ndjson à un ViewSet.
+
+    Les filtres du ViewSet (django-filter, recherche) s'appliquent. Le
+    queryset est restreint à la commune de l'administrateur via
+    `export_champ_commune`. Les lignes sont lues par lots
+    (`iterator(chunk_size=...)`) et envoyées au fil de l'eau : la mémoire
+    reste constante quel que soit le volume.
+    """
+    export_fields = []
+    export_champ_commune = 'commune'
+    export_nom = 'export'
+
+    def get_export_queryset(self):
+        queryset = self.filter_queryset(self.queryset.model.objects.all())
+        user = self.request.user
+        if not user.is_super_admin():
+            queryset = queryset.filter(**{self.export_champ_commune: user.commune_id})
+        return queryset.order_by('pk')
+
+    @extend_schema(
+        summary='Export CSV / NDJSON',
+        parameters=[OpenApiParameter('format_export', OpenApiTypes.STR, enum=list(FORMATS_EXPORT))],
+        responses={(200, 'text/csv'): OpenApiTypes.BINARY},
+    )
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """Export en streaming des éléments visibles par l'administrateur"""
+        # Vérifié ici : certains ViewSets redéfinissent get_permissions()
+        permission = PeutExporter()
+        if not permission.has_permission(request, self):
+            self.permission_denied(request, message='Export réservé aux administrateurs')
+
+        format_export = request.query_params.get('format_export', 'csv')
+        if format_export not in FORMATS_EXPORT:
+            return Response(
+                {'error': f"Format inconnu. Formats disponibles : {', '.join(FORMATS_EXPORT)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        champs = list(self.export_fields)
+        lignes = self.get_export_queryset().values_list(*champs).iterator(chunk_size=TAILLE_LOT_EXPORT)
+        generateur = lignes_csv if format_export == 'csv' else lignes_ndjson
+
+        response = StreamingHttpResponse(
+            generateur(champs, lignes),
+            content_type=FORMATS_EXPORT[format_export]
+        )
+        horodatage = timezone.now().strftime('%Y%m%d-%H%M%S')
+        response['Content-Disposition'] = (
+            f'attachment; filename="{self.export_nom}-{horodatage}.{format_export}"'
+        )
+        return response
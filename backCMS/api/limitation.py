@@ -0,0 +1,182 @@
+"""
+API - Limitation de débit des écritures anonymes (seaux de jetons)
+
+Chaque vue limitée déclare une portée (`throttle_scope`) ; LIMITES_DEBIT lui
+associe un débit par adresse IP et par commune (tenant du sous-domaine ; le
+portail national n'a que les seaux par adresse IP) :
+
+    LIMITES_DEBIT = {'signalements': {'ip': '10/h', 'commune': '300/h'}}
+
+Un débit "10/h" est un seau de 10 jetons qui se remplit de 10 jetons par
+heure : une rafale de 10 requêtes passe, puis une toutes les 6 minutes.
+Une requête ne prend un jeton que si chacun de ses seaux en a un : refusée
+par le seau de la commune, elle ne vide pas celui de l'adresse IP. Elle
+reçoit alors 429 avec Retry-After, avant toute lecture du corps, validation
+ou accès à la base.
+
+Les seaux sont gardés dans le cache (partagé entre les processus avec
+Redis) ; si le cache est injoignable, dans la mémoire du processus. Lecture
+et mise à jour d'un seau sont atomiques : script Lua exécuté par Redis, ou
+verrou du processus pour un cache local (deux requêtes simultanées ne
+prennent pas le même jeton). Les requêtes authentifiées et les lectures ne
+sont pas limitées.
+"""
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.redis import RedisCache
+from rest_framework import permissions
+from rest_framework.throttling import BaseThrottle
+
+
+logger = logging.getLogger(__name__)
+
+PERIODES = {'s': 1, 'min': 60, 'h': 3600, 'j': 86400}
+
+# Prélèvement atomique dans Redis : KEYS seaux (hash jetons / instant),
+# ARGV[1] maintenant puis, par seau, capacité, remplissage (jetons par
+# seconde) et durée de vie. Tous les seaux sont vérifiés avant d'en vider un.
+# Attente retournée en texte (un nombre Lua deviendrait un entier)
+SCRIPT_PRELEVER = """
+local maintenant = tonumber(ARGV[1])
+local restants, attente = {}, 0
+for i, cle in ipairs(KEYS) do
+    local capacite, remplissage = tonumber(ARGV[3 * i - 1]), tonumber(ARGV[3 * i])
+    local etat = redis.call('HMGET', cle, 'jetons', 'instant')
+    local jetons = tonumber(etat[1]) or capacite
+    local instant = tonumber(etat[2]) or maintenant
+    restants[i] = math.min(capacite, jetons + math.max(0, maintenant - instant) * remplissage)
+    if restants[i] < 1 then
+        attente = math.max(attente, (1 - restants[i]) / remplissage)
+    end
+end
+if attente > 0 then
+    return tostring(attente)
+end
+for i, cle in ipairs(KEYS) do
+    redis.call('HSET', cle, 'jetons', tostring(restants[i] - 1), 'instant', tostring(maintenant))
+    redis.call('EXPIRE', cle, tonumber(ARGV[3 * i + 1]))
+end
+return '0'
+"""
+
+# Lecture / écriture des seaux d'un cache local (ou des seaux_locaux)
+_verrou = threading.Lock()
+
+
+def lire_debit(debit):
+    """'10/min' → (10 jetons, 60 secondes)"""
+    nombre, periode = debit.split('/')
+    return int(nombre), PERIODES[periode]
+
+
+class SeauxLocaux:
+    """Seaux gardés dans la mémoire du processus (les plus anciens oubliés au-delà de `taille_max`)"""
+
+    def __init__(self, taille_max=10000):
+        self.taille_max = taille_max
+        self.seaux = OrderedDict()
+        self.verrou = threading.Lock()
+
+    def get(self, cle):
+        with self.verrou:
+            etat = self.seaux.get(cle)
+            if etat is None:
+                return None
+            valeur, expiration = etat
+            if expiration < time.monotonic():
+                del self.seaux[cle]
+                return None
+            return valeur
+
+    def set(self, cle, valeur, timeout):
+        with self.verrou:
+            self.seaux[cle] = (valeur, time.monotonic() + timeout)
+            self.seaux.move_to_end(cle)
+            while len(self.seaux) > self.taille_max:
+                self.seaux.popitem(last=False)
+
+    def clear(self):
+        with self.verrou:
+            self.seaux.clear()
+
+
+seaux_locaux = SeauxLocaux()
+
+
+def _prelever_redis(stockage, seaux, maintenant):
+    client = stockage._cache.get_client(seaux[0][0], write=True)
+    script = client.register_script(SCRIPT_PRELEVER)
+    arguments = [maintenant]
+    for _, capacite, periode in seaux:
+        arguments += [capacite, capacite / periode, math.ceil(periode) + 1]
+    return float(script(keys=[stockage.make_and_validate_key(cle) for cle, _, _ in seaux], args=arguments))
+
+
+def _prelever_verrou(stockage, seaux, maintenant):
+    with _verrou:
+        restants, attente = [], 0
+        for cle, capacite, periode in seaux:
+            remplissage = capacite / periode
+            jetons, instant = stockage.get(cle) or (capacite, maintenant)
+            jetons = min(capacite, jetons + max(0, maintenant - instant) * remplissage)
+            if jetons < 1:
+                attente = max(attente, (1 - jetons) / remplissage)
+            restants.append(jetons)
+        if attente:
+            return attente
+        for (cle, _, periode), jetons in zip(seaux, restants):
+            # Seau de nouveau plein après `periode` : inutile de le garder au-delà
+            stockage.set(cle, (jetons - 1, maintenant), math.ceil(periode) + 1)
+    return 0
+
+
+def prelever(seaux):
+    """
+    Prélève un jeton de chacun des `seaux` ((cle, capacite, periode)) s'ils
+    en ont tous un ; retourne 0 si la requête passe, sinon le nombre de
+    secondes avant que tous aient un jeton disponible
+    """
+    if not seaux:
+        return 0
+    maintenant = time.time()
+    stockage = caches['default']
+    try:
+        if isinstance(stockage, RedisCache):
+            return _prelever_redis(stockage, seaux, maintenant)
+        return _prelever_verrou(stockage, seaux, maintenant)
+    except Exception as exc:
+        # Cache partagé injoignable : limitation par processus
+        logger.warning('Limitation de débit : cache indisponible (%s)', exc)
+        return _prelever_verrou(seaux_locaux, seaux, maintenant)
+
+
+class LimiteDebitAnonyme(BaseThrottle):
+    """Seaux de jetons par IP et par commune pour les écritures anonymes de la portée `throttle_scope`"""
+
+    def allow_request(self, request, view):
+        self.attente = 0
+        if request.method in permissions.SAFE_METHODS or request.user.is_authenticated:
+            return True
+        portee = getattr(view, 'throttle_scope', None)
+        limites = getattr(settings, 'LIMITES_DEBIT', {}).get(portee)
+        if not limites:
+            return True
+
+        tenant = getattr(request, 'tenant', None)
+        # Portail national : pas de seau commun à tous les visiteurs, seulement l'adresse IP
+        identifiants = {'ip': self.get_ident(request), 'commune': tenant.pk if tenant else None}
+        seaux = [
+            (f'debit:{portee}:{nature}:{identifiants[nature]}', *lire_debit(debit))
+            for nature, debit in limites.items() if identifiants.get(nature) is not None
+        ]
+        self.attente = prelever(seaux)
+        return not self.attente
+
+    def wait(self):
+        return self.attente
@@ -0,0 +1,91 @@
+"""
+Commande de benchmark de l'ingestion en lot
+Compare le débit de POST .../bulk/ à celui des POST unitaires
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from actualites.models import Actualite
+from api.bulk import TAILLE_MAX_LOT
+from api.views import ActualiteViewSet
+from communes.models import Commune
+from core.models import Utilisateur
+
+
+SLUG_BENCHMARK = 'benchmark-bulk'
+EMAIL_BENCHMARK = 'benchmark-bulk@ecms.cm'
+
+
+class Command(BaseCommand):
+    help = "Compare le débit de création d'actualités : endpoint unitaire vs endpoint bulk"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--elements', type=int, default=1000, help="Nombre d'actualités créées par mode")
+        parser.add_argument(
+            '--taille-lot', type=int, default=TAILLE_MAX_LOT,
+            help=f'Éléments par requête bulk (max {TAILLE_MAX_LOT})',
+        )
+
+    def handle(self, *args, **options):
+        total = options['elements']
+        taille_lot = min(options['taille_lot'], TAILLE_MAX_LOT)
+        commune, _ = Commune.objects.get_or_create(
+            slug=SLUG_BENCHMARK, defaults={'nom': 'Commune Benchmark Bulk'}
+        )
+        # Auteur réel : Actualite.auteur est une clé étrangère
+        utilisateur, _ = Utilisateur.objects.get_or_create(
+            email=EMAIL_BENCHMARK,
+            defaults={'nom': 'Benchmark', 'role': Utilisateur.Role.SUPER_ADMIN},
+        )
+        self.factory = APIRequestFactory()
+        self.utilisateur = utilisateur
+        try:
+            duree_unitaire = self.mesurer_unitaire(commune, total)
+            duree_bulk = self.mesurer_bulk(commune, total, taille_lot)
+        finally:
+            Actualite.objects.filter(commune=commune).delete()
+            commune.delete()
+            utilisateur.delete()
+
+        self.stdout.write(
+            f'  Unitaire : {total / duree_unitaire:,.0f} éléments/s ({duree_unitaire:.2f}s)'
+        )
+        self.stdout.write(
+            f'  Bulk     : {total / duree_bulk:,.0f} éléments/s ({duree_bulk:.2f}s, lots de {taille_lot})'
+        )
+        self.stdout.write(self.style.SUCCESS(f'✅ Accélération x{duree_unitaire / duree_bulk:.1f}'))
+
+    def donnees(self, commune, prefixe, numero):
+        return {
+            'commune': commune.id,
+            'titre': f'{prefixe} actualité importée {numero}',
+            'contenu': 'Contenu repris de l\'ancien site de la commune, avec quelques paragraphes de texte.',
+            'categorie': Actualite.Categorie.NOUVELLE,
+            'est_publie': True,
+        }
+
+    def appeler(self, methode, donnees):
+        requete = self.factory.post('/api/v1/actualites/', donnees, format='json')
+        force_authenticate(requete, user=self.utilisateur)
+        response = ActualiteViewSet.as_view({'post': methode})(requete)
+        if response.status_code != 201:
+            raise CommandError(f'{methode} en échec (HTTP {response.status_code}) : {response.data}')
+
+    def mesurer_unitaire(self, commune, total):
+        self.stdout.write(self.style.NOTICE(f'📨 {total} POST unitaires...'))
+        debut = time.monotonic()
+        for numero in range(total):
+            self.appeler('create', self.donnees(commune, 'Unitaire', numero))
+        return time.monotonic() - debut
+
+    def mesurer_bulk(self, commune, total, taille_lot):
+        self.stdout.write(self.style.NOTICE(f'📦 {total} éléments par lots de {taille_lot}...'))
+        debut = time.monotonic()
+        for depart in range(0, total, taille_lot):
+            self.appeler('bulk', [
+                self.donnees(commune, 'Bulk', numero)
+                for numero in range(depart, min(depart + taille_lot, total))
+            ])
+        return time.monotonic() - debut
@@ -0,0 +1,110 @@
+"""
+Commande de benchmark des exports en streaming
+Vérifie que la mémoire du worker reste stable pendant un export volumineux
+"""
+import resource
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.views import ContactViewSet
+from communes.models import Commune
+from core.models import Utilisateur
+from services.models import Contact
+
+
+SLUG_BENCHMARK = 'benchmark-export'
+
+
+def rss_mo():
+    """Mémoire résidente actuelle du processus (Mo)"""
+    try:
+        with open('/proc/self/statm') as statm:
+            pages = int(statm.read().split()[1])
+        return pages * resource.getpagesize() / 1024 / 1024
+    except (OSError, IndexError, ValueError):
+        # Hors Linux : pic de mémoire (ko sous Linux, octets sous macOS)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Command(BaseCommand):
+    help = "Mesure débit et mémoire de l'export streaming (contacts) sur un grand volume"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lignes', type=int, default=1_000_000, help='Nombre de lignes exportées')
+        parser.add_argument('--format', choices=['csv', 'ndjson'], default='csv', dest='format_export')
+        parser.add_argument('--taille-lot', type=int, default=5000, help='Taille des lots de bulk_create')
+        parser.add_argument(
+            '--seuil-mo', type=float, default=50.0,
+            help='Croissance mémoire maximale tolérée pendant l\'export (Mo)',
+        )
+        parser.add_argument('--garder', action='store_true', help='Conserve les données générées')
+
+    def handle(self, *args, **options):
+        commune, _ = Commune.objects.get_or_create(
+            slug=SLUG_BENCHMARK, defaults={'nom': 'Commune Benchmark Export'}
+        )
+        try:
+            self.generer(commune, options['lignes'], options['taille_lot'])
+            self.mesurer(commune, options['lignes'], options['format_export'], options['seuil_mo'])
+        finally:
+            if not options['garder']:
+                Contact.objects.filter(commune=commune).delete()
+                commune.delete()
+
+    def generer(self, commune, total, taille_lot):
+        existants = Contact.objects.filter(commune=commune).count()
+        if existants >= total:
+            return
+        self.stdout.write(self.style.NOTICE(f'🏗️  Génération de {total - existants} contacts...'))
+        debut = time.monotonic()
+        for depart in range(existants, total, taille_lot):
+            Contact.objects.bulk_create([
+                Contact(
+                    commune=commune,
+                    nom=f'Citoyen {i}',
+                    email=f'citoyen{i}@example.cm',
+                    telephone='+237600000000',
+                    sujet=f'Demande n°{i}',
+                    message='Bonjour, je souhaite obtenir des informations sur les horaires de la mairie.',
+                )
+                for i in range(depart, min(depart + taille_lot, total))
+            ])
+        self.stdout.write(f'  Généré en {time.monotonic() - debut:.1f}s')
+
+    def mesurer(self, commune, total, format_export, seuil_mo):
+        requete = APIRequestFactory().get(
+            '/api/v1/contacts/export/', {'commune': commune.id, 'format_export': format_export}
+        )
+        # Utilisateur non enregistré : aucune écriture en base
+        force_authenticate(requete, user=Utilisateur(email='benchmark@ecms.cm', role=Utilisateur.Role.SUPER_ADMIN))
+        response = ContactViewSet.as_view({'get': 'export'})(requete)
+        if response.status_code != 200:
+            raise CommandError(f'Export en échec (HTTP {response.status_code})')
+
+        self.stdout.write(self.style.NOTICE(f'📤 Export {format_export} de {total} lignes...'))
+        rss_debut = rss_max = rss_mo()
+        lignes = octets = 0
+        debut = time.monotonic()
+        for morceau in response.streaming_content:
+            lignes += 1
+            octets += len(morceau)
+            if lignes % 50_000 == 0:
+                rss_max = max(rss_max, rss_mo())
+        duree = time.monotonic() - debut
+        rss_max = max(rss_max, rss_mo())
+
+        lignes_donnees = lignes - 1 if format_export == 'csv' else lignes
+        croissance = rss_max - rss_debut
+        self.stdout.write(
+            f'  {lignes_donnees} lignes, {octets / 1024 / 1024:.1f} Mo en {duree:.1f}s '
+            f'({lignes_donnees / max(duree, 1e-9):,.0f} lignes/s)'
+        )
+        self.stdout.write(f'  RSS début {rss_debut:.1f} Mo, max {rss_max:.1f} Mo (+{croissance:.1f} Mo)')
+
+        if lignes_donnees != total:
+            raise CommandError(f'{lignes_donnees} lignes exportées au lieu de {total}')
+        if croissance > seuil_mo:
+            raise CommandError(f'Mémoire en hausse de {croissance:.1f} Mo (seuil {seuil_mo} Mo)')
+        self.stdout.write(self.style.SUCCESS('✅ Mémoire stable pendant l\'export'))
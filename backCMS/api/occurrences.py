@@ -0,0 +1,144 @@
+"""
+API Occurrences - E-CMS
+Listes d'événements où les séries récurrentes sont développées en
+occurrences (voir evenements.recurrence), sans rien enregistrer en base
+"""
+import copy
+import heapq
+import itertools
+from datetime import timedelta
+from functools import cmp_to_key
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from drf_spectacular.utils import extend_schema
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from evenements import recurrence
+
+from .serializers import FenetreEvenementsSerializer
+
+
+# Événements développés en occurrences (règle renseignée)
+SERIES = Q(est_recurrent=True) & ~Q(recurrence='')
+
+
+def horizon():
+    """Jours d'occurrences listés quand la fenêtre n'a pas de fin"""
+    return getattr(settings, 'EVENEMENTS_HORIZON_RECURRENCE', 90)
+
+
+def fenetre_max():
+    return getattr(settings, 'EVENEMENTS_FENETRE_MAX', 366)
+
+
+def cle_tri(ordre):
+    """Clé de tri Python équivalente à order_by(*ordre)"""
+    champs = [(champ.lstrip('-'), champ.startswith('-')) for champ in ordre]
+
+    def comparer(a, b):
+        for champ, decroissant in champs:
+            valeur_a, valeur_b = getattr(a, champ), getattr(b, champ)
+            if valeur_a == valeur_b:
+                continue
+            resultat = -1 if valeur_a < valeur_b else 1
+            return -resultat if decroissant else resultat
+        return 0
+
+    return cmp_to_key(comparer)
+
+
+def developper(series, du, au):
+    """Occurrences des `series` du `du` au `au` : copies datées du jour de l'occurrence"""
+    occurrences = []
+    for serie in series:
+        for jour in recurrence.dates_evenement(serie, du, au):
+            occurrence = copy.copy(serie)
+            occurrence.date = jour
+            occurrences.append(occurrence)
+    return occurrences
+
+
+class ListeFusionnee:
+    """
+    Événements uniques (queryset trié, lu à la demande) et occurrences
+    (liste en mémoire) fusionnés dans l'ordre `ordre`. Une page ne lit en
+    base que les événements uniques qui peuvent y figurer (LIMIT).
+    """
+
+    def __init__(self, uniques, occurrences, ordre):
+        self.uniques = uniques.order_by(*ordre)
+        self.cle = cle_tri(ordre)
+        self.occurrences = sorted(occurrences, key=self.cle)
+
+    def count(self):
+        return self.uniques.count() + len(self.occurrences)
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        # Les `stop` premiers éléments fusionnés viennent des `stop` premiers de chaque liste
+        uniques = self.uniques if index.stop is None else self.uniques[:index.stop]
+        fusion = heapq.merge(uniques, self.occurrences, key=self.cle)
+        return list(itertools.islice(fusion, index.start, index.stop))
+
+
+def fusionner(queryset, du, au, uniques_du=None, uniques_au=None, ordre=None):
+    """
+    ListeFusionnee des événements de `queryset` : uniques (entre `uniques_du`
+    et `uniques_au` s'ils sont donnés) et occurrences des séries du `du` au `au`
+    """
+    ordre = ordre or list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+    uniques = queryset.exclude(SERIES)
+    if uniques_du is not None:
+        uniques = uniques.filter(date__gte=uniques_du)
+    if uniques_au is not None:
+        uniques = uniques.filter(date__lte=uniques_au)
+    series = queryset.filter(SERIES, date__lte=au).order_by()
+    return ListeFusionnee(uniques, developper(series, du, au), ordre)
+
+
+class OccurrencesMixin:
+    """
+    Liste d'événements avec les séries récurrentes développées dans la fenêtre
+    `du` / `au` (incluse). `a_venir=true` fait commencer la fenêtre aujourd'hui.
+    Sans `au`, les événements uniques ne sont pas bornés et les occurrences
+    s'arrêtent après EVENEMENTS_HORIZON_RECURRENCE jours ; une fenêtre
+    d'occurrences dépasse au plus EVENEMENTS_FENETRE_MAX jours.
+    `occurrences=false` liste les séries telles qu'enregistrées.
+    """
+
+    @extend_schema(parameters=[FenetreEvenementsSerializer])
+    def list(self, request, *args, **kwargs):
+        parametres = FenetreEvenementsSerializer(data=request.query_params.dict())
+        parametres.is_valid(raise_exception=True)
+        du, au = parametres.validated_data.get('du'), parametres.validated_data.get('au')
+        if du is None and parametres.validated_data['a_venir']:
+            du = timezone.localdate()
+
+        queryset = self.filter_queryset(self.get_queryset())
+        if not parametres.validated_data['occurrences']:
+            # Séries en cours incluses quelle que soit leur date de début
+            if du is not None:
+                queryset = queryset.filter(Q(date__gte=du) | SERIES)
+            if au is not None:
+                queryset = queryset.filter(date__lte=au)
+            liste = queryset
+        else:
+            debut = du or timezone.localdate()
+            fin = au or debut + timedelta(days=horizon())
+            if (fin - debut).days >= fenetre_max():
+                raise serializers.ValidationError({'au': f'Fenêtre limitée à {fenetre_max()} jours.'})
+            liste = fusionner(queryset, debut, fin, uniques_du=du, uniques_au=au)
+
+        page = self.paginate_queryset(liste)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer(liste[0:None] if isinstance(liste, ListeFusionnee) else liste, many=True)
+        return Response(serializer.data)
@@ -2,16 +2,26 @@
 API Serializers - E-CMS
 Serializers pour toutes les entités du CMS
 """
+import re
+from datetime import timedelta
+
 from rest_framework import serializers
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 from core.models import ConfigurationPortail, TokenVerification
 from communes.models import (
     Region, Departement, Commune, DemandeCreationSite,
     ServiceMunicipal, EquipeMunicipale
 )
+from actualites.imports import normaliser_email
 from actualites.models import Actualite, PageCMS, FAQ, Newsletter, AbonneNewsletter
+from evenements import disponibilites, recurrence
 from evenements.models import Evenement, InscriptionEvenement, RendezVous
+from medias import televersements
+from medias.models import Televersement
+from medias.serializers import PhotoReduiteField, TeleversementMixin, VariantesImageField, VignetteField
 from services.models import Formulaire, Demarche, Signalement, Contact
 from transparence.models import Projet, Deliberation, DocumentBudgetaire, DocumentOfficiel
 
@@ -118,11 +128,14 @@ class CommuneListSerializer(serializers.ModelSerializer):
     departement_nom = serializers.CharField(source='departement.nom', read_only=True)
     region_nom = serializers.CharField(source='departement.region.nom', read_only=True)
     statut_display = serializers.CharField(source='get_statut_display', read_only=True)
+    # Listes : vignettes uniquement
+    logo = VignetteField()
+    logo_variantes = VariantesImageField(source='logo', vignettes=True)
     
     class Meta:
         model = Commune
         fields = [
-            'id', 'nom', 'slug', 'logo', 'departement_nom', 'region_nom',
+            'id', 'nom', 'slug', 'logo', 'logo_variantes', 'departement_nom', 'region_nom',
             'population', 'statut', 'statut_display'
         ]
 
@@ -134,6 +147,9 @@ class CommuneDetailSerializer(serializers.ModelSerializer):
     statut_display = serializers.CharField(source='get_statut_display', read_only=True)
     services = serializers.SerializerMethodField()
     equipe = serializers.SerializerMethodField()
+    logo_variantes = VariantesImageField(source='logo')
+    banniere_variantes = VariantesImageField(source='banniere')
+    photo_maire_variantes = VariantesImageField(source='photo_maire')
     
     class Meta:
         model = Commune
@@ -160,6 +176,7 @@ class ServiceMunicipalSerializer(serializers.ModelSerializer):
 class EquipeMunicipaleSerializer(serializers.ModelSerializer):
     """Serializer pour l'équipe municipale"""
     fonction_display = serializers.CharField(source='get_fonction_display', read_only=True)
+    photo_variantes = VariantesImageField(source='photo')
     
     class Meta:
         model = EquipeMunicipale
@@ -183,11 +200,13 @@ class ActualiteListSerializer(serializers.ModelSerializer):
     commune_nom = serializers.CharField(source='commune.nom', read_only=True)
     auteur_nom = serializers.CharField(source='auteur.nom', read_only=True)
     categorie_display = serializers.CharField(source='get_categorie_display', read_only=True)
+    image_principale = VignetteField()
+    image_principale_variantes = VariantesImageField(source='image_principale', vignettes=True)
     
     class Meta:
         model = Actualite
         fields = [
-            'id', 'titre', 'slug', 'resume', 'image_principale',
+            'id', 'titre', 'slug', 'resume', 'image_principale', 'image_principale_variantes',
             'categorie', 'categorie_display', 'commune', 'commune_nom',
             'auteur_nom', 'est_publie', 'est_mis_en_avant',
             'date_publication', 'nombre_vues'
@@ -199,6 +218,7 @@ class ActualiteDetailSerializer(serializers.ModelSerializer):
     commune_nom = serializers.CharField(source='commune.nom', read_only=True)
     auteur_nom = serializers.CharField(source='auteur.nom', read_only=True)
     categorie_display = serializers.CharField(source='get_categorie_display', read_only=True)
+    image_principale_variantes = VariantesImageField(source='image_principale')
     
     class Meta:
         model = Actualite
@@ -235,6 +255,13 @@ class NewsletterSerializer(serializers.ModelSerializer):
     class Meta:
         model = Newsletter
         fields = '__all__'
+    
+    def validate(self, data):
+        statut = data.get('statut', getattr(self.instance, 'statut', None))
+        date_envoi = data.get('date_envoi', getattr(self.instance, 'date_envoi', None))
+        if statut == Newsletter.Statut.PLANIFIEE and not date_envoi:
+            raise serializers.ValidationError({'date_envoi': 'Date d\'envoi requise pour une newsletter planifiée'})
+        return data
 
 
 class AbonneNewsletterSerializer(serializers.ModelSerializer):
@@ -244,6 +271,16 @@ class AbonneNewsletterSerializer(serializers.ModelSerializer):
         model = AbonneNewsletter
         fields = ['id', 'commune', 'email', 'nom', 'est_actif', 'date_inscription']
         read_only_fields = ['date_inscription', 'token_desinscription']
+    
+    def validate_email(self, value):
+        # Même forme canonique que l'import CSV (unicité commune + email)
+        return normaliser_email(value) or value
+
+
+class ImportAbonnesSerializer(serializers.Serializer):
+    """Import CSV des abonnés d'une commune"""
+    commune = serializers.PrimaryKeyRelatedField(queryset=Commune.objects.all())
+    fichier = serializers.FileField()
 
 
 # ===== EVENEMENTS SERIALIZERS =====
@@ -254,24 +291,44 @@ class EvenementListSerializer(serializers.ModelSerializer):
     categorie_display = serializers.CharField(source='get_categorie_display', read_only=True)
     statut_display = serializers.CharField(source='get_statut_display', read_only=True)
     places_restantes = serializers.IntegerField(read_only=True)
+    image = VignetteField()
+    image_variantes = VariantesImageField(source='image', vignettes=True)
     
     class Meta:
         model = Evenement
         fields = [
             'id', 'nom', 'slug', 'description', 'date', 'heure_debut', 'heure_fin',
             'lieu', 'categorie', 'categorie_display', 'statut', 'statut_display',
-            'image', 'commune', 'commune_nom', 'inscription_requise',
+            'image', 'image_variantes', 'commune', 'commune_nom', 'inscription_requise',
             'places_limitees', 'nombre_places', 'places_restantes',
-            'est_public', 'est_mis_en_avant'
+            'est_public', 'est_mis_en_avant', 'est_recurrent', 'recurrence'
         ]
 
 
+class FenetreEvenementsSerializer(serializers.Serializer):
+    """Paramètres des listes d'événements (séries récurrentes développées en occurrences)"""
+    du = serializers.DateField(required=False, help_text='Premier jour (inclus)')
+    au = serializers.DateField(required=False, help_text='Dernier jour (inclus)')
+    a_venir = serializers.BooleanField(required=False, default=False, help_text='Fenêtre à partir d\'aujourd\'hui')
+    occurrences = serializers.BooleanField(
+        required=False, default=True,
+        help_text='false : séries récurrentes telles qu\'enregistrées, sans développement'
+    )
+    
+    def validate(self, data):
+        if data.get('du') and data.get('au') and data['au'] < data['du']:
+            raise serializers.ValidationError({'au': 'La fin de la fenêtre doit suivre son début.'})
+        return data
+
+
 class EvenementDetailSerializer(serializers.ModelSerializer):
     """Serializer détail d'un événement"""
     commune_nom = serializers.CharField(source='commune.nom', read_only=True)
     categorie_display = serializers.CharField(source='get_categorie_display', read_only=True)
     statut_display = serializers.CharField(source='get_statut_display', read_only=True)
     places_restantes = serializers.IntegerField(read_only=True)
+    image_variantes = VariantesImageField(source='image')
+    dates_exclues = serializers.ListField(child=serializers.DateField(), required=False)
     
     class Meta:
         model = Evenement
@@ -283,6 +340,14 @@ class EvenementDetailSerializer(serializers.ModelSerializer):
             'heure_fin': {'required': False},
             'adresse': {'required': False},
         }
+    
+    def validate_recurrence(self, value):
+        if value:
+            try:
+                recurrence.lire(value)
+            except recurrence.RegleInvalide as exc:
+                raise serializers.ValidationError(str(exc))
+        return value
 
 
 class InscriptionEvenementSerializer(serializers.ModelSerializer):
@@ -306,6 +371,58 @@ class RendezVousSerializer(serializers.ModelSerializer):
         model = RendezVous
         fields = '__all__'
         read_only_fields = ['date_creation']
+    
+    def validate(self, data):
+        # Mise à jour partielle : heures manquantes lues sur le rendez-vous
+        debut = data.get('heure_debut', getattr(self.instance, 'heure_debut', None))
+        fin = data.get('heure_fin', getattr(self.instance, 'heure_fin', None))
+        if debut is not None and fin is not None and fin <= debut:
+            raise serializers.ValidationError({'heure_fin': 'L\'heure de fin doit suivre l\'heure de début.'})
+        return data
+
+
+class DisponibilitesRequeteSerializer(serializers.Serializer):
+    """Paramètres de la recherche de créneaux libres (fenêtre de 14 jours par défaut)"""
+    service = serializers.PrimaryKeyRelatedField(
+        queryset=ServiceMunicipal.objects.filter(est_actif=True).select_related('commune')
+    )
+    du = serializers.DateField(required=False)
+    au = serializers.DateField(required=False)
+    
+    def validate(self, data):
+        aujourd_hui = timezone.localdate()
+        # Pas de créneau dans le passé
+        du = max(data.get('du') or aujourd_hui, aujourd_hui)
+        au = data.get('au') or du + timedelta(days=13)
+        if au < du:
+            raise serializers.ValidationError({'au': 'La fin de la fenêtre doit suivre son début (et aujourd\'hui).'})
+        if (au - du).days >= disponibilites.fenetre_max():
+            raise serializers.ValidationError({
+                'au': f'Fenêtre limitée à {disponibilites.fenetre_max()} jours.'
+            })
+        data['du'], data['au'] = du, au
+        return data
+
+
+class CreneauSerializer(serializers.Serializer):
+    """Créneau libre (heures locales HH:MM)"""
+    debut = serializers.CharField()
+    fin = serializers.CharField()
+
+
+class DisponibiliteJourSerializer(serializers.Serializer):
+    """Créneaux libres d'un jour"""
+    date = serializers.DateField()
+    creneaux = CreneauSerializer(many=True)
+
+
+class DisponibilitesSerializer(serializers.Serializer):
+    """Créneaux libres d'un service sur une fenêtre"""
+    service = serializers.IntegerField()
+    duree = serializers.IntegerField(help_text='Durée d\'un créneau (minutes)')
+    du = serializers.DateField()
+    au = serializers.DateField()
+    jours = DisponibiliteJourSerializer(many=True)
 
 
 # ===== SERVICES SERIALIZERS =====
@@ -351,12 +468,25 @@ class SignalementSerializer(serializers.ModelSerializer):
     commune_nom = serializers.CharField(source='commune.nom', read_only=True)
     categorie_display = serializers.CharField(source='get_categorie_display', read_only=True)
     statut_display = serializers.CharField(source='get_statut_display', read_only=True)
+    photo = PhotoReduiteField(required=False, allow_null=True)
+    photo_variantes = VariantesImageField(source='photo')
     
     class Meta:
         model = Signalement
         fields = '__all__'
         read_only_fields = ['numero_suivi', 'date_signalement']
 
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        gps = getattr(attrs.get('photo'), 'gps', None)
+        if gps:
+            # Position de la photo reprise si le signalement n'en a pas
+            latitude = attrs.get('latitude', getattr(self.instance, 'latitude', None))
+            longitude = attrs.get('longitude', getattr(self.instance, 'longitude', None))
+            if latitude is None and longitude is None:
+                attrs['latitude'], attrs['longitude'] = gps
+        return attrs
+
 
 class ContactSerializer(serializers.ModelSerializer):
     """Serializer pour les messages de contact"""
@@ -374,6 +504,8 @@ class ProjetListSerializer(serializers.ModelSerializer):
     commune_nom = serializers.CharField(source='commune.nom', read_only=True)
     categorie_display = serializers.CharField(source='get_categorie_display', read_only=True)
     statut_display = serializers.CharField(source='get_statut_display', read_only=True)
+    image_principale = VignetteField()
+    image_principale_variantes = VariantesImageField(source='image_principale', vignettes=True)
     
     class Meta:
         model = Projet
@@ -381,7 +513,7 @@ class ProjetListSerializer(serializers.ModelSerializer):
             'id', 'titre', 'slug', 'budget', 'budget_depense', 'avancement',
             'date_debut', 'date_fin', 'categorie', 'categorie_display',
             'statut', 'statut_display', 'commune', 'commune_nom',
-            'image_principale', 'est_public', 'est_mis_en_avant'
+            'image_principale', 'image_principale_variantes', 'est_public', 'est_mis_en_avant'
         ]
 
 
@@ -390,22 +522,24 @@ class ProjetDetailSerializer(serializers.ModelSerializer):
     commune_nom = serializers.CharField(source='commune.nom', read_only=True)
     categorie_display = serializers.CharField(source='get_categorie_display', read_only=True)
     statut_display = serializers.CharField(source='get_statut_display', read_only=True)
+    image_principale_variantes = VariantesImageField(source='image_principale')
     
     class Meta:
         model = Projet
         fields = '__all__'
 
 
-class DeliberationSerializer(serializers.ModelSerializer):
+class DeliberationSerializer(TeleversementMixin, serializers.ModelSerializer):
     """Serializer pour les délibérations"""
     commune_nom = serializers.CharField(source='commune.nom', read_only=True)
     
     class Meta:
         model = Deliberation
         fields = '__all__'
+        extra_kwargs = {'fichier': {'required': False}}
 
 
-class DocumentBudgetaireSerializer(serializers.ModelSerializer):
+class DocumentBudgetaireSerializer(TeleversementMixin, serializers.ModelSerializer):
     """Serializer pour les documents budgétaires"""
     commune_nom = serializers.CharField(source='commune.nom', read_only=True)
     type_display = serializers.CharField(source='get_type_document_display', read_only=True)
@@ -413,9 +547,10 @@ class DocumentBudgetaireSerializer(serializers.ModelSerializer):
     class Meta:
         model = DocumentBudgetaire
         fields = '__all__'
+        extra_kwargs = {'fichier': {'required': False}}
 
 
-class DocumentOfficielSerializer(serializers.ModelSerializer):
+class DocumentOfficielSerializer(TeleversementMixin, serializers.ModelSerializer):
     """Serializer pour les documents officiels"""
     commune_nom = serializers.CharField(source='commune.nom', read_only=True)
     type_display = serializers.CharField(source='get_type_document_display', read_only=True)
@@ -423,6 +558,39 @@ class DocumentOfficielSerializer(serializers.ModelSerializer):
     class Meta:
         model = DocumentOfficiel
         fields = '__all__'
+        extra_kwargs = {'fichier': {'required': False}}
+
+
+class TeleversementSerializer(serializers.ModelSerializer):
+    """Serializer pour les téléversements fragmentés"""
+    taille_fragment = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = Televersement
+        fields = ['id', 'nom_fichier', 'taille', 'empreinte', 'recu', 'statut', 'taille_fragment', 'date_creation']
+        read_only_fields = ['recu', 'statut', 'date_creation']
+    
+    def get_taille_fragment(self, obj):
+        return televersements.taille_fragment()
+    
+    def validate_nom_fichier(self, value):
+        extensions = getattr(settings, 'TELEVERSEMENTS_EXTENSIONS', ['.pdf'])
+        if not value.lower().endswith(tuple(extensions)):
+            raise serializers.ValidationError(f"Extensions acceptées : {', '.join(extensions)}.")
+        return value
+    
+    def validate_taille(self, value):
+        if not 0 < value <= televersements.taille_max():
+            raise serializers.ValidationError(
+                f'La taille doit être comprise entre 1 et {televersements.taille_max()} octets.'
+            )
+        return value
+    
+    def validate_empreinte(self, value):
+        value = value.lower()
+        if not re.fullmatch(r'[0-9a-f]{64}', value):
+            raise serializers.ValidationError('Empreinte SHA-256 attendue (64 caractères hexadécimaux).')
+        return value
 
 
 # ===== AUTH SERIALIZERS =====
@@ -1,8 +1,15 @@
 """
 Tests pour l'API REST - ViewSets et endpoints
 """
+import json
+import threading
 from datetime import date, timedelta
-from django.test import TestCase
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.base import BaseCache
+from django.db import IntegrityError, connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 from rest_framework.test import APITestCase, APIClient
@@ -14,6 +21,10 @@ from actualites.models import Actualite, PageCMS, FAQ, AbonneNewsletter
 from services.models import Demarche, Signalement, Contact, Formulaire
 from transparence.models import Projet, Deliberation, DocumentBudgetaire, DocumentOfficiel
 from evenements.models import Evenement
+from recherche.models import SearchDocument
+
+from .exports import _valeur
+from .limitation import prelever, seaux_locaux
 
 Utilisateur = get_user_model()
 
@@ -22,6 +33,8 @@ class BaseAPITestCase(APITestCase):
     """Classe de base pour les tests API"""
     
     def setUp(self):
+        # Seaux de limitation de débit gardés dans le cache d'un test à l'autre
+        cache.clear()
         self.client = APIClient()
         self.region = Region.objects.create(nom='Centre', code='CE')
         self.departement = Departement.objects.create(
@@ -200,6 +213,48 @@ class NewsletterAPITest(BaseAPITestCase):
         }
         response = self.client.post('/api/v1/newsletter/abonnes/', data)
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_subscribe_email_normalise(self):
+        """Test l'email est normalisé (doublon malgré la casse)"""
+        AbonneNewsletter.objects.create(commune=self.commune, email='existing@test.cm')
+        data = {'commune': self.commune.id, 'email': ' Existing@TEST.cm '}
+        response = self.client.post('/api/v1/newsletter/abonnes/', data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def fichier_csv(self, contenu):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        return SimpleUploadedFile('abonnes.csv', contenu.encode('utf-8-sig'), content_type='text/csv')
+    
+    @override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=0)
+    def test_import_abonnes_csv(self):
+        """Test import CSV (fichier stocké sur disque) et bilan"""
+        AbonneNewsletter.objects.create(commune=self.commune, email='existing@test.cm')
+        self.auth_as(self.admin_commune)
+        response = self.client.post('/api/v1/newsletter/abonnes/importer/', {
+            'commune': self.commune.id,
+            'fichier': self.fichier_csv('email,nom\nElodie@test.cm,Élodie\nexisting@test.cm,X\nfaux\n'),
+        }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            (response.data['inseres'], response.data['doublons'], response.data['invalides']), (1, 1, 1)
+        )
+        self.assertEqual(AbonneNewsletter.objects.get(email='elodie@test.cm').nom, 'Élodie')
+    
+    def test_import_abonnes_permissions(self):
+        """Test import réservé aux gestionnaires de la commune"""
+        fichier = self.fichier_csv('a@test.cm\n')
+        response = self.client.post('/api/v1/newsletter/abonnes/importer/', {
+            'commune': self.commune.id, 'fichier': fichier,
+        }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        
+        autre = Commune.objects.create(nom='Autre', slug='autre', statut=Commune.Statut.ACTIVE)
+        self.auth_as(self.admin_commune)
+        response = self.client.post('/api/v1/newsletter/abonnes/importer/', {
+            'commune': autre.id, 'fichier': self.fichier_csv('a@test.cm\n'),
+        }, format='multipart')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(AbonneNewsletter.objects.exists())
 
 
 class ServicesMunicipauxAPITest(BaseAPITestCase):
@@ -722,7 +777,7 @@ class NewsletterAdvancedAPITest(BaseAPITestCase):
         """Test envoi newsletter"""
         self.auth_as(self.admin_commune)
         response = self.client.post(f'/api/v1/newsletters/{self.newsletter.id}/envoyer/')
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
         self.assertTrue(response.data['success'])
         self.assertEqual(response.data['destinataires'], 1)
     
@@ -736,6 +791,39 @@ class NewsletterAdvancedAPITest(BaseAPITestCase):
         response = self.client.post(f'/api/v1/newsletters/{self.newsletter.id}/envoyer/')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
     
+    def test_newsletter_planifiee_sans_date(self):
+        """Test une newsletter planifiée exige une date d'envoi"""
+        self.auth_as(self.admin_commune)
+        response = self.client.post('/api/v1/newsletters/', {
+            'commune': self.commune.id, 'titre': 'Plus tard', 'contenu': '...', 'statut': 'planifiee',
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('date_envoi', response.data)
+    
+    def test_newsletter_pixel_ouverture(self):
+        """Test pixel de suivi : GIF immédiat, ouverture comptée une fois"""
+        from django.core.cache import cache
+        from actualites.suivi import jeton_ouverture, tampon
+        cache.clear()
+        url = f'/api/v1/newsletter/ouverture/{jeton_ouverture(self.newsletter.id, 7)}.gif'
+        for _ in range(3):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response['Content-Type'], 'image/gif')
+        self.assertEqual(self.client.get('/api/v1/newsletter/ouverture/invalide.gif').status_code, 200)
+        
+        # Refusé sans droits, sans rien écrire
+        response = self.client.get(f'/api/v1/newsletters/{self.newsletter.id}/statistiques/')
+        self.assertIn(response.status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
+        self.newsletter.refresh_from_db()
+        self.assertEqual(self.newsletter.nombre_ouvertures, 0)
+        
+        # Écriture du minuteur
+        tampon.vider()
+        self.auth_as(self.admin_commune)
+        response = self.client.get(f'/api/v1/newsletters/{self.newsletter.id}/statistiques/')
+        self.assertEqual(response.data['nombre_ouvertures'], 1)
+    
     def test_newsletter_statistiques(self):
         """Test stats newsletter"""
         self.auth_as(self.admin_commune)
@@ -804,6 +892,141 @@ class EvenementInscriptionAPITest(BaseAPITestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
 
+class CacheInjoignable(BaseCache):
+    """Cache dont le serveur ne répond pas"""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+
+    def get(self, key, default=None, version=None):
+        raise ConnectionError('cache injoignable')
+
+    def set(self, key, value, timeout=None, version=None):
+        raise ConnectionError('cache injoignable')
+
+
+@override_settings(LIMITES_DEBIT={
+    'signalements': {'ip': '2/h', 'commune': '3/h'},
+    'connexion': {'ip': '1/min', 'commune': '100/min'},
+})
+class LimitationDebitAPITest(BaseAPITestCase):
+    """Tests de la limitation de débit des écritures anonymes"""
+
+    def tearDown(self):
+        cache.clear()
+        seaux_locaux.clear()
+
+    def signaler(self, ip='10.0.0.1', host='testserver'):
+        return self.client.post('/api/v1/signalements/', {
+            'commune': self.commune.id, 'titre': 'Nid de poule', 'description': 'Chaussée dégradée',
+        }, REMOTE_ADDR=ip, HTTP_HOST=host)
+
+    def test_seau_par_ip(self):
+        """Test rafale acceptée puis 429 avec Retry-After, sans accès à la base"""
+        self.assertEqual(self.signaler().status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.signaler().status_code, status.HTTP_201_CREATED)
+
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.signaler()
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        # Un jeton toutes les 30 minutes
+        self.assertTrue(1700 < int(response['Retry-After']) <= 1800)
+        self.assertEqual(len(requetes), 0)
+
+        self.assertEqual(self.signaler(ip='10.0.0.2').status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Signalement.objects.count(), 3)
+
+    def test_seau_par_commune(self):
+        """Test le seau de la commune (tenant) limite toutes les adresses"""
+        for ip in ('10.0.0.1', '10.0.0.2', '10.0.0.3'):
+            self.assertEqual(self.signaler(ip=ip, host='test-commune.localhost').status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            self.signaler(ip='10.0.0.4', host='test-commune.localhost').status_code,
+            status.HTTP_429_TOO_MANY_REQUESTS,
+        )
+
+    def test_refus_commune_sans_prelevement_ip(self):
+        """Test une requête refusée par le seau de la commune ne consomme pas le jeton de son adresse"""
+        self.signaler(ip='10.0.0.1', host='test-commune.localhost')
+        self.signaler(ip='10.0.0.1', host='test-commune.localhost')
+        self.signaler(ip='10.0.0.2', host='test-commune.localhost')
+        self.assertEqual(
+            self.signaler(ip='10.0.0.3', host='test-commune.localhost').status_code,
+            status.HTTP_429_TOO_MANY_REQUESTS,
+        )
+        # Seau de 10.0.0.3 intact : rafale de 2 sur le portail national
+        self.assertEqual(self.signaler(ip='10.0.0.3').status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.signaler(ip='10.0.0.3').status_code, status.HTTP_201_CREATED)
+
+    def test_portail_sans_seau_commun(self):
+        """Test le portail national ne partage pas un seau entre toutes les adresses"""
+        for numero in range(1, 6):
+            self.assertEqual(self.signaler(ip=f'10.0.0.{numero}').status_code, status.HTTP_201_CREATED)
+
+    def test_x_forwarded_for_ignore_sans_proxy(self):
+        """Test sans proxy déclaré (API_NOMBRE_PROXYS=0), X-Forwarded-For ne change pas l'adresse"""
+        for ip in ('1.2.3.4', '5.6.7.8'):
+            response = self.client.post('/api/v1/signalements/', {
+                'commune': self.commune.id, 'titre': 'Test', 'description': 'Test',
+            }, REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR=ip)
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.signaler().status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    @override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1})
+    def test_adresse_derriere_le_proxy(self):
+        """Test l'adresse du client est celle ajoutée par nginx à X-Forwarded-For"""
+        self.assertEqual(self.signaler().status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.signaler().status_code, status.HTTP_201_CREATED)
+        # Adresse falsifiée par le client en tête de X-Forwarded-For : ignorée
+        response = self.client.post('/api/v1/signalements/', {
+            'commune': self.commune.id, 'titre': 'Test', 'description': 'Test',
+        }, REMOTE_ADDR='172.18.0.5', HTTP_X_FORWARDED_FOR='1.2.3.4, 10.0.0.1')
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_authentifie_et_lecture_non_limites(self):
+        """Test les requêtes authentifiées et les lectures ne consomment pas de jeton"""
+        self.auth_as(self.admin_commune)
+        for _ in range(4):
+            self.assertEqual(self.signaler().status_code, status.HTTP_201_CREATED)
+        self.client.credentials()
+        for _ in range(3):
+            self.assertEqual(self.client.get('/api/v1/signalements/', REMOTE_ADDR='10.0.0.1').status_code, 200)
+        self.assertEqual(self.signaler().status_code, status.HTTP_201_CREATED)
+
+    def test_connexion_limitee(self):
+        """Test la connexion est limitée avant la vérification du mot de passe"""
+        donnees = {'email': 'admin@test.cm', 'password': 'mauvais'}
+        self.assertEqual(self.client.post('/api/v1/auth/login/', donnees).status_code, status.HTTP_401_UNAUTHORIZED)
+        response = self.client.post('/api/v1/auth/login/', donnees)
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', response)
+
+    def test_prelevements_simultanes(self):
+        """Test des prélèvements simultanés ne prennent pas deux fois le même jeton"""
+        depart = threading.Barrier(20)
+        acceptes = []
+
+        def demander():
+            depart.wait()
+            if not prelever([('debit:test:ip:10.0.0.9', 5, 3600)]):
+                acceptes.append(1)
+
+        fils = [threading.Thread(target=demander) for _ in range(20)]
+        for fil in fils:
+            fil.start()
+        for fil in fils:
+            fil.join()
+        self.assertEqual(len(acceptes), 5)
+
+    def test_repli_sans_cache(self):
+        """Test cache injoignable : seaux gardés dans la mémoire du processus"""
+        with override_settings(CACHES={'default': {'BACKEND': 'api.tests.CacheInjoignable'}}):
+            with self.assertLogs('api.limitation', 'WARNING'):
+                self.assertEqual(self.signaler().status_code, status.HTTP_201_CREATED)
+                self.assertEqual(self.signaler().status_code, status.HTTP_201_CREATED)
+                self.assertEqual(self.signaler().status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+
 class DashboardAPITest(BaseAPITestCase):
     """Tests pour le dashboard"""
     
@@ -827,3 +1050,264 @@ class DashboardAPITest(BaseAPITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertIn('actualites', response.data)
         self.assertIn('demarches_en_attente', response.data)
+
+
+class ExportAPITest(BaseAPITestCase):
+    """Tests pour les exports CSV / NDJSON en streaming"""
+    
+    def setUp(self):
+        super().setUp()
+        self.autre_commune = Commune.objects.create(
+            nom='Autre Commune', slug='autre-commune', statut=Commune.Statut.ACTIVE
+        )
+        Contact.objects.create(
+            commune=self.commune, nom='Jean', email='jean@test.cm',
+            sujet='=HYPERLINK("x")', message='Bonjour'
+        )
+        Contact.objects.create(
+            commune=self.autre_commune, nom='Paul', email='paul@test.cm',
+            sujet='Autre', message='Bonjour'
+        )
+        Demarche.objects.create(
+            commune=self.commune, type='acte_naissance',
+            donnees={'enfant': 'Ali'}, nom_demandeur='Awa'
+        )
+        self.evenement = Evenement.objects.create(
+            commune=self.commune, nom='Fête', slug='fete', description='Test',
+            date=date.today(), heure_debut='09:00', lieu='Mairie'
+        )
+        self.evenement.inscriptions.create(nom='Awa', email='awa@test.cm')
+    
+    def contenu(self, response):
+        return b''.join(response.streaming_content).decode('utf-8')
+    
+    def test_export_requires_admin(self):
+        """Test export refusé aux anonymes et aux simples utilisateurs"""
+        response = self.client.get('/api/v1/contacts/export/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        
+        citoyen = Utilisateur.objects.create_user(email='citoyen@test.cm', nom='Citoyen', password='pass')
+        self.auth_as(citoyen)
+        response = self.client.get('/api/v1/signalements/export/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+    
+    def test_export_csv_limite_a_la_commune(self):
+        """Test export CSV d'un admin commune (sa commune uniquement)"""
+        self.auth_as(self.admin_commune)
+        response = self.client.get('/api/v1/contacts/export/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment; filename="contacts-', response['Content-Disposition'])
+        lignes = self.contenu(response).lstrip('\ufeff').splitlines()
+        self.assertEqual(len(lignes), 2)
+        self.assertTrue(lignes[0].startswith('id,commune_id,nom,email'))
+        # Protection contre l'injection de formules
+        self.assertIn('\'=HYPERLINK', lignes[1])
+    
+    def test_export_csv_nombres_non_echappes(self):
+        """Test nombres et téléphones exportés tels quels, formules échappées"""
+        self.assertEqual(_valeur('+237 6 99 00 00 00'), '+237 6 99 00 00 00')
+        self.assertEqual(_valeur('-12.5'), '-12.5')
+        self.assertEqual(_valeur('-1+cmd|\' /C calc\'!A0'), '\'-1+cmd|\' /C calc\'!A0')
+        self.assertEqual(_valeur('+ 1'), '\'+ 1')
+        self.assertEqual(_valeur('@SUM(A1)'), '\'@SUM(A1)')
+    
+    def test_export_ndjson_superadmin(self):
+        """Test export NDJSON du super admin avec filtres du ViewSet"""
+        self.auth_as(self.superadmin)
+        response = self.client.get('/api/v1/contacts/export/?format_export=ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(len(self.contenu(response).splitlines()), 2)
+        
+        response = self.client.get(f'/api/v1/demarches/export/?format_export=ndjson&commune={self.commune.id}')
+        ligne = json.loads(self.contenu(response))
+        self.assertEqual(ligne['donnees'], {'enfant': 'Ali'})
+        self.assertEqual(ligne['nom_demandeur'], 'Awa')
+        # Dates au format ISO 8601
+        self.assertRegex(ligne['date_demande'], r'^\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}')
+    
+    def test_export_inscriptions(self):
+        """Test export des inscriptions (commune via l'événement)"""
+        self.auth_as(self.admin_commune)
+        response = self.client.get('/api/v1/inscriptions-evenements/export/?format_export=ndjson')
+        self.assertIn('"evenement__nom": "Fête"', self.contenu(response))
+    
+    def test_export_format_inconnu(self):
+        """Test format d'export invalide"""
+        self.auth_as(self.admin_commune)
+        response = self.client.get('/api/v1/contacts/export/?format_export=xlsx')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BulkAPITest(BaseAPITestCase):
+    """Tests pour la création / mise à jour en lot"""
+    
+    def setUp(self):
+        super().setUp()
+        self.autre_commune = Commune.objects.create(
+            nom='Autre Commune', slug='autre-commune', statut=Commune.Statut.ACTIVE
+        )
+        Actualite.objects.create(
+            commune=self.commune, titre='Marché rénové', slug='marche-renove', contenu='Texte'
+        )
+    
+    def actualite(self, titre, **kwargs):
+        return {'commune': self.commune.id, 'titre': titre, 'contenu': 'Contenu importé', **kwargs}
+    
+    def test_bulk_create_actualites_slugs(self):
+        """Test création en lot avec slugs dédupliqués (base et lot)"""
+        self.auth_as(self.admin_commune)
+        response = self.client.post('/api/v1/actualites/bulk/', [
+            self.actualite('Marché rénové', est_publie=True),
+            self.actualite('Marché rénové'),
+            self.actualite('Budget voté'),
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['nombre'], 3)
+        self.assertEqual(
+            [resultat['slug'] for resultat in response.data['resultats']],
+            ['marche-renove-2', 'marche-renove-3', 'budget-vote']
+        )
+        creee = Actualite.objects.get(slug='marche-renove-2')
+        self.assertEqual(creee.auteur, self.admin_commune)
+        self.assertIsNotNone(creee.date_creation)
+        # Indexée malgré l'absence de post_save
+        self.assertTrue(SearchDocument.objects.filter(
+            type=SearchDocument.Type.ACTUALITE, objet_id=creee.id
+        ).exists())
+    
+    def test_bulk_create_erreurs_par_element(self):
+        """Test erreurs signalées par élément, rien n'est créé"""
+        self.auth_as(self.admin_commune)
+        response = self.client.post('/api/v1/actualites/bulk/', [
+            self.actualite('Valide'),
+            {'commune': self.commune.id, 'contenu': 'Sans titre'},
+            self.actualite('Commune inconnue', commune=999999),
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        erreurs = {erreur['index']: erreur['erreurs'] for erreur in response.data['erreurs']}
+        self.assertEqual(set(erreurs), {1, 2})
+        self.assertIn('titre', erreurs[1])
+        self.assertIn('commune', erreurs[2])
+        self.assertFalse(Actualite.objects.filter(titre='Valide').exists())
+    
+    def test_bulk_create_autre_commune_interdit(self):
+        """Test un admin ne peut pas importer dans une autre commune"""
+        self.auth_as(self.admin_commune)
+        response = self.client.post('/api/v1/faqs/bulk/', [
+            {'commune': self.commune.id, 'question': 'Horaires ?', 'reponse': '8h-15h'},
+            {'commune': self.autre_commune.id, 'question': 'Adresse ?', 'reponse': 'Centre'},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(response.data['erreurs'][0]['index'], 1)
+        self.assertEqual(FAQ.objects.count(), 0)
+    
+    def test_bulk_create_pages_slug_pris(self):
+        """Test slug fourni déjà utilisé (en base ou dans le lot)"""
+        PageCMS.objects.create(commune=self.commune, titre='Accueil', slug='accueil', contenu='Texte')
+        self.auth_as(self.superadmin)
+        page = {'commune': self.commune.id, 'titre': 'Page', 'contenu': 'Texte'}
+        response = self.client.post('/api/v1/pages/bulk/', [
+            {**page, 'slug': 'accueil'},
+            {**page, 'slug': 'histoire'},
+            {**page, 'slug': 'histoire'},
+            {**page, 'slug': 'accueil', 'commune': self.autre_commune.id},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([erreur['index'] for erreur in response.data['erreurs']], [0, 2])
+    
+    def test_bulk_create_slug_pris_pendant_l_ecriture(self):
+        """Test slug pris par une écriture concurrente : 400 par élément (pas de 500)"""
+        table = PageCMS._meta.db_table
+        etat = {'insert': False, 'concurrente': False}
+        
+        def ecriture_concurrente(execute, sql, params, many, context):
+            if not etat['insert'] and sql.startswith(f'INSERT INTO "{table}"'):
+                # Première écriture : le slug vient d'être pris par une autre requête
+                etat['insert'] = True
+                raise IntegrityError('UNIQUE constraint failed: slug')
+            if etat['insert'] and not etat['concurrente'] and sql.startswith('SELECT') and table in sql:
+                etat['concurrente'] = True
+                PageCMS.objects.create(commune=self.commune, titre='Concurrente', slug='histoire', contenu='Texte')
+            return execute(sql, params, many, context)
+        
+        self.auth_as(self.superadmin)
+        page = {'commune': self.commune.id, 'titre': 'Page', 'contenu': 'Texte'}
+        with connection.execute_wrapper(ecriture_concurrente):
+            response = self.client.post('/api/v1/pages/bulk/', [
+                {**page, 'slug': 'accueil'},
+                {**page, 'slug': 'histoire'},
+            ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([erreur['index'] for erreur in response.data['erreurs']], [1])
+        self.assertEqual(list(PageCMS.objects.values_list('titre', flat=True)), ['Concurrente'])
+    
+    def test_bulk_create_slug_genere_rejoue(self):
+        """Test slugs générés recalculés quand l'écriture est rejouée"""
+        table = Actualite._meta.db_table
+        etat = {'insert': False}
+        
+        def ecriture_concurrente(execute, sql, params, many, context):
+            if not etat['insert'] and sql.startswith(f'INSERT INTO "{table}"'):
+                etat['insert'] = True
+                raise IntegrityError('UNIQUE constraint failed: slug')
+            return execute(sql, params, many, context)
+        
+        self.auth_as(self.admin_commune)
+        with connection.execute_wrapper(ecriture_concurrente):
+            response = self.client.post('/api/v1/actualites/bulk/', [
+                self.actualite('Marché rénové'), self.actualite('Budget voté'),
+            ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([resultat['slug'] for resultat in response.data['resultats']], ['marche-renove-2', 'budget-vote'])
+        self.assertEqual(Actualite.objects.count(), 3)
+    
+    def test_bulk_create_evenements(self):
+        """Test création d'événements en lot (slug tiré du nom)"""
+        self.auth_as(self.admin_commune)
+        evenement = {
+            'commune': self.commune.id, 'nom': 'Fête de la musique', 'description': 'Concerts',
+            'date': str(date.today() + timedelta(days=10)), 'heure_debut': '18:00', 'lieu': 'Place',
+        }
+        response = self.client.post('/api/v1/evenements/bulk/', [evenement, evenement], format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            sorted(Evenement.objects.values_list('slug', flat=True)),
+            ['fete-de-la-musique', 'fete-de-la-musique-2']
+        )
+    
+    def test_bulk_update(self):
+        """Test mise à jour en lot et élément introuvable"""
+        faqs = [
+            FAQ.objects.create(commune=self.commune, question=f'Question {i}', reponse='R')
+            for i in range(3)
+        ]
+        self.auth_as(self.admin_commune)
+        response = self.client.patch('/api/v1/faqs/bulk/', [
+            {'id': faqs[0].id, 'reponse': 'Nouvelle réponse'},
+            {'id': faqs[1].id, 'ordre': 5},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        faqs[0].refresh_from_db()
+        faqs[1].refresh_from_db()
+        self.assertEqual(faqs[0].reponse, 'Nouvelle réponse')
+        self.assertEqual(faqs[1].ordre, 5)
+        
+        response = self.client.patch('/api/v1/faqs/bulk/', [
+            {'id': faqs[2].id, 'ordre': 1},
+            {'id': 999999, 'ordre': 1},
+            {'ordre': 1},
+        ], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([erreur['index'] for erreur in response.data['erreurs']], [1, 2])
+    
+    def test_bulk_limites(self):
+        """Test corps invalide, trop d'éléments et accès anonyme"""
+        response = self.client.post('/api/v1/faqs/bulk/', [], format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        
+        self.auth_as(self.superadmin)
+        response = self.client.post('/api/v1/faqs/bulk/', {'question': 'x'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post('/api/v1/faqs/bulk/', [{}] * 501, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
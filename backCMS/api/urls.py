@@ -39,7 +39,7 @@ from .views import (
     
     # Transparence viewsets
     ProjetViewSet, DeliberationViewSet,
-    DocumentBudgetaireViewSet, DocumentOfficielViewSet,
+    DocumentBudgetaireViewSet, DocumentOfficielViewSet, TeleversementViewSet,
     
     # Dashboard
     DashboardStatsView,
@@ -50,9 +50,10 @@ from .views import (
     SuiviSignalementPublicView,
     NewsletterViewSet,
     NewsletterUnsubscribeView,
+    NewsletterOuvertureView,
     StatsPubliquesView,
     CommuneStatsView,
-    RechercheGlobaleView,
+    RechercheGlobaleView, SuggestionsView,
 )
 
 # Création du routeur API
@@ -91,6 +92,7 @@ router.register(r'projets', ProjetViewSet, basename='projets')
 router.register(r'deliberations', DeliberationViewSet, basename='deliberations')
 router.register(r'documents-budgetaires', DocumentBudgetaireViewSet, basename='documents-budgetaires')
 router.register(r'documents-officiels', DocumentOfficielViewSet, basename='documents-officiels')
+router.register(r'televersements', TeleversementViewSet, basename='televersements')
 
 # Newsletter
 router.register(r'newsletters', NewsletterViewSet, basename='newsletters')
@@ -120,6 +122,7 @@ urlpatterns = [
     
     # ===== NEWSLETTER =====
     path('newsletter/unsubscribe/<str:token>/', NewsletterUnsubscribeView.as_view(), name='newsletter_unsubscribe'),
+    path('newsletter/ouverture/<str:jeton>.gif', NewsletterOuvertureView.as_view(), name='newsletter_ouverture'),
     
     # ===== STATISTIQUES PUBLIQUES =====
     path('stats/', StatsPubliquesView.as_view(), name='stats_publiques'),
@@ -127,6 +130,7 @@ urlpatterns = [
     
     # ===== RECHERCHE GLOBALE =====
     path('recherche/', RechercheGlobaleView.as_view(), name='recherche_globale'),
+    path('recherche/suggestions/', SuggestionsView.as_view(), name='recherche_suggestions'),
     
     # ===== DOCUMENTATION API =====
     path('schema/', SpectacularAPIView.as_view(), name='schema'),
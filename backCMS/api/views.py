@@ -2,42 +2,60 @@
 API Views - E-CMS
 ViewSets et vues API REST
 """
-from rest_framework import viewsets, permissions, status, filters, generics
+import io
+from datetime import timedelta
+
+from rest_framework import viewsets, mixins, permissions, status, filters, generics
 from rest_framework.decorators import action
+from rest_framework.exceptions import APIException
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
 from drf_spectacular.utils import extend_schema, extend_schema_view
 from django.contrib.auth import get_user_model
+from django.http import HttpResponse
 from django.utils import timezone
 from django.db.models import Q, Count, Sum
-from django.db import models
+from django.db import models, transaction
 from django_filters.rest_framework import DjangoFilterBackend
 
-from core.models import ConfigurationPortail, TokenVerification
+from core.jetons import JetonRafraichissement
+from core.models import ConfigurationPortail, EmailSortant, TokenVerification
 from communes.models import (
     Region, Departement, Commune, DemandeCreationSite,
     ServiceMunicipal, EquipeMunicipale
 )
+from communes.taches import creer_site
+from actualites.imports import importer_abonnes
 from actualites.models import Actualite, PageCMS, FAQ, Newsletter, AbonneNewsletter
+from actualites.suivi import PIXEL_GIF, lire_jeton, tampon as tampon_ouvertures
+from actualites.taches import envoyer_newsletter
+from medias import televersements
+from medias.models import Televersement
+from evenements import disponibilites, reservations
 from evenements.models import Evenement, InscriptionEvenement, RendezVous
 from services.models import Formulaire, Demarche, Signalement, Contact
 from transparence.models import Projet, Deliberation, DocumentBudgetaire, DocumentOfficiel
+from recherche.filters import RechercheFilter
 
+from .bulk import BulkMixin
+from .exports import ExportMixin
+from .limitation import LimiteDebitAnonyme
+from .occurrences import OccurrencesMixin, fusionner, horizon as horizon_recurrence
 from .serializers import (
     UtilisateurSerializer, UtilisateurCreateSerializer, UtilisateurUpdateSerializer,
     ChangePasswordSerializer, ConfigurationPortailSerializer,
     RegionSerializer, DepartementSerializer, CommuneListSerializer, CommuneDetailSerializer,
     ServiceMunicipalSerializer, EquipeMunicipaleSerializer, DemandeCreationSiteSerializer,
     ActualiteListSerializer, ActualiteDetailSerializer, PageCMSSerializer, FAQSerializer,
-    NewsletterSerializer, AbonneNewsletterSerializer,
+    NewsletterSerializer, AbonneNewsletterSerializer, ImportAbonnesSerializer,
     EvenementListSerializer, EvenementDetailSerializer, InscriptionEvenementSerializer,
-    RendezVousSerializer,
+    RendezVousSerializer, DisponibilitesRequeteSerializer, DisponibilitesSerializer,
     FormulaireSerializer, DemarcheListSerializer, DemarcheDetailSerializer,
     SignalementSerializer, ContactSerializer,
     ProjetListSerializer, ProjetDetailSerializer, DeliberationSerializer,
-    DocumentBudgetaireSerializer, DocumentOfficielSerializer,
+    DocumentBudgetaireSerializer, DocumentOfficielSerializer, TeleversementSerializer,
     LoginSerializer, PasswordResetRequestSerializer, PasswordResetConfirmSerializer,
     EmailVerificationSerializer
 )
@@ -84,8 +102,7 @@ class IsCommuneAdminOrReadOnly(permissions.BasePermission):
             return True
         
         # Vérifier si l'objet appartient à la commune de l'utilisateur
-        commune = getattr(obj, 'commune', None)
-        return commune and request.user.peut_gerer_commune(commune)
+        return request.user.peut_gerer_commune(getattr(obj, 'commune_id', None))
 
 
 # ===== AUTH VIEWS =====
@@ -95,6 +112,8 @@ class CustomLoginView(generics.GenericAPIView):
     """Connexion utilisateur avec retour user + tokens"""
     permission_classes = [permissions.AllowAny]
     serializer_class = LoginSerializer
+    throttle_classes = [LimiteDebitAnonyme]
+    throttle_scope = 'connexion'
     
     def post(self, request):
         serializer = self.get_serializer(data=request.data)
@@ -116,7 +135,7 @@ class CustomLoginView(generics.GenericAPIView):
                         status=status.HTTP_401_UNAUTHORIZED
                     )
                 
-                refresh = RefreshToken.for_user(user)
+                refresh = JetonRafraichissement.for_user(user)
                 
                 return Response({
                     'user': UtilisateurSerializer(user).data,
@@ -144,16 +163,20 @@ class RegisterView(generics.CreateAPIView):
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
-            user = serializer.save()
-            
-            # Générer token de vérification email
-            token = TokenVerification.generer_token(
-                user, TokenVerification.TypeToken.EMAIL_VERIFICATION
-            )
-            
-            # TODO: Envoyer email de vérification
+            with transaction.atomic():
+                user = serializer.save()
+                
+                # Générer token de vérification email, envoyé par `envoyer_emails`
+                token = TokenVerification.generer_token(
+                    user, TokenVerification.TypeToken.EMAIL_VERIFICATION
+                )
+                EmailSortant.objects.create(
+                    type_email=EmailSortant.TypeEmail.VERIFICATION,
+                    destinataire=user.email,
+                    token=token,
+                )
             
-            refresh = RefreshToken.for_user(user)
+            refresh = JetonRafraichissement.for_user(user)
             return Response({
                 'user': UtilisateurSerializer(user).data,
                 'tokens': {
@@ -173,7 +196,8 @@ class ProfileView(generics.RetrieveUpdateAPIView):
     serializer_class = UtilisateurSerializer
     
     def get_object(self):
-        return self.request.user
+        # request.user peut être reconstruit depuis le jeton : profil lu en base
+        return Utilisateur.objects.get(pk=self.request.user.pk)
     
     def get_serializer_class(self):
         if self.request.method in ['PUT', 'PATCH']:
@@ -190,14 +214,15 @@ class ChangePasswordView(generics.GenericAPIView):
     def post(self, request):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
-            if not request.user.check_password(serializer.data['old_password']):
+            user = Utilisateur.objects.get(pk=request.user.pk)
+            if not user.check_password(serializer.data['old_password']):
                 return Response(
                     {'old_password': 'Mot de passe incorrect'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            request.user.set_password(serializer.data['new_password'])
-            request.user.save()
+            user.set_password(serializer.data['new_password'])
+            user.save()
             return Response({'message': 'Mot de passe modifié avec succès'})
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -208,19 +233,19 @@ class PasswordResetRequestView(generics.GenericAPIView):
     """Demande de réinitialisation du mot de passe"""
     permission_classes = [permissions.AllowAny]
     serializer_class = PasswordResetRequestSerializer
+    throttle_classes = [LimiteDebitAnonyme]
+    throttle_scope = 'reinitialisation'
     
     def post(self, request):
         serializer = self.get_serializer(data=request.data)
         if serializer.is_valid():
-            email = serializer.data['email']
-            try:
-                user = Utilisateur.objects.get(email=email)
-                token = TokenVerification.generer_token(
-                    user, TokenVerification.TypeToken.PASSWORD_RESET, duree_heures=1
-                )
-                # TODO: Envoyer email avec lien de reset
-            except Utilisateur.DoesNotExist:
-                pass  # Ne pas révéler si l'email existe
+            # Ne pas révéler si l'email existe : la demande est enregistrée
+            # sans chercher le compte (même travail, même temps de réponse) ;
+            # l'expéditeur crée le token si un compte correspond
+            EmailSortant.objects.create(
+                type_email=EmailSortant.TypeEmail.REINITIALISATION,
+                destinataire=serializer.data['email'],
+            )
             
             return Response({
                 'message': 'Si cet email existe, un lien de réinitialisation a été envoyé.'
@@ -289,8 +314,9 @@ class RegionViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Region.objects.all()
     serializer_class = RegionSerializer
     permission_classes = [permissions.AllowAny]
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [RechercheFilter, filters.OrderingFilter]
     search_fields = ['nom', 'code']
+    search_identifiants = ['code']
     ordering_fields = ['nom']
 
 
@@ -299,9 +325,10 @@ class DepartementViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Departement.objects.select_related('region').all()
     serializer_class = DepartementSerializer
     permission_classes = [permissions.AllowAny]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, RechercheFilter, filters.OrderingFilter]
     filterset_fields = ['region']
     search_fields = ['nom', 'code']
+    search_identifiants = ['code']
     ordering_fields = ['nom']
 
 
@@ -309,7 +336,7 @@ class CommuneViewSet(viewsets.ModelViewSet):
     """ViewSet pour les communes"""
     queryset = Commune.objects.select_related('departement__region').all()
     permission_classes = [IsAdminOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, RechercheFilter, filters.OrderingFilter]
     filterset_fields = ['departement', 'departement__region', 'statut']
     search_fields = ['nom', 'description']
     ordering_fields = ['nom', 'population', 'date_creation']
@@ -339,10 +366,12 @@ class CommuneViewSet(viewsets.ModelViewSet):
     def evenements(self, request, slug=None):
         """Récupérer les événements à venir d'une commune"""
         commune = self.get_object()
-        evenements = commune.evenements.filter(
-            est_public=True,
-            date__gte=timezone.now().date()
-        ).order_by('date', 'heure_debut')[:10]
+        aujourd_hui = timezone.localdate()
+        evenements = fusionner(
+            commune.evenements.select_related('commune').filter(est_public=True),
+            aujourd_hui, aujourd_hui + timedelta(days=horizon_recurrence()), uniques_du=aujourd_hui,
+            ordre=['date', 'heure_debut']
+        )[:10]
         serializer = EvenementListSerializer(evenements, many=True)
         return Response(serializer.data)
     
@@ -360,7 +389,7 @@ class ServiceMunicipalViewSet(viewsets.ModelViewSet):
     queryset = ServiceMunicipal.objects.select_related('commune').filter(est_actif=True)
     serializer_class = ServiceMunicipalSerializer
     permission_classes = [IsCommuneAdminOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, RechercheFilter]
     filterset_class = ServiceMunicipalFilter
     search_fields = ['nom', 'description']
 
@@ -370,7 +399,7 @@ class EquipeMunicipaleViewSet(viewsets.ModelViewSet):
     queryset = EquipeMunicipale.objects.select_related('commune').filter(est_visible=True)
     serializer_class = EquipeMunicipaleSerializer
     permission_classes = [IsCommuneAdminOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, RechercheFilter]
     filterset_class = EquipeMunicipaleFilter
     search_fields = ['nom']
 
@@ -380,6 +409,8 @@ class DemandeCreationSiteViewSet(viewsets.ModelViewSet):
     queryset = DemandeCreationSite.objects.all()
     serializer_class = DemandeCreationSiteSerializer
     permission_classes = [permissions.IsAuthenticated]
+    throttle_classes = [LimiteDebitAnonyme]
+    throttle_scope = 'demandes_site'
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_fields = ['statut']
     ordering_fields = ['date_demande']
@@ -415,35 +446,21 @@ class DemandeCreationSiteViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        try:
-            from communes.services import SiteCreationService
-            
-            # Notes optionnelles
-            notes = request.data.get('notes', '')
-            if notes:
-                demande.notes_admin = notes
-                demande.save(update_fields=['notes_admin'])
-            
-            service = SiteCreationService(demande)
-            result = service.creer_site()
-            
-            return Response({
-                'success': True,
-                'message': f"Site créé pour {demande.nom_commune}",
-                'commune': result['commune'],
-                'admin': {
-                    'email': result['admin']['email'],
-                    # Le mot de passe doit être envoyé par email sécurisé
-                    'password_sent': True
-                },
-                'site_url': f"https://{result['commune']['domaine']}"
-            }, status=status.HTTP_201_CREATED)
-            
-        except Exception as e:
-            return Response(
-                {'error': str(e)},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+        # Notes optionnelles
+        notes = request.data.get('notes', '')
+        if notes:
+            demande.notes_admin = notes
+            demande.save(update_fields=['notes_admin'])
+        
+        # La création (site, commune, admin, services) et l'email de premier
+        # accès de l'administrateur sont traités par le worker
+        tache = creer_site.differer(cle=f'creer-site-{demande.id}', demande_id=demande.id)
+        
+        return Response({
+            'success': True,
+            'message': f"Création du site de {demande.nom_commune} en cours",
+            'tache': tache.id,
+        }, status=status.HTTP_202_ACCEPTED)
     
     @action(detail=True, methods=['post'], url_path='rejeter')
     def rejeter(self, request, pk=None):
@@ -482,15 +499,16 @@ class DemandeCreationSiteViewSet(viewsets.ModelViewSet):
 
 # ===== ACTUALITES VIEWSETS =====
 
-class ActualiteViewSet(viewsets.ModelViewSet):
+class ActualiteViewSet(BulkMixin, viewsets.ModelViewSet):
     """ViewSet pour les actualités"""
     queryset = Actualite.objects.select_related('commune', 'auteur').all()
     permission_classes = [IsCommuneAdminOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, RechercheFilter, filters.OrderingFilter]
     filterset_class = ActualiteFilter
     search_fields = ['titre', 'resume', 'contenu']
     ordering_fields = ['date_publication', 'nombre_vues', 'date_creation']
     lookup_field = 'slug'
+    bulk_champ_slug = 'titre'
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -510,26 +528,30 @@ class ActualiteViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
     
     def perform_create(self, serializer):
-        serializer.save(auteur=self.request.user)
+        serializer.save(auteur_id=self.request.user.pk)
+    
+    def get_bulk_valeurs_creation(self):
+        return {'auteur_id': self.request.user.pk}
 
 
-class PageCMSViewSet(viewsets.ModelViewSet):
+class PageCMSViewSet(BulkMixin, viewsets.ModelViewSet):
     """ViewSet pour les pages CMS"""
     queryset = PageCMS.objects.select_related('commune').all()
     serializer_class = PageCMSSerializer
     permission_classes = [IsCommuneAdminOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, RechercheFilter]
     filterset_class = PageCMSFilter
     search_fields = ['titre', 'contenu']
     lookup_field = 'slug'
+    bulk_champ_slug = 'titre'
 
 
-class FAQViewSet(viewsets.ModelViewSet):
+class FAQViewSet(BulkMixin, viewsets.ModelViewSet):
     """ViewSet pour les FAQ"""
     queryset = FAQ.objects.select_related('commune').filter(est_active=True)
     serializer_class = FAQSerializer
     permission_classes = [IsCommuneAdminOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, RechercheFilter]
     filterset_class = FAQFilter
     search_fields = ['question', 'reponse']
 
@@ -539,6 +561,8 @@ class AbonneNewsletterViewSet(viewsets.ModelViewSet):
     queryset = AbonneNewsletter.objects.all()
     serializer_class = AbonneNewsletterSerializer
     permission_classes = [permissions.AllowAny]
+    throttle_classes = [LimiteDebitAnonyme]
+    throttle_scope = 'abonnements'
     filter_backends = [DjangoFilterBackend]
     filterset_class = AbonneNewsletterFilter
     
@@ -546,19 +570,44 @@ class AbonneNewsletterViewSet(viewsets.ModelViewSet):
         if self.action == 'create':
             return [permissions.AllowAny()]
         return [permissions.IsAuthenticated()]
+    
+    @extend_schema(request={'multipart/form-data': ImportAbonnesSerializer})
+    @action(detail=False, methods=['post'], parser_classes=[MultiPartParser])
+    def importer(self, request):
+        """
+        Importe une liste d'abonnés depuis un fichier CSV (colonnes email, nom)
+        POST /api/v1/newsletter/abonnes/importer/
+        """
+        serializer = ImportAbonnesSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        commune = serializer.validated_data['commune']
+        if not request.user.peut_gerer_commune(commune):
+            return Response(
+                {'error': 'Vous ne pouvez pas gérer cette commune'},
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        # Les gros fichiers sont stockés sur disque par Django : lecture en flux
+        fichier = serializer.validated_data['fichier']
+        lignes = io.TextIOWrapper(fichier.file, encoding='utf-8-sig', errors='replace', newline='')
+        resultat = importer_abonnes(commune, lignes)
+        return Response(resultat.as_dict())
 
 
 # ===== EVENEMENTS VIEWSETS =====
 
-class EvenementViewSet(viewsets.ModelViewSet):
-    """ViewSet pour les événements"""
+class EvenementViewSet(OccurrencesMixin, BulkMixin, viewsets.ModelViewSet):
+    """ViewSet pour les événements (liste : séries récurrentes développées en occurrences)"""
     queryset = Evenement.objects.select_related('commune', 'organisateur').all()
     permission_classes = [IsCommuneAdminOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, RechercheFilter, filters.OrderingFilter]
     filterset_class = EvenementFilter
     search_fields = ['nom', 'description', 'lieu']
     ordering_fields = ['date', 'heure_debut', 'date_creation']
     lookup_field = 'slug'
+    bulk_champ_slug = 'nom'
+    # Portée de limitation de l'action `inscrire`
+    throttle_scope = None
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -569,15 +618,13 @@ class EvenementViewSet(viewsets.ModelViewSet):
         queryset = super().get_queryset()
         if not self.request.user.is_authenticated:
             queryset = queryset.filter(est_public=True)
-        
-        # Filtre par date (à venir)
-        a_venir = self.request.query_params.get('a_venir', None)
-        if a_venir == 'true':
-            queryset = queryset.filter(date__gte=timezone.now().date())
-        
+        # Fenêtre de dates (du, au, a_venir) : OccurrencesMixin.list
         return queryset
     
-    @action(detail=True, methods=['post'], permission_classes=[permissions.AllowAny])
+    @action(
+        detail=True, methods=['post'], permission_classes=[permissions.AllowAny],
+        throttle_classes=[LimiteDebitAnonyme], throttle_scope='inscriptions'
+    )
     def inscrire(self, request, slug=None):
         """S'inscrire à un événement"""
         evenement = self.get_object()
@@ -595,7 +642,7 @@ class EvenementViewSet(viewsets.ModelViewSet):
         
         if serializer.is_valid():
             if request.user.is_authenticated:
-                serializer.save(participant=request.user)
+                serializer.save(participant_id=request.user.pk)
             else:
                 serializer.save()
             return Response(serializer.data, status=status.HTTP_201_CREATED)
@@ -603,13 +650,25 @@ class EvenementViewSet(viewsets.ModelViewSet):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class InscriptionEvenementViewSet(viewsets.ModelViewSet):
+class InscriptionEvenementViewSet(ExportMixin, viewsets.ModelViewSet):
     """ViewSet pour les inscriptions aux événements"""
     queryset = InscriptionEvenement.objects.select_related('evenement', 'participant').all()
     serializer_class = InscriptionEvenementSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
     filterset_fields = ['evenement', 'statut']
+    export_fields = [
+        'id', 'evenement_id', 'evenement__nom', 'participant_id', 'nom', 'email', 'telephone',
+        'nombre_personnes', 'commentaire', 'statut', 'date_inscription',
+    ]
+    export_champ_commune = 'evenement__commune'
+    export_nom = 'inscriptions'
+
+
+class CreneauIndisponible(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Ce créneau est déjà réservé.'
+    default_code = 'creneau_occupe'
 
 
 class RendezVousViewSet(viewsets.ModelViewSet):
@@ -627,18 +686,70 @@ class RendezVousViewSet(viewsets.ModelViewSet):
             if not self.request.user.is_super_admin():
                 # Utilisateur voit ses propres RDV ou ceux de sa commune
                 queryset = queryset.filter(
-                    Q(demandeur=self.request.user) |
-                    Q(commune=self.request.user.commune)
+                    Q(demandeur_id=self.request.user.pk) |
+                    Q(commune_id=self.request.user.commune_id)
                 )
         else:
             queryset = RendezVous.objects.none()
         return queryset
     
+    def _reserver(self, serializer, **kwargs):
+        """Enregistre le rendez-vous si son créneau est libre pour le service (409 sinon)"""
+        instance = serializer.instance
+        valeurs = {
+            champ: serializer.validated_data.get(champ, getattr(instance, champ, None))
+            for champ in ('service', 'date', 'heure_debut', 'heure_fin', 'statut')
+        }
+        try:
+            reservations.reserver(
+                lambda: serializer.save(**kwargs),
+                valeurs['service'], valeurs['date'], valeurs['heure_debut'], valeurs['heure_fin'],
+                statut=valeurs['statut'], exclure=getattr(instance, 'pk', None)
+            )
+        except reservations.CreneauOccupe as exc:
+            raise CreneauIndisponible(str(exc))
+    
     def perform_create(self, serializer):
         if self.request.user.is_authenticated:
-            serializer.save(demandeur=self.request.user)
+            self._reserver(serializer, demandeur_id=self.request.user.pk)
         else:
-            serializer.save()
+            self._reserver(serializer)
+    
+    def perform_update(self, serializer):
+        self._reserver(serializer)
+    
+    @extend_schema(
+        parameters=[DisponibilitesRequeteSerializer],
+        responses={200: DisponibilitesSerializer}
+    )
+    @action(detail=False, methods=['get'], permission_classes=[permissions.AllowAny],
+            filter_backends=[], pagination_class=None)
+    def disponibilites(self, request):
+        """
+        Créneaux libres d'un service, jour par jour
+        Paramètres: service (id), du, au (AAAA-MM-JJ, inclus ; aujourd'hui et +13 jours par défaut)
+        """
+        requete = DisponibilitesRequeteSerializer(data=request.query_params)
+        requete.is_valid(raise_exception=True)
+        service, du, au = (requete.validated_data[cle] for cle in ('service', 'du', 'au'))
+        
+        jours = disponibilites.disponibilites(service, du, au)
+        return Response({
+            'service': service.pk,
+            'duree': disponibilites.duree_creneau(),
+            'du': du,
+            'au': au,
+            'jours': [
+                {
+                    'date': jour,
+                    'creneaux': [
+                        {'debut': disponibilites.format_heure(debut), 'fin': disponibilites.format_heure(fin)}
+                        for debut, fin in creneaux
+                    ]
+                }
+                for jour, creneaux in jours
+            ]
+        })
 
 
 # ===== SERVICES VIEWSETS =====
@@ -648,19 +759,27 @@ class FormulaireViewSet(viewsets.ModelViewSet):
     queryset = Formulaire.objects.select_related('commune').filter(est_actif=True)
     serializer_class = FormulaireSerializer
     permission_classes = [IsCommuneAdminOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, RechercheFilter]
     filterset_fields = ['commune', 'type']
     search_fields = ['nom', 'description']
 
 
-class DemarcheViewSet(viewsets.ModelViewSet):
+class DemarcheViewSet(ExportMixin, viewsets.ModelViewSet):
     """ViewSet pour les démarches"""
     queryset = Demarche.objects.select_related('commune', 'formulaire', 'demandeur').all()
     permission_classes = [permissions.IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, RechercheFilter, filters.OrderingFilter]
     filterset_fields = ['commune', 'statut', 'type']
     search_fields = ['numero_suivi', 'nom_demandeur']
+    search_identifiants = ['numero_suivi']
     ordering_fields = ['date_demande', 'priorite']
+    export_fields = [
+        'id', 'numero_suivi', 'commune_id', 'type', 'formulaire_id', 'demandeur_id',
+        'nom_demandeur', 'email_demandeur', 'telephone_demandeur', 'donnees', 'statut',
+        'priorite', 'agent_traitant_id', 'commentaire_agent', 'motif_rejet',
+        'date_demande', 'date_prise_en_charge', 'date_traitement',
+    ]
+    export_nom = 'demarches'
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -673,13 +792,13 @@ class DemarcheViewSet(viewsets.ModelViewSet):
         
         if user.is_super_admin():
             return queryset
-        elif user.is_admin_commune() and user.commune:
-            return queryset.filter(commune=user.commune)
+        elif user.is_admin_commune() and user.commune_id:
+            return queryset.filter(commune_id=user.commune_id)
         else:
-            return queryset.filter(demandeur=user)
+            return queryset.filter(demandeur_id=user.pk)
     
     def perform_create(self, serializer):
-        serializer.save(demandeur=self.request.user)
+        serializer.save(demandeur_id=self.request.user.pk)
     
     @action(detail=True, methods=['get'])
     def suivi(self, request, pk=None):
@@ -701,14 +820,23 @@ class DemarcheViewSet(viewsets.ModelViewSet):
         )
 
 
-class SignalementViewSet(viewsets.ModelViewSet):
+class SignalementViewSet(ExportMixin, viewsets.ModelViewSet):
     """ViewSet pour les signalements"""
     queryset = Signalement.objects.select_related('commune', 'signaleur').all()
     serializer_class = SignalementSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    throttle_classes = [LimiteDebitAnonyme]
+    throttle_scope = 'signalements'
+    filter_backends = [DjangoFilterBackend, RechercheFilter, filters.OrderingFilter]
     filterset_class = SignalementFilter
     search_fields = ['titre', 'description', 'adresse', 'numero_suivi']
+    search_identifiants = ['numero_suivi']
     ordering_fields = ['date_signalement']
+    export_fields = [
+        'id', 'numero_suivi', 'commune_id', 'categorie', 'titre', 'description', 'adresse',
+        'latitude', 'longitude', 'photo', 'email_contact', 'signaleur_id', 'statut',
+        'agent_traitant_id', 'commentaire_resolution', 'date_signalement', 'date_resolution',
+    ]
+    export_nom = 'signalements'
     
     def get_permissions(self):
         # Permettre la création de signalements sans authentification
@@ -718,18 +846,25 @@ class SignalementViewSet(viewsets.ModelViewSet):
     
     def perform_create(self, serializer):
         if self.request.user.is_authenticated:
-            serializer.save(signaleur=self.request.user)
+            serializer.save(signaleur_id=self.request.user.pk)
         else:
             serializer.save()
 
 
-class ContactViewSet(viewsets.ModelViewSet):
+class ContactViewSet(ExportMixin, viewsets.ModelViewSet):
     """ViewSet pour les messages de contact"""
     queryset = Contact.objects.select_related('commune').all()
     serializer_class = ContactSerializer
+    throttle_classes = [LimiteDebitAnonyme]
+    throttle_scope = 'contacts'
     filter_backends = [DjangoFilterBackend, filters.OrderingFilter]
     filterset_class = ContactFilter
     ordering_fields = ['date_envoi']
+    export_fields = [
+        'id', 'commune_id', 'nom', 'email', 'telephone', 'sujet', 'message',
+        'est_lu', 'est_traite', 'reponse', 'date_envoi', 'date_reponse',
+    ]
+    export_nom = 'contacts'
     
     def get_permissions(self):
         if self.action == 'create':
@@ -743,7 +878,7 @@ class ProjetViewSet(viewsets.ModelViewSet):
     """ViewSet pour les projets"""
     queryset = Projet.objects.select_related('commune', 'responsable').all()
     permission_classes = [IsCommuneAdminOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, RechercheFilter, filters.OrderingFilter]
     filterset_class = ProjetFilter
     search_fields = ['titre', 'description', 'lieu']
     ordering_fields = ['date_debut', 'budget', 'avancement', 'date_creation']
@@ -766,9 +901,10 @@ class DeliberationViewSet(viewsets.ModelViewSet):
     queryset = Deliberation.objects.select_related('commune').filter(est_publie=True)
     serializer_class = DeliberationSerializer
     permission_classes = [IsCommuneAdminOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, RechercheFilter, filters.OrderingFilter]
     filterset_class = DeliberationFilter
     search_fields = ['numero', 'titre', 'resume']
+    search_identifiants = ['numero']
     ordering_fields = ['date_seance', 'date_creation']
 
 
@@ -777,7 +913,7 @@ class DocumentBudgetaireViewSet(viewsets.ModelViewSet):
     queryset = DocumentBudgetaire.objects.select_related('commune').filter(est_publie=True)
     serializer_class = DocumentBudgetaireSerializer
     permission_classes = [IsCommuneAdminOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, RechercheFilter, filters.OrderingFilter]
     filterset_class = DocumentBudgetaireFilter
     search_fields = ['titre', 'description']
     ordering_fields = ['annee', 'date_creation']
@@ -788,9 +924,10 @@ class DocumentOfficielViewSet(viewsets.ModelViewSet):
     queryset = DocumentOfficiel.objects.select_related('commune', 'auteur').filter(est_public=True)
     serializer_class = DocumentOfficielSerializer
     permission_classes = [IsCommuneAdminOrReadOnly]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    filter_backends = [DjangoFilterBackend, RechercheFilter, filters.OrderingFilter]
     filterset_class = DocumentOfficielFilter
     search_fields = ['titre', 'description', 'numero_reference']
+    search_identifiants = ['numero_reference']
     ordering_fields = ['date_document', 'date_creation', 'nombre_telechargements']
     
     @action(detail=True, methods=['post'])
@@ -802,6 +939,63 @@ class DocumentOfficielViewSet(viewsets.ModelViewSet):
         return Response({'url': document.fichier.url})
 
 
+@extend_schema(tags=['Transparence'])
+class TeleversementViewSet(
+    mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.DestroyModelMixin, viewsets.GenericViewSet
+):
+    """
+    Téléversement fragmenté des gros documents (délibérations, budgets,
+    documents officiels), reprise possible après une coupure
+    """
+    serializer_class = TeleversementSerializer
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get_queryset(self):
+        return Televersement.objects.filter(utilisateur_id=self.request.user.pk)
+    
+    def perform_create(self, serializer):
+        serializer.save(utilisateur_id=self.request.user.pk)
+    
+    def perform_destroy(self, instance):
+        televersements.supprimer_fichier(instance)
+        instance.delete()
+    
+    @extend_schema(request={'application/octet-stream': bytes})
+    @action(detail=True, methods=['put'], parser_classes=[])
+    def fragment(self, request, pk=None):
+        """Reçoit un fragment (en-tête Content-Range, octets bruts dans le corps)"""
+        televersement = self.get_object()
+        plage = televersements.lire_content_range(request.headers.get('Content-Range'))
+        if plage is None or plage[2] != televersement.taille:
+            return Response(
+                {'error': f'En-tête Content-Range attendu : bytes <début>-<fin>/{televersement.taille}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        debut, fin, _ = plage
+        longueur = fin - debut + 1
+        if int(request.headers.get('Content-Length') or 0) != longueur:
+            return Response(
+                {'error': 'Content-Length ne correspond pas à Content-Range.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            # request.stream : corps lu par blocs, jamais chargé en mémoire
+            recu = televersements.ecrire_fragment(televersement, debut, longueur, request.stream)
+        except televersements.ErreurTeleversement as exc:
+            return Response({'error': str(exc), 'recu': exc.recu}, status=status.HTTP_409_CONFLICT)
+        return Response({'recu': recu, 'taille': televersement.taille})
+    
+    @action(detail=True, methods=['post'])
+    def terminer(self, request, pk=None):
+        """Vérifie la taille et l'empreinte du fichier assemblé"""
+        televersement = self.get_object()
+        try:
+            televersements.terminer(televersement)
+        except televersements.ErreurTeleversement as exc:
+            return Response({'error': str(exc), 'recu': exc.recu}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.get_serializer(televersement).data)
+
+
 # ===== STATISTIQUES DASHBOARD =====
 
 from rest_framework import serializers as drf_serializers
@@ -899,7 +1093,7 @@ class CommuneMapView(generics.ListAPIView):
     """
     permission_classes = [permissions.AllowAny]
     serializer_class = CommuneMapSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, RechercheFilter]
     filterset_fields = ['departement', 'departement__region']
     search_fields = ['nom']
     
@@ -1108,14 +1302,14 @@ class NewsletterViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         queryset = super().get_queryset()
         if self.request.user.is_authenticated:
-            if not self.request.user.is_super_admin() and self.request.user.commune:
-                queryset = queryset.filter(commune=self.request.user.commune)
+            if not self.request.user.is_super_admin() and self.request.user.commune_id:
+                queryset = queryset.filter(commune_id=self.request.user.commune_id)
         else:
             queryset = Newsletter.objects.none()
         return queryset
     
     def perform_create(self, serializer):
-        serializer.save(auteur=self.request.user)
+        serializer.save(auteur_id=self.request.user.pk)
     
     @action(detail=True, methods=['post'], url_path='envoyer')
     def envoyer(self, request, pk=None):
@@ -1143,23 +1337,22 @@ class NewsletterViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # TODO: Intégrer un service d'envoi d'emails (Celery + SendGrid/Mailgun)
-        # Pour le MVP, on simule l'envoi
-        
-        newsletter.statut = Newsletter.Statut.ENVOYEE
-        newsletter.date_envoi = timezone.now()
-        newsletter.nombre_destinataires = abonnes.count()
-        newsletter.save()
+        destinataires = abonnes.count()
+        tache = envoyer_newsletter.differer(cle=f'newsletter-{newsletter.id}', newsletter_id=newsletter.id)
         
         return Response({
             'success': True,
-            'message': f'Newsletter envoyée à {abonnes.count()} abonné(s)',
-            'destinataires': abonnes.count()
-        })
+            'message': f'Envoi de la newsletter à {destinataires} abonné(s) en cours',
+            'destinataires': destinataires,
+            'tache': tache.id,
+        }, status=status.HTTP_202_ACCEPTED)
     
     @action(detail=True, methods=['get'])
     def statistiques(self, request, pk=None):
-        """Statistiques d'une newsletter"""
+        """
+        Statistiques d'une newsletter (ouvertures écrites en base par chaque
+        processus au plus NEWSLETTER_OUVERTURES_DELAI secondes après réception)
+        """
         newsletter = self.get_object()
         
         return Response({
@@ -1201,6 +1394,25 @@ class NewsletterUnsubscribeView(generics.GenericAPIView):
             )
 
 
+@extend_schema(exclude=True)
+class NewsletterOuvertureView(APIView):
+    """
+    Pixel de suivi des ouvertures : répond immédiatement avec un GIF 1×1,
+    l'ouverture est comptée en mémoire puis écrite par lots
+    """
+    permission_classes = [permissions.AllowAny]
+    authentication_classes = []
+    
+    def get(self, request, jeton):
+        identifiants = lire_jeton(jeton)
+        if identifiants:
+            tampon_ouvertures.enregistrer(*identifiants)
+        response = HttpResponse(PIXEL_GIF, content_type='image/gif')
+        # Chaque ouverture doit atteindre le serveur (pas de cache client)
+        response['Cache-Control'] = 'no-store, private'
+        return response
+
+
 # ===== STATISTIQUES PUBLIQUES =====
 
 class StatsPubliquesSerializer(drf_serializers.Serializer):
@@ -1318,26 +1530,40 @@ class RechercheGlobaleSerializer(drf_serializers.Serializer):
     url = drf_serializers.CharField()
     commune = drf_serializers.CharField()
     date = drf_serializers.DateTimeField(allow_null=True)
+    score = drf_serializers.FloatField()
+    pages = drf_serializers.ListField(
+        child=drf_serializers.DictField(), required=False,
+        help_text='Délibérations et documents : pages du PDF correspondant à la requête'
+    )
 
 
 @extend_schema(
     tags=['Recherche'],
     summary='Recherche globale',
-    description='Recherche multi-modèles dans actualités, événements, pages, FAQ et projets',
+    description='Recherche plein texte (BM25) dans actualités, événements, pages, FAQ, projets, délibérations et documents (texte des PDF compris)',
     responses={200: RechercheGlobaleSerializer(many=True)}
 )
 class RechercheGlobaleView(generics.GenericAPIView):
     """
     Recherche globale sur l'ensemble du contenu du CMS
     Accessible publiquement
+    
+    Paramètres: q (requête), commune (slug), type (liste séparée par des virgules),
+    limit (max 50), cursor (valeur `next` de la page précédente)
     """
     permission_classes = [permissions.AllowAny]
     serializer_class = RechercheGlobaleSerializer
     
     def get(self, request):
+        from recherche.models import SearchDocument
+        from recherche.moteur import CurseurInvalide, pages_pdf, rechercher_page
+        
         query = request.query_params.get('q', '').strip()
         commune_slug = request.query_params.get('commune', None)
-        limit = int(request.query_params.get('limit', 20))
+        try:
+            limit = int(request.query_params.get('limit', 20))
+        except ValueError:
+            limit = 20
         
         if len(query) < 2:
             return Response({
@@ -1345,114 +1571,105 @@ class RechercheGlobaleView(generics.GenericAPIView):
                 'query': query
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        results = []
-        
-        # Filtrer par commune si spécifiée
-        commune_filter = {}
+        # Filtrer par commune si spécifiée (sinon par tenant)
+        commune_id = None
         if commune_slug:
-            try:
-                commune = Commune.objects.get(slug=commune_slug)
-                commune_filter = {'commune': commune}
-            except Commune.DoesNotExist:
-                pass
-        
-        # Recherche dans les actualités
-        actualites = Actualite.objects.filter(
-            Q(titre__icontains=query) | Q(contenu__icontains=query) | Q(resume__icontains=query),
-            est_publie=True,
-            **commune_filter
-        ).select_related('commune')[:limit]
-        
-        for actu in actualites:
-            results.append({
-                'type': 'actualite',
-                'id': actu.id,
-                'titre': actu.titre,
-                'extrait': actu.resume[:150] if actu.resume else '',
-                'url': f'/api/v1/actualites/{actu.slug}/',
-                'commune': actu.commune.nom,
-                'date': actu.date_publication,
-            })
-        
-        # Recherche dans les événements
-        evenements = Evenement.objects.filter(
-            Q(nom__icontains=query) | Q(description__icontains=query),
-            est_public=True,
-            **commune_filter
-        ).select_related('commune')[:limit]
-        
-        for evt in evenements:
-            results.append({
-                'type': 'evenement',
-                'id': evt.id,
-                'titre': evt.nom,
-                'extrait': evt.description[:150] if evt.description else '',
-                'url': f'/api/v1/evenements/{evt.slug}/',
-                'commune': evt.commune.nom,
-                'date': timezone.make_aware(
-                    timezone.datetime.combine(evt.date, evt.heure_debut)
-                ) if evt.date else None,
-            })
+            commune_id = Commune.objects.filter(slug=commune_slug).values_list('id', flat=True).first()
+        elif getattr(request, 'tenant', None):
+            commune_id = request.tenant.id
         
-        # Recherche dans les pages CMS
-        pages = PageCMS.objects.filter(
-            Q(titre__icontains=query) | Q(contenu__icontains=query),
-            est_publie=True,
-            **commune_filter
-        ).select_related('commune')[:limit]
+        # Filtrer par type de contenu
+        types = [
+            t for t in request.query_params.get('type', '').split(',')
+            if t in SearchDocument.Type.values
+        ]
         
-        for page in pages:
-            results.append({
-                'type': 'page',
-                'id': page.id,
-                'titre': page.titre,
-                'extrait': page.contenu[:150] if page.contenu else '',
-                'url': f'/api/v1/pages/{page.slug}/',
-                'commune': page.commune.nom,
-                'date': page.date_modification,
-            })
+        try:
+            resultats, suivant = rechercher_page(
+                query, commune_id=commune_id, types=types, limit=limit,
+                curseur=request.query_params.get('cursor')
+            )
+        except CurseurInvalide:
+            return Response({'error': 'Curseur invalide'}, status=status.HTTP_400_BAD_REQUEST)
         
-        # Recherche dans les FAQ
-        faqs = FAQ.objects.filter(
-            Q(question__icontains=query) | Q(reponse__icontains=query),
-            est_active=True,
-            **commune_filter
-        ).select_related('commune')[:limit]
+        pages = pages_pdf(resultats, query)
+        results = []
+        for resultat in resultats:
+            document = resultat.document
+            result = {
+                'type': document.type,
+                'id': document.objet_id,
+                'titre': document.titre,
+                'extrait': document.extrait,
+                'url': document.url,
+                'commune': document.commune.nom if document.commune else '',
+                'date': document.date,
+                'score': round(resultat.score, 4),
+            }
+            if (document.type, document.objet_id) in pages:
+                result['pages'] = pages[(document.type, document.objet_id)]
+            results.append(result)
         
-        for faq in faqs:
-            results.append({
-                'type': 'faq',
-                'id': faq.id,
-                'titre': faq.question,
-                'extrait': faq.reponse[:150] if faq.reponse else '',
-                'url': f'/api/v1/faqs/{faq.id}/',
-                'commune': faq.commune.nom,
-                'date': faq.date_creation,
-            })
+        next_url = None
+        if suivant:
+            params = request.query_params.copy()
+            params['cursor'] = suivant
+            next_url = request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
         
-        # Recherche dans les projets
-        projets = Projet.objects.filter(
-            Q(titre__icontains=query) | Q(description__icontains=query),
-            est_public=True,
-            **commune_filter
-        ).select_related('commune')[:limit]
+        return Response({
+            'query': query,
+            'count': len(results),
+            'next': next_url,
+            'results': results
+        })
+
+
+class SuggestionSerializer(drf_serializers.Serializer):
+    """Serializer pour les suggestions d'autocomplétion"""
+    type = drf_serializers.CharField()
+    id = drf_serializers.IntegerField()
+    libelle = drf_serializers.CharField()
+    url = drf_serializers.CharField()
+
+
+@extend_schema(
+    tags=['Recherche'],
+    summary='Suggestions de recherche',
+    description='Autocomplétion par préfixe sur les communes, actualités, événements, FAQ et projets',
+    responses={200: SuggestionSerializer(many=True)}
+)
+class SuggestionsView(APIView):
+    """
+    Suggestions pour la barre de recherche (un appel par frappe)
+    Servies depuis un index de préfixes en mémoire, sans requête en base
+    
+    Paramètres: q (préfixe), commune (slug), type (liste séparée par des virgules), limit (max 20)
+    """
+    permission_classes = [permissions.AllowAny]
+    LIMITE_MAX = 20
+    
+    def get(self, request):
+        from recherche.suggestions import POIDS_TYPES, get_index
         
-        for projet in projets:
-            results.append({
-                'type': 'projet',
-                'id': projet.id,
-                'titre': projet.titre,
-                'extrait': projet.description[:150] if projet.description else '',
-                'url': f'/api/v1/projets/{projet.slug}/',
-                'commune': projet.commune.nom,
-                'date': projet.date_creation,
-            })
+        query = request.query_params.get('q', '').strip()
+        try:
+            limit = min(max(int(request.query_params.get('limit', 8)), 1), self.LIMITE_MAX)
+        except ValueError:
+            limit = 8
+        types = [t for t in request.query_params.get('type', '').split(',') if t in POIDS_TYPES]
         
-        # Trier par pertinence (les plus récents d'abord)
-        results.sort(key=lambda x: x['date'] or timezone.now(), reverse=True)
+        index = get_index()
+        commune_id = None
+        commune_slug = request.query_params.get('commune', None)
+        if commune_slug:
+            commune_id = index.commune_id(commune_slug)
+            if commune_id is None:
+                return Response({'query': query, 'results': []})
+        elif getattr(request, 'tenant', None):
+            commune_id = request.tenant.id
         
+        suggestions = index.suggerer(query, limit=limit, commune_id=commune_id, types=types)
         return Response({
             'query': query,
-            'count': len(results),
-            'results': results[:limit]
+            'results': SuggestionSerializer(suggestions, many=True).data
         })
@@ -173,29 +173,18 @@ class DemandeCreationSiteAdmin(admin.ModelAdmin):
     
     @admin.action(description='✅ Valider et créer les sites')
     def valider_demandes(self, request, queryset):
-        from .services import SiteCreationService
-        
-        success_count = 0
-        errors = []
+        from .taches import creer_site
         
+        count = 0
         for demande in queryset.filter(statut=DemandeCreationSite.Statut.EN_ATTENTE):
-            try:
-                service = SiteCreationService(demande)
-                result = service.creer_site()
-                success_count += 1
-                self.message_user(
-                    request,
-                    f"✅ Site créé pour {demande.nom_commune} - Admin: {result['admin']['email']}",
-                    level='SUCCESS'
-                )
-            except Exception as e:
-                errors.append(f"{demande.nom_commune}: {str(e)}")
-        
-        if errors:
-            self.message_user(request, f"❌ Erreurs: {', '.join(errors)}", level='ERROR')
+            creer_site.differer(cle=f'creer-site-{demande.id}', demande_id=demande.id)
+            count += 1
         
-        if success_count:
-            self.message_user(request, f"✅ {success_count} site(s) créé(s) avec succès!")
+        if count:
+            self.message_user(
+                request,
+                f"✅ {count} création(s) de site mise(s) en file, l'administrateur de chaque commune recevra son lien d'accès par email"
+            )
     
     @admin.action(description='❌ Rejeter les demandes')
     def rejeter_demandes(self, request, queryset):
@@ -0,0 +1,46 @@
+"""
+Communes - Tâches de fond : création des sous-sites communaux
+"""
+from django.db import transaction
+
+from core.models import EmailSortant, TokenVerification
+from taches.registre import tache
+
+from .models import DemandeCreationSite
+from .services import SiteCreationService
+
+
+# Validité du lien de premier accès envoyé à l'administrateur de la commune
+DUREE_LIEN_BIENVENUE_HEURES = 72
+
+
+@tache('communes.creer_site', max_tentatives=3)
+def creer_site(demande_id):
+    """
+    Crée le site d'une demande validée et, dans la même transaction, l'email
+    de premier accès de l'administrateur (lien pour choisir son mot de passe :
+    le mot de passe temporaire n'est ni stocké ni transmis).
+    """
+    demande = DemandeCreationSite.objects.get(id=demande_id)
+    if demande.statut != DemandeCreationSite.Statut.EN_ATTENTE:
+        # Déjà traitée (nouvelle tentative après succès, ou rejet entre-temps)
+        return {'commune_id': demande.commune_creee_id, 'deja_traitee': True}
+
+    with transaction.atomic():
+        service = SiteCreationService(demande)
+        resultat = service.creer_site()
+        token = TokenVerification.generer_token(
+            service.admin_user, TokenVerification.TypeToken.PASSWORD_RESET,
+            duree_heures=DUREE_LIEN_BIENVENUE_HEURES,
+        )
+        EmailSortant.objects.create(
+            type_email=EmailSortant.TypeEmail.BIENVENUE,
+            destinataire=service.admin_user.email,
+            token=token,
+        )
+
+    return {
+        'commune_id': resultat['commune']['id'],
+        'slug': resultat['commune']['slug'],
+        'admin': resultat['admin']['email'],
+    }
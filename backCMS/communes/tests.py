@@ -291,8 +291,9 @@ class CommuneAPITest(APITestCase):
         self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
         
         response = self.client.post(f'/api/v1/demandes-creation/{demande.id}/valider/')
-        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
         self.assertTrue(response.data['success'])
+        self.assertIn('tache', response.data)
     
     def test_valider_demande_unauthenticated(self):
         """Test validation de demande sans auth"""
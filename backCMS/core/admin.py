@@ -1,9 +1,10 @@
 """Core - Administration Django"""
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.utils import timezone
 from django.utils.html import format_html
 
-from .models import Utilisateur, TokenVerification, ConfigurationPortail
+from .models import Utilisateur, TokenVerification, EmailSortant, ConfigurationPortail
 
 
 @admin.register(Utilisateur)
@@ -49,6 +50,28 @@ class TokenVerificationAdmin(admin.ModelAdmin):
     statut.short_description = 'Statut'
 
 
+@admin.register(EmailSortant)
+class EmailSortantAdmin(admin.ModelAdmin):
+    """Suivi de la file des emails de compte"""
+    
+    list_display = ['destinataire', 'type_email', 'statut', 'tentatives', 'prochain_essai', 'date_creation', 'date_envoi']
+    list_filter = ['type_email', 'statut']
+    search_fields = ['destinataire']
+    readonly_fields = [f.name for f in EmailSortant._meta.fields]
+    actions = ['relancer']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    @admin.action(description='Remettre en file les emails sélectionnés')
+    def relancer(self, request, queryset):
+        count = queryset.exclude(statut=EmailSortant.Statut.ENVOYE).update(
+            statut=EmailSortant.Statut.EN_ATTENTE, tentatives=0,
+            prochain_essai=timezone.now(), verrouille_par='',
+        )
+        self.message_user(request, f"{count} email(s) remis en file.")
+
+
 @admin.register(ConfigurationPortail)
 class ConfigurationPortailAdmin(admin.ModelAdmin):
     """Admin pour la configuration du portail (singleton)"""
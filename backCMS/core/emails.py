@@ -0,0 +1,231 @@
+"""
+Core - Envoi des emails de compte depuis la file EmailSortant (outbox)
+
+Les vues n'envoient rien : elles écrivent une ligne EmailSortant dans la
+transaction qui crée le token, ce qui ne coûte qu'un INSERT. Une demande de
+réinitialisation est enregistrée telle quelle, sans chercher le compte :
+la réponse HTTP fait le même travail que l'adresse existe ou non, et c'est
+l'expéditeur qui crée le token (ou ignore la demande).
+
+L'expéditeur (`manage.py envoyer_emails`) réserve des lots d'emails dus et
+les envoie par des connexions SMTP gardées ouvertes d'un lot à l'autre (une
+par thread). Réservation : SELECT ... FOR UPDATE SKIP LOCKED si la base le
+permet, UPDATE conditionnel sinon ; la réservation repousse prochain_essai
+(bail), un expéditeur arrêté brutalement libère donc ses emails à
+l'expiration du bail. Un échec SMTP est réessayé avec un délai exponentiel.
+"""
+import logging
+import os
+import random
+import socket
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import close_old_connections, connection, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import EmailSortant, TokenVerification, Utilisateur
+
+
+logger = logging.getLogger(__name__)
+
+# Validité des liens envoyés (heures)
+DUREE_LIEN_REINITIALISATION = 1
+
+
+def _reglage(nom, defaut):
+    return getattr(settings, nom, defaut)
+
+
+def delai_reessai(tentatives):
+    """Délai exponentiel plafonné à 6 h, avec ±20 % de gigue"""
+    delai = min(_reglage('EMAILS_DELAI_REESSAI', 60) * 2 ** max(tentatives - 1, 0), 6 * 3600)
+    return timedelta(seconds=delai * random.uniform(0.8, 1.2))
+
+
+# ===== RENDU =====
+
+def _preparer_token(email):
+    """Token à envoyer, créé à l'envoi pour une demande de réinitialisation ; None si rien à envoyer"""
+    if email.type_email == EmailSortant.TypeEmail.REINITIALISATION and email.token_id is None:
+        utilisateur = Utilisateur.objects.filter(email=email.destinataire, is_active=True).first()
+        if utilisateur is None:
+            return None
+        with transaction.atomic():
+            email.token = TokenVerification.generer_token(
+                utilisateur, TokenVerification.TypeToken.PASSWORD_RESET,
+                duree_heures=DUREE_LIEN_REINITIALISATION,
+            )
+            EmailSortant.objects.filter(pk=email.pk).update(token=email.token)
+        return email.token
+    token = email.token
+    if token is None or not token.est_valide():
+        return None
+    return token
+
+
+def construire_message(email, token, connexion=None):
+    """EmailMessage correspondant à une ligne de la file"""
+    utilisateur = token.utilisateur
+    expiration = timezone.localtime(token.date_expiration)
+    if email.type_email == EmailSortant.TypeEmail.VERIFICATION:
+        sujet = 'Vérifiez votre adresse email - E-CMS'
+        introduction = 'Pour activer votre compte, confirmez votre adresse email :'
+        lien = f'{settings.FRONTEND_URL}/verify-email?token={token.token}'
+    elif email.type_email == EmailSortant.TypeEmail.BIENVENUE:
+        sujet = 'Votre espace d\'administration communale - E-CMS'
+        introduction = (
+            f"Le site de votre commune a été créé. Votre identifiant est {utilisateur.email}.\n"
+            f"Choisissez votre mot de passe :"
+        )
+        lien = f'{settings.FRONTEND_URL}/reset-password?token={token.token}'
+    else:
+        sujet = 'Réinitialisation de votre mot de passe - E-CMS'
+        introduction = 'Pour choisir un nouveau mot de passe, suivez ce lien :'
+        lien = f'{settings.FRONTEND_URL}/reset-password?token={token.token}'
+    return EmailMessage(
+        sujet,
+        f"Bonjour {utilisateur.nom},\n\n{introduction}\n{lien}\n\n"
+        f"Ce lien expire le {expiration:%d/%m/%Y à %H:%M}.",
+        to=[email.destinataire],
+        connection=connexion,
+    )
+
+
+# ===== FILE =====
+
+def reserver(expediteur, nombre):
+    """Réserve jusqu'à `nombre` emails dus pour `expediteur`"""
+    maintenant = timezone.now()
+    dus = EmailSortant.objects.filter(
+        statut=EmailSortant.Statut.EN_ATTENTE, prochain_essai__lte=maintenant
+    ).order_by('prochain_essai', 'id')
+    bail = dict(
+        verrouille_par=expediteur,
+        prochain_essai=maintenant + timedelta(seconds=_reglage('EMAILS_DUREE_BAIL', 300)),
+    )
+
+    if connections[EmailSortant.objects.db].features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(dus.select_for_update(skip_locked=True).values_list('id', flat=True)[:nombre])
+            EmailSortant.objects.filter(id__in=ids).update(**bail)
+    else:
+        ids = [
+            candidat for candidat in list(dus.values_list('id', flat=True)[:nombre])
+            if EmailSortant.objects.filter(
+                id=candidat, statut=EmailSortant.Statut.EN_ATTENTE, prochain_essai__lte=maintenant
+            ).update(**bail)
+        ]
+    return list(
+        EmailSortant.objects.filter(id__in=ids, verrouille_par=expediteur)
+        .select_related('token__utilisateur').order_by('id')
+    )
+
+
+def _echec(email, erreur):
+    tentatives = email.tentatives + 1
+    if tentatives >= _reglage('EMAILS_TENTATIVES_MAX', 8):
+        logger.error('Email #%s vers %s abandonné : %s', email.pk, email.destinataire, erreur)
+        valeurs = dict(statut=EmailSortant.Statut.ECHOUE)
+    else:
+        valeurs = dict(prochain_essai=timezone.now() + delai_reessai(tentatives))
+    EmailSortant.objects.filter(pk=email.pk, verrouille_par=email.verrouille_par).update(
+        tentatives=tentatives, derniere_erreur=str(erreur)[:2000], verrouille_par='', **valeurs
+    )
+
+
+class Expediteur:
+    """
+    Envoie la file avec N threads, chacun gardant sa connexion SMTP ouverte
+    tant qu'il y a des emails à envoyer
+    """
+
+    def __init__(self, connexions=1, taille_lot=None, intervalle=5.0, une_fois=False, stdout=None):
+        self.connexions = max(1, connexions)
+        self.taille_lot = taille_lot or _reglage('EMAILS_TAILLE_LOT', 50)
+        self.intervalle = intervalle
+        self.une_fois = une_fois
+        self.stdout = stdout
+        self.nom = f'{socket.gethostname()}:{os.getpid()}'
+        self.arret = threading.Event()
+        self._verrou = threading.Lock()
+        self.envoyes = 0
+        self.echecs = 0
+
+    def arreter(self):
+        self.arret.set()
+
+    def demarrer(self):
+        """Envoie jusqu'à l'arrêt (ou file vide avec une_fois) ; retourne le nombre d'emails envoyés"""
+        if self.connexions == 1:
+            self._boucle(0)
+        else:
+            threads = [
+                threading.Thread(target=self._boucle, args=(numero,), name=f'expediteur-{numero}')
+                for numero in range(self.connexions)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        return self.envoyes
+
+    def envoyer_lot(self, emails, connexion):
+        """Envoie un lot réservé sur une connexion SMTP ; retourne (envoyés, échecs)"""
+        envoyes, ignores, echecs = [], [], 0
+        for email in emails:
+            token = _preparer_token(email)
+            if token is None:
+                # Aucun compte pour cette adresse, ou lien déjà utilisé / expiré
+                ignores.append(email.pk)
+                continue
+            try:
+                # Sans effet si la connexion est déjà ouverte : elle sert à tout le lot
+                connexion.open()
+                connexion.send_messages([construire_message(email, token, connexion)])
+            except Exception as exc:
+                _echec(email, exc)
+                echecs += 1
+                # Connexion probablement inutilisable : rouverte au prochain envoi
+                connexion.close()
+                continue
+            envoyes.append(email.pk)
+
+        maintenant = timezone.now()
+        EmailSortant.objects.filter(id__in=envoyes).update(
+            statut=EmailSortant.Statut.ENVOYE, date_envoi=maintenant, verrouille_par='',
+            tentatives=F('tentatives') + 1,
+        )
+        EmailSortant.objects.filter(id__in=ignores).update(
+            statut=EmailSortant.Statut.IGNORE, date_envoi=maintenant, verrouille_par='',
+        )
+        return len(envoyes), echecs
+
+    def _boucle(self, numero):
+        nom = f'{self.nom}:{numero}'
+        connexion = get_connection()
+        try:
+            while not self.arret.is_set():
+                close_old_connections()
+                emails = reserver(nom, self.taille_lot)
+                if not emails:
+                    # File vide : la connexion SMTP n'est pas gardée inutilement
+                    connexion.close()
+                    if self.une_fois:
+                        break
+                    self.arret.wait(self.intervalle)
+                    continue
+                envoyes, echecs = self.envoyer_lot(emails, connexion)
+                with self._verrou:
+                    self.envoyes += envoyes
+                    self.echecs += echecs
+                if self.stdout:
+                    self.stdout.write(f'  ✓ {envoyes} envoyé(s), ✗ {echecs} échec(s) ({nom})')
+        finally:
+            connexion.close()
+            if self.connexions > 1:
+                # Connexion à la base propre au thread
+                connection.close()
@@ -0,0 +1,172 @@
+"""
+Core - Jetons JWT portant les droits de l'utilisateur
+
+Le jeton d'accès contient `role`, `commune_id` et `is_active` : l'API
+authentifie et vérifie les permissions sans lire l'utilisateur en base
+(UtilisateurJeton remplace l'instance Utilisateur dans request.user).
+
+Les droits sont relus en base à chaque rafraîchissement. Entre deux, un
+changement de rôle, de commune ou une désactivation révoque les jetons
+d'accès déjà émis : l'identifiant de l'utilisateur est gardé dans le cache
+partagé (Redis) pendant la durée de vie d'un jeton d'accès, avec l'instant
+de la révocation, et les jetons émis avant sont refusés (claim `emis`, à la
+microseconde). Le client rafraîchit alors son jeton (refusé si le compte est
+désactivé). Sans cache partagé, la révocation ne serait vue que par un seul
+processus : JWT_SANS_REQUETE est alors faux et l'utilisateur relu en base.
+
+Les jetons émis sans ces claims (avant leur ajout) sont authentifiés par une
+lecture en base, comme avec JWTAuthentication.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication, JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+CLAIMS = ('role', 'commune_id', 'is_active')
+
+
+def ajouter_claims(jeton, utilisateur):
+    jeton['role'] = utilisateur.role
+    jeton['commune_id'] = utilisateur.commune_id
+    jeton['is_active'] = utilisateur.is_active
+
+
+# ===== RÉVOCATION =====
+
+def _cle_revocation(utilisateur_id):
+    return f'jwt:revocation:{utilisateur_id}'
+
+
+def revoquer(utilisateur_id):
+    """Refuse les jetons d'accès de l'utilisateur émis jusqu'à maintenant"""
+    duree = int(api_settings.ACCESS_TOKEN_LIFETIME.total_seconds())
+    # Gardé le temps que les jetons visés expirent
+    cache.set(_cle_revocation(utilisateur_id), time.time(), duree + 60)
+
+
+def est_revoque(jeton):
+    revocation = cache.get(_cle_revocation(jeton[api_settings.USER_ID_CLAIM]))
+    if revocation is None:
+        return False
+    if 'emis' in jeton:
+        return jeton['emis'] < revocation
+    # `iat` est à la seconde près : un jeton émis dans la seconde de la révocation est refusé
+    return jeton.get('iat', 0) <= revocation
+
+
+# ===== UTILISATEUR =====
+
+class UtilisateurJeton(TokenUser):
+    """Utilisateur reconstruit depuis les claims du jeton, sans accès à la base"""
+
+    @cached_property
+    def id(self):
+        return int(self.token[api_settings.USER_ID_CLAIM])
+
+    @cached_property
+    def pk(self):
+        return self.id
+
+    @cached_property
+    def role(self):
+        return self.token['role']
+
+    @cached_property
+    def commune_id(self):
+        return self.token['commune_id']
+
+    @cached_property
+    def is_active(self):
+        return self.token['is_active']
+
+    @cached_property
+    def commune(self):
+        """Commune de l'utilisateur (lue en base à la première utilisation)"""
+        from communes.models import Commune
+        return Commune.objects.filter(pk=self.commune_id).first() if self.commune_id else None
+
+    def __getattr__(self, attr):
+        # Pas de valeur None silencieuse pour un champ absent du jeton (email, nom...)
+        raise AttributeError(f'{attr} : absent du jeton, lire l\'utilisateur en base')
+
+    def __str__(self):
+        return f'Utilisateur {self.id} (jeton)'
+
+    def is_super_admin(self):
+        from .models import Utilisateur
+        return self.role == Utilisateur.Role.SUPER_ADMIN
+
+    def is_admin_commune(self):
+        from .models import Utilisateur
+        return self.role == Utilisateur.Role.ADMIN_COMMUNE
+
+    def is_editeur(self):
+        from .models import Utilisateur
+        return self.role == Utilisateur.Role.EDITEUR
+
+    def peut_gerer_commune(self, commune):
+        """Comme Utilisateur.peut_gerer_commune ; `commune` : instance ou identifiant"""
+        from .models import Utilisateur
+        if self.is_super_admin():
+            return True
+        commune_id = getattr(commune, 'pk', commune)
+        return (
+            commune_id is not None and commune_id == self.commune_id
+            and self.role in [Utilisateur.Role.ADMIN_COMMUNE, Utilisateur.Role.EDITEUR]
+        )
+
+
+# ===== AUTHENTIFICATION =====
+
+class JWTSansRequeteAuthentication(JWTStatelessUserAuthentication):
+    """JWT authentifié par ses claims (UtilisateurJeton), après contrôle de la liste de révocation"""
+
+    def get_user(self, validated_token):
+        if not getattr(settings, 'JWT_SANS_REQUETE', False) or not all(claim in validated_token for claim in CLAIMS):
+            # Pas de cache partagé pour les révocations, ou jeton émis avant l'ajout des claims
+            return JWTAuthentication.get_user(self, validated_token)
+        if not validated_token['is_active'] or est_revoque(validated_token):
+            raise AuthenticationFailed('Jeton révoqué.', code='token_revoked')
+        return super().get_user(validated_token)
+
+
+# ===== ÉMISSION =====
+
+class JetonRafraichissement(RefreshToken):
+    """Jeton de rafraîchissement dont les jetons d'accès portent les droits à jour"""
+
+    @classmethod
+    def for_user(cls, user):
+        jeton = super().for_user(user)
+        ajouter_claims(jeton, user)
+        jeton._utilisateur = user
+        return jeton
+
+    @property
+    def access_token(self):
+        utilisateur = getattr(self, '_utilisateur', None)
+        if utilisateur is None:
+            # Rafraîchissement : droits relus en base
+            from .models import Utilisateur
+            utilisateur = Utilisateur.objects.only('role', 'commune_id', 'is_active').filter(
+                pk=self[api_settings.USER_ID_CLAIM]
+            ).first()
+        if utilisateur is not None:
+            # Aussi sur ce jeton : le jeton tourné garde les droits à jour
+            ajouter_claims(self, utilisateur)
+        acces = super().access_token
+        # Instant d'émission plus précis que `iat`, comparé aux révocations
+        acces['emis'] = time.time()
+        return acces
+
+
+class JetonRafraichissementSerializer(TokenRefreshSerializer):
+    token_class = JetonRafraichissement
@@ -0,0 +1,52 @@
+"""
+Commande de l'expéditeur des emails de compte (file EmailSortant)
+En continu (service dédié, voir docker-compose.yml) :
+    python manage.py envoyer_emails --connexions 2
+Ou vidage ponctuel de la file (cron) :
+    * * * * * cd /app && python manage.py envoyer_emails --une-fois
+"""
+import signal
+
+from django.core.management.base import BaseCommand
+
+from core.emails import Expediteur
+
+
+class Command(BaseCommand):
+    help = 'Envoie les emails de compte en attente (vérification, réinitialisation, premier accès)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--connexions', type=int, default=1,
+            help='Connexions SMTP ouvertes en parallèle (une par thread)',
+        )
+        parser.add_argument('--taille-lot', type=int, help='Emails réservés à la fois par connexion')
+        parser.add_argument(
+            '--intervalle', type=float, default=5.0,
+            help='Attente (s) entre deux consultations d\'une file vide',
+        )
+        parser.add_argument('--une-fois', action='store_true', help='S\'arrête quand la file est vide')
+
+    def handle(self, *args, **options):
+        expediteur = Expediteur(
+            connexions=options['connexions'],
+            taille_lot=options['taille_lot'],
+            intervalle=options['intervalle'],
+            une_fois=options['une_fois'],
+            stdout=self.stdout,
+        )
+
+        def arreter(signum, frame):
+            self.stdout.write(self.style.WARNING('⏹️  Arrêt demandé, fin des lots en cours...'))
+            expediteur.arreter()
+
+        signal.signal(signal.SIGINT, arreter)
+        signal.signal(signal.SIGTERM, arreter)
+
+        self.stdout.write(self.style.NOTICE(
+            f'📧 Expéditeur {expediteur.nom} : {expediteur.connexions} connexion(s) SMTP'
+        ))
+        envoyes = expediteur.demarrer()
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {envoyes} email(s) envoyé(s), {expediteur.echecs} échec(s)'
+        ))
@@ -5,14 +5,77 @@ Régions, Départements et données de démonstration
 from django.core.management.base import BaseCommand
 from django.utils import timezone
 from django.contrib.sites.models import Site
+from contextlib import contextmanager
+from datetime import time as heure, timedelta
 from decimal import Decimal
+from itertools import accumulate
 import random
+import time
 
 from communes.models import Region, Departement, Commune, ServiceMunicipal, EquipeMunicipale
 from actualites.models import Actualite, PageCMS, FAQ
-from evenements.models import Evenement
+from evenements.models import Evenement, InscriptionEvenement
+from services.models import Demarche, Signalement
 from transparence.models import Projet
 from core.models import ConfigurationPortail, Utilisateur
+from medias import stockage
+from medias.stockage import CHAMPS_CONTENU
+from recherche import indexation, suggestions
+from recherche.models import SearchDocument
+
+
+# Préfixe des communes générées par --scale
+PREFIXE_ECHELLE = 'scale-'
+
+# Volumes par défaut du mode --scale
+VOLUMES_ECHELLE = {
+    'communes': 360,
+    'actualites': 1_000_000,
+    'evenements': 200_000,
+    'signalements': 1_000_000,
+    'demarches': 1_000_000,
+    'inscriptions': 2_000_000,
+}
+
+# Répartitions du mode --scale (poids relatifs par valeur)
+REPARTITION_STATUTS_SIGNALEMENT = {
+    Signalement.Statut.SIGNALE: 30, Signalement.Statut.EN_COURS: 20,
+    Signalement.Statut.RESOLU: 45, Signalement.Statut.REJETE: 5,
+}
+REPARTITION_STATUTS_DEMARCHE = {
+    Demarche.Statut.EN_ATTENTE: 20, Demarche.Statut.EN_COURS: 15, Demarche.Statut.VALIDEE: 25,
+    Demarche.Statut.REJETEE: 5, Demarche.Statut.COMPLETEE: 30, Demarche.Statut.ANNULEE: 5,
+}
+REPARTITION_PRIORITES = {0: 80, 1: 15, 2: 5}
+REPARTITION_PERSONNES = {1: 70, 2: 20, 3: 7, 4: 3}
+REPARTITION_STATUTS_INSCRIPTION = {
+    InscriptionEvenement.Statut.EN_ATTENTE: 20, InscriptionEvenement.Statut.CONFIRME: 60,
+    InscriptionEvenement.Statut.ANNULE: 5, InscriptionEvenement.Statut.PRESENT: 10,
+    InscriptionEvenement.Statut.ABSENT: 5,
+}
+
+MOTS_TITRES = [
+    'marché', 'route', 'école', 'santé', 'eau', 'éclairage', 'conseil', 'budget', 'jeunesse',
+    'culture', 'sport', 'assainissement', 'quartier', 'forage', 'pont', 'vaccination',
+    'état civil', 'recensement', 'festival', 'formation', 'environnement', 'propreté',
+]
+
+
+@contextmanager
+def dates_libres(*modeles):
+    """Désactive auto_now / auto_now_add pour conserver les dates générées"""
+    champs = [
+        champ for modele in modeles for champ in modele._meta.concrete_fields
+        if getattr(champ, 'auto_now', False) or getattr(champ, 'auto_now_add', False)
+    ]
+    etats = [(champ, champ.auto_now, champ.auto_now_add) for champ in champs]
+    for champ in champs:
+        champ.auto_now = champ.auto_now_add = False
+    try:
+        yield
+    finally:
+        for champ, auto_now, auto_now_add in etats:
+            champ.auto_now, champ.auto_now_add = auto_now, auto_now_add
 
 
 class Command(BaseCommand):
@@ -29,6 +92,30 @@ class Command(BaseCommand):
             action='store_true',
             help='Force la recréation des données même si elles existent',
         )
+        parser.add_argument(
+            '--scale',
+            action='store_true',
+            help='Génère un jeu de données massif (tests de charge, benchmarks)',
+        )
+        for nom, volume in VOLUMES_ECHELLE.items():
+            parser.add_argument(
+                f'--{nom}',
+                type=int,
+                default=volume,
+                help=f'Mode --scale : nombre de {nom} à générer (défaut: {volume})',
+            )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Mode --scale : graine aléatoire (jeu de données reproductible)',
+        )
+        parser.add_argument(
+            '--taille-lot',
+            type=int,
+            default=5000,
+            help='Mode --scale : nombre de lignes par bulk_create',
+        )
 
     def handle(self, *args, **options):
         self.stdout.write(self.style.NOTICE('🇨🇲 Initialisation des données du Cameroun...'))
@@ -43,6 +130,10 @@ class Command(BaseCommand):
         if options['demo']:
             self.create_demo_data()
         
+        # Créer le jeu de données massif si demandé
+        if options['scale']:
+            self.create_scale_data(options)
+        
         self.stdout.write(self.style.SUCCESS('✅ Initialisation terminée!'))
 
     def create_regions_departements(self, force=False):
@@ -490,3 +581,225 @@ class Command(BaseCommand):
                     'est_public': True,
                 }
             )
+
+    # ===== MODE --scale =====
+
+    def create_scale_data(self, options):
+        """
+        Génère des centaines de communes et des millions de contenus.
+        Distribution réaliste : la taille des communes suit une loi log-normale
+        et le volume de contenu est proportionnel à la population ; les dates
+        sont plus denses récemment. Tout est déterministe pour une graine donnée.
+        """
+        self.rng = random.Random(options['seed'])
+        self.seed = options['seed']
+        self.taille_lot = max(options['taille_lot'], 1)
+        self.maintenant = timezone.now()
+        # Listes de choix calculées une fois (les propriétés .values sont recalculées à chaque appel)
+        self.choix = {
+            'actualite': Actualite.Categorie.values,
+            'evenement': Evenement.Categorie.values,
+            'signalement': Signalement.Categorie.values,
+        }
+
+        existantes = Commune.objects.filter(slug__startswith=PREFIXE_ECHELLE)
+        if existantes.exists():
+            if not options['force']:
+                self.stdout.write(self.style.WARNING(
+                    '⚠️ Données --scale existantes, utiliser --force pour recréer'
+                ))
+                return
+            self.stdout.write('  🗑️  Suppression des données --scale existantes...')
+            self.supprimer_scale()
+            existantes.delete()
+
+        departements = list(Departement.objects.values_list('id', flat=True))
+        if not departements:
+            self.stdout.write(self.style.ERROR('❌ Départements non trouvés'))
+            return
+
+        self.stdout.write(self.style.NOTICE(f'📈 Génération à grande échelle (seed={self.seed})...'))
+        debut = time.monotonic()
+
+        communes = self.generer_communes(options['communes'], departements)
+        ids_communes = [commune_id for commune_id, _ in communes]
+        # Poids cumulés : les grandes communes produisent plus de contenu
+        self.poids_communes = list(accumulate(population for _, population in communes))
+        self.ids_communes = ids_communes
+
+        with dates_libres(Actualite, Evenement, Signalement, Demarche, InscriptionEvenement):
+            self.generer('actualites', options['actualites'], self.nouvelle_actualite, Actualite)
+            self.generer('evenements', options['evenements'], self.nouvel_evenement, Evenement)
+            self.generer('signalements', options['signalements'], self.nouveau_signalement, Signalement)
+            self.generer('demarches', options['demarches'], self.nouvelle_demarche, Demarche)
+
+            evenements = list(
+                Evenement.objects.filter(commune_id__in=ids_communes)
+                .order_by('id').values_list('id', 'date')
+            )
+            if evenements:
+                # Popularité des événements : loi de Pareto (quelques événements très suivis)
+                self.evenements = evenements
+                self.poids_evenements = list(accumulate(
+                    self.rng.paretovariate(1.2) for _ in evenements
+                ))
+                self.generer(
+                    'inscriptions', options['inscriptions'], self.nouvelle_inscription, InscriptionEvenement
+                )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Jeu de données généré en {time.monotonic() - debut:.0f}s '
+            '(lancer reindexer_recherche pour l\'index de recherche)'
+        ))
+
+    def supprimer_scale(self):
+        """
+        Supprime le contenu des communes --scale par SQL direct (pas de chargement
+        objet par objet), puis ce que les signaux auraient mis à jour : documents
+        de l'index de recherche, statistiques, suggestions et compteurs de
+        références des fichiers stockés par contenu (les fichiers et leurs
+        déclinaisons partent au prochain nettoyer_medias)
+        """
+        documents = SearchDocument.objects.filter(commune__slug__startswith=PREFIXE_ECHELLE)
+        documents._raw_delete(documents.db)
+        for modele, champ in [
+            (InscriptionEvenement, 'evenement__commune__slug__startswith'),
+            (Evenement, 'commune__slug__startswith'),
+            (Actualite, 'commune__slug__startswith'),
+            (Signalement, 'commune__slug__startswith'),
+            (Demarche, 'commune__slug__startswith'),
+        ]:
+            queryset = modele.objects.filter(**{champ: PREFIXE_ECHELLE})
+            for champ_fichier in CHAMPS_CONTENU.get(modele._meta.label, []):
+                stockage.dereferencer(
+                    queryset.exclude(**{champ_fichier: ''}).values_list(champ_fichier, flat=True).iterator()
+                )
+            queryset._raw_delete(queryset.db)
+        indexation.recalculer_stats()
+        suggestions.invalider_tout()
+
+    def generer_communes(self, nombre, departements):
+        """Crée les communes et retourne [(id, population), ...]"""
+        objets = []
+        for i in range(nombre):
+            population = int(min(max(self.rng.lognormvariate(10.5, 1.0), 2000), 3_000_000))
+            objets.append(Commune(
+                nom=f'Commune {i + 1}',
+                slug=f'{PREFIXE_ECHELLE}{i + 1}',
+                departement_id=self.rng.choice(departements),
+                population=population,
+                statut=Commune.Statut.ACTIVE if self.rng.random() < 0.9 else Commune.Statut.EN_ATTENTE,
+                latitude=Decimal(f'{self.rng.uniform(2.0, 13.0):.6f}'),
+                longitude=Decimal(f'{self.rng.uniform(8.5, 16.0):.6f}'),
+            ))
+        Commune.objects.bulk_create(objets, batch_size=self.taille_lot)
+        self.stdout.write(f'  🏛️ {nombre} communes')
+        return list(
+            Commune.objects.filter(slug__startswith=PREFIXE_ECHELLE)
+            .order_by('id').values_list('id', 'population')
+        )
+
+    def generer(self, nom, total, fabrique, modele):
+        """Insère `total` objets par lots de bulk_create"""
+        debut = time.monotonic()
+        for depart in range(0, total, self.taille_lot):
+            modele.objects.bulk_create(
+                [fabrique(n) for n in range(depart, min(depart + self.taille_lot, total))],
+                batch_size=self.taille_lot,
+            )
+        duree = time.monotonic() - debut
+        self.stdout.write(f'  📦 {total} {nom} en {duree:.1f}s ({total / max(duree, 1e-9):,.0f}/s)')
+
+    # --- Fabriques d'objets ---
+
+    def commune(self):
+        return self.rng.choices(self.ids_communes, cum_weights=self.poids_communes)[0]
+
+    def tirer(self, repartition):
+        """Valeur tirée selon les poids de `repartition`"""
+        return self.rng.choices(list(repartition), weights=list(repartition.values()))[0]
+
+    def date_passee(self, jours=3 * 365):
+        """Date passée, plus probable récemment"""
+        return self.maintenant - timedelta(days=jours * (1 - self.rng.betavariate(2, 1)))
+
+    def titre(self):
+        return ' '.join(self.rng.sample(MOTS_TITRES, 3)).capitalize()
+
+    def nouvelle_actualite(self, n):
+        date = self.date_passee()
+        return Actualite(
+            commune_id=self.commune(),
+            titre=self.titre(),
+            slug=f'scale-{self.seed}-{n}',
+            resume='Information de la commune à destination des habitants.',
+            contenu='<p>La commune informe la population des mesures prises.</p>',
+            categorie=self.rng.choice(self.choix['actualite']),
+            est_publie=self.rng.random() < 0.85,
+            date_publication=date,
+            nombre_vues=int(self.rng.paretovariate(1.5) * 10),
+            date_creation=date,
+            date_modification=date,
+        )
+
+    def nouvel_evenement(self, n):
+        date = self.maintenant + timedelta(days=self.rng.uniform(-2 * 365, 180))
+        return Evenement(
+            commune_id=self.commune(),
+            nom=self.titre(),
+            slug=f'scale-{self.seed}-{n}',
+            description='Événement organisé par la commune.',
+            date=date.date(),
+            heure_debut=heure(self.rng.randint(7, 19), self.rng.choice([0, 30])),
+            lieu='Hôtel de Ville',
+            categorie=self.rng.choice(self.choix['evenement']),
+            statut=Evenement.Statut.TERMINE if date < self.maintenant else Evenement.Statut.CONFIRME,
+            est_public=self.rng.random() < 0.9,
+            date_creation=date - timedelta(days=30),
+            date_modification=date - timedelta(days=30),
+        )
+
+    def nouveau_signalement(self, n):
+        date = self.date_passee(2 * 365)
+        statut = self.tirer(REPARTITION_STATUTS_SIGNALEMENT)
+        return Signalement(
+            commune_id=self.commune(),
+            numero_suivi=f'SIG-S{self.seed}-{n:08d}',
+            titre=self.titre(),
+            description='Problème constaté dans le quartier.',
+            categorie=self.rng.choice(self.choix['signalement']),
+            latitude=Decimal(f'{self.rng.uniform(2.0, 13.0):.6f}'),
+            longitude=Decimal(f'{self.rng.uniform(8.5, 16.0):.6f}'),
+            statut=statut,
+            date_signalement=date,
+            date_resolution=date + timedelta(days=self.rng.expovariate(1 / 15))
+            if statut == Signalement.Statut.RESOLU else None,
+        )
+
+    def nouvelle_demarche(self, n):
+        date = self.date_passee(2 * 365)
+        statut = self.tirer(REPARTITION_STATUTS_DEMARCHE)
+        return Demarche(
+            commune_id=self.commune(),
+            numero_suivi=f'DEM-S{self.seed}-{n:08d}',
+            type=self.rng.choice(['acte_naissance', 'acte_mariage', 'permis_construire', 'certificat_residence']),
+            donnees={'motif': 'Demande générée'},
+            nom_demandeur=f'Demandeur {n}',
+            email_demandeur=f'demandeur{n}@example.cm',
+            statut=statut,
+            priorite=self.tirer(REPARTITION_PRIORITES),
+            date_demande=date,
+            date_traitement=date + timedelta(days=self.rng.expovariate(1 / 10))
+            if statut in (Demarche.Statut.VALIDEE, Demarche.Statut.REJETEE, Demarche.Statut.COMPLETEE) else None,
+        )
+
+    def nouvelle_inscription(self, n):
+        evenement_id, date = self.rng.choices(self.evenements, cum_weights=self.poids_evenements)[0]
+        return InscriptionEvenement(
+            evenement_id=evenement_id,
+            nom=f'Participant {n}',
+            email=f'participant{n}@example.cm',
+            nombre_personnes=self.tirer(REPARTITION_PERSONNES),
+            statut=self.tirer(REPARTITION_STATUTS_INSCRIPTION),
+            date_inscription=self.maintenant - timedelta(days=self.rng.uniform(0, 60)),
+        )
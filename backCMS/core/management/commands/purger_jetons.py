@@ -0,0 +1,47 @@
+"""
+Commande qui purge les tokens de vérification et les jetons JWT de
+rafraîchissement expirés, par lots, et affiche la taille des tables
+Passage unique (cron, chaque nuit) :
+    30 3 * * * cd /app && python manage.py purger_jetons
+Exemples :
+    python manage.py purger_jetons --lot 5000 --pause 0.1
+    python manage.py purger_jetons --simulation
+"""
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from core import purge
+from core.models import TokenVerification
+
+
+TABLES = [TokenVerification, OutstandingToken, BlacklistedToken]
+
+
+class Command(BaseCommand):
+    help = 'Supprime par lots les tokens de vérification et les jetons de rafraîchissement expirés'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lot', type=int, default=purge.TAILLE_LOT, help='Lignes supprimées par transaction')
+        parser.add_argument('--pause', type=float, default=0, help='Attente (s) entre deux lots')
+        parser.add_argument('--simulation', action='store_true', help='Compte les lignes expirées sans les supprimer')
+
+    def _tailles(self, titre):
+        self.stdout.write(self.style.NOTICE(titre))
+        for modele in TABLES:
+            lignes, octets = purge.taille_table(modele)
+            taille = f', {filesizeformat(octets)}' if octets is not None else ''
+            self.stdout.write(f'   {modele._meta.db_table} : {lignes} ligne(s){taille}')
+
+    def handle(self, *args, **options):
+        self._tailles('📏 Tables avant la purge')
+
+        for nom, queryset in purge.expires().items():
+            if options['simulation']:
+                self.stdout.write(self.style.NOTICE(f'🔍 {nom} : {queryset.count()} ligne(s) expirée(s)'))
+                continue
+            supprimes = purge.purger_par_lots(queryset, lot=options['lot'], pause=options['pause'])
+            self.stdout.write(self.style.SUCCESS(f'🗑️  {nom} : {supprimes} ligne(s) supprimée(s)'))
+
+        if not options['simulation']:
+            self._tailles('📏 Tables après la purge')
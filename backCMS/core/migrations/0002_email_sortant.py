@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmailSortant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type_email', models.CharField(choices=[('verification', 'Vérification email'), ('reinitialisation', 'Réinitialisation mot de passe'), ('bienvenue', 'Premier accès administrateur')], max_length=20, verbose_name='Type')),
+                ('destinataire', models.EmailField(max_length=254, verbose_name='Destinataire')),
+                ('statut', models.CharField(choices=[('en_attente', 'En attente'), ('envoye', 'Envoyé'), ('echoue', 'Échoué'), ('ignore', 'Ignoré')], default='en_attente', max_length=20, verbose_name='Statut')),
+                ('tentatives', models.PositiveSmallIntegerField(default=0, verbose_name='Tentatives')),
+                ('prochain_essai', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Prochain essai')),
+                ('verrouille_par', models.CharField(blank=True, max_length=255, verbose_name='Expéditeur')),
+                ('derniere_erreur', models.TextField(blank=True, verbose_name='Dernière erreur')),
+                ('date_creation', models.DateTimeField(auto_now_add=True, verbose_name='Date création')),
+                ('date_envoi', models.DateTimeField(blank=True, null=True, verbose_name='Date envoi')),
+                ('token', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='emails', to='core.tokenverification')),
+            ],
+            options={
+                'verbose_name': 'Email sortant',
+                'verbose_name_plural': 'Emails sortants',
+                'ordering': ['-date_creation'],
+                'indexes': [models.Index(condition=models.Q(('statut', 'en_attente')), fields=['prochain_essai', 'id'], name='email_sortant_file_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_email_sortant'),
+        ('token_blacklist', '0013_alter_blacklistedtoken_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tokenverification',
+            index=models.Index(fields=['utilisateur', 'type_token', 'est_utilise'], name='token_verif_util_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tokenverification',
+            index=models.Index(fields=['date_expiration'], name='token_verif_expiration_idx'),
+        ),
+        # Purge des jetons de rafraîchissement expirés : modèle de
+        # rest_framework_simplejwt.token_blacklist, sans index sur expires_at
+        migrations.RunSQL(
+            'CREATE INDEX IF NOT EXISTS token_outstanding_expiration_idx '
+            'ON token_blacklist_outstandingtoken (expires_at)',
+            'DROP INDEX IF EXISTS token_outstanding_expiration_idx',
+        ),
+    ]
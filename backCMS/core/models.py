@@ -94,10 +94,14 @@ class Utilisateur(AbstractBaseUser, PermissionsMixin):
         return self.role == self.Role.EDITEUR
     
     def peut_gerer_commune(self, commune):
-        """Vérifie si l'utilisateur peut gérer une commune"""
+        """Vérifie si l'utilisateur peut gérer une commune (instance ou identifiant)"""
         if self.is_super_admin():
             return True
-        return self.commune == commune and self.role in [self.Role.ADMIN_COMMUNE, self.Role.EDITEUR]
+        commune_id = getattr(commune, 'pk', commune)
+        return (
+            commune_id is not None and self.commune_id == commune_id
+            and self.role in [self.Role.ADMIN_COMMUNE, self.Role.EDITEUR]
+        )
 
 
 class TokenVerification(models.Model):
@@ -121,6 +125,12 @@ class TokenVerification(models.Model):
     class Meta:
         verbose_name = 'Token de vérification'
         verbose_name_plural = 'Tokens de vérification'
+        indexes = [
+            # Invalidation des tokens précédents (generer_token)
+            models.Index(fields=['utilisateur', 'type_token', 'est_utilise'], name='token_verif_util_type_idx'),
+            # Purge des tokens expirés (purger_jetons)
+            models.Index(fields=['date_expiration'], name='token_verif_expiration_idx'),
+        ]
     
     @classmethod
     def generer_token(cls, utilisateur, type_token, duree_heures=24):
@@ -142,6 +152,60 @@ class TokenVerification(models.Model):
         return not self.est_utilise and self.date_expiration > timezone.now()
 
 
+class EmailSortant(models.Model):
+    """
+    File d'envoi des emails de compte (outbox) : la ligne est écrite dans la
+    même transaction que le token, le processus `envoyer_emails` l'envoie.
+    """
+    
+    class TypeEmail(models.TextChoices):
+        VERIFICATION = 'verification', 'Vérification email'
+        REINITIALISATION = 'reinitialisation', 'Réinitialisation mot de passe'
+        BIENVENUE = 'bienvenue', 'Premier accès administrateur'
+    
+    class Statut(models.TextChoices):
+        EN_ATTENTE = 'en_attente', 'En attente'
+        ENVOYE = 'envoye', 'Envoyé'
+        ECHOUE = 'echoue', 'Échoué'
+        IGNORE = 'ignore', 'Ignoré'
+    
+    type_email = models.CharField('Type', max_length=20, choices=TypeEmail.choices)
+    destinataire = models.EmailField('Destinataire')
+    # Vide pour une demande de réinitialisation : le token est créé à l'envoi,
+    # si un compte correspond à l'adresse
+    token = models.ForeignKey(
+        TokenVerification,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name='emails'
+    )
+    
+    statut = models.CharField('Statut', max_length=20, choices=Statut.choices, default=Statut.EN_ATTENTE)
+    tentatives = models.PositiveSmallIntegerField('Tentatives', default=0)
+    # Date du prochain essai ; repoussée pendant l'envoi (bail de l'expéditeur)
+    prochain_essai = models.DateTimeField('Prochain essai', default=timezone.now)
+    verrouille_par = models.CharField('Expéditeur', max_length=255, blank=True)
+    derniere_erreur = models.TextField('Dernière erreur', blank=True)
+    
+    date_creation = models.DateTimeField('Date création', auto_now_add=True)
+    date_envoi = models.DateTimeField('Date envoi', null=True, blank=True)
+    
+    class Meta:
+        verbose_name = 'Email sortant'
+        verbose_name_plural = 'Emails sortants'
+        ordering = ['-date_creation']
+        indexes = [
+            models.Index(
+                fields=['prochain_essai', 'id'],
+                condition=models.Q(statut='en_attente'),
+                name='email_sortant_file_idx',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_type_email_display()} → {self.destinataire}"
+
+
 class ConfigurationPortail(models.Model):
     """Configuration du portail national (singleton)"""
     
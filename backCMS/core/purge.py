@@ -0,0 +1,73 @@
+"""
+Core - Purge des jetons expirés
+
+Tokens de vérification (email, mot de passe) et jetons JWT de
+rafraîchissement suivis par token_blacklist (une ligne par connexion et par
+rafraîchissement) : les lignes expirées sont supprimées par lots de `lot`
+lignes, chacun dans sa propre transaction. Les verrous ne durent que le
+temps d'un lot ; `pause` espace les lots pour laisser passer le trafic.
+
+Les lots sont choisis par l'index sur la date d'expiration.
+"""
+import time
+
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+
+from .models import TokenVerification
+
+
+TAILLE_LOT = 1000
+
+
+def expires():
+    """{nom: queryset des lignes expirées} des tables purgées"""
+    maintenant = timezone.now()
+    return {
+        'tokens_verification': TokenVerification.objects.filter(date_expiration__lt=maintenant),
+        # Les jetons révoqués (BlacklistedToken) suivent en cascade
+        'jetons_rafraichissement': OutstandingToken.objects.filter(expires_at__lt=maintenant),
+    }
+
+
+def purger_par_lots(queryset, lot=TAILLE_LOT, pause=0):
+    """Supprime les lignes de `queryset` par lots ; retourne le nombre de lignes du modèle supprimées"""
+    modele = queryset.model
+    supprimes = 0
+    while True:
+        with transaction.atomic():
+            pks = list(queryset.order_by().values_list('pk', flat=True)[:lot])
+            if not pks:
+                break
+            _, detail = modele.objects.filter(pk__in=pks).delete()
+        supprimes += detail.get(modele._meta.label, 0)
+        if len(pks) < lot:
+            break
+        if pause:
+            time.sleep(pause)
+    return supprimes
+
+
+def taille_table(modele):
+    """(lignes, octets occupés ou None si la base ne le donne pas) de la table de `modele`"""
+    table = modele._meta.db_table
+    lignes = modele.objects.count()
+    with connection.cursor() as curseur:
+        try:
+            if connection.vendor == 'postgresql':
+                # Table, index et TOAST
+                curseur.execute('SELECT pg_total_relation_size(%s::regclass)', [table])
+            elif connection.vendor == 'sqlite':
+                # Table et index (SQLite compilé avec dbstat)
+                curseur.execute(
+                    'SELECT SUM(pgsize) FROM dbstat WHERE name = %s '
+                    'OR name IN (SELECT name FROM sqlite_master WHERE type = %s AND tbl_name = %s)',
+                    [table, 'index', table]
+                )
+            else:
+                return lignes, None
+            octets = curseur.fetchone()[0]
+        except Exception:
+            return lignes, None
+    return lignes, octets
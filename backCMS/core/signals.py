@@ -0,0 +1,43 @@
+"""
+Core - Signaux : révocation des jetons d'accès quand les droits d'un
+utilisateur changent (voir core.jetons)
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from . import jetons
+
+
+# Champs du modèle dont les claims sont tirés (update_fields)
+CHAMPS_CLAIMS = {'role', 'commune', 'commune_id', 'is_active'}
+
+def _avant_sauvegarde(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Droits avant la sauvegarde, lus en base (l'instance a déjà les nouveaux)
+    instance._jetons_claims_avant = None
+    if raw or instance.pk is None or (update_fields and not set(update_fields) & CHAMPS_CLAIMS):
+        return
+    instance._jetons_claims_avant = sender._base_manager.filter(pk=instance.pk).values(*jetons.CLAIMS).first()
+
+
+def _apres_sauvegarde(sender, instance, raw=False, **kwargs):
+    avant = getattr(instance, '_jetons_claims_avant', None)
+    instance._jetons_claims_avant = None
+    if raw or avant is None:
+        return
+    if any(avant[claim] != getattr(instance, claim) for claim in jetons.CLAIMS):
+        pk = instance.pk
+        transaction.on_commit(lambda: jetons.revoquer(pk))
+
+
+def _apres_suppression(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: jetons.revoquer(pk))
+
+
+def connecter():
+    """Connecte les signaux du modèle utilisateur"""
+    modele = get_user_model()
+    pre_save.connect(_avant_sauvegarde, sender=modele, dispatch_uid='core_jetons_avant')
+    post_save.connect(_apres_sauvegarde, sender=modele, dispatch_uid='core_jetons')
+    post_delete.connect(_apres_suppression, sender=modele, dispatch_uid='core_jetons_suppr')
@@ -1,13 +1,33 @@
 """
 Tests pour le module Core - Utilisateurs et Configuration
 """
-from django.test import TestCase
+from datetime import timedelta
+from io import StringIO
+
+from django.core import mail
+from django.core.cache import cache
+from django.core.mail.backends.locmem import EmailBackend as LocmemBackend
+from django.test import TestCase, override_settings
+from django.utils import timezone
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
 
-from core.models import ConfigurationPortail, TokenVerification
+from core import jetons, purge
+from core.emails import Expediteur
+from core.models import ConfigurationPortail, EmailSortant, TokenVerification
+from communes.models import Commune
+from actualites.models import Actualite
+from evenements.models import Evenement, InscriptionEvenement
+from services.models import Demarche, Signalement
+from medias.models import FichierStocke
+from recherche import indexation
+from recherche.models import SearchDocument, SearchStats
 
 Utilisateur = get_user_model()
 
@@ -195,3 +215,381 @@ class AuthAPITest(APITestCase):
         """Test accès profil non authentifié"""
         response = self.client.get('/api/v1/auth/profile/')
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(JWT_SANS_REQUETE=True)
+class JetonsClaimsTest(APITestCase):
+    """Tests de l'authentification par les claims du jeton (sans lecture de l'utilisateur)"""
+
+    def setUp(self):
+        cache.clear()
+        self.commune = Commune.objects.create(nom='Yaoundé', slug='yaounde', statut=Commune.Statut.ACTIVE)
+        self.autre_commune = Commune.objects.create(nom='Douala', slug='douala', statut=Commune.Statut.ACTIVE)
+        self.admin = Utilisateur.objects.create_user(
+            email='admin@yaounde.cm', nom='Admin', password='testpass123',
+            role=Utilisateur.Role.ADMIN_COMMUNE, commune=self.commune
+        )
+        self.actualites = {
+            commune.slug: Actualite.objects.create(
+                commune=commune, auteur=self.admin, titre=f'Actualité {commune.nom}',
+                slug=f'actualite-{commune.slug}', contenu='Contenu'
+            )
+            for commune in (self.commune, self.autre_commune)
+        }
+
+    def tearDown(self):
+        cache.clear()
+
+    def _connecter(self, jeton):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {jeton}')
+
+    def _requetes_utilisateur(self, requete):
+        with CaptureQueriesContext(connection) as contexte:
+            response = requete()
+        return response, [q['sql'] for q in contexte.captured_queries if 'FROM "core_utilisateur"' in q['sql']]
+
+    def test_claims_du_jeton(self):
+        """Test la connexion émet un jeton d'accès portant rôle, commune et état"""
+        response = self.client.post('/api/v1/auth/login/', {'email': 'admin@yaounde.cm', 'password': 'testpass123'})
+        acces = AccessToken(response.data['tokens']['access'])
+        self.assertEqual(acces['role'], Utilisateur.Role.ADMIN_COMMUNE)
+        self.assertEqual(acces['commune_id'], self.commune.pk)
+        self.assertTrue(acces['is_active'])
+
+    def test_aucune_requete_utilisateur(self):
+        """Test authentification et permissions sans lecture de l'utilisateur ni de sa commune"""
+        self._connecter(jetons.JetonRafraichissement.for_user(self.admin).access_token)
+        response, requetes = self._requetes_utilisateur(
+            lambda: self.client.patch('/api/v1/actualites/actualite-yaounde/', {'resume': 'Modifié'})
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(requetes, [])
+
+        # Jeton émis sans claims : utilisateur lu en base
+        self._connecter(RefreshToken.for_user(self.admin).access_token)
+        response, requetes = self._requetes_utilisateur(lambda: self.client.get('/api/v1/newsletters/'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(requetes), 1)
+
+    def test_permissions_par_commune(self):
+        """Test écriture limitée à la commune du jeton"""
+        self._connecter(jetons.JetonRafraichissement.for_user(self.admin).access_token)
+        response = self.client.patch('/api/v1/actualites/actualite-douala/', {'resume': 'Modifié'})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_cles_etrangeres(self):
+        """Test l'utilisateur du jeton est enregistré comme auteur / signaleur"""
+        self._connecter(jetons.JetonRafraichissement.for_user(self.admin).access_token)
+        response = self.client.post('/api/v1/signalements/', {
+            'commune': self.commune.pk, 'titre': 'Lampadaire', 'description': 'Éteint',
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Signalement.objects.get().signaleur, self.admin)
+
+        response = self.client.get('/api/v1/auth/profile/')
+        self.assertEqual(response.data['email'], 'admin@yaounde.cm')
+
+    def test_revocation_changement_de_droits(self):
+        """Test un changement de commune révoque le jeton ; le rafraîchissement porte les nouveaux droits"""
+        refresh = jetons.JetonRafraichissement.for_user(self.admin)
+        # Jeton émis avant la révocation
+        jeton = refresh.access_token
+        jeton['iat'] -= 5
+        jeton['emis'] -= 5
+        self._connecter(jeton)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.admin.commune = self.autre_commune
+            self.admin.save()
+        response = self.client.get('/api/v1/newsletters/')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        response = self.client.post('/api/v1/auth/refresh/', {'refresh': str(refresh)})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        acces = AccessToken(response.data['access'])
+        self.assertEqual(acces['commune_id'], self.autre_commune.pk)
+        self.assertEqual(AccessToken(str(RefreshToken(response.data['refresh']).access_token))['commune_id'], self.autre_commune.pk)
+
+        self._connecter(response.data['access'])
+        response = self.client.patch('/api/v1/actualites/actualite-douala/', {'resume': 'Modifié'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_revocation_desactivation(self):
+        """Test un compte désactivé : jeton d'accès et rafraîchissement refusés"""
+        refresh = jetons.JetonRafraichissement.for_user(self.admin)
+        jeton = refresh.access_token
+        jeton['iat'] -= 5
+        jeton['emis'] -= 5
+        self._connecter(jeton)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.admin.is_active = False
+            self.admin.save(update_fields=['is_active'])
+        self.assertEqual(self.client.get('/api/v1/newsletters/').status_code, status.HTTP_401_UNAUTHORIZED)
+
+        self.client.credentials()
+        response = self.client.post('/api/v1/auth/refresh/', {'refresh': str(refresh)})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_sauvegarde_sans_changement_de_droits(self):
+        """Test modifier le nom ne révoque pas les jetons"""
+        jeton = jetons.JetonRafraichissement.for_user(self.admin).access_token
+        jeton['iat'] -= 5
+        jeton['emis'] -= 5
+        with self.captureOnCommitCallbacks(execute=True):
+            self.admin.nom = 'Nouveau nom'
+            self.admin.save()
+        self.assertFalse(jetons.est_revoque(jeton))
+
+    def test_jeton_emis_dans_la_seconde_de_la_revocation(self):
+        """Test un jeton émis juste après la révocation, dans la même seconde, reste valide"""
+        avant = jetons.JetonRafraichissement.for_user(self.admin).access_token
+        jetons.revoquer(self.admin.pk)
+        apres = jetons.JetonRafraichissement.for_user(self.admin).access_token
+        self.assertTrue(jetons.est_revoque(avant))
+        self.assertFalse(jetons.est_revoque(apres))
+
+        # Jeton sans `emis` : refusé jusqu'à la fin de la seconde de la révocation
+        del apres['emis']
+        self.assertTrue(jetons.est_revoque(apres))
+
+    @override_settings(JWT_SANS_REQUETE=False)
+    def test_sans_cache_partage(self):
+        """Test sans cache partagé pour les révocations, l'utilisateur est relu en base"""
+        self._connecter(jetons.JetonRafraichissement.for_user(self.admin).access_token)
+        response, requetes = self._requetes_utilisateur(lambda: self.client.get('/api/v1/newsletters/'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(requetes), 1)
+
+
+class BackendComptage(LocmemBackend):
+    """Backend de test : compte les ouvertures de connexion, peut échouer"""
+    ouvertures = 0
+    en_panne = False
+    
+    def open(self):
+        if getattr(self, 'ouverte', False):
+            return False
+        BackendComptage.ouvertures += 1
+        self.ouverte = True
+        return True
+    
+    def close(self):
+        self.ouverte = False
+    
+    def send_messages(self, messages):
+        if BackendComptage.en_panne:
+            raise ConnectionRefusedError('SMTP indisponible')
+        return super().send_messages(messages)
+
+
+@override_settings(EMAIL_BACKEND='core.tests.BackendComptage')
+class EmailSortantTest(APITestCase):
+    """Tests de la file des emails de compte"""
+    
+    def setUp(self):
+        BackendComptage.ouvertures = 0
+        BackendComptage.en_panne = False
+        self.user = Utilisateur.objects.create_user(
+            email='test@example.com', nom='Test User', password='testpass123'
+        )
+    
+    def envoyer(self, **options):
+        expediteur = Expediteur(une_fois=True, **options)
+        expediteur.demarrer()
+        return expediteur
+    
+    def test_inscription_ecrit_la_file(self):
+        """Test inscription : token et email en file, envoi par l'expéditeur"""
+        response = self.client.post('/api/v1/auth/register/', {
+            'email': 'new@example.com', 'nom': 'New User',
+            'password': 'newpass123', 'password_confirm': 'newpass123',
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(mail.outbox), 0)
+        email = EmailSortant.objects.get(destinataire='new@example.com')
+        self.assertEqual(email.type_email, EmailSortant.TypeEmail.VERIFICATION)
+        
+        self.assertEqual(self.envoyer().envoyes, 1)
+        self.assertIn(f'/verify-email?token={email.token.token}', mail.outbox[0].body)
+        email.refresh_from_db()
+        self.assertEqual(email.statut, EmailSortant.Statut.ENVOYE)
+    
+    def test_reinitialisation_temps_constant(self):
+        """Test même travail que le compte existe ou non"""
+        requetes = []
+        for adresse in ('test@example.com', 'inconnu@example.com'):
+            with CaptureQueriesContext(connection) as capture:
+                response = self.client.post('/api/v1/auth/password-reset/', {'email': adresse})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            requetes.append(len(capture))
+        self.assertEqual(requetes[0], requetes[1])
+        self.assertFalse(TokenVerification.objects.exists())
+        
+        self.envoyer()
+        self.assertEqual([m.to for m in mail.outbox], [['test@example.com']])
+        token = TokenVerification.objects.get(utilisateur=self.user)
+        self.assertIn(f'/reset-password?token={token.token}', mail.outbox[0].body)
+        self.assertEqual(
+            EmailSortant.objects.get(destinataire='inconnu@example.com').statut, EmailSortant.Statut.IGNORE
+        )
+    
+    def test_connexion_reutilisee(self):
+        """Test une connexion SMTP pour tout un lot"""
+        for numero in range(5):
+            token = TokenVerification.generer_token(
+                Utilisateur.objects.create_user(email=f'u{numero}@example.com', nom='U', password='x'),
+                TokenVerification.TypeToken.EMAIL_VERIFICATION,
+            )
+            EmailSortant.objects.create(
+                type_email=EmailSortant.TypeEmail.VERIFICATION, destinataire=token.utilisateur.email, token=token
+            )
+        self.assertEqual(self.envoyer(taille_lot=10).envoyes, 5)
+        self.assertEqual(BackendComptage.ouvertures, 1)
+    
+    @override_settings(EMAILS_TENTATIVES_MAX=2)
+    def test_reessai_puis_abandon(self):
+        """Test échec SMTP : nouvel essai différé, puis abandon"""
+        email = EmailSortant.objects.create(
+            type_email=EmailSortant.TypeEmail.REINITIALISATION, destinataire='test@example.com'
+        )
+        BackendComptage.en_panne = True
+        self.assertEqual(self.envoyer().echecs, 1)
+        email.refresh_from_db()
+        self.assertEqual(email.statut, EmailSortant.Statut.EN_ATTENTE)
+        self.assertEqual(email.tentatives, 1)
+        self.assertGreater(email.prochain_essai, timezone.now())
+        self.assertEqual(self.envoyer().echecs, 0)  # pas encore dû
+        
+        EmailSortant.objects.filter(pk=email.pk).update(prochain_essai=timezone.now())
+        self.envoyer()
+        email.refresh_from_db()
+        self.assertEqual(email.statut, EmailSortant.Statut.ECHOUE)
+        # Un seul token créé malgré les essais
+        self.assertEqual(TokenVerification.objects.count(), 1)
+
+
+class PurgeJetonsTest(TestCase):
+    """Tests de la purge des tokens de vérification et jetons de rafraîchissement expirés"""
+
+    def setUp(self):
+        self.user = Utilisateur.objects.create_user(email='test@example.com', nom='Test', password='testpass123')
+        maintenant = timezone.now()
+        self.tokens_expires = [
+            TokenVerification.objects.create(
+                utilisateur=self.user, token=f'expire-{i}', date_expiration=maintenant - timedelta(hours=1),
+                type_token=TokenVerification.TypeToken.PASSWORD_RESET,
+            )
+            for i in range(5)
+        ]
+        self.token_valide = TokenVerification.generer_token(self.user, TokenVerification.TypeToken.EMAIL_VERIFICATION)
+        self.email = EmailSortant.objects.create(
+            type_email=EmailSortant.TypeEmail.REINITIALISATION, destinataire=self.user.email,
+            token=self.tokens_expires[0], statut=EmailSortant.Statut.ENVOYE,
+        )
+
+        for i in range(3):
+            expire = OutstandingToken.objects.create(
+                user=self.user, jti=f'expire-{i}', token='...', expires_at=maintenant - timedelta(days=1)
+            )
+            BlacklistedToken.objects.create(token=expire)
+        self.jeton_valide = OutstandingToken.objects.create(
+            user=self.user, jti='valide', token='...', expires_at=maintenant + timedelta(days=7)
+        )
+
+    def test_purge_par_lots(self):
+        """Test suppression par lots des seules lignes expirées"""
+        with CaptureQueriesContext(connection) as requetes:
+            supprimes = purge.purger_par_lots(purge.expires()['tokens_verification'], lot=2)
+        self.assertEqual(supprimes, 5)
+        # Lots de 2 lignes : 3 suppressions
+        self.assertEqual(sum('DELETE FROM "core_tokenverification"' in q['sql'] for q in requetes.captured_queries), 3)
+        self.assertEqual(list(TokenVerification.objects.all()), [self.token_valide])
+
+        # L'historique des emails est gardé
+        self.email.refresh_from_db()
+        self.assertIsNone(self.email.token)
+
+    def test_purge_jetons_rafraichissement(self):
+        """Test jetons expirés et leurs révocations supprimés"""
+        self.assertEqual(purge.purger_par_lots(purge.expires()['jetons_rafraichissement'], lot=2), 3)
+        self.assertEqual(list(OutstandingToken.objects.all()), [self.jeton_valide])
+        self.assertFalse(BlacklistedToken.objects.exists())
+
+    def test_taille_table(self):
+        """Test lignes et taille de la table"""
+        lignes, octets = purge.taille_table(TokenVerification)
+        self.assertEqual(lignes, 6)
+        if octets is not None:
+            self.assertGreater(octets, 0)
+
+    def test_commande(self):
+        """Test la commande affiche les tailles avant et après la purge"""
+        out = StringIO()
+        call_command('purger_jetons', '--simulation', stdout=out)
+        self.assertIn('tokens_verification : 5 ligne(s) expirée(s)', out.getvalue())
+        self.assertEqual(TokenVerification.objects.count(), 6)
+
+        out = StringIO()
+        call_command('purger_jetons', '--lot', '2', stdout=out)
+        sortie = out.getvalue()
+        self.assertIn('tokens_verification : 5 ligne(s) supprimée(s)', sortie)
+        self.assertIn('jetons_rafraichissement : 3 ligne(s) supprimée(s)', sortie)
+        self.assertIn('core_tokenverification : 6 ligne(s)', sortie)
+        self.assertIn('core_tokenverification : 1 ligne(s)', sortie)
+        self.assertIn('token_blacklist_outstandingtoken : 1 ligne(s)', sortie)
+
+
+class InitCamerounScaleTest(TestCase):
+    """Tests pour la génération de données à grande échelle (init_cameroun --scale)"""
+    
+    VOLUMES = [
+        '--communes', '5', '--actualites', '40', '--evenements', '10',
+        '--signalements', '30', '--demarches', '30', '--inscriptions', '50',
+        '--taille-lot', '7',
+    ]
+    
+    def generer(self, *options):
+        call_command('init_cameroun', '--scale', *self.VOLUMES, *options, stdout=StringIO())
+    
+    def test_volumes_et_dates(self):
+        """Test volumes générés et dates réparties dans le passé"""
+        self.generer()
+        self.assertEqual(Commune.objects.filter(slug__startswith='scale-').count(), 5)
+        self.assertEqual(Actualite.objects.count(), 40)
+        self.assertEqual(Evenement.objects.count(), 10)
+        self.assertEqual(Signalement.objects.count(), 30)
+        self.assertEqual(Demarche.objects.count(), 30)
+        self.assertEqual(InscriptionEvenement.objects.count(), 50)
+        # auto_now_add désactivé pendant la génération
+        self.assertGreater(
+            Signalement.objects.values('date_signalement').distinct().count(), 1
+        )
+        self.assertTrue(Demarche.objects.filter(numero_suivi__startswith='DEM-S42-').exists())
+    
+    def test_reproductible_avec_graine(self):
+        """Test que la même graine produit les mêmes données"""
+        self.generer()
+        premiers = list(Actualite.objects.order_by('slug').values_list('slug', 'titre', 'commune__slug'))
+        
+        sortie = StringIO()
+        call_command('init_cameroun', '--scale', *self.VOLUMES, stdout=sortie)
+        self.assertIn('--force', sortie.getvalue())
+        
+        self.generer('--force')
+        seconds = list(Actualite.objects.order_by('slug').values_list('slug', 'titre', 'commune__slug'))
+        self.assertEqual(premiers, seconds)
+    
+    def test_force_purge_index_et_references(self):
+        """Test recréation : index de recherche et compteurs de fichiers mis à jour"""
+        self.generer()
+        indexation.reindexer()
+        self.assertTrue(SearchDocument.objects.exists())
+        fichier = FichierStocke.objects.create(empreinte='a' * 64, nom='contenu/aa/image.jpg', taille=10, references=1)
+        Actualite.objects.filter(pk=Actualite.objects.first().pk).update(image_principale=fichier.nom)
+        
+        self.generer('--force')
+        self.assertFalse(SearchDocument.objects.exists())
+        self.assertEqual(SearchStats.get_instance().nombre_documents, 0)
+        fichier.refresh_from_db()
+        self.assertEqual(fichier.references, 0)
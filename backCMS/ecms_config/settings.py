@@ -37,6 +37,12 @@ def is_module_available(module_name):
 # Django CMS disponible ?
 DJANGO_CMS_AVAILABLE = is_module_available('cms')
 
+# Export open data au format Parquet disponible ?
+PYARROW_AVAILABLE = is_module_available('pyarrow')
+
+# Extraction du texte des PDF (recherche dans les délibérations) disponible ?
+PYPDF_AVAILABLE = is_module_available('pypdf')
+
 # ===== INSTALLED APPS =====
 INSTALLED_APPS = [
     # Django Core
@@ -63,6 +69,9 @@ INSTALLED_APPS = [
     'evenements',
     'services',
     'transparence',
+    'recherche',
+    'taches',
+    'medias',
     'api',
 ]
 
@@ -180,8 +189,81 @@ STATICFILES_DIRS = [BASE_DIR / 'static'] if (BASE_DIR / 'static').exists() else
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Jeux de données ouvertes (publier_opendata), servis comme fichiers statiques
+OPENDATA_ROOT = MEDIA_ROOT / 'opendata'
+OPENDATA_URL = MEDIA_URL + 'opendata/'
+
+# Fichiers stockés par contenu (medias.stockage) : délai avant que
+# nettoyer_medias supprime un fichier qui n'est plus référencé
+MEDIAS_DELAI_NETTOYAGE = 24 * 3600
+
+# Téléversements fragmentés des gros documents (PDF) : fichiers partiels
+# hors de MEDIA_ROOT (non servis), taille maximale d'un fragment par requête,
+# purge par nettoyer_medias après TELEVERSEMENTS_DUREE secondes sans activité
+TELEVERSEMENTS_ROOT = BASE_DIR / 'televersements'
+TELEVERSEMENTS_TAILLE_MAX = 200 * 1024 * 1024
+TELEVERSEMENTS_TAILLE_FRAGMENT = 5 * 1024 * 1024
+TELEVERSEMENTS_EXTENSIONS = ['.pdf']
+TELEVERSEMENTS_DUREE = 24 * 3600
+
+# Texte des PDF indexé pour la recherche (si pypdf est installé) : pages lues
+# au plus par document
+PDF_PAGES_MAX = 2000
+
+# Images responsives : largeurs des déclinaisons WebP / JPEG générées après
+# l'upload, et largeur maximale des vignettes référencées par les listes
+IMAGES_LARGEURS = [320, 640, 1280]
+IMAGES_LARGEUR_VIGNETTE = 640
+
+# Photos des signalements, réduites à la réception (medias.photos) : poids et
+# nombre de pixels acceptés, plus grand côté et qualité WebP après réduction,
+# décodages simultanés par processus et attente d'un créneau libre (secondes)
+PHOTOS_TAILLE_MAX = 15 * 1024 * 1024
+PHOTOS_PIXELS_MAX = 50_000_000
+PHOTOS_COTE_MAX = 1600
+PHOTOS_QUALITE = 80
+PHOTOS_CONCURRENCE = 2
+PHOTOS_ATTENTE = 10
+# Uploads au-delà de cette taille écrits dans un fichier temporaire, pas en mémoire
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2_621_440
+
+# Rendez-vous (evenements.disponibilites) : durée d'un créneau (minutes),
+# fenêtre maximale d'une recherche de créneaux libres (jours) et durée de vie
+# des créneaux d'un jour en cache (secondes, effacés à chaque réservation) ;
+# sans cache partagé, un processus ne voit pas les effacements des autres :
+# durée de vie courte
+RENDEZ_VOUS_DUREE_CRENEAU = 30
+RENDEZ_VOUS_FENETRE_MAX = 62
+RENDEZ_VOUS_CACHE_DUREE = 3600
+RENDEZ_VOUS_CACHE_DUREE_LOCALE = 5
+
+# Événements récurrents (evenements.recurrence) : jours d'occurrences listés
+# quand la fenêtre n'a pas de fin, et fenêtre maximale d'une liste (jours)
+EVENEMENTS_HORIZON_RECURRENCE = 90
+EVENEMENTS_FENETRE_MAX = 366
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# ===== CACHE =====
+# Redis (partagé entre les processus) si REDIS_URL est défini, sinon mémoire
+# locale du processus
+REDIS_URL = os.environ.get('REDIS_URL', '')
+CACHE_PARTAGE = bool(REDIS_URL) and is_module_available('redis')
+if CACHE_PARTAGE:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        }
+    }
+
 # ===== DJANGO CMS CONFIGURATION (si disponible) =====
 if DJANGO_CMS_AVAILABLE:
     CMS_TEMPLATES = [
@@ -235,9 +317,17 @@ if DJANGO_CMS_AVAILABLE:
     FILER_CANONICAL_URL = 'sharing/'
 
 # ===== DJANGO REST FRAMEWORK =====
+# Jetons d'accès authentifiés par leurs claims (rôle, commune), sans lecture
+# de l'utilisateur en base. Les révocations doivent être vues par tous les
+# processus : sans cache partagé (REDIS_URL), l'utilisateur est relu en base
+# à chaque requête
+JWT_SANS_REQUETE = CACHE_PARTAGE and os.environ.get('JWT_SANS_REQUETE', 'True').lower() in ('true', '1', 'yes')
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # Droits lus dans les claims du jeton (core.jetons) si JWT_SANS_REQUETE,
+        # sinon utilisateur relu en base
+        'core.jetons.JWTSansRequeteAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
@@ -245,12 +335,29 @@ REST_FRAMEWORK = {
     ),
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
-        'rest_framework.filters.SearchFilter',
+        'recherche.filters.RechercheFilter',
         'rest_framework.filters.OrderingFilter',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # Proxys devant l'API : l'adresse du client est la dernière ajoutée à
+    # X-Forwarded-For. 0 (API exposée directement) : en-tête ignoré ; 1
+    # derrière nginx (profil production de docker-compose)
+    'NUM_PROXIES': int(os.environ.get('API_NOMBRE_PROXYS', 0)),
+}
+
+# Limitation de débit des écritures anonymes (api.limitation) : seaux de
+# jetons "nombre/période" (s, min, h, j) par adresse IP et par commune
+# (sous-domaine ; le portail national n'a que les seaux par adresse IP)
+LIMITES_DEBIT = {
+    'connexion': {'ip': '10/min', 'commune': '300/min'},
+    'reinitialisation': {'ip': '5/h', 'commune': '100/h'},
+    'signalements': {'ip': '10/h', 'commune': '300/h'},
+    'contacts': {'ip': '5/h', 'commune': '200/h'},
+    'demandes_site': {'ip': '3/h', 'commune': '20/h'},
+    'abonnements': {'ip': '10/h', 'commune': '500/h'},
+    'inscriptions': {'ip': '20/h', 'commune': '1000/h'},
 }
 
 # ===== JWT CONFIGURATION =====
@@ -260,6 +367,8 @@ SIMPLE_JWT = {
     'ROTATE_REFRESH_TOKENS': True,
     'BLACKLIST_AFTER_ROTATION': True,
     'AUTH_HEADER_TYPES': ('Bearer',),
+    'TOKEN_USER_CLASS': 'core.jetons.UtilisateurJeton',
+    'TOKEN_REFRESH_SERIALIZER': 'core.jetons.JetonRafraichissementSerializer',
 }
 
 # ===== CORS =====
@@ -306,6 +415,41 @@ EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD', '')
 DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'E-CMS <noreply@ecms.cm>')
 
 FRONTEND_URL = os.environ.get('FRONTEND_URL', 'http://localhost:3000')
+# File des emails de compte (manage.py envoyer_emails) : emails réservés par
+# lot, tentatives avant abandon, délai de base entre deux tentatives (s, doublé
+# à chaque échec), durée de réservation d'un lot par un expéditeur (s)
+EMAILS_TAILLE_LOT = 50
+EMAILS_TENTATIVES_MAX = 8
+EMAILS_DELAI_REESSAI = 60
+EMAILS_DUREE_BAIL = 300
+# URL publique de l'API (liens de désinscription des newsletters)
+BACKEND_URL = os.environ.get('BACKEND_URL', 'http://localhost:8000')
+
+# Envoi des newsletters : abonnés par lot (une connexion SMTP par lot) et
+# débit maximal en emails par seconde (0 = illimité)
+NEWSLETTER_TAILLE_LOT = int(os.environ.get('NEWSLETTER_TAILLE_LOT', 200))
+NEWSLETTER_DEBIT = float(os.environ.get('NEWSLETTER_DEBIT', 10))
+# Suivi des ouvertures : écriture en base toutes les N ouvertures, et au plus
+# tard N secondes après une ouverture ; une ouverture par abonné retenue
+# pendant la rétention (s)
+NEWSLETTER_OUVERTURES_LOT = 500
+NEWSLETTER_OUVERTURES_DELAI = 10
+NEWSLETTER_OUVERTURES_RETENTION = 90 * 24 * 3600
+
+# ===== RECHERCHE =====
+# Backend plein texte : 'auto' (postgresql / sqlite FTS5 selon la base), 'python', 'postgresql', 'sqlite'
+RECHERCHE_BACKEND = os.environ.get('RECHERCHE_BACKEND', 'auto')
+
+# ===== TÂCHES DE FOND =====
+# Exécutées par `manage.py run_worker` ; TACHES_SYNCHRONE=True les exécute
+# immédiatement dans la requête (développement sans worker)
+TACHES_SYNCHRONE = os.environ.get('TACHES_SYNCHRONE', 'False').lower() in ('true', '1', 'yes')
+TACHES_CONCURRENCE = int(os.environ.get('TACHES_CONCURRENCE', 2))
+# Délai de base / maximal entre deux tentatives (s), doublé à chaque échec
+TACHES_DELAI_REESSAI = 30
+TACHES_DELAI_REESSAI_MAX = 3600
+# Une tâche « en cours » depuis plus longtemps est considérée orpheline (s)
+TACHES_DELAI_VERROU = 900
 
 # ===== API DOCUMENTATION =====
 SPECTACULAR_SETTINGS = {
@@ -44,7 +44,7 @@ class EvenementAdmin(admin.ModelAdmin):
             'fields': ('est_public', 'est_mis_en_avant')
         }),
         ('Récurrence', {
-            'fields': ('est_recurrent', 'recurrence'),
+            'fields': ('est_recurrent', 'recurrence', 'dates_exclues'),
             'classes': ('collapse',)
         }),
     )
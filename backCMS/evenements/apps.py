@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class EvenementsConfig(AppConfig):
     name = 'evenements'
+
+    def ready(self):
+        from . import signals
+        signals.connecter()
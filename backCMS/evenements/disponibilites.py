@@ -0,0 +1,198 @@
+"""
+Événements - Créneaux de rendez-vous disponibles
+
+Les horaires d'ouverture d'une commune (Commune.horaires_ouverture) sont
+donnés par jour de la semaine, en plages "HH:MM-HH:MM", avec les jours de
+fermeture exceptionnelle :
+
+    {
+        "lundi": ["07:30-12:00", "13:00-15:30"],
+        ...
+        "samedi": ["08:00-12:00"],
+        "dimanche": [],
+        "fermetures": ["2026-12-25"]
+    }
+
+Chaque plage est découpée en créneaux de RENDEZ_VOUS_DUREE_CRENEAU minutes.
+Un créneau est libre si aucun rendez-vous non annulé du service ne le
+chevauche : les rendez-vous d'un jour forment un index trié par heure de
+début, et chaque créneau y est cherché par dichotomie.
+
+Les créneaux libres sont gardés dans le cache par service et par jour, avec
+l'empreinte des horaires qui les ont produits (une modification des horaires
+les périme). Une réservation, sa modification ou sa suppression efface le
+jour concerné (evenements.signals) ; cet effacement ne touche que le cache du
+processus quand il n'est pas partagé (pas de REDIS_URL) : les créneaux n'y
+sont alors gardés que RENDEZ_VOUS_CACHE_DUREE_LOCALE secondes. Une fenêtre de plusieurs semaines coûte
+une lecture groupée du cache et, pour les jours absents, une seule requête.
+"""
+import bisect
+import hashlib
+import itertools
+import json
+import logging
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import RendezVous
+
+
+logger = logging.getLogger(__name__)
+
+JOURS = ('lundi', 'mardi', 'mercredi', 'jeudi', 'vendredi', 'samedi', 'dimanche')
+MINUTES_JOUR = 24 * 60
+
+
+def duree_creneau():
+    return getattr(settings, 'RENDEZ_VOUS_DUREE_CRENEAU', 30)
+
+
+def fenetre_max():
+    return getattr(settings, 'RENDEZ_VOUS_FENETRE_MAX', 62)
+
+
+# ===== HORAIRES =====
+
+def _minutes(heure):
+    """'07:30' → 450"""
+    heures, minutes = str(heure).strip().split(':')[:2]
+    return int(heures) * 60 + int(minutes)
+
+
+def _plage(plage):
+    # "07:30-12:00" ou ["07:30", "12:00"]
+    debut, fin = plage.split('-') if isinstance(plage, str) else plage
+    return _minutes(debut), _minutes(fin)
+
+
+def plages_ouverture(horaires, jour):
+    """Plages d'ouverture (début, fin) en minutes du jour `jour`, triées ; les plages illisibles sont ignorées"""
+    horaires = horaires if isinstance(horaires, dict) else {}
+    if jour.isoformat() in (horaires.get('fermetures') or []):
+        return []
+    plages = []
+    for plage in horaires.get(JOURS[jour.weekday()]) or []:
+        try:
+            debut, fin = _plage(plage)
+        except (TypeError, ValueError):
+            logger.warning('Horaires d\'ouverture : plage illisible %r', plage)
+            continue
+        if 0 <= debut < fin <= MINUTES_JOUR:
+            plages.append((debut, fin))
+    return sorted(plages)
+
+
+def grille(plages, duree):
+    """Créneaux (début, fin) de `duree` minutes contenus dans les plages, triés et sans doublon"""
+    creneaux = set()
+    for debut, fin in plages:
+        creneaux.update((minute, minute + duree) for minute in range(debut, fin - duree + 1, duree))
+    return sorted(creneaux)
+
+
+def empreinte(horaires, duree):
+    """Empreinte des horaires et de la durée des créneaux (périme les créneaux en cache)"""
+    contenu = json.dumps([horaires, duree], sort_keys=True, default=str)
+    return hashlib.sha1(contenu.encode()).hexdigest()[:12]
+
+
+# ===== INDEX DES RENDEZ-VOUS =====
+
+class IndexIntervalles:
+    """Intervalles [début, fin) triés par début, avec le maximum cumulé des fins"""
+
+    def __init__(self, intervalles):
+        intervalles = sorted(intervalles)
+        self.debuts = [debut for debut, _ in intervalles]
+        self.fins_max = list(itertools.accumulate((fin for _, fin in intervalles), max))
+
+    def chevauche(self, debut, fin):
+        # Parmi les intervalles commençant avant `fin`, l'un finit-il après `debut` ?
+        n = bisect.bisect_left(self.debuts, fin)
+        return n > 0 and self.fins_max[n - 1] > debut
+
+
+def creneaux_libres(plages, reservations, duree):
+    """Créneaux de la grille des `plages` qui ne chevauchent aucune des `reservations` (début, fin)"""
+    index = IndexIntervalles(reservations)
+    return [creneau for creneau in grille(plages, duree) if not index.chevauche(*creneau)]
+
+
+def reservations(service_id, jours):
+    """{jour: [(début, fin) en minutes]} des rendez-vous non annulés du service aux `jours`"""
+    par_jour = defaultdict(list)
+    lignes = RendezVous.objects.filter(service_id=service_id, date__in=jours).exclude(
+        statut=RendezVous.Statut.ANNULE
+    ).values_list('date', 'heure_debut', 'heure_fin')
+    for jour, heure_debut, heure_fin in lignes:
+        debut = heure_debut.hour * 60 + heure_debut.minute
+        fin = heure_fin.hour * 60 + heure_fin.minute
+        # Un rendez-vous sans durée (ou mal saisi) occupe tout de même son heure de début
+        par_jour[jour].append((debut, max(fin, debut + 1)))
+    return par_jour
+
+
+# ===== CACHE =====
+
+def cle_cache(service_id, jour):
+    return f'rdv:dispo:{service_id}:{jour.isoformat()}'
+
+
+def duree_cache():
+    """Durée de vie des créneaux en cache : courte si les autres processus ne voient pas les effacements"""
+    if getattr(settings, 'CACHE_PARTAGE', False):
+        return getattr(settings, 'RENDEZ_VOUS_CACHE_DUREE', 3600)
+    return getattr(settings, 'RENDEZ_VOUS_CACHE_DUREE_LOCALE', 5)
+
+
+def invalider(service_id, jour):
+    """Efface les créneaux en cache du service pour ce jour"""
+    if service_id is not None and jour is not None:
+        cache.delete(cle_cache(service_id, jour))
+
+
+def disponibilites(service, du, au):
+    """
+    [(jour, [(début, fin) en minutes])] des créneaux libres du service du `du`
+    au `au` inclus ; les créneaux déjà commencés aujourd'hui sont retirés
+    """
+    duree = duree_creneau()
+    horaires = service.commune.horaires_ouverture
+    signature = empreinte(horaires, duree)
+    jours = [du + timedelta(days=n) for n in range((au - du).days + 1)]
+
+    cles = {jour: cle_cache(service.pk, jour) for jour in jours}
+    en_cache = cache.get_many(cles.values())
+    resultat = {}
+    for jour, cle in cles.items():
+        valeur = en_cache.get(cle)
+        if valeur is not None and valeur[0] == signature:
+            resultat[jour] = valeur[1]
+
+    manquants = [jour for jour in jours if jour not in resultat]
+    if manquants:
+        # Jours fermés : pas de requête
+        plages = {jour: plages_ouverture(horaires, jour) for jour in manquants}
+        occupes = reservations(service.pk, [jour for jour in manquants if plages[jour]])
+        a_garder = {}
+        for jour in manquants:
+            resultat[jour] = creneaux_libres(plages[jour], occupes.get(jour, ()), duree)
+            a_garder[cles[jour]] = (signature, resultat[jour])
+        cache.set_many(a_garder, duree_cache())
+
+    maintenant = timezone.localtime()
+    minute_actuelle = maintenant.hour * 60 + maintenant.minute
+    aujourd_hui = maintenant.date()
+    return [
+        (jour, [c for c in resultat[jour] if jour != aujourd_hui or c[0] > minute_actuelle])
+        for jour in jours
+    ]
+
+
+def format_heure(minutes):
+    """450 → '07:30'"""
+    return f'{minutes // 60:02d}:{minutes % 60:02d}'
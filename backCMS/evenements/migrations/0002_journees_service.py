@@ -0,0 +1,29 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communes', '0001_initial'),
+        ('evenements', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JourneeService',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Date')),
+                ('version', models.PositiveIntegerField(default=0, verbose_name='Version')),
+                ('service', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='journees', to='communes.servicemunicipal')),
+            ],
+            options={
+                'verbose_name': 'Journée de service',
+                'verbose_name_plural': 'Journées de service',
+                'unique_together': {('service', 'date')},
+            },
+        ),
+    ]
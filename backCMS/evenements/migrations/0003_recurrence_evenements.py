@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:50
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('evenements', '0002_journees_service'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='evenement',
+            name='dates_exclues',
+            field=models.JSONField(blank=True, default=list, encoder=django.core.serializers.json.DjangoJSONEncoder, help_text='Dates retirées de la série (AAAA-MM-JJ)', verbose_name='Dates exclues'),
+        ),
+        migrations.AlterField(
+            model_name='evenement',
+            name='recurrence',
+            field=models.CharField(blank=True, help_text='Règle RRULE, ex. FREQ=WEEKLY;BYDAY=SA ou FREQ=MONTHLY;BYDAY=1MO', max_length=255, verbose_name='Récurrence'),
+        ),
+    ]
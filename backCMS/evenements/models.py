@@ -1,8 +1,13 @@
 """
 Événements - Agenda municipal et inscriptions
 """
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from django.utils.text import slugify
 
 
@@ -74,9 +79,16 @@ class Evenement(models.Model):
     est_public = models.BooleanField('Public', default=True)
     est_mis_en_avant = models.BooleanField('Mis en avant', default=False)
     
-    # Récurrence
+    # Récurrence : occurrences calculées à la demande (evenements.recurrence)
     est_recurrent = models.BooleanField('Récurrent', default=False)
-    recurrence = models.CharField('Récurrence', max_length=50, blank=True)
+    recurrence = models.CharField(
+        'Récurrence', max_length=255, blank=True,
+        help_text='Règle RRULE, ex. FREQ=WEEKLY;BYDAY=SA ou FREQ=MONTHLY;BYDAY=1MO'
+    )
+    dates_exclues = models.JSONField(
+        'Dates exclues', default=list, blank=True, encoder=DjangoJSONEncoder,
+        help_text='Dates retirées de la série (AAAA-MM-JJ)'
+    )
     
     # Dates
     date_creation = models.DateTimeField('Date création', auto_now_add=True)
@@ -91,11 +103,28 @@ class Evenement(models.Model):
     def __str__(self):
         return f"{self.nom} - {self.date}"
     
+    def clean(self):
+        from .recurrence import RegleInvalide, lire
+        if self.est_recurrent and self.recurrence:
+            try:
+                lire(self.recurrence)
+            except RegleInvalide as exc:
+                raise ValidationError({'recurrence': str(exc)})
+    
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.nom)
         super().save(*args, **kwargs)
     
+    def get_date_debut(self):
+        """Date et heure de début de l'événement (datetime aware)"""
+        if not self.date:
+            return None
+        # Les valeurs peuvent encore être des chaînes avant rechargement depuis la base
+        jour = self._meta.get_field('date').to_python(self.date)
+        heure = self._meta.get_field('heure_debut').to_python(self.heure_debut)
+        return timezone.make_aware(datetime.combine(jour, heure))
+    
     def places_restantes(self):
         if self.places_limitees and self.nombre_places:
             inscrits = self.inscriptions.filter(statut='confirme').count()
@@ -197,3 +226,27 @@ class RendezVous(models.Model):
     def __str__(self):
         nom = self.demandeur.nom if self.demandeur else self.nom_demandeur
         return f"RDV {nom} - {self.date} {self.heure_debut}"
+
+
+class JourneeService(models.Model):
+    """
+    Journée de rendez-vous d'un service : sa ligne est verrouillée pendant
+    qu'une réservation vérifie et enregistre son créneau (voir
+    evenements.reservations)
+    """
+    service = models.ForeignKey(
+        'communes.ServiceMunicipal',
+        on_delete=models.CASCADE,
+        related_name='journees'
+    )
+    date = models.DateField('Date')
+    # Incrémentée à chaque réservation : l'écriture pose le verrou
+    version = models.PositiveIntegerField('Version', default=0)
+    
+    class Meta:
+        verbose_name = 'Journée de service'
+        verbose_name_plural = 'Journées de service'
+        unique_together = ['service', 'date']
+    
+    def __str__(self):
+        return f"{self.service} - {self.date}"
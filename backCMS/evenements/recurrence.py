@@ -0,0 +1,265 @@
+"""
+Événements - Récurrence, développée à la demande
+
+Règle d'un événement récurrent (champ `recurrence`) : sous-ensemble des
+RRULE iCalendar (RFC 5545), la série commençant à la date de l'événement.
+
+    FREQ=WEEKLY;BYDAY=SA                               marché chaque samedi
+    FREQ=MONTHLY;BYDAY=1MO                             premier lundi du mois
+    FREQ=MONTHLY;BYDAY=-1FR                            dernier vendredi du mois
+    FREQ=MONTHLY;BYMONTHDAY=15,-1                      le 15 et le dernier jour
+    FREQ=WEEKLY;INTERVAL=2;BYDAY=TU,TH;UNTIL=20271231  un mardi et jeudi sur deux
+    FREQ=YEARLY;COUNT=5                                cinq ans de suite
+
+FREQ (DAILY, WEEKLY, MONTHLY, YEARLY) est obligatoire ; INTERVAL, BYDAY
+(WEEKLY, MONTHLY), BYMONTHDAY (MONTHLY), et COUNT ou UNTIL sont facultatifs.
+Les anciennes valeurs libres « quotidien », « hebdomadaire », « mensuel » et
+« annuel » sont comprises. Les dates de `dates_exclues` sont retirées de la
+série (séance reportée, jour férié).
+
+Les occurrences ne sont jamais enregistrées en base : elles sont calculées
+pour la fenêtre demandée, mois par mois, en sautant directement au premier
+mois de la fenêtre (une série avec COUNT est parcourue depuis son début,
+COUNT_MAX occurrences au plus). Les dates d'un mois ne dépendent que de la
+règle et du début de la série : elles sont gardées en mémoire, sans
+invalidation.
+"""
+import calendar
+import logging
+from dataclasses import dataclass
+from datetime import date, timedelta
+from functools import lru_cache
+
+
+logger = logging.getLogger(__name__)
+
+FREQUENCES = ('DAILY', 'WEEKLY', 'MONTHLY', 'YEARLY')
+ALIAS = {
+    'quotidien': 'DAILY', 'quotidienne': 'DAILY',
+    'hebdomadaire': 'WEEKLY',
+    'mensuel': 'MONTHLY', 'mensuelle': 'MONTHLY',
+    'annuel': 'YEARLY', 'annuelle': 'YEARLY',
+}
+JOURS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+COUNT_MAX = 1000
+
+
+class RegleInvalide(ValueError):
+    """Règle de récurrence illisible ou non prise en charge"""
+
+
+@dataclass(frozen=True)
+class Regle:
+    """Règle lue ; `jours` : (rang dans le mois ou 0 pour chaque, jour de la semaine 0-6)"""
+    frequence: str
+    intervalle: int = 1
+    jours: tuple = ()
+    jours_du_mois: tuple = ()
+    nombre: int = None
+    jusqu_au: date = None
+
+
+# ===== LECTURE =====
+
+def _jour(valeur):
+    """'MO' → (0, 0) ; '1MO' → (1, 0) ; '-1FR' → (-1, 4)"""
+    rang, code = valeur[:-2], valeur[-2:]
+    if code not in JOURS:
+        raise RegleInvalide(f'Jour inconnu : {valeur}')
+    return int(rang or 0), JOURS.index(code)
+
+
+def _date_ical(valeur):
+    """'20271231', '2027-12-31' ou '20271231T235959Z' → date"""
+    chiffres = valeur.replace('-', '')[:8]
+    return date(int(chiffres[:4]), int(chiffres[4:6]), int(chiffres[6:8]))
+
+
+@lru_cache(maxsize=1024)
+def lire(texte):
+    """Regle décrite par `texte` ; lève RegleInvalide"""
+    texte = (texte or '').strip()
+    if texte.lower() in ALIAS:
+        return Regle(ALIAS[texte.lower()])
+    texte = texte.upper()
+    if texte.startswith('RRULE:'):
+        texte = texte[len('RRULE:'):]
+
+    parties = {}
+    for partie in filter(None, (partie.strip() for partie in texte.split(';'))):
+        cle, egal, valeur = partie.partition('=')
+        if not egal or not valeur.strip():
+            raise RegleInvalide(f'Partie illisible : {partie}')
+        parties[cle.strip()] = valeur.strip()
+
+    frequence = parties.pop('FREQ', None)
+    if frequence not in FREQUENCES:
+        raise RegleInvalide('FREQ attendu : DAILY, WEEKLY, MONTHLY ou YEARLY.')
+    try:
+        intervalle = int(parties.pop('INTERVAL', 1))
+        jours = tuple(_jour(jour.strip()) for jour in parties.pop('BYDAY', '').split(',') if jour.strip())
+        jours_du_mois = tuple(int(jour) for jour in parties.pop('BYMONTHDAY', '').split(',') if jour.strip())
+        nombre = int(parties.pop('COUNT')) if 'COUNT' in parties else None
+        jusqu_au = _date_ical(parties.pop('UNTIL')) if 'UNTIL' in parties else None
+    except RegleInvalide:
+        raise
+    except (TypeError, ValueError) as exc:
+        raise RegleInvalide(f'Valeur illisible : {exc}') from exc
+    if parties:
+        raise RegleInvalide(f'Non pris en charge : {", ".join(sorted(parties))}.')
+
+    if intervalle < 1:
+        raise RegleInvalide('INTERVAL doit être positif.')
+    if nombre is not None and not 1 <= nombre <= COUNT_MAX:
+        raise RegleInvalide(f'COUNT doit être compris entre 1 et {COUNT_MAX}.')
+    if nombre is not None and jusqu_au is not None:
+        raise RegleInvalide('COUNT et UNTIL ne peuvent pas être combinés.')
+    if jours and frequence not in ('WEEKLY', 'MONTHLY'):
+        raise RegleInvalide('BYDAY : WEEKLY ou MONTHLY uniquement.')
+    if any(rang for rang, _ in jours) and frequence != 'MONTHLY':
+        raise RegleInvalide('Rang dans le mois (1MO, -1FR) : MONTHLY uniquement.')
+    if any(not -5 <= rang <= 5 for rang, _ in jours):
+        raise RegleInvalide('Rang dans le mois compris entre -5 et 5.')
+    if jours_du_mois and frequence != 'MONTHLY':
+        raise RegleInvalide('BYMONTHDAY : MONTHLY uniquement.')
+    if jours_du_mois and jours:
+        raise RegleInvalide('BYDAY et BYMONTHDAY ne peuvent pas être combinés.')
+    if any(not 1 <= abs(jour) <= 31 for jour in jours_du_mois):
+        raise RegleInvalide('BYMONTHDAY compris entre 1 et 31 (ou -31 et -1).')
+    return Regle(frequence, intervalle, jours, jours_du_mois, nombre, jusqu_au)
+
+
+# ===== DÉVELOPPEMENT =====
+
+def _mois_suivant(annee, mois, ecart=1):
+    annee, mois = divmod(annee * 12 + mois - 1 + ecart, 12)
+    return annee, mois + 1
+
+
+def _jours_du_mois(regle, debut, annee, mois):
+    dernier = calendar.monthrange(annee, mois)[1]
+    jours = set()
+    for jour in regle.jours_du_mois:
+        jour = jour if jour > 0 else dernier + 1 + jour
+        if 1 <= jour <= dernier:
+            jours.add(jour)
+    for rang, jour_semaine in regle.jours:
+        premier = 1 + (jour_semaine - date(annee, mois, 1).weekday()) % 7
+        candidats = list(range(premier, dernier + 1, 7))
+        if rang == 0:
+            jours.update(candidats)
+        elif rang <= len(candidats) and -rang <= len(candidats):
+            jours.add(candidats[rang - 1 if rang > 0 else rang])
+    if not regle.jours and not regle.jours_du_mois and debut.day <= dernier:
+        # Jour du mois du début (les mois trop courts sont sautés)
+        jours.add(debut.day)
+    return [date(annee, mois, jour) for jour in sorted(jours)]
+
+
+def _periode(regle, debut, k):
+    """(premier jour, dates candidates triées) de la k-ième période de la série"""
+    ecart = k * regle.intervalle
+    if regle.frequence == 'DAILY':
+        jour = debut + timedelta(days=ecart)
+        return jour, [jour]
+    if regle.frequence == 'WEEKLY':
+        lundi = debut - timedelta(days=debut.weekday()) + timedelta(weeks=ecart)
+        jours = sorted({jour for _, jour in regle.jours}) or [debut.weekday()]
+        return lundi, [lundi + timedelta(days=jour) for jour in jours]
+    if regle.frequence == 'MONTHLY':
+        annee, mois = _mois_suivant(debut.year, debut.month, ecart)
+        return date(annee, mois, 1), _jours_du_mois(regle, debut, annee, mois)
+    annee = debut.year + ecart
+    try:
+        return date(annee, 1, 1), [debut.replace(year=annee)]
+    except ValueError:
+        # 29 février d'une année non bissextile
+        return date(annee, 1, 1), []
+
+
+def _premiere_periode(regle, debut, jour):
+    """Rang de la période qui contient `jour` (ou de la précédente)"""
+    if jour <= debut:
+        return 0
+    if regle.frequence == 'DAILY':
+        ecart = (jour - debut).days
+    elif regle.frequence == 'WEEKLY':
+        ecart = (jour - debut + timedelta(days=debut.weekday())).days // 7
+    elif regle.frequence == 'MONTHLY':
+        ecart = (jour.year - debut.year) * 12 + jour.month - debut.month
+    else:
+        ecart = jour.year - debut.year
+    return ecart // regle.intervalle
+
+
+def _dates(regle, debut, du, au):
+    """Dates de la série jusqu'au `au` inclus, à partir de la période qui contient `du`"""
+    # Avec COUNT, les occurrences sont comptées depuis le début de la série
+    k = 0 if regle.nombre else _premiere_periode(regle, debut, du)
+    emises = 0
+    while True:
+        premier_jour, candidats = _periode(regle, debut, k)
+        if premier_jour > au:
+            return
+        for jour in candidats:
+            if jour < debut:
+                continue
+            if jour > au or (regle.jusqu_au and jour > regle.jusqu_au):
+                return
+            yield jour
+            emises += 1
+            if regle.nombre and emises >= regle.nombre:
+                return
+        k += 1
+
+
+@lru_cache(maxsize=4096)
+def _mois(regle, debut, annee, mois):
+    """Dates de la série dans le mois (gardées en mémoire)"""
+    premier = date(annee, mois, 1)
+    dernier = date(annee, mois, calendar.monthrange(annee, mois)[1])
+    return tuple(jour for jour in _dates(regle, debut, premier, dernier) if jour >= premier)
+
+
+def occurrences(regle, debut, du, au, exclues=frozenset()):
+    """Dates de la série commencée le `debut`, du `du` au `au` inclus, hors `exclues`"""
+    du = max(du, debut)
+    if regle.jusqu_au:
+        au = min(au, regle.jusqu_au)
+    dates = []
+    annee, mois = du.year, du.month
+    while (annee, mois) <= (au.year, au.month):
+        dates.extend(jour for jour in _mois(regle, debut, annee, mois) if du <= jour <= au and jour not in exclues)
+        annee, mois = _mois_suivant(annee, mois)
+    return dates
+
+
+# ===== ÉVÉNEMENTS =====
+
+def regle_evenement(evenement):
+    """Regle de l'événement ; None s'il n'est pas récurrent ou si sa règle est illisible"""
+    if not evenement.est_recurrent or not (evenement.recurrence or '').strip():
+        return None
+    try:
+        return lire(evenement.recurrence)
+    except RegleInvalide as exc:
+        logger.warning('Événement %s : récurrence ignorée (%s)', evenement.pk, exc)
+        return None
+
+
+def dates_exclues(evenement):
+    exclues = set()
+    for valeur in evenement.dates_exclues or []:
+        try:
+            exclues.add(date.fromisoformat(str(valeur)[:10]))
+        except ValueError:
+            continue
+    return exclues
+
+
+def dates_evenement(evenement, du, au):
+    """Dates de l'événement du `du` au `au` inclus : série développée, ou sa seule date"""
+    regle = regle_evenement(evenement)
+    if regle is None:
+        return [evenement.date] if du <= evenement.date <= au else []
+    return occurrences(regle, evenement.date, du, au, dates_exclues(evenement))
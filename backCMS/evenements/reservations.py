@@ -0,0 +1,82 @@
+"""
+Événements - Réservation des créneaux sans double réservation
+
+Deux rendez-vous non annulés d'un même service ne se chevauchent pas. La
+recherche d'un chevauchement et l'enregistrement se font dans une
+transaction qui verrouille d'abord la journée du service (ligne
+JourneeService du couple (service, date), créée à la première réservation) :
+les réservations d'une même journée passent l'une après l'autre ; celles des
+autres journées et des autres services ne s'attendent pas (PostgreSQL).
+
+Le verrou est posé par un UPDATE, première écriture de la transaction, ce
+qui convient aussi à SQLite : la base entière y est verrouillée le temps de
+l'écriture, et une transaction refusée parce que la base est verrouillée
+est rejouée.
+"""
+import random
+import time
+
+from django.db import OperationalError, transaction
+from django.db.models import F
+
+from .models import JourneeService, RendezVous
+
+
+# Transactions rejouées quand SQLite refuse l'écriture (base verrouillée)
+TENTATIVES_VERROU = 10
+
+
+class CreneauOccupe(Exception):
+    """Le créneau chevauche un rendez-vous non annulé du service"""
+
+    def __init__(self, conflit):
+        super().__init__(
+            f'Créneau déjà réservé ({conflit.heure_debut:%H:%M}-{conflit.heure_fin:%H:%M}).'
+        )
+        self.conflit = conflit
+
+
+def chevauchements(service_id, jour, debut, fin, exclure=None):
+    """Rendez-vous non annulés du service qui chevauchent [debut, fin) le `jour`"""
+    rendez_vous = RendezVous.objects.filter(
+        service_id=service_id, date=jour, heure_debut__lt=fin, heure_fin__gt=debut
+    ).exclude(statut=RendezVous.Statut.ANNULE)
+    if exclure is not None:
+        rendez_vous = rendez_vous.exclude(pk=exclure)
+    return rendez_vous
+
+
+def verrouiller(service_id, jour):
+    """Verrouille la journée du service jusqu'à la fin de la transaction"""
+    journee = JourneeService.objects.filter(service_id=service_id, date=jour)
+    if not journee.update(version=F('version') + 1):
+        # Première réservation du jour (création concurrente : la ligne existe)
+        JourneeService.objects.get_or_create(service_id=service_id, date=jour)
+        journee.update(version=F('version') + 1)
+
+
+def reserver(enregistrer, service, jour, debut, fin, statut=None, exclure=None):
+    """
+    Appelle `enregistrer()` (qui enregistre le rendez-vous) sous le verrou de
+    la journée du service si le créneau est libre ; lève CreneauOccupe sinon.
+    `exclure` : rendez-vous modifié, ignoré dans la recherche.
+    """
+    service_id = getattr(service, 'pk', service)
+    if service_id is None or statut == RendezVous.Statut.ANNULE:
+        # Sans service ou annulé : n'occupe aucun créneau
+        return enregistrer()
+
+    for essai in range(TENTATIVES_VERROU):
+        try:
+            with transaction.atomic():
+                verrouiller(service_id, jour)
+                conflit = chevauchements(service_id, jour, debut, fin, exclure=exclure).first()
+                if conflit is not None:
+                    raise CreneauOccupe(conflit)
+                return enregistrer()
+        except OperationalError as exc:
+            # Dans une transaction englobante, elle seule peut être rejouée
+            rejouable = 'locked' in str(exc) and not transaction.get_connection().in_atomic_block
+            if not rejouable or essai == TENTATIVES_VERROU - 1:
+                raise
+            time.sleep(random.uniform(0.01, 0.05) * (essai + 1))
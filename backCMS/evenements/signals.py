@@ -0,0 +1,50 @@
+"""
+Événements - Signaux : créneaux disponibles en cache effacés quand un
+rendez-vous est pris, modifié ou supprimé (voir evenements.disponibilites)
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from . import disponibilites
+from .models import RendezVous
+
+
+def _avant_sauvegarde(sender, instance, raw=False, **kwargs):
+    # Service et jour avant la sauvegarde : un rendez-vous déplacé libère l'ancien créneau
+    instance._disponibilites_avant = None
+    if raw or instance.pk is None:
+        return
+    instance._disponibilites_avant = sender._base_manager.filter(pk=instance.pk).values_list(
+        'service_id', 'date'
+    ).first()
+
+
+def _invalider(*jours):
+    def effacer():
+        for service_id, jour in jours:
+            disponibilites.invalider(service_id, jour)
+    # Aussi après la validation : un calcul concurrent a pu relire l'état d'avant
+    effacer()
+    transaction.on_commit(effacer)
+
+
+def _apres_sauvegarde(sender, instance, raw=False, **kwargs):
+    avant = getattr(instance, '_disponibilites_avant', None)
+    instance._disponibilites_avant = None
+    if raw:
+        return
+    jours = {(instance.service_id, instance.date)}
+    if avant is not None:
+        jours.add(avant)
+    _invalider(*jours)
+
+
+def _apres_suppression(sender, instance, **kwargs):
+    _invalider((instance.service_id, instance.date))
+
+
+def connecter():
+    """Connecte les signaux des rendez-vous"""
+    pre_save.connect(_avant_sauvegarde, sender=RendezVous, dispatch_uid='evenements_disponibilites_avant')
+    post_save.connect(_apres_sauvegarde, sender=RendezVous, dispatch_uid='evenements_disponibilites')
+    post_delete.connect(_apres_suppression, sender=RendezVous, dispatch_uid='evenements_disponibilites_suppr')
@@ -1,8 +1,14 @@
 """
 Tests pour le module Événements
 """
+import random
+import threading
+import unittest
 from datetime import date, time, timedelta
-from django.test import TestCase
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 from rest_framework.test import APITestCase, APIClient
@@ -10,7 +16,8 @@ from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
 
 from communes.models import Region, Departement, Commune, ServiceMunicipal
-from evenements.models import Evenement, InscriptionEvenement, RendezVous
+from evenements import disponibilites, recurrence, reservations
+from evenements.models import Evenement, InscriptionEvenement, JourneeService, RendezVous
 
 Utilisateur = get_user_model()
 
@@ -377,6 +384,222 @@ class EvenementAPITest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
 
+class RecurrenceTest(TestCase):
+    """Tests des règles de récurrence et de leur développement"""
+    
+    def _dates(self, texte, debut, du, au, exclues=frozenset()):
+        return recurrence.occurrences(recurrence.lire(texte), debut, du, au, exclues)
+    
+    def test_hebdomadaire(self):
+        """Chaque samedi, dates exclues retirées"""
+        dates = self._dates(
+            'FREQ=WEEKLY;BYDAY=SA', date(2026, 1, 3), date(2026, 1, 1), date(2026, 1, 31),
+            exclues={date(2026, 1, 17)}
+        )
+        self.assertEqual(dates, [date(2026, 1, 3), date(2026, 1, 10), date(2026, 1, 24), date(2026, 1, 31)])
+        # Ancienne valeur libre : jour de la semaine du début
+        self.assertEqual(
+            self._dates('Hebdomadaire', date(2026, 1, 3), date(2026, 1, 1), date(2026, 1, 14)),
+            [date(2026, 1, 3), date(2026, 1, 10)]
+        )
+    
+    def test_mensuel(self):
+        """Rang dans le mois et jours du mois"""
+        self.assertEqual(
+            self._dates('FREQ=MONTHLY;BYDAY=1MO', date(2026, 1, 1), date(2026, 1, 1), date(2026, 3, 31)),
+            [date(2026, 1, 5), date(2026, 2, 2), date(2026, 3, 2)]
+        )
+        self.assertEqual(
+            self._dates('FREQ=MONTHLY;BYDAY=-1FR', date(2026, 1, 1), date(2026, 1, 1), date(2026, 3, 31)),
+            [date(2026, 1, 30), date(2026, 2, 27), date(2026, 3, 27)]
+        )
+        self.assertEqual(
+            self._dates('FREQ=MONTHLY;BYMONTHDAY=15,-1', date(2026, 1, 20), date(2026, 1, 1), date(2026, 3, 1)),
+            [date(2026, 1, 31), date(2026, 2, 15), date(2026, 2, 28)]
+        )
+        # Le 31 : mois trop courts sautés
+        self.assertEqual(
+            self._dates('mensuel', date(2026, 1, 31), date(2026, 1, 1), date(2026, 5, 31)),
+            [date(2026, 1, 31), date(2026, 3, 31), date(2026, 5, 31)]
+        )
+    
+    def test_intervalle_et_fin(self):
+        """Une semaine sur deux jusqu'à UNTIL ; COUNT compté depuis le début de la série"""
+        self.assertEqual(
+            self._dates(
+                'FREQ=WEEKLY;INTERVAL=2;BYDAY=TU,TH;UNTIL=20260122', date(2026, 1, 6),
+                date(2026, 1, 1), date(2026, 12, 31)
+            ),
+            [date(2026, 1, 6), date(2026, 1, 8), date(2026, 1, 20), date(2026, 1, 22)]
+        )
+        self.assertEqual(
+            self._dates('FREQ=YEARLY;COUNT=5', date(2026, 5, 20), date(2029, 1, 1), date(2040, 1, 1)),
+            [date(2029, 5, 20), date(2030, 5, 20)]
+        )
+        self.assertEqual(
+            self._dates('FREQ=YEARLY', date(2024, 2, 29), date(2024, 1, 1), date(2028, 12, 31)),
+            [date(2024, 2, 29), date(2028, 2, 29)]
+        )
+    
+    def test_fenetre_lointaine_sans_parcours(self):
+        """Une fenêtre lointaine donne les mêmes dates qu'un parcours depuis le début de la série"""
+        aleatoire = random.Random(50)
+        regles = [
+            'FREQ=DAILY;INTERVAL=3', 'FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,FR', 'FREQ=WEEKLY;BYDAY=SU',
+            'FREQ=MONTHLY;INTERVAL=5;BYDAY=2WE', 'FREQ=MONTHLY;BYMONTHDAY=30', 'FREQ=YEARLY;INTERVAL=3',
+        ]
+        for texte in regles:
+            regle = recurrence.lire(texte)
+            for _ in range(20):
+                debut = date(2020, 1, 1) + timedelta(days=aleatoire.randint(0, 2000))
+                du = debut + timedelta(days=aleatoire.randint(-30, 4000))
+                au = du + timedelta(days=aleatoire.randint(0, 120))
+                parcours = [
+                    jour for jour in recurrence._dates(regle, debut, debut, au) if jour >= du
+                ]
+                self.assertEqual(recurrence.occurrences(regle, debut, du, au), parcours, texte)
+    
+    def test_regles_invalides(self):
+        """Règles illisibles ou non prises en charge refusées"""
+        for texte in [
+            'chaque samedi', 'BYDAY=SA', 'FREQ=HOURLY', 'FREQ=WEEKLY;BYDAY=XX',
+            'FREQ=WEEKLY;BYDAY=1MO', 'FREQ=MONTHLY;BYSETPOS=1', 'FREQ=DAILY;COUNT=2;UNTIL=20270101',
+            'FREQ=DAILY;INTERVAL=0', 'FREQ=MONTHLY;BYMONTHDAY=32', 'FREQ=DAILY;COUNT=100000',
+        ]:
+            with self.assertRaises(recurrence.RegleInvalide, msg=texte):
+                recurrence.lire(texte)
+        self.assertEqual(recurrence.lire('RRULE:freq=weekly;byday=sa'), recurrence.Regle('WEEKLY', jours=((0, 5),)))
+
+
+class EvenementsRecurrentsAPITest(APITestCase):
+    """Tests des listes d'événements avec séries récurrentes"""
+    
+    def setUp(self):
+        self.region = Region.objects.create(nom='Centre', code='CE')
+        self.departement = Departement.objects.create(
+            region=self.region, nom='Mfoundi', code='MF'
+        )
+        self.commune = Commune.objects.create(
+            nom='Yaoundé 1er',
+            slug='yaounde-1er',
+            departement=self.departement,
+            statut=Commune.Statut.ACTIVE
+        )
+        self.aujourd_hui = timezone.localdate()
+        # Marché chaque samedi depuis un an
+        self.marche = self._evenement(
+            'Marché hebdomadaire', self.aujourd_hui - timedelta(days=365),
+            est_recurrent=True, recurrence='FREQ=WEEKLY;BYDAY=SA', categorie=Evenement.Categorie.MARCHE
+        )
+        self.fete = self._evenement('Fête de la musique', self.aujourd_hui + timedelta(days=10))
+        self.passe = self._evenement('Conférence passée', self.aujourd_hui - timedelta(days=10))
+    
+    def _evenement(self, nom, jour, **kwargs):
+        return Evenement.objects.create(
+            commune=self.commune, nom=nom, description='Test', date=jour,
+            heure_debut=time(8, 0), lieu='Mairie', **kwargs
+        )
+    
+    def _samedis(self, du, au):
+        premier = du + timedelta(days=(5 - du.weekday()) % 7)
+        return [premier + timedelta(weeks=n) for n in range((au - premier).days // 7 + 1)] if premier <= au else []
+    
+    def test_fenetre(self):
+        """Occurrences de la fenêtre fusionnées par date avec les événements uniques"""
+        du, au = self.aujourd_hui, self.aujourd_hui + timedelta(days=27)
+        response = self.client.get('/api/v1/evenements/', {'du': du.isoformat(), 'au': au.isoformat()})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        resultats = response.data['results']
+        attendu = sorted(
+            [(jour.isoformat(), self.marche.slug) for jour in self._samedis(du, au)]
+            + [(self.fete.date.isoformat(), self.fete.slug)]
+        )
+        self.assertEqual([(r['date'], r['slug']) for r in resultats], attendu)
+        self.assertEqual(response.data['count'], len(attendu))
+        self.assertTrue(all(r['est_recurrent'] for r in resultats if r['slug'] == self.marche.slug))
+        # Rien d'enregistré
+        self.assertEqual(Evenement.objects.count(), 3)
+    
+    def test_a_venir(self):
+        """Série commencée il y a un an listée par ses prochaines occurrences ; passé exclu"""
+        response = self.client.get('/api/v1/evenements/', {'a_venir': 'true'})
+        dates = [r['date'] for r in response.data['results']]
+        self.assertEqual(dates, sorted(dates))
+        self.assertNotIn(self.passe.slug, [r['slug'] for r in response.data['results']])
+        occurrences = [r['date'] for r in response.data['results'] if r['slug'] == self.marche.slug]
+        self.assertTrue(occurrences)
+        self.assertGreaterEqual(occurrences[0], self.aujourd_hui.isoformat())
+        self.assertLessEqual(
+            occurrences[-1], (self.aujourd_hui + timedelta(days=90)).isoformat()
+        )
+    
+    def test_pagination(self):
+        """Pages successives : suite ordonnée sans doublon ni trou"""
+        self._evenement(
+            'Permanence', self.aujourd_hui, est_recurrent=True, recurrence='FREQ=DAILY'
+        )
+        du, au = self.aujourd_hui, self.aujourd_hui + timedelta(days=30)
+        vus, url, params = [], '/api/v1/evenements/', {'du': du.isoformat(), 'au': au.isoformat()}
+        while url:
+            response = self.client.get(url, params)
+            vus += [(r['date'], r['heure_debut'], r['slug']) for r in response.data['results']]
+            url, params = response.data['next'], None
+        self.assertEqual(response.data['count'], len(vus))
+        self.assertEqual(len(vus), 31 + len(self._samedis(du, au)) + 1)
+        self.assertEqual(len(set(vus)), len(vus))
+        self.assertEqual([(d, h) for d, h, _ in vus], sorted((d, h) for d, h, _ in vus))
+    
+    def test_dates_exclues_et_series_brutes(self):
+        """Dates exclues retirées ; occurrences=false liste les lignes enregistrées"""
+        samedi = self._samedis(self.aujourd_hui, self.aujourd_hui + timedelta(days=6))[0]
+        self.marche.dates_exclues = [samedi]
+        self.marche.save()
+        response = self.client.get('/api/v1/evenements/', {
+            'du': samedi.isoformat(), 'au': (samedi + timedelta(days=7)).isoformat()
+        })
+        self.assertEqual(
+            [r['date'] for r in response.data['results'] if r['slug'] == self.marche.slug],
+            [(samedi + timedelta(days=7)).isoformat()]
+        )
+        response = self.client.get('/api/v1/evenements/', {'occurrences': 'false', 'a_venir': 'true'})
+        self.assertEqual(sorted(r['slug'] for r in response.data['results']), sorted([self.marche.slug, self.fete.slug]))
+    
+    def test_creation_regle_invalide(self):
+        """Règle illisible refusée à la création ; dates exclues enregistrées"""
+        admin = Utilisateur.objects.create_superuser(email='admin@test.cm', nom='Admin', password='adminpass')
+        refresh = RefreshToken.for_user(admin)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
+        data = {
+            'commune': self.commune.id, 'nom': 'Conseil municipal', 'description': 'Séance',
+            'date': self.aujourd_hui.isoformat(), 'heure_debut': '15:00:00', 'lieu': 'Mairie',
+            'est_recurrent': True, 'recurrence': 'le premier lundi',
+        }
+        response = self.client.post('/api/v1/evenements/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('recurrence', response.data)
+        
+        data.update(recurrence='FREQ=MONTHLY;BYDAY=1MO', dates_exclues=['2027-01-04'])
+        response = self.client.post('/api/v1/evenements/', data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Evenement.objects.get(slug='conseil-municipal').dates_exclues, ['2027-01-04'])
+    
+    def test_fenetre_invalide(self):
+        """Fenêtre inversée ou trop longue : 400"""
+        du = self.aujourd_hui
+        for au in (du - timedelta(days=1), du + timedelta(days=400)):
+            response = self.client.get('/api/v1/evenements/', {'du': du.isoformat(), 'au': au.isoformat()})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_evenements_commune(self):
+        """Prochains événements d'une commune : occurrences comprises"""
+        response = self.client.get(f'/api/v1/communes/{self.commune.slug}/evenements/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 10)
+        self.assertIn(self.fete.slug, [r['slug'] for r in response.data])
+        # Samedi dans la semaine, avant la fête (J+10)
+        self.assertEqual(response.data[0]['slug'], self.marche.slug)
+
+
 class RendezVousAPITest(APITestCase):
     """Tests API pour les rendez-vous"""
     
@@ -445,6 +668,388 @@ class RendezVousAPITest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
 
 
+class DisponibilitesRendezVousTest(APITestCase):
+    """Tests du calcul des créneaux libres"""
+    
+    HORAIRES = {
+        'lundi': ['08:00-12:00', '13:00-15:00'],
+        'mardi': [['08:00', '10:00']],
+        'mercredi': ['08:00-09:00'],
+        'samedi': [],
+    }
+    
+    def setUp(self):
+        cache.clear()
+        self.region = Region.objects.create(nom='Centre', code='CE')
+        self.departement = Departement.objects.create(
+            region=self.region, nom='Mfoundi', code='MF'
+        )
+        self.commune = Commune.objects.create(
+            nom='Yaoundé 1er',
+            slug='yaounde-1er',
+            departement=self.departement,
+            horaires_ouverture=self.HORAIRES
+        )
+        self.service = ServiceMunicipal.objects.create(
+            commune=self.commune,
+            nom='Etat civil'
+        )
+        # Premier lundi dans au moins une semaine
+        debut = timezone.localdate() + timedelta(days=7)
+        self.lundi = debut + timedelta(days=-debut.weekday() % 7)
+    
+    def _rdv(self, jour, debut, fin, **kwargs):
+        return RendezVous.objects.create(
+            commune=self.commune, service=self.service, motif='Acte de naissance',
+            date=jour, heure_debut=debut, heure_fin=fin, **kwargs
+        )
+    
+    def _get(self, **params):
+        params.setdefault('service', self.service.pk)
+        return self.client.get('/api/v1/rendez-vous/disponibilites/', params)
+    
+    def _creneaux(self, response, jour):
+        for disponibilite in response.data['jours']:
+            if disponibilite['date'] == jour:
+                return [(c['debut'], c['fin']) for c in disponibilite['creneaux']]
+        raise AssertionError(f'{jour} absent de la réponse')
+    
+    def test_index_intervalles(self):
+        """Le test de chevauchement de l'index trié donne le résultat d'un parcours complet"""
+        aleatoire = random.Random(48)
+        for _ in range(200):
+            intervalles = []
+            for _ in range(aleatoire.randint(0, 12)):
+                debut = aleatoire.randint(0, 600)
+                intervalles.append((debut, debut + aleatoire.randint(1, 120)))
+            index = disponibilites.IndexIntervalles(intervalles)
+            debut = aleatoire.randint(0, 700)
+            fin = debut + aleatoire.randint(1, 60)
+            attendu = any(d < fin and f > debut for d, f in intervalles)
+            self.assertEqual(index.chevauche(debut, fin), attendu)
+    
+    def test_plages_ouverture(self):
+        """Plages lues par jour de la semaine ; plages illisibles et jours de fermeture ignorés"""
+        mercredi = self.lundi + timedelta(days=2)
+        self.assertEqual(disponibilites.plages_ouverture(self.HORAIRES, self.lundi), [(480, 720), (780, 900)])
+        with self.assertLogs('evenements.disponibilites', level='WARNING'):
+            plages = disponibilites.plages_ouverture({'mercredi': ['08:00-09:00', 'matin', '18:00-17:00']}, mercredi)
+        self.assertEqual(plages, [(480, 540)])
+        self.assertEqual(disponibilites.plages_ouverture(self.HORAIRES, self.lundi + timedelta(days=6)), [])
+        horaires = dict(self.HORAIRES, fermetures=[self.lundi.isoformat()])
+        self.assertEqual(disponibilites.plages_ouverture(horaires, self.lundi), [])
+        self.assertEqual(disponibilites.grille([(480, 600)], 45), [(480, 525), (525, 570)])
+    
+    def test_creneaux_sur_plusieurs_semaines(self):
+        """Grille des horaires, moins les rendez-vous non annulés du service"""
+        mardi = self.lundi + timedelta(days=1)
+        self._rdv(self.lundi, time(8, 15), time(8, 45))
+        self._rdv(self.lundi, time(13, 0), time(14, 0))
+        self._rdv(mardi, time(8, 0), time(8, 30), statut=RendezVous.Statut.ANNULE)
+        autre_service = ServiceMunicipal.objects.create(commune=self.commune, nom='Urbanisme')
+        RendezVous.objects.create(
+            commune=self.commune, service=autre_service, motif='Permis',
+            date=mardi, heure_debut=time(9, 0), heure_fin=time(9, 30)
+        )
+        
+        au = self.lundi + timedelta(days=20)
+        response = self._get(du=self.lundi.isoformat(), au=au.isoformat())
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['duree'], 30)
+        self.assertEqual(len(response.data['jours']), 21)
+        
+        lundi = self._creneaux(response, self.lundi)
+        self.assertNotIn(('08:00', '08:30'), lundi)
+        self.assertNotIn(('08:30', '09:00'), lundi)
+        self.assertNotIn(('13:30', '14:00'), lundi)
+        self.assertIn(('09:00', '09:30'), lundi)
+        self.assertIn(('14:00', '14:30'), lundi)
+        self.assertEqual(len(lundi), 8 + 4 - 4)
+        # Rendez-vous annulé ou d'un autre service : créneaux libres
+        self.assertEqual(
+            self._creneaux(response, mardi),
+            [('08:00', '08:30'), ('08:30', '09:00'), ('09:00', '09:30'), ('09:30', '10:00')]
+        )
+        self.assertEqual(self._creneaux(response, self.lundi + timedelta(days=5)), [])
+        self.assertEqual(len(self._creneaux(response, self.lundi + timedelta(days=7))), 12)
+    
+    @override_settings(CACHE_PARTAGE=True)
+    def test_cache_par_jour(self):
+        """Fenêtre servie depuis le cache ; une réservation efface le jour concerné"""
+        params = {'du': self.lundi.isoformat(), 'au': (self.lundi + timedelta(days=27)).isoformat()}
+        with CaptureQueriesContext(connection) as requetes:
+            self._get(**params)
+        # Service, puis tous les rendez-vous de la fenêtre en une requête
+        self.assertEqual(len(requetes), 2)
+        
+        with CaptureQueriesContext(connection) as requetes:
+            response = self._get(**params)
+        self.assertEqual(len(requetes), 1)
+        self.assertIn(('10:00', '10:30'), self._creneaux(response, self.lundi))
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            rdv = self._rdv(self.lundi, time(10, 0), time(10, 30))
+        response = self._get(**params)
+        self.assertNotIn(('10:00', '10:30'), self._creneaux(response, self.lundi))
+        
+        # Rendez-vous déplacé : l'ancien créneau est libéré
+        with self.captureOnCommitCallbacks(execute=True):
+            rdv.date = self.lundi + timedelta(days=7)
+            rdv.save()
+        response = self._get(**params)
+        self.assertIn(('10:00', '10:30'), self._creneaux(response, self.lundi))
+        self.assertNotIn(('10:00', '10:30'), self._creneaux(response, self.lundi + timedelta(days=7)))
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            rdv.delete()
+        response = self._get(**params)
+        self.assertIn(('10:00', '10:30'), self._creneaux(response, self.lundi + timedelta(days=7)))
+    
+    def test_cache_non_partage(self):
+        """Sans cache partagé, une réservation faite par un autre processus est vue après RENDEZ_VOUS_CACHE_DUREE_LOCALE"""
+        params = {'du': self.lundi.isoformat(), 'au': self.lundi.isoformat()}
+        autre_processus = RendezVous(
+            commune=self.commune, service=self.service, motif='Acte de naissance',
+            date=self.lundi, heure_debut=time(10, 0), heure_fin=time(10, 30),
+        )
+        with override_settings(CACHE_PARTAGE=False, RENDEZ_VOUS_CACHE_DUREE_LOCALE=0):
+            self._get(**params)
+            # Enregistré sans signal : l'effacement a eu lieu dans le cache de l'autre processus
+            RendezVous.objects.bulk_create([autre_processus])
+            response = self._get(**params)
+        self.assertNotIn(('10:00', '10:30'), self._creneaux(response, self.lundi))
+        
+        RendezVous.objects.all().delete()
+        cache.clear()
+        with override_settings(CACHE_PARTAGE=True):
+            self._get(**params)
+            autre_processus.pk = None
+            RendezVous.objects.bulk_create([autre_processus])
+            response = self._get(**params)
+        self.assertIn(('10:00', '10:30'), self._creneaux(response, self.lundi))
+    
+    def test_horaires_modifies(self):
+        """Une modification des horaires périme les créneaux en cache"""
+        self._get(du=self.lundi.isoformat(), au=self.lundi.isoformat())
+        self.commune.horaires_ouverture = {'lundi': ['10:00-11:00']}
+        self.commune.save()
+        response = self._get(du=self.lundi.isoformat(), au=self.lundi.isoformat())
+        self.assertEqual(self._creneaux(response, self.lundi), [('10:00', '10:30'), ('10:30', '11:00')])
+    
+    def test_fenetre_par_defaut_et_passe(self):
+        """Fenêtre de 14 jours à partir d'aujourd'hui ; jours passés retirés"""
+        aujourd_hui = timezone.localdate()
+        response = self._get(du=(aujourd_hui - timedelta(days=3)).isoformat())
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['du'], aujourd_hui)
+        self.assertEqual(len(response.data['jours']), 14)
+    
+    def test_parametres_invalides(self):
+        """Service inconnu ou inactif, fenêtre inversée ou trop longue : 400"""
+        self.assertEqual(self._get(service=9999).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self._get(service='').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self._get(du='demain').status_code, status.HTTP_400_BAD_REQUEST)
+        response = self._get(du=self.lundi.isoformat(), au=(self.lundi - timedelta(days=1)).isoformat())
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self._get(du=self.lundi.isoformat(), au=(self.lundi + timedelta(days=62)).isoformat())
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.service.est_actif = False
+        self.service.save()
+        self.assertEqual(self._get().status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ReservationCreneauMixin:
+    """Commune, service et demandeur authentifié pour les tests de réservation"""
+    
+    def creer_donnees(self):
+        cache.clear()
+        self.region = Region.objects.create(nom='Centre', code='CE')
+        self.departement = Departement.objects.create(
+            region=self.region, nom='Mfoundi', code='MF'
+        )
+        self.commune = Commune.objects.create(
+            nom='Yaoundé 1er',
+            slug='yaounde-1er',
+            departement=self.departement
+        )
+        self.service = ServiceMunicipal.objects.create(commune=self.commune, nom='Etat civil')
+        self.user = Utilisateur.objects.create_user(
+            email='citoyen@test.cm',
+            nom='Citoyen',
+            password='pass123',
+            commune=self.commune
+        )
+        self.jour = date.today() + timedelta(days=3)
+        self.jeton = str(RefreshToken.for_user(self.user).access_token)
+    
+    def client_authentifie(self):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.jeton}')
+        return client
+    
+    def donnees_rdv(self, debut='10:00', fin='10:30', jour=None, service=None):
+        return {
+            'commune': self.commune.id,
+            'service': (service or self.service).id,
+            'motif': 'Acte de mariage',
+            'date': (jour or self.jour).isoformat(),
+            'heure_debut': debut,
+            'heure_fin': fin,
+        }
+
+
+class ReservationCreneauTest(ReservationCreneauMixin, APITestCase):
+    """Tests du refus des créneaux déjà réservés"""
+    
+    def setUp(self):
+        self.creer_donnees()
+        self.client = self.client_authentifie()
+    
+    def _reserver(self, *args, **kwargs):
+        return self.client.post('/api/v1/rendez-vous/', self.donnees_rdv(*args, **kwargs))
+    
+    def test_chevauchement_refuse(self):
+        """Créneau chevauchant un rendez-vous du service : 409"""
+        self.assertEqual(self._reserver('10:00', '10:30').status_code, status.HTTP_201_CREATED)
+        response = self._reserver('10:15', '10:45')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertIn('10:00-10:30', response.data['detail'])
+        self.assertEqual(response.data['detail'].code, 'creneau_occupe')
+        self.assertEqual(self._reserver('09:00', '12:00').status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(RendezVous.objects.count(), 1)
+    
+    def test_creneaux_voisins_et_autres_services(self):
+        """Créneaux contigus, autre jour ou autre service : acceptés"""
+        autre_service = ServiceMunicipal.objects.create(commune=self.commune, nom='Urbanisme')
+        self.assertEqual(self._reserver('10:00', '10:30').status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self._reserver('10:30', '11:00').status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self._reserver('09:30', '10:00').status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self._reserver(jour=self.jour + timedelta(days=1)).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self._reserver(service=autre_service).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            JourneeService.objects.get(service=self.service, date=self.jour).version, 3
+        )
+    
+    def test_rendez_vous_annule_libere_le_creneau(self):
+        """Un rendez-vous annulé n'occupe plus son créneau"""
+        rdv_id = self._reserver().data['id']
+        self.client.patch(f'/api/v1/rendez-vous/{rdv_id}/', {'statut': RendezVous.Statut.ANNULE})
+        self.assertEqual(self._reserver().status_code, status.HTTP_201_CREATED)
+        # Réactivé alors que le créneau est repris : refusé
+        response = self.client.patch(f'/api/v1/rendez-vous/{rdv_id}/', {'statut': RendezVous.Statut.CONFIRME})
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+    
+    def test_modification(self):
+        """Le rendez-vous modifié ne se bloque pas lui-même ; déplacé sur un créneau pris : 409"""
+        premier = self._reserver('10:00', '10:30').data['id']
+        self._reserver('11:00', '11:30')
+        response = self.client.patch(f'/api/v1/rendez-vous/{premier}/', {'heure_fin': '10:45'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.patch(f'/api/v1/rendez-vous/{premier}/', {'heure_debut': '10:45', 'heure_fin': '11:15'})
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(RendezVous.objects.get(pk=premier).heure_fin, time(10, 45))
+    
+    def test_heures_inversees(self):
+        """Heure de fin avant l'heure de début : 400"""
+        self.assertEqual(self._reserver('10:30', '10:00').status_code, status.HTTP_400_BAD_REQUEST)
+        rdv_id = self._reserver('10:00', '10:30').data['id']
+        response = self.client.patch(f'/api/v1/rendez-vous/{rdv_id}/', {'heure_debut': '11:00'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ReservationConcurrenteTest(ReservationCreneauMixin, TransactionTestCase):
+    """Tests de réservations simultanées (un thread et une connexion par requête)"""
+    
+    def setUp(self):
+        self.creer_donnees()
+    
+    def _en_parallele(self, reservations_demandees):
+        """POST simultanés des données `reservations_demandees` ; retourne les codes de réponse"""
+        depart = threading.Barrier(len(reservations_demandees))
+        codes = [None] * len(reservations_demandees)
+        
+        def reserver(rang, donnees):
+            client = self.client_authentifie()
+            try:
+                depart.wait()
+                codes[rang] = client.post('/api/v1/rendez-vous/', donnees).status_code
+            finally:
+                connection.close()
+        
+        threads = [
+            threading.Thread(target=reserver, args=(rang, donnees))
+            for rang, donnees in enumerate(reservations_demandees)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return codes
+    
+    def test_un_seul_gagnant_par_creneau(self):
+        """Douze demandes simultanées du même créneau : une acceptée, les autres en 409"""
+        codes = self._en_parallele([self.donnees_rdv('10:00', '10:30')] * 12)
+        self.assertEqual(codes.count(status.HTTP_201_CREATED), 1)
+        self.assertEqual(codes.count(status.HTTP_409_CONFLICT), 11)
+        self.assertEqual(RendezVous.objects.count(), 1)
+    
+    def test_journees_et_creneaux_independants(self):
+        """Créneaux distincts acceptés ; un gagnant par créneau disputé sur chaque journée"""
+        autre_service = ServiceMunicipal.objects.create(commune=self.commune, nom='Urbanisme')
+        demandes = []
+        for service in (self.service, autre_service):
+            for decalage in range(2):
+                jour = self.jour + timedelta(days=decalage)
+                # Deux créneaux libres et un créneau disputé par trois demandes chevauchantes
+                demandes += [
+                    self.donnees_rdv('08:00', '08:30', jour, service),
+                    self.donnees_rdv('08:30', '09:00', jour, service),
+                    self.donnees_rdv('10:00', '11:00', jour, service),
+                    self.donnees_rdv('10:30', '11:30', jour, service),
+                    self.donnees_rdv('10:15', '10:45', jour, service),
+                ]
+        random.Random(49).shuffle(demandes)
+        codes = self._en_parallele(demandes)
+        self.assertEqual(codes.count(status.HTTP_201_CREATED), 4 * 3)
+        self.assertEqual(codes.count(status.HTTP_409_CONFLICT), 4 * 2)
+        
+        for rdv in RendezVous.objects.all():
+            self.assertFalse(
+                reservations.chevauchements(
+                    rdv.service_id, rdv.date, rdv.heure_debut, rdv.heure_fin, exclure=rdv.pk
+                ).exists()
+            )
+    
+    @unittest.skipUnless(connection.vendor == 'postgresql', 'Verrous de ligne : SQLite verrouille toute la base')
+    def test_verrou_limite_a_la_journee(self):
+        """Journée verrouillée : les réservations des autres journées ne l'attendent pas"""
+        autre_jour = self.jour + timedelta(days=1)
+        termine = threading.Event()
+        codes = {}
+        
+        def reserver(cle, donnees):
+            try:
+                codes[cle] = self.client_authentifie().post('/api/v1/rendez-vous/', donnees).status_code
+            finally:
+                connection.close()
+                termine.set()
+        
+        with transaction.atomic():
+            reservations.verrouiller(self.service.pk, self.jour)
+            thread = threading.Thread(target=reserver, args=('autre_jour', self.donnees_rdv(jour=autre_jour)))
+            thread.start()
+            self.assertTrue(termine.wait(timeout=10))
+            thread.join()
+            
+            termine.clear()
+            thread = threading.Thread(target=reserver, args=('meme_jour', self.donnees_rdv()))
+            thread.start()
+            # Même journée : attend la fin de la transaction
+            self.assertFalse(termine.wait(timeout=0.5))
+        thread.join()
+        self.assertEqual(codes, {'autre_jour': status.HTTP_201_CREATED, 'meme_jour': status.HTTP_201_CREATED})
+
+
 class DashboardAPITest(APITestCase):
     """Tests pour le dashboard"""
     
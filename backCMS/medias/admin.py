@@ -0,0 +1,16 @@
+"""Médias - Administration Django"""
+from django.contrib import admin
+
+from .models import FichierStocke
+
+
+@admin.register(FichierStocke)
+class FichierStockeAdmin(admin.ModelAdmin):
+    """Fichiers stockés par contenu (lecture seule)"""
+    list_display = ['nom', 'taille', 'references', 'date_creation', 'date_modification']
+    list_filter = ['date_creation']
+    search_fields = ['nom', 'empreinte']
+    readonly_fields = [f.name for f in FichierStocke._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class MediasConfig(AppConfig):
+    name = 'medias'
+    verbose_name = 'Médias'
+
+    def ready(self):
+        from . import signals
+        signals.connecter()
@@ -0,0 +1,169 @@
+"""
+Médias - Déclinaisons des images uploadées (images responsives)
+
+Après un upload, une tâche de fond génère chaque image en WebP et en JPEG
+aux largeurs IMAGES_LARGEURS (jamais au-delà de la largeur d'origine) :
+
+    derives/<nom du fichier source>/640.webp
+    derives/<nom du fichier source>/640.jpg
+    derives/<nom du fichier source>/variantes.json   (manifeste)
+
+Le manifeste liste les fichiers générés ; il est gardé en cache pour que
+les serializers construisent les srcset sans accès disque. Un fichier absent
+ou illisible reçoit un manifeste d'erreur (`{"erreur": ...}`) : il n'est
+pas remis en file à chaque sauvegarde.
+"""
+import io
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+
+# Champs image déclinés, par modèle
+CHAMPS_IMAGES = {
+    'actualites.Actualite': ['image_principale'],
+    'communes.Commune': ['logo', 'banniere', 'photo_maire'],
+    'communes.EquipeMunicipale': ['photo'],
+    'evenements.Evenement': ['image'],
+    'transparence.Projet': ['image_principale'],
+    'services.Signalement': ['photo'],
+}
+
+FORMATS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'quality': 82, 'optimize': True, 'progressive': True},
+}
+EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+
+DOSSIER_DERIVES = 'derives'
+# Manifeste absent (déclinaisons pas encore générées) : gardé en cache peu de temps
+DUREE_CACHE_ABSENT = 60
+
+
+def largeurs():
+    return sorted(getattr(settings, 'IMAGES_LARGEURS', [320, 640, 1280]))
+
+
+def largeur_vignette():
+    """Largeur maximale des images référencées par les listes"""
+    return getattr(settings, 'IMAGES_LARGEUR_VIGNETTE', 640)
+
+
+def chemin_manifeste(nom):
+    return f'{DOSSIER_DERIVES}/{nom}/variantes.json'
+
+
+def _cle_cache(nom):
+    return f'medias:variantes:{nom}'
+
+
+def _manifeste(nom):
+    """Manifeste enregistré (déclinaisons ou erreur) ; {} s'il n'existe pas (encore)"""
+    cle = _cle_cache(nom)
+    manifeste = cache.get(cle)
+    if manifeste is None:
+        chemin = chemin_manifeste(nom)
+        if default_storage.exists(chemin):
+            with default_storage.open(chemin) as fichier:
+                manifeste = json.load(fichier)
+            cache.set(cle, manifeste, None)
+        else:
+            manifeste = {}
+            cache.set(cle, manifeste, DUREE_CACHE_ABSENT)
+    return manifeste
+
+
+def variantes(nom):
+    """Manifeste des déclinaisons d'une image, ou None si elles n'existent pas (encore)"""
+    manifeste = _manifeste(nom)
+    return None if not manifeste or 'erreur' in manifeste else manifeste
+
+
+def traitee(nom):
+    """L'image a été traitée : déclinaisons générées ou fichier écarté"""
+    return bool(_manifeste(nom))
+
+
+def _enregistrer(chemin, contenu):
+    if default_storage.exists(chemin):
+        default_storage.delete(chemin)
+    default_storage.save(chemin, ContentFile(contenu))
+
+
+def _en_rgb(image):
+    """JPEG : pas de transparence, fond blanc"""
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        fond = Image.new('RGB', image.size, (255, 255, 255))
+        fond.paste(image, mask=image.getchannel('A'))
+        return fond
+    return image.convert('RGB')
+
+
+def _ecarter(nom, erreur):
+    """Manifeste d'erreur : le fichier ne sera plus proposé à la génération"""
+    manifeste = {'erreur': erreur}
+    _enregistrer(chemin_manifeste(nom), json.dumps(manifeste).encode())
+    cache.set(_cle_cache(nom), manifeste, None)
+
+
+def generer(nom):
+    """
+    Génère les déclinaisons de l'image `nom` (chemin dans le stockage des
+    médias) et retourne le manifeste ; None si le fichier est absent ou
+    n'est pas une image (manifeste d'erreur enregistré)
+    """
+    if not default_storage.exists(nom):
+        _ecarter(nom, 'Fichier absent')
+        return None
+    with default_storage.open(nom) as source:
+        try:
+            image = Image.open(source)
+            origine = image.size
+            # JPEG : décodage directement à une résolution réduite (carré : l'image
+            # peut encore être pivotée selon son orientation EXIF)
+            image.draft('RGB', (max(largeurs()),) * 2)
+            decodee = image.size
+            image = ImageOps.exif_transpose(image)
+            image.load()
+        except (OSError, Image.DecompressionBombError) as exc:
+            _ecarter(nom, str(exc)[:200] or 'Image illisible')
+            return None
+    if image.size != decodee:
+        origine = origine[::-1]
+
+    cibles = [largeur for largeur in largeurs() if largeur < origine[0]] or [image.width]
+    manifeste = {'largeur': origine[0], 'hauteur': origine[1], 'webp': {}, 'jpeg': {}}
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or image.mode == 'P' else 'RGB')
+
+    # Des plus grandes aux plus petites, chaque réduction part de la précédente
+    courante = image
+    for largeur in sorted(cibles, reverse=True):
+        hauteur = max(1, round(image.height * largeur / image.width))
+        if courante.width != largeur:
+            courante = courante.resize((largeur, hauteur), Image.LANCZOS)
+        for format_, options in FORMATS.items():
+            tampon = io.BytesIO()
+            (courante if format_ == 'webp' else _en_rgb(courante)).save(tampon, **options)
+            chemin = f'{DOSSIER_DERIVES}/{nom}/{largeur}.{EXTENSIONS[format_]}'
+            _enregistrer(chemin, tampon.getvalue())
+            manifeste[format_][str(largeur)] = chemin
+
+    _enregistrer(chemin_manifeste(nom), json.dumps(manifeste).encode())
+    cache.set(_cle_cache(nom), manifeste, None)
+    return manifeste
+
+
+def supprimer(nom):
+    """Supprime les déclinaisons d'une image (ou son manifeste d'erreur)"""
+    manifeste = _manifeste(nom)
+    for format_ in FORMATS:
+        for chemin in manifeste.get(format_, {}).values():
+            default_storage.delete(chemin)
+    default_storage.delete(chemin_manifeste(nom))
+    cache.delete(_cle_cache(nom))
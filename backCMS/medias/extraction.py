@@ -0,0 +1,164 @@
+"""
+Médias - Extraction du texte des PDF (délibérations, budgets, documents officiels)
+
+Après l'upload, une tâche de fond lit le PDF avec pypdf (bibliothèque pure
+Python, optionnelle) page par page. Le texte est stocké une fois par contenu
+(TextePDF, clé : empreinte SHA-256) avec la position de début de chaque page
+et, pour chaque terme, la liste des pages qui le contiennent (TermePDF). Le
+document est ensuite réindexé : la recherche globale trouve le texte du PDF et
+indique les pages correspondantes.
+
+Sans pypdf, rien n'est extrait ; `manage.py extraire_textes_pdf` rattrape les
+fichiers existants une fois la bibliothèque installée.
+"""
+import hashlib
+import logging
+import re
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models.functions import Substr
+
+from recherche.analyse import analyser, normaliser, raciniser
+
+from .models import FichierPDF, TermePDF, TextePDF
+
+
+logger = logging.getLogger(__name__)
+
+# Champ PDF extrait, par modèle
+CHAMPS_PDF = {
+    'transparence.Deliberation': 'fichier',
+    'transparence.DocumentBudgetaire': 'fichier',
+    'transparence.DocumentOfficiel': 'fichier',
+}
+
+TAILLE_BLOC = 64 * 1024
+LONGUEUR_EXTRAIT = 160
+MOT = re.compile(r'\w+')
+
+
+def disponible():
+    return getattr(settings, 'PYPDF_AVAILABLE', False)
+
+
+def _empreinte(fichier):
+    empreinte = hashlib.sha256()
+    for bloc in iter(lambda: fichier.read(TAILLE_BLOC), b''):
+        empreinte.update(bloc)
+    return empreinte.hexdigest()
+
+
+def _lire_pages(fichier):
+    """(texte, débuts des pages, {terme: [pages]}, erreur)"""
+    from pypdf import PdfReader
+
+    morceaux, debuts, position = [], [], 0
+    pages_termes = defaultdict(list)
+    erreur = ''
+    try:
+        lecteur = PdfReader(fichier)
+        if lecteur.is_encrypted:
+            # PDF protégé sans mot de passe d'ouverture : lisible avec un mot de passe vide
+            lecteur.decrypt('')
+        for numero, page in enumerate(lecteur.pages, start=1):
+            if numero > getattr(settings, 'PDF_PAGES_MAX', 2000):
+                break
+            contenu = (page.extract_text() or '').replace('\x00', '').strip() + '\n'
+            debuts.append(position)
+            morceaux.append(contenu)
+            position += len(contenu)
+            for terme in set(analyser(contenu)):
+                pages_termes[terme[:64]].append(numero)
+    except Exception as exc:
+        # pypdf lève des exceptions variées sur les fichiers mal formés : on
+        # garde les pages déjà lues
+        logger.warning('Extraction PDF incomplète : %s', exc)
+        erreur = f'{type(exc).__name__}: {exc}'[:2000]
+    return ''.join(morceaux), debuts, pages_termes, erreur
+
+
+def _enregistrer(empreinte, texte, debuts, pages_termes, erreur):
+    try:
+        with transaction.atomic():
+            texte_pdf = TextePDF.objects.create(empreinte=empreinte, texte=texte, pages=debuts, erreur=erreur)
+            TermePDF.objects.bulk_create([
+                TermePDF(texte=texte_pdf, terme=terme, pages=pages)
+                for terme, pages in pages_termes.items()
+            ], batch_size=1000)
+    except IntegrityError:
+        # Même contenu extrait en parallèle
+        texte_pdf = TextePDF.objects.get(empreinte=empreinte)
+    return texte_pdf
+
+
+def extraire(fichier):
+    """
+    Texte du PDF `fichier` (FieldFile), extrait au besoin ; None si pypdf est
+    absent ou le fichier introuvable
+    """
+    existant = FichierPDF.objects.filter(nom=fichier.name).select_related('texte').first()
+    if existant is not None:
+        return existant.texte
+    if not disponible() or not fichier.storage.exists(fichier.name):
+        return None
+
+    with fichier.storage.open(fichier.name, 'rb') as source:
+        empreinte = _empreinte(source)
+        texte_pdf = TextePDF.objects.filter(empreinte=empreinte).first()
+        if texte_pdf is None:
+            source.seek(0)
+            texte_pdf = _enregistrer(empreinte, *_lire_pages(source))
+    FichierPDF.objects.update_or_create(nom=fichier.name, defaults={'texte': texte_pdf})
+    return texte_pdf
+
+
+def textes(noms):
+    """{chemin: texte extrait} des fichiers déjà traités parmi `noms`"""
+    noms = [nom for nom in noms if nom]
+    if not noms:
+        return {}
+    return dict(FichierPDF.objects.filter(nom__in=noms).values_list('nom', 'texte__texte'))
+
+
+def _extrait(contenu, termes):
+    """Passage de la page autour du premier terme trouvé"""
+    for mot in MOT.finditer(contenu):
+        if raciniser(normaliser(mot.group())) in termes:
+            debut = max(0, mot.start() - LONGUEUR_EXTRAIT // 3)
+            break
+    else:
+        debut = 0
+    passage = ' '.join(contenu[debut:debut + LONGUEUR_EXTRAIT].split())
+    return ('…' if debut else '') + passage + ('…' if debut + LONGUEUR_EXTRAIT < len(contenu) else '')
+
+
+def pages_correspondantes(nom, requete, limite=3):
+    """
+    Pages du PDF `nom` contenant le plus de termes de la requête :
+    [{'page': numéro, 'extrait': passage}, ...]
+    """
+    termes = set(analyser(requete))
+    texte_id = FichierPDF.objects.filter(nom=nom).values_list('texte_id', flat=True).first()
+    if not termes or texte_id is None:
+        return []
+
+    compteur = Counter()
+    for pages in TermePDF.objects.filter(texte_id=texte_id, terme__in=termes).values_list('pages', flat=True):
+        compteur.update(pages)
+    if not compteur:
+        return []
+
+    texte_pdf = TextePDF.objects.only('pages').get(pk=texte_id)
+    resultats = []
+    for numero, _ in sorted(compteur.items(), key=lambda item: (-item[1], item[0]))[:limite]:
+        debut = texte_pdf.pages[numero - 1]
+        fin = texte_pdf.pages[numero] if numero < len(texte_pdf.pages) else None
+        # Seule la page est lue en base, pas le texte entier
+        longueur = (fin - debut) if fin is not None else 10 ** 9
+        contenu = TextePDF.objects.filter(pk=texte_id).annotate(
+            page=Substr('texte', debut + 1, longueur)
+        ).values_list('page', flat=True).get()
+        resultats.append({'page': numero, 'extrait': _extrait(contenu, termes)})
+    return resultats
@@ -0,0 +1,37 @@
+"""
+Commande qui extrait le texte des PDF déjà uploadés et les réindexe
+Exemple :
+    python manage.py extraire_textes_pdf
+"""
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from medias import extraction
+from medias.models import FichierPDF
+from recherche.indexation import indexer
+
+
+class Command(BaseCommand):
+    help = 'Extrait le texte des délibérations et documents PDF pas encore traités'
+
+    def handle(self, *args, **options):
+        if not getattr(settings, 'PYPDF_AVAILABLE', False):
+            raise CommandError('pypdf n\'est pas installé (pip install pypdf)')
+
+        deja_extraits = set(FichierPDF.objects.values_list('nom', flat=True))
+        total = 0
+        for label, champ in extraction.CHAMPS_PDF.items():
+            modele = apps.get_model(label)
+            self.stdout.write(self.style.NOTICE(f'📄 {modele._meta.verbose_name_plural}...'))
+            for instance in modele.objects.exclude(**{champ: ''}).order_by('pk').iterator():
+                if getattr(instance, champ).name in deja_extraits:
+                    continue
+                texte = extraction.extraire(getattr(instance, champ))
+                if texte is None:
+                    self.stdout.write(self.style.WARNING(f'  Fichier absent : {getattr(instance, champ).name}'))
+                    continue
+                deja_extraits.add(getattr(instance, champ).name)
+                indexer(instance)
+                total += 1
+        self.stdout.write(self.style.SUCCESS(f'✅ {total} document(s) extrait(s) et réindexé(s)'))
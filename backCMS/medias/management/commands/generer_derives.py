@@ -0,0 +1,39 @@
+"""
+Commande qui génère les déclinaisons des images déjà uploadées
+Exemple :
+    python manage.py generer_derives
+    python manage.py generer_derives --forcer   # régénère tout (nouvelles largeurs)
+"""
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+from medias import derives
+
+
+class Command(BaseCommand):
+    help = 'Génère les déclinaisons WebP / JPEG manquantes des images uploadées'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--forcer', action='store_true', help='Régénère aussi les déclinaisons existantes')
+
+    def handle(self, *args, **options):
+        generees = ignorees = 0
+        for label, champs in derives.CHAMPS_IMAGES.items():
+            modele = apps.get_model(label)
+            self.stdout.write(self.style.NOTICE(f'🖼️  {modele._meta.verbose_name_plural}...'))
+            for champ in champs:
+                noms = (
+                    modele.objects.exclude(**{champ: ''}).exclude(**{f'{champ}__isnull': True})
+                    .values_list(champ, flat=True).distinct().iterator()
+                )
+                for nom in noms:
+                    if not options['forcer'] and derives.traitee(nom):
+                        continue
+                    if derives.generer(nom):
+                        generees += 1
+                    else:
+                        ignorees += 1
+                        self.stdout.write(self.style.WARNING(f'  Fichier absent ou illisible : {nom}'))
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {generees} image(s) déclinée(s), {ignorees} ignorée(s)'
+        ))
@@ -0,0 +1,42 @@
+"""
+Commande qui supprime les fichiers stockés par contenu qui ne sont plus
+référencés et les téléversements fragmentés abandonnés
+Exemple :
+    python manage.py nettoyer_medias
+    python manage.py nettoyer_medias --simulation
+    python manage.py nettoyer_medias --delai 0      # sans délai de grâce
+"""
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+
+from medias import stockage, televersements
+
+
+class Command(BaseCommand):
+    help = 'Supprime les fichiers stockés par contenu orphelins et les téléversements abandonnés'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--delai', type=int, default=None,
+            help='Secondes sans référence avant suppression (défaut : MEDIAS_DELAI_NETTOYAGE)'
+        )
+        parser.add_argument('--simulation', action='store_true', help='Affiche ce qui serait supprimé')
+
+    def handle(self, *args, **options):
+        if not options['simulation']:
+            abandonnes = televersements.purger_expires()
+            if abandonnes:
+                self.stdout.write(self.style.NOTICE(f'🗑️  {abandonnes} téléversement(s) abandonné(s) supprimé(s)'))
+            corriges = stockage.recompter()
+            if corriges:
+                self.stdout.write(self.style.WARNING(f'🔢 {corriges} compteur(s) de références corrigé(s)'))
+
+        nombre, taille = stockage.nettoyer(options['delai'], simulation=options['simulation'])
+        if options['simulation']:
+            self.stdout.write(self.style.NOTICE(
+                f'🔍 {nombre} fichier(s) à supprimer ({filesizeformat(taille)})'
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'✅ {nombre} fichier(s) supprimé(s), {filesizeformat(taille)} libéré(s)'
+            ))
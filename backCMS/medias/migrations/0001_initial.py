@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FichierStocke',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('empreinte', models.CharField(max_length=64, unique=True, verbose_name='Empreinte SHA-256')),
+                ('nom', models.CharField(max_length=255, unique=True, verbose_name='Chemin')),
+                ('taille', models.PositiveBigIntegerField(verbose_name='Taille (octets)')),
+                ('references', models.PositiveIntegerField(default=0, verbose_name='Références')),
+                ('date_creation', models.DateTimeField(auto_now_add=True, verbose_name='Date création')),
+                ('date_modification', models.DateTimeField(auto_now=True, verbose_name='Dernière modification')),
+            ],
+            options={
+                'verbose_name': 'Fichier stocké',
+                'verbose_name_plural': 'Fichiers stockés',
+                'ordering': ['-date_creation'],
+                'indexes': [models.Index(condition=models.Q(('references', 0)), fields=['date_modification'], name='fichier_orphelin_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('medias', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Televersement',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('nom_fichier', models.CharField(max_length=255, verbose_name='Nom du fichier')),
+                ('taille', models.PositiveBigIntegerField(verbose_name='Taille (octets)')),
+                ('empreinte', models.CharField(max_length=64, verbose_name='Empreinte SHA-256 attendue')),
+                ('recu', models.PositiveBigIntegerField(default=0, verbose_name='Octets reçus')),
+                ('statut', models.CharField(choices=[('en_cours', 'En cours'), ('termine', 'Terminé')], default='en_cours', max_length=20, verbose_name='Statut')),
+                ('date_creation', models.DateTimeField(auto_now_add=True, verbose_name='Date création')),
+                ('date_modification', models.DateTimeField(auto_now=True, verbose_name='Dernière modification')),
+                ('utilisateur', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='televersements', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Téléversement',
+                'verbose_name_plural': 'Téléversements',
+                'ordering': ['-date_creation'],
+                'indexes': [models.Index(fields=['date_modification'], name='televersement_modif_idx')],
+            },
+        ),
+    ]
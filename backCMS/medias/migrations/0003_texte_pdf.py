@@ -0,0 +1,56 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:10
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medias', '0002_televersement'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TextePDF',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('empreinte', models.CharField(max_length=64, unique=True, verbose_name='Empreinte SHA-256')),
+                ('texte', models.TextField(blank=True, verbose_name='Texte')),
+                ('pages', models.JSONField(default=list, verbose_name='Début des pages')),
+                ('erreur', models.TextField(blank=True, verbose_name="Erreur d'extraction")),
+                ('date_extraction', models.DateTimeField(auto_now_add=True, verbose_name='Date extraction')),
+            ],
+            options={
+                'verbose_name': 'Texte PDF',
+                'verbose_name_plural': 'Textes PDF',
+                'ordering': ['-date_extraction'],
+            },
+        ),
+        migrations.CreateModel(
+            name='FichierPDF',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nom', models.CharField(max_length=255, unique=True, verbose_name='Chemin')),
+                ('texte', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fichiers', to='medias.textepdf')),
+            ],
+            options={
+                'verbose_name': 'Fichier PDF',
+                'verbose_name_plural': 'Fichiers PDF',
+            },
+        ),
+        migrations.CreateModel(
+            name='TermePDF',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('terme', models.CharField(max_length=64, verbose_name='Terme')),
+                ('pages', models.JSONField(default=list, verbose_name='Pages')),
+                ('texte', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='termes', to='medias.textepdf')),
+            ],
+            options={
+                'verbose_name': 'Terme PDF',
+                'verbose_name_plural': 'Termes PDF',
+                'unique_together': {('texte', 'terme')},
+            },
+        ),
+    ]
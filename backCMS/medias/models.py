@@ -0,0 +1,130 @@
+"""
+Médias - Fichiers stockés par empreinte de contenu, téléversements fragmentés
+Un fichier uploadé plusieurs fois (même logo, même modèle de PDF) n'est
+écrit qu'une fois ; `references` compte les champs qui le désignent.
+"""
+import uuid
+
+from django.conf import settings
+from django.db import models
+from django.db.models import Q
+
+
+class FichierStocke(models.Model):
+    """Un contenu stocké une seule fois sous son empreinte SHA-256"""
+
+    empreinte = models.CharField('Empreinte SHA-256', max_length=64, unique=True)
+    nom = models.CharField('Chemin', max_length=255, unique=True)
+    taille = models.PositiveBigIntegerField('Taille (octets)')
+    references = models.PositiveIntegerField('Références', default=0)
+
+    date_creation = models.DateTimeField('Date création', auto_now_add=True)
+    # Dernier changement du compteur : délai de grâce avant suppression
+    date_modification = models.DateTimeField('Dernière modification', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Fichier stocké'
+        verbose_name_plural = 'Fichiers stockés'
+        ordering = ['-date_creation']
+        indexes = [
+            # Nettoyage : fichiers plus référencés
+            models.Index(
+                fields=['date_modification'],
+                condition=Q(references=0),
+                name='fichier_orphelin_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return self.nom
+
+
+class Televersement(models.Model):
+    """
+    Upload d'un gros fichier en plusieurs requêtes (reprise possible) ;
+    le fichier assemblé est ensuite rattaché à un document
+    """
+
+    class Statut(models.TextChoices):
+        EN_COURS = 'en_cours', 'En cours'
+        TERMINE = 'termine', 'Terminé'
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    utilisateur = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='televersements'
+    )
+    nom_fichier = models.CharField('Nom du fichier', max_length=255)
+    taille = models.PositiveBigIntegerField('Taille (octets)')
+    empreinte = models.CharField('Empreinte SHA-256 attendue', max_length=64)
+    recu = models.PositiveBigIntegerField('Octets reçus', default=0)
+    statut = models.CharField('Statut', max_length=20, choices=Statut.choices, default=Statut.EN_COURS)
+
+    date_creation = models.DateTimeField('Date création', auto_now_add=True)
+    date_modification = models.DateTimeField('Dernière modification', auto_now=True)
+
+    class Meta:
+        verbose_name = 'Téléversement'
+        verbose_name_plural = 'Téléversements'
+        ordering = ['-date_creation']
+        indexes = [
+            # Purge des téléversements abandonnés
+            models.Index(fields=['date_modification'], name='televersement_modif_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.nom_fichier} ({self.recu}/{self.taille})"
+
+
+class TextePDF(models.Model):
+    """
+    Texte extrait d'un PDF, une fois par contenu (empreinte SHA-256) ;
+    `pages` contient la position de début de chaque page dans `texte`
+    """
+
+    empreinte = models.CharField('Empreinte SHA-256', max_length=64, unique=True)
+    texte = models.TextField('Texte', blank=True)
+    pages = models.JSONField('Début des pages', default=list)
+    erreur = models.TextField('Erreur d\'extraction', blank=True)
+    date_extraction = models.DateTimeField('Date extraction', auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'Texte PDF'
+        verbose_name_plural = 'Textes PDF'
+        ordering = ['-date_extraction']
+
+    def __str__(self):
+        return f"{self.empreinte[:12]} ({len(self.pages)} page(s))"
+
+    @property
+    def nombre_pages(self):
+        return len(self.pages)
+
+
+class FichierPDF(models.Model):
+    """Fichier (chemin dans le stockage) dont le texte a été extrait"""
+
+    nom = models.CharField('Chemin', max_length=255, unique=True)
+    texte = models.ForeignKey(TextePDF, on_delete=models.CASCADE, related_name='fichiers')
+
+    class Meta:
+        verbose_name = 'Fichier PDF'
+        verbose_name_plural = 'Fichiers PDF'
+
+    def __str__(self):
+        return self.nom
+
+
+class TermePDF(models.Model):
+    """Pages d'un texte PDF contenant un terme (résultats par page)"""
+
+    texte = models.ForeignKey(TextePDF, on_delete=models.CASCADE, related_name='termes')
+    terme = models.CharField('Terme', max_length=64)
+    pages = models.JSONField('Pages', default=list)
+
+    class Meta:
+        verbose_name = 'Terme PDF'
+        verbose_name_plural = 'Termes PDF'
+        unique_together = ['texte', 'terme']
+
+    def __str__(self):
+        return f"{self.terme} -> {self.pages}"
@@ -0,0 +1,144 @@
+"""
+Médias - Réduction des photos à la réception (signalements citoyens)
+
+Les photos prises au téléphone (4 à 12 Mo) sont réduites avant d'être
+enregistrées :
+
+1. Django reçoit l'upload par morceaux et l'écrit dans un fichier temporaire
+   au-delà de FILE_UPLOAD_MAX_MEMORY_SIZE ; la taille est bornée par
+   PHOTOS_TAILLE_MAX.
+2. Seul l'en-tête est lu pour contrôler les dimensions (PHOTOS_PIXELS_MAX).
+   Les coordonnées GPS de l'EXIF sont relevées.
+3. Un JPEG est décodé directement à l'échelle réduite (1/2, 1/4, 1/8) : il
+   n'est jamais décompressé en pleine résolution.
+4. L'image, redressée selon son orientation EXIF, est ramenée à
+   PHOTOS_COTE_MAX pixels sur son plus grand côté et réencodée en WebP, sans
+   métadonnées, dans un fichier temporaire.
+
+Au plus PHOTOS_CONCURRENCE photos sont décodées en même temps par processus :
+au-delà, la requête attend PHOTOS_ATTENTE secondes puis est refusée (503).
+"""
+import math
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.files import File
+from PIL import Image, ImageOps
+
+
+TAG_GPS = 0x8825
+# Fichier de sortie gardé en mémoire jusqu'à cette taille, puis sur disque
+TAILLE_MEMOIRE_SORTIE = 1024 * 1024
+
+_verrou = threading.Lock()
+_creneaux = None
+
+
+class PhotoRefusee(ValueError):
+    """Photo trop lourde, trop grande ou illisible"""
+
+
+class ReceptionSaturee(Exception):
+    """Trop de photos en cours de traitement dans ce processus"""
+
+
+def _reglage(nom, defaut):
+    return getattr(settings, nom, defaut)
+
+
+def taille_max():
+    return _reglage('PHOTOS_TAILLE_MAX', 15 * 1024 * 1024)
+
+
+def cote_max():
+    return _reglage('PHOTOS_COTE_MAX', 1600)
+
+
+def _semaphore():
+    global _creneaux
+    with _verrou:
+        if _creneaux is None:
+            _creneaux = threading.BoundedSemaphore(_reglage('PHOTOS_CONCURRENCE', 2))
+        return _creneaux
+
+
+@contextmanager
+def _creneau():
+    creneaux = _semaphore()
+    if not creneaux.acquire(timeout=_reglage('PHOTOS_ATTENTE', 10)):
+        raise ReceptionSaturee()
+    try:
+        yield
+    finally:
+        creneaux.release()
+
+
+def _degres(valeur):
+    degres, minutes, secondes = (float(partie) for partie in valeur)
+    return degres + minutes / 60 + secondes / 3600
+
+
+def coordonnees_gps(exif):
+    """(latitude, longitude) en Decimal à 6 décimales d'un EXIF Pillow ; None si absentes ou invalides"""
+    gps = exif.get_ifd(TAG_GPS)
+    try:
+        latitude = _degres(gps[2]) * (-1 if str(gps.get(1, 'N')).upper().startswith('S') else 1)
+        longitude = _degres(gps[4]) * (-1 if str(gps.get(3, 'E')).upper().startswith('W') else 1)
+    except (KeyError, TypeError, ValueError, ZeroDivisionError):
+        return None
+    if not (math.isfinite(latitude) and math.isfinite(longitude)):
+        return None
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180) or (latitude, longitude) == (0, 0):
+        # 0,0 : GPS sans position (valeur par défaut de certains appareils)
+        return None
+    return Decimal(f'{latitude:.6f}'), Decimal(f'{longitude:.6f}')
+
+
+def _taille_brouillon(largeur, hauteur, cote):
+    # Plus grand côté ramené à `cote`, proportions conservées
+    echelle = cote / max(largeur, hauteur)
+    return max(1, math.ceil(largeur * echelle)), max(1, math.ceil(hauteur * echelle))
+
+
+def reduire(fichier, cote=None, qualite=None):
+    """
+    Photo `fichier` (upload) réduite et réencodée en WebP sans EXIF :
+    (File, coordonnées GPS ou None). Lève PhotoRefusee ou ReceptionSaturee.
+    """
+    cote = cote or cote_max()
+    qualite = qualite or _reglage('PHOTOS_QUALITE', 80)
+    if fichier.size is not None and fichier.size > taille_max():
+        raise PhotoRefusee(f'Photo trop lourde (maximum {taille_max() // (1024 * 1024)} Mo).')
+
+    with _creneau():
+        fichier.seek(0)
+        try:
+            image = Image.open(fichier)
+            largeur, hauteur = image.size
+            if largeur * hauteur > _reglage('PHOTOS_PIXELS_MAX', 50_000_000):
+                raise PhotoRefusee('Photo trop grande.')
+            gps = coordonnees_gps(image.getexif())
+            if max(largeur, hauteur) > cote:
+                # JPEG : décodage direct à l'échelle réduite ; sans effet sur les autres formats
+                image.draft('RGB', _taille_brouillon(largeur, hauteur, cote))
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((cote, cote), Image.Resampling.LANCZOS)
+            if image.mode not in ('RGB', 'RGBA'):
+                image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+            sortie = tempfile.SpooledTemporaryFile(max_size=TAILLE_MEMOIRE_SORTIE)
+            # Aucune métadonnée passée à save() : l'EXIF n'est pas recopié
+            image.save(sortie, 'WEBP', quality=qualite, method=4)
+        except PhotoRefusee:
+            raise
+        except (OSError, ValueError, Image.DecompressionBombError) as exc:
+            raise PhotoRefusee('Image illisible.') from exc
+        finally:
+            fichier.close()
+
+    sortie.seek(0)
+    nom = os.path.splitext(os.path.basename(fichier.name or 'photo'))[0] or 'photo'
+    return File(sortie, name=f'{nom}.webp'), gps
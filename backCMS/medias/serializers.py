@@ -0,0 +1,160 @@
+"""
+Médias - Champs de serializers pour les images déclinées, les photos réduites
+à la réception et les documents téléversés par fragments
+
+    image_principale_variantes = VariantesImageField(source='image_principale')
+
+produit, une fois les déclinaisons générées :
+
+    {
+        "largeur": 3000, "hauteur": 2000,
+        "webp": {"320": "https://.../320.webp", "640": ..., "1280": ...},
+        "jpeg": {"320": "https://.../320.jpg", ...},
+        "srcset": {"webp": "https://.../320.webp 320w, ...", "jpeg": "..."}
+    }
+
+et None tant qu'elles ne le sont pas (l'image d'origine reste disponible).
+"""
+from django.core.files.storage import default_storage
+from rest_framework import serializers, status
+from rest_framework.exceptions import APIException
+
+from . import photos, televersements
+from .derives import FORMATS, largeur_vignette, variantes
+from .models import Televersement
+
+
+def _url(serializer_field, chemin):
+    url = default_storage.url(chemin)
+    request = serializer_field.context.get('request')
+    return request.build_absolute_uri(url) if request else url
+
+
+class VariantesImageField(serializers.Field):
+    """Déclinaisons d'une image par format et largeur (lecture seule)"""
+
+    def __init__(self, vignettes=False, **kwargs):
+        # vignettes : ne garder que les largeurs adaptées aux listes
+        self.vignettes = vignettes
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, fichier):
+        if not fichier:
+            return None
+        manifeste = variantes(fichier.name)
+        if not manifeste:
+            return None
+        largeur_max = largeur_vignette() if self.vignettes else None
+        representation = {'largeur': manifeste['largeur'], 'hauteur': manifeste['hauteur'], 'srcset': {}}
+        for format_ in FORMATS:
+            urls = {
+                largeur: _url(self, chemin)
+                for largeur, chemin in sorted(manifeste[format_].items(), key=lambda item: int(item[0]))
+                if largeur_max is None or int(largeur) <= largeur_max
+            }
+            if not urls:
+                # Image plus petite que toutes les largeurs : déclinaison la plus petite
+                largeur, chemin = min(manifeste[format_].items(), key=lambda item: int(item[0]))
+                urls = {largeur: _url(self, chemin)}
+            representation[format_] = urls
+            representation['srcset'][format_] = ', '.join(f'{url} {largeur}w' for largeur, url in urls.items())
+        return representation
+
+
+class VignetteField(serializers.Field):
+    """
+    URL de la vignette JPEG d'une image (listes) ; l'image d'origine tant que
+    les déclinaisons ne sont pas générées
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, fichier):
+        if not fichier:
+            return None
+        manifeste = variantes(fichier.name)
+        if not manifeste:
+            return _url(self, fichier.name)
+        candidates = {int(largeur): chemin for largeur, chemin in manifeste['jpeg'].items()}
+        adaptees = [largeur for largeur in candidates if largeur <= largeur_vignette()] or [min(candidates)]
+        return _url(self, candidates[max(adaptees)])
+
+
+class ReceptionSaturee(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Trop de photos en cours de traitement, réessayez dans quelques instants.'
+    default_code = 'reception_saturee'
+
+
+class PhotoReduiteField(serializers.ImageField):
+    """
+    Photo réduite et réencodée en WebP sans EXIF à la réception (voir
+    medias.photos) ; les coordonnées GPS relevées sont dans l'attribut `gps`
+    du fichier retourné
+    """
+
+    def to_internal_value(self, data):
+        if getattr(data, 'size', None) is not None and data.size > photos.taille_max():
+            # Refusée avant que Pillow ne lise le fichier
+            raise serializers.ValidationError(f'Photo trop lourde (maximum {photos.taille_max() // (1024 * 1024)} Mo).')
+        fichier = super().to_internal_value(data)
+        try:
+            photo, gps = photos.reduire(fichier)
+        except photos.ReceptionSaturee:
+            raise ReceptionSaturee()
+        except photos.PhotoRefusee as exc:
+            raise serializers.ValidationError(str(exc))
+        photo.gps = gps
+        return photo
+
+
+class TeleversementMixin(serializers.Serializer):
+    """
+    Document dont le fichier peut venir d'un téléversement fragmenté terminé :
+    "televersement": "<id>" remplace le fichier (Meta.extra_kwargs doit
+    rendre ce champ facultatif)
+    """
+    champ_televerse = 'fichier'
+
+    televersement = serializers.PrimaryKeyRelatedField(
+        queryset=Televersement.objects.filter(statut=Televersement.Statut.TERMINE),
+        write_only=True, required=False,
+        help_text='Identifiant d\'un téléversement terminé, à la place du fichier',
+    )
+
+    def validate_televersement(self, televersement):
+        request = self.context.get('request')
+        if request is None or televersement.utilisateur_id != request.user.pk:
+            raise serializers.ValidationError('Téléversement introuvable.')
+        return televersement
+
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        if attrs.get('televersement') and attrs.get(self.champ_televerse):
+            raise serializers.ValidationError('Fichier et téléversement sont exclusifs.')
+        if self.instance is None and not attrs.get('televersement') and not attrs.get(self.champ_televerse):
+            raise serializers.ValidationError({self.champ_televerse: 'Ce champ est obligatoire.'})
+        return attrs
+
+    def _enregistrer(self, enregistrer, validated_data):
+        televersement = validated_data.pop('televersement', None)
+        if televersement is None:
+            return enregistrer(validated_data)
+        fichier = televersements.ouvrir(televersement)
+        validated_data[self.champ_televerse] = fichier
+        try:
+            instance = enregistrer(validated_data)
+        except Exception:
+            fichier.close()
+            raise
+        televersements.consommer(televersement, fichier)
+        return instance
+
+    def create(self, validated_data):
+        return self._enregistrer(super().create, validated_data)
+
+    def update(self, instance, validated_data):
+        return self._enregistrer(lambda donnees: super(TeleversementMixin, self).update(instance, donnees), validated_data)
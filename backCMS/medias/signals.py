@@ -0,0 +1,101 @@
+"""
+Médias - Signaux : déclinaisons des images et texte des PDF après un upload,
+compteurs de références des fichiers stockés par contenu
+"""
+from django.apps import apps
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from . import stockage
+from .derives import CHAMPS_IMAGES, traitee
+from .extraction import CHAMPS_PDF, disponible as extraction_disponible
+from .models import FichierPDF
+from .stockage import CHAMPS_CONTENU
+
+
+def _apres_sauvegarde(sender, instance, raw=False, update_fields=None, **kwargs):
+    champs = CHAMPS_IMAGES[sender._meta.label]
+    # Sauvegarde partielle sans champ image (compteur de vues...) : rien à décliner
+    if raw or (update_fields is not None and not set(update_fields) & set(champs)):
+        return
+    from .taches import generer_derives
+    for champ in champs:
+        fichier = getattr(instance, champ)
+        if fichier and not traitee(fichier.name):
+            nom = fichier.name
+            # Après le commit : le worker doit voir le fichier et la ligne
+            transaction.on_commit(lambda nom=nom: generer_derives.differer(cle=f'derives:{nom}'[:200], nom=nom))
+
+
+def _apres_sauvegarde_pdf(sender, instance, raw=False, update_fields=None, **kwargs):
+    champ = CHAMPS_PDF[sender._meta.label]
+    if raw or not extraction_disponible() or (update_fields and champ not in update_fields):
+        return
+    from .taches import extraire_texte_pdf
+    fichier = getattr(instance, champ)
+    if fichier and not FichierPDF.objects.filter(nom=fichier.name).exists():
+        label, pk = sender._meta.label, instance.pk
+        transaction.on_commit(
+            lambda: extraire_texte_pdf.differer(cle=f'texte-pdf:{label}:{pk}', modele=label, pk=pk)
+        )
+
+
+def _fichiers(instance, champs):
+    return {champ: getattr(instance, champ).name or '' for champ in champs}
+
+
+def _champs_contenu(sender, update_fields):
+    """Champs stockés par contenu concernés par la sauvegarde"""
+    champs = CHAMPS_CONTENU[sender._meta.label]
+    if update_fields is None:
+        return list(champs)
+    return [champ for champ in champs if champ in update_fields]
+
+
+def _avant_sauvegarde_contenu(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Fichiers désignés avant la sauvegarde, lus en base (l'instance a déjà les nouveaux)
+    champs = _champs_contenu(sender, update_fields)
+    # Sauvegarde partielle sans champ fichier (compteur de vues...) : aucune lecture
+    instance._medias_fichiers_avant = (
+        sender._base_manager.filter(pk=instance.pk).values(*champs).first() or {}
+        if champs and instance.pk is not None and not raw else {}
+    )
+
+
+def _apres_sauvegarde_contenu(sender, instance, raw=False, update_fields=None, **kwargs):
+    champs = _champs_contenu(sender, update_fields)
+    if raw or not champs:
+        return
+    avant = getattr(instance, '_medias_fichiers_avant', {})
+    ajoutes, retires = [], []
+    for champ, nom in _fichiers(instance, champs).items():
+        ancien = avant.get(champ) or ''
+        if ancien != nom:
+            ajoutes.append(nom)
+            retires.append(ancien)
+    stockage.referencer(ajoutes)
+    stockage.dereferencer(retires)
+    instance._medias_fichiers_avant = {}
+
+
+def _apres_suppression_contenu(sender, instance, **kwargs):
+    stockage.dereferencer(_fichiers(instance, CHAMPS_CONTENU[sender._meta.label]).values())
+
+
+def connecter():
+    """Connecte les signaux des modèles ayant des images déclinées, des PDF ou des fichiers stockés par contenu"""
+    for label in CHAMPS_IMAGES:
+        post_save.connect(
+            _apres_sauvegarde, sender=apps.get_model(label),
+            dispatch_uid=f'medias_derives_{label}'
+        )
+    for label in CHAMPS_PDF:
+        post_save.connect(
+            _apres_sauvegarde_pdf, sender=apps.get_model(label),
+            dispatch_uid=f'medias_texte_pdf_{label}'
+        )
+    for label in CHAMPS_CONTENU:
+        modele = apps.get_model(label)
+        pre_save.connect(_avant_sauvegarde_contenu, sender=modele, dispatch_uid=f'medias_contenu_avant_{label}')
+        post_save.connect(_apres_sauvegarde_contenu, sender=modele, dispatch_uid=f'medias_contenu_{label}')
+        post_delete.connect(_apres_suppression_contenu, sender=modele, dispatch_uid=f'medias_contenu_suppr_{label}')
@@ -0,0 +1,204 @@
+"""
+Médias - Stockage adressé par le contenu
+
+Les fichiers des champs de CHAMPS_CONTENU sont enregistrés sous leur
+empreinte SHA-256, calculée pendant la copie de l'upload (par morceaux,
+mémoire constante) :
+
+    contenu/3f/3fa2...c9.pdf
+
+Un contenu déjà présent n'est pas réécrit : l'upload reçoit le chemin
+existant. Chaque fichier a une ligne FichierStocke dont `references` compte
+les champs qui le désignent (tenu à jour par les signaux de medias.signals).
+Un fichier n'est jamais supprimé à l'upload d'un remplaçant ni à la
+suppression d'un objet : `manage.py nettoyer_medias` efface ceux qui ne sont
+plus référencés depuis MEDIAS_DELAI_NETTOYAGE secondes.
+
+Un chemin désignant toujours le même contenu, nginx sert contenu/ avec des
+en-têtes de cache immuables.
+"""
+import hashlib
+import os
+import re
+import tempfile
+from collections import Counter
+from datetime import timedelta
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+
+# Champs dont les fichiers sont stockés par contenu, par modèle
+CHAMPS_CONTENU = {
+    'actualites.Actualite': ['image_principale'],
+    'actualites.PageCMS': ['image_bandeau'],
+    'transparence.Deliberation': ['fichier'],
+    'transparence.DocumentOfficiel': ['fichier'],
+}
+
+DOSSIER_CONTENU = 'contenu'
+
+
+def chemin_contenu(empreinte, extension):
+    return f'{DOSSIER_CONTENU}/{empreinte[:2]}/{empreinte}{extension}'
+
+
+def _extension(nom):
+    extension = os.path.splitext(nom)[1].lower()
+    return extension if re.fullmatch(r'\.[a-z0-9]{1,10}', extension) else ''
+
+
+class StockageContenu(FileSystemStorage):
+    """Stockage des médias dédupliqué par empreinte SHA-256"""
+
+    def get_available_name(self, name, max_length=None):
+        # Le chemin définitif dépend du contenu : il est choisi par _save
+        return name
+
+    def _save(self, name, content):
+        from .models import FichierStocke
+
+        dossier_temporaire = self.path(f'{DOSSIER_CONTENU}/.tmp')
+        os.makedirs(dossier_temporaire, exist_ok=True)
+        descripteur, temporaire = tempfile.mkstemp(dir=dossier_temporaire)
+        empreinte, taille = hashlib.sha256(), 0
+        try:
+            with os.fdopen(descripteur, 'wb') as sortie:
+                for morceau in content.chunks():
+                    empreinte.update(morceau)
+                    taille += len(morceau)
+                    sortie.write(morceau)
+            os.chmod(temporaire, self.file_permissions_mode or 0o644)
+            empreinte = empreinte.hexdigest()
+
+            # Contenu connu : la mise à jour attend un nettoyage en cours sur
+            # cette ligne et repousse le suivant (délai de grâce)
+            existant = FichierStocke.objects.filter(empreinte=empreinte)
+            nom = existant.values_list('nom', flat=True).first()
+            if nom is None or not existant.update(date_modification=timezone.now()):
+                nom = chemin_contenu(empreinte, _extension(name))
+                nouveau = True
+            else:
+                nouveau = False
+            # Contenu identique : remplacer le fichier garantit seulement sa présence
+            os.makedirs(os.path.dirname(self.path(nom)), exist_ok=True)
+            os.replace(temporaire, self.path(nom))
+            temporaire = None
+        finally:
+            if temporaire:
+                os.remove(temporaire)
+
+        if nouveau:
+            try:
+                with transaction.atomic():
+                    FichierStocke.objects.create(empreinte=empreinte, nom=nom, taille=taille)
+            except IntegrityError:
+                # Même contenu enregistré en parallèle (sous une autre extension)
+                existant = FichierStocke.objects.get(empreinte=empreinte).nom
+                if existant != nom:
+                    os.remove(self.path(nom))
+                nom = existant
+        return nom
+
+    def delete(self, name):
+        # Un contenu peut être partagé : suppression par nettoyer_medias uniquement
+        pass
+
+    def supprimer(self, name):
+        """Supprime réellement un fichier (nettoyage)"""
+        super().delete(name)
+
+
+stockage = StockageContenu()
+
+
+def stockage_contenu():
+    """Stockage des champs de CHAMPS_CONTENU (storage= des FileField)"""
+    return stockage
+
+
+# ===== RÉFÉRENCES =====
+
+def _ajuster(noms, delta):
+    from .models import FichierStocke
+
+    maintenant = timezone.now()
+    for nom, nombre in Counter(noms).items():
+        fichiers = FichierStocke.objects.filter(nom=nom)
+        if delta < 0:
+            fichiers = fichiers.filter(references__gte=nombre)
+        fichiers.update(references=F('references') + delta * nombre, date_modification=maintenant)
+
+
+def referencer(noms):
+    """Ajoute une référence à chaque fichier de `noms` (chemins hors stockage ignorés)"""
+    _ajuster([nom for nom in noms if nom.startswith(f'{DOSSIER_CONTENU}/')], 1)
+
+
+def dereferencer(noms):
+    """Retire une référence à chaque fichier de `noms`"""
+    _ajuster([nom for nom in noms if nom.startswith(f'{DOSSIER_CONTENU}/')], -1)
+
+
+def recompter():
+    """
+    Recalcule les compteurs depuis les champs (écritures faites sans signaux :
+    update(), bulk_create...) ; retourne le nombre de compteurs corrigés
+    """
+    from .models import FichierStocke
+
+    comptes = Counter()
+    for label, champs in CHAMPS_CONTENU.items():
+        modele = apps.get_model(label)
+        for champ in champs:
+            lignes = (
+                modele.objects.filter(**{f'{champ}__startswith': f'{DOSSIER_CONTENU}/'})
+                .values_list(champ).annotate(nombre=Count('pk')).order_by()
+            )
+            for nom, nombre in lignes:
+                comptes[nom] += nombre
+
+    corriges = 0
+    for pk, nom, references in FichierStocke.objects.values_list('pk', 'nom', 'references').iterator():
+        if comptes[nom] != references:
+            FichierStocke.objects.filter(pk=pk).update(references=comptes[nom], date_modification=timezone.now())
+            corriges += 1
+    return corriges
+
+
+def nettoyer(delai=None, simulation=False):
+    """
+    Supprime les fichiers non référencés depuis `delai` secondes ; retourne
+    (nombre de fichiers, octets libérés)
+    """
+    from . import derives
+    from .models import FichierStocke
+
+    if delai is None:
+        delai = getattr(settings, 'MEDIAS_DELAI_NETTOYAGE', 24 * 3600)
+    limite = timezone.now() - timedelta(seconds=delai)
+    orphelins = FichierStocke.objects.filter(references=0, date_modification__lt=limite)
+    if simulation:
+        resume = orphelins.aggregate(nombre=Count('pk'), taille=Sum('taille'))
+        return resume['nombre'], resume['taille'] or 0
+
+    supprimes, liberes = 0, 0
+    for pk in list(orphelins.values_list('pk', flat=True)):
+        with transaction.atomic():
+            # Ligne verrouillée : un upload du même contenu attend la fin de la suppression
+            fichier = (
+                FichierStocke.objects.select_for_update()
+                .filter(pk=pk, references=0, date_modification__lt=limite).first()
+            )
+            if fichier is None:
+                continue
+            stockage.supprimer(fichier.nom)
+            derives.supprimer(fichier.nom)
+            fichier.delete()
+        supprimes += 1
+        liberes += fichier.taille
+    return supprimes, liberes
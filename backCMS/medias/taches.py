@@ -0,0 +1,30 @@
+"""
+Médias - Tâches de fond : déclinaisons des images, texte des PDF
+"""
+from django.apps import apps
+
+from taches.models import Tache
+from taches.registre import tache
+
+from . import derives, extraction
+
+
+@tache('medias.generer_derives', priorite=Tache.Priorite.BASSE, max_tentatives=3)
+def generer_derives(nom):
+    """Génère les déclinaisons WebP / JPEG d'une image uploadée"""
+    manifeste = derives.generer(nom)
+    return {'largeurs': sorted(int(largeur) for largeur in manifeste['jpeg']) if manifeste else []}
+
+
+@tache('medias.extraire_texte_pdf', priorite=Tache.Priorite.BASSE, max_tentatives=3)
+def extraire_texte_pdf(modele, pk):
+    """Extrait le texte du PDF d'un document puis le réindexe pour la recherche"""
+    from recherche.indexation import indexer
+
+    instance = apps.get_model(modele).objects.filter(pk=pk).first()
+    if instance is None:
+        return {'pages': 0}
+    texte = extraction.extraire(getattr(instance, extraction.CHAMPS_PDF[modele]))
+    if texte is not None:
+        indexer(instance)
+    return {'pages': texte.nombre_pages if texte else 0}
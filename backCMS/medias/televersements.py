@@ -0,0 +1,167 @@
+"""
+Médias - Téléversements fragmentés (reprise après coupure)
+
+Protocole (api/v1/televersements/) :
+
+1. POST {nom_fichier, taille, empreinte}      → id, recu = 0
+2. PUT <id>/fragment/ avec l'en-tête
+   Content-Range: bytes <début>-<fin>/<taille> et les octets bruts.
+   Le fragment doit commencer à `recu` (sinon 409 avec la position
+   attendue) ; il est copié par blocs dans TELEVERSEMENTS_ROOT, sans être
+   chargé en mémoire. Une coupure en cours de fragment conserve les octets
+   déjà écrits.
+3. GET <id>/ donne `recu` : le client reprend à cette position.
+4. POST <id>/terminer/ vérifie la taille et l'empreinte SHA-256 (relue par
+   blocs sur le disque).
+5. Le document est créé (ou modifié) avec "televersement": <id> à la place
+   du fichier : le fichier assemblé lui est rattaché puis supprimé.
+
+Les téléversements sans activité depuis TELEVERSEMENTS_DUREE secondes sont
+supprimés par `manage.py nettoyer_medias`.
+"""
+import hashlib
+import os
+import re
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Televersement
+
+
+TAILLE_BLOC = 64 * 1024
+
+CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+class ErreurTeleversement(Exception):
+    """Fragment ou fichier refusé ; `recu` : position attendue"""
+
+    def __init__(self, message, recu=None):
+        super().__init__(message)
+        self.recu = recu
+
+
+def _reglage(nom, defaut):
+    return getattr(settings, nom, defaut)
+
+
+def taille_max():
+    return _reglage('TELEVERSEMENTS_TAILLE_MAX', 200 * 1024 * 1024)
+
+
+def taille_fragment():
+    """Taille de fragment conseillée, et maximale par requête"""
+    return _reglage('TELEVERSEMENTS_TAILLE_FRAGMENT', 5 * 1024 * 1024)
+
+
+def chemin(televersement):
+    return Path(_reglage('TELEVERSEMENTS_ROOT', settings.BASE_DIR / 'televersements')) / f'{televersement.pk}.part'
+
+
+def lire_content_range(entete):
+    """(début, fin incluse, taille) d'un en-tête Content-Range ; None s'il est invalide"""
+    correspondance = CONTENT_RANGE.match(entete or '')
+    if not correspondance:
+        return None
+    debut, fin, taille = map(int, correspondance.groups())
+    return (debut, fin, taille) if debut <= fin < taille else None
+
+
+def ecrire_fragment(televersement, debut, longueur, flux):
+    """
+    Copie `longueur` octets de `flux` à la position `debut` ; retourne le
+    nombre d'octets reçus au total
+    """
+    if televersement.statut != Televersement.Statut.EN_COURS:
+        raise ErreurTeleversement('Téléversement déjà terminé.', televersement.recu)
+    if debut != televersement.recu:
+        raise ErreurTeleversement('Le fragment doit commencer à la position reçue.', televersement.recu)
+    if longueur > taille_fragment():
+        raise ErreurTeleversement(f'Fragment trop grand (maximum {taille_fragment()} octets).')
+    if debut + longueur > televersement.taille:
+        raise ErreurTeleversement('Le fragment dépasse la taille annoncée.', televersement.recu)
+
+    fichier = chemin(televersement)
+    fichier.parent.mkdir(parents=True, exist_ok=True)
+    ecrits = 0
+    try:
+        with open(fichier, 'r+b' if fichier.exists() else 'wb') as sortie:
+            sortie.seek(debut)
+            # Octets d'une tentative interrompue au-delà de `recu` : écrasés
+            sortie.truncate()
+            while ecrits < longueur:
+                bloc = flux.read(min(TAILLE_BLOC, longueur - ecrits))
+                if not bloc:
+                    break
+                sortie.write(bloc)
+                ecrits += len(bloc)
+    finally:
+        # Position enregistrée même si le client coupe au milieu du fragment ;
+        # un envoi concurrent à la même position ne compte qu'une fois
+        Televersement.objects.filter(pk=televersement.pk, recu=debut).update(
+            recu=debut + ecrits, date_modification=timezone.now()
+        )
+    televersement.refresh_from_db(fields=['recu', 'date_modification'])
+    return televersement.recu
+
+
+def terminer(televersement):
+    """Vérifie le fichier assemblé (taille et SHA-256) ; un fichier corrompu est à renvoyer entièrement"""
+    if televersement.statut == Televersement.Statut.TERMINE:
+        return televersement
+    if televersement.recu != televersement.taille:
+        raise ErreurTeleversement('Téléversement incomplet.', televersement.recu)
+
+    empreinte = hashlib.sha256()
+    with open(chemin(televersement), 'rb') as fichier:
+        for bloc in iter(lambda: fichier.read(TAILLE_BLOC), b''):
+            empreinte.update(bloc)
+    if empreinte.hexdigest() != televersement.empreinte:
+        supprimer_fichier(televersement)
+        Televersement.objects.filter(pk=televersement.pk).update(recu=0, date_modification=timezone.now())
+        televersement.recu = 0
+        raise ErreurTeleversement('Empreinte SHA-256 différente : fichier à renvoyer.', 0)
+
+    televersement.statut = Televersement.Statut.TERMINE
+    televersement.save(update_fields=['statut', 'date_modification'])
+    return televersement
+
+
+def ouvrir(televersement):
+    """Fichier assemblé, à affecter à un FileField (copié par blocs par le stockage)"""
+    return File(open(chemin(televersement), 'rb'), name=televersement.nom_fichier)
+
+
+def consommer(televersement, fichier):
+    """Après rattachement au document : ferme et supprime le fichier assemblé"""
+    fichier.close()
+
+    def supprimer():
+        supprimer_fichier(televersement)
+        Televersement.objects.filter(pk=televersement.pk).delete()
+
+    transaction.on_commit(supprimer)
+
+
+def supprimer_fichier(televersement):
+    try:
+        os.remove(chemin(televersement))
+    except FileNotFoundError:
+        pass
+
+
+def purger_expires(duree=None):
+    """Supprime les téléversements sans activité depuis `duree` secondes ; retourne leur nombre"""
+    if duree is None:
+        duree = _reglage('TELEVERSEMENTS_DUREE', 24 * 3600)
+    expires = Televersement.objects.filter(date_modification__lt=timezone.now() - timedelta(seconds=duree))
+    nombre = 0
+    for televersement in expires.iterator():
+        supprimer_fichier(televersement)
+        nombre += Televersement.objects.filter(pk=televersement.pk).delete()[0]
+    return nombre
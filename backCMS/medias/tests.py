@@ -0,0 +1,670 @@
+"""
+Tests pour le module Médias - Déclinaisons des images, stockage par contenu,
+téléversements fragmentés, texte des PDF
+"""
+import hashlib
+import io
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from actualites.models import Actualite, PageCMS
+from communes.models import Commune, Departement, Region
+from services.models import Signalement
+from taches.models import Tache
+from transparence.models import Deliberation, DocumentBudgetaire, DocumentOfficiel
+
+from . import derives, extraction, photos, stockage, televersements
+from .models import FichierPDF, FichierStocke, Televersement, TextePDF
+
+
+def image_test(largeur, hauteur, format_='JPEG', mode='RGB'):
+    tampon = io.BytesIO()
+    Image.new(mode, (largeur, hauteur), (200, 30, 30) if mode == 'RGB' else (200, 30, 30, 128)).save(tampon, format_)
+    return tampon.getvalue()
+
+
+def pdf_test(pages):
+    """PDF minimal : une page par texte de `pages`"""
+    objets = ['<< /Type /Catalog /Pages 2 0 R >>', None, '<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>']
+    enfants = []
+    for texte in pages:
+        flux = f'BT /F1 12 Tf 72 720 Td ({texte}) Tj ET'.encode('latin-1')
+        objets.append(f'<< /Length {len(flux)} >>\nstream\n'.encode('latin-1') + flux + b'\nendstream')
+        objets.append(
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] '
+            f'/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objets)} 0 R >>'
+        )
+        enfants.append(f'{len(objets)} 0 R')
+    objets[1] = f'<< /Type /Pages /Kids [{" ".join(enfants)}] /Count {len(pages)} >>'
+
+    sortie = io.BytesIO()
+    sortie.write(b'%PDF-1.4\n')
+    positions = []
+    for numero, objet in enumerate(objets, start=1):
+        positions.append(sortie.tell())
+        contenu = objet if isinstance(objet, bytes) else objet.encode('latin-1')
+        sortie.write(f'{numero} 0 obj\n'.encode() + contenu + b'\nendobj\n')
+    xref = sortie.tell()
+    sortie.write(f'xref\n0 {len(objets) + 1}\n0000000000 65535 f \n'.encode())
+    for position in positions:
+        sortie.write(f'{position:010d} 00000 n \n'.encode())
+    sortie.write(f'trailer\n<< /Size {len(objets) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n'.encode())
+    return sortie.getvalue()
+
+
+def photo_test(largeur, hauteur, gps=None, orientation=None):
+    """JPEG avec EXIF : gps = {1: 'N', 2: (d, m, s), 3: 'E', 4: (d, m, s)}"""
+    exif = Image.Exif()
+    exif[0x010F] = 'Appareil test'
+    if orientation:
+        exif[0x0112] = orientation
+    if gps:
+        exif[photos.TAG_GPS] = gps
+    tampon = io.BytesIO()
+    Image.new('RGB', (largeur, hauteur), (200, 30, 30)).save(tampon, 'JPEG', exif=exif)
+    return tampon.getvalue()
+
+
+class MediasTestCase(TestCase):
+    """Stockage des médias dans un dossier temporaire"""
+
+    def setUp(self):
+        cache.clear()
+        self.dossier = tempfile.mkdtemp()
+        self.reglages = override_settings(
+            MEDIA_ROOT=self.dossier, IMAGES_LARGEURS=[320, 640, 1280], IMAGES_LARGEUR_VIGNETTE=640
+        )
+        self.reglages.enable()
+
+    def tearDown(self):
+        self.reglages.disable()
+        shutil.rmtree(self.dossier, ignore_errors=True)
+        cache.clear()
+
+
+class GenerationDerivesTest(MediasTestCase):
+    """Tests de la génération des déclinaisons"""
+
+    def test_largeurs_generees(self):
+        """Test WebP et JPEG aux largeurs inférieures à l'original, sans agrandissement"""
+        nom = default_storage.save('actualites/grande.jpg', ContentFile(image_test(1000, 500)))
+        manifeste = derives.generer(nom)
+
+        self.assertEqual((manifeste['largeur'], manifeste['hauteur']), (1000, 500))
+        self.assertEqual(sorted(manifeste['webp'], key=int), ['320', '640'])
+        self.assertEqual(sorted(manifeste['jpeg'], key=int), ['320', '640'])
+        with default_storage.open(manifeste['webp']['640']) as fichier:
+            image = Image.open(fichier)
+            self.assertEqual((image.format, image.size), ('WEBP', (640, 320)))
+        with default_storage.open(manifeste['jpeg']['320']) as fichier:
+            image = Image.open(fichier)
+            self.assertEqual((image.format, image.size), ('JPEG', (320, 160)))
+
+    def test_petite_image_gardee_a_sa_taille(self):
+        """Test une image plus petite que toutes les largeurs garde sa taille"""
+        nom = default_storage.save('logos/petit.png', ContentFile(image_test(200, 100, 'PNG', 'RGBA')))
+        manifeste = derives.generer(nom)
+        self.assertEqual(list(manifeste['webp']), ['200'])
+        with default_storage.open(manifeste['jpeg']['200']) as fichier:
+            self.assertEqual(Image.open(fichier).size, (200, 100))
+
+    def test_manifeste_relu_sans_cache(self):
+        """Test manifeste relu depuis le stockage après vidage du cache"""
+        nom = default_storage.save('actualites/image.jpg', ContentFile(image_test(800, 600)))
+        self.assertIsNone(derives.variantes(nom))
+        manifeste = derives.generer(nom)
+        cache.clear()
+        self.assertEqual(derives.variantes(nom), manifeste)
+
+        derives.supprimer(nom)
+        self.assertIsNone(derives.variantes(nom))
+        self.assertFalse(default_storage.exists(manifeste['webp']['640']))
+
+    def test_fichier_non_image(self):
+        """Test fichier illisible ignoré, manifeste d'erreur enregistré"""
+        nom = default_storage.save('actualites/faux.jpg', ContentFile(b'pas une image'))
+        self.assertIsNone(derives.generer(nom))
+        self.assertIsNone(derives.generer('actualites/absent.jpg'))
+
+        cache.clear()
+        for nom in (nom, 'actualites/absent.jpg'):
+            self.assertIsNone(derives.variantes(nom))
+            self.assertTrue(derives.traitee(nom))
+        derives.supprimer(nom)
+        self.assertFalse(derives.traitee(nom))
+
+
+class DerivesAPITest(MediasTestCase):
+    """Tests de l'upload et des URLs exposées par l'API"""
+
+    def setUp(self):
+        super().setUp()
+        region = Region.objects.create(nom='Centre', code='CE')
+        self.commune = Commune.objects.create(
+            nom='Test Commune', slug='test-commune',
+            departement=Departement.objects.create(region=region, nom='Mfoundi', code='MF'),
+            statut=Commune.Statut.ACTIVE,
+        )
+        auteur = get_user_model().objects.create_superuser(
+            email='superadmin@test.cm', nom='Super Admin', password='adminpass'
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.actualite = Actualite.objects.create(
+                commune=self.commune, auteur=auteur, titre='Actualité', slug='actualite',
+                contenu='Contenu', est_publie=True, date_publication=timezone.now(),
+                image_principale=SimpleUploadedFile('photo.jpg', image_test(2000, 1000), 'image/jpeg'),
+            )
+        self.client = APIClient()
+
+    def test_upload_met_en_file(self):
+        """Test la sauvegarde d'une image met la génération en file"""
+        tache_ = Tache.objects.get(nom='medias.generer_derives')
+        self.assertEqual(tache_.arguments['nom'], self.actualite.image_principale.name)
+
+    def test_sauvegarde_sans_champ_image(self):
+        """Test une sauvegarde partielle sans champ image ne remet rien en file"""
+        Tache.objects.all().delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.actualite.incrementer_vues()
+            self.actualite.save(update_fields=['titre'])
+        self.assertFalse(Tache.objects.exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.actualite.save(update_fields=['titre', 'image_principale'])
+        self.assertTrue(Tache.objects.filter(nom='medias.generer_derives').exists())
+
+    def test_image_illisible_pas_remise_en_file(self):
+        """Test une image illisible n'est plus mise en file après l'échec de la génération"""
+        Tache.objects.all().delete()
+        self.actualite.image_principale.save('faux.jpg', ContentFile(b'pas une image'), save=False)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.actualite.save()
+        call_command('run_worker', '--une-fois', '--concurrence', '1', stdout=StringIO())
+        self.assertEqual(Tache.objects.get().statut, Tache.Statut.TERMINEE)
+
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.actualite.save()
+        self.assertEqual(Tache.objects.count(), 1)
+
+    def test_image_originale_avant_generation(self):
+        """Test la liste renvoie l'original tant que les déclinaisons manquent"""
+        resultat = self.client.get('/api/v1/actualites/').json()['results'][0]
+        self.assertTrue(resultat['image_principale'].endswith(self.actualite.image_principale.name))
+        self.assertIsNone(resultat['image_principale_variantes'])
+
+    def test_liste_vignettes_et_detail_srcset(self):
+        """Test vignette dans les listes, toutes les largeurs dans le détail"""
+        call_command('run_worker', '--une-fois', '--concurrence', '1', stdout=StringIO())
+
+        resultat = self.client.get('/api/v1/actualites/').json()['results'][0]
+        self.assertTrue(resultat['image_principale'].endswith('/640.jpg'))
+        self.assertEqual(sorted(resultat['image_principale_variantes']['webp'], key=int), ['320', '640'])
+
+        detail = self.client.get(f'/api/v1/actualites/{self.actualite.slug}/').json()
+        variantes = detail['image_principale_variantes']
+        self.assertEqual((variantes['largeur'], variantes['hauteur']), (2000, 1000))
+        self.assertEqual(sorted(variantes['jpeg'], key=int), ['320', '640', '1280'])
+        self.assertTrue(variantes['webp']['1280'].startswith('http://testserver/'))
+        self.assertIn('1280.webp 1280w', variantes['srcset']['webp'])
+
+    def test_commande_generer_derives(self):
+        """Test rattrapage des images existantes"""
+        out = StringIO()
+        call_command('generer_derives', stdout=out)
+        self.assertIn('1 image(s) déclinée(s)', out.getvalue())
+        self.assertIsNotNone(derives.variantes(self.actualite.image_principale.name))
+
+        out = StringIO()
+        call_command('generer_derives', stdout=out)
+        self.assertIn('0 image(s) déclinée(s)', out.getvalue())
+
+
+class StockageContenuTest(MediasTestCase):
+    """Tests du stockage par empreinte de contenu"""
+
+    def setUp(self):
+        super().setUp()
+        region = Region.objects.create(nom='Centre', code='CE')
+        self.commune = Commune.objects.create(
+            nom='Test Commune', slug='test-commune',
+            departement=Departement.objects.create(region=region, nom='Mfoundi', code='MF'),
+        )
+        self.auteur = get_user_model().objects.create_superuser(
+            email='superadmin@test.cm', nom='Super Admin', password='adminpass'
+        )
+        self.contenu = image_test(400, 300)
+
+    def creer_actualite(self, slug, contenu, nom='photo.jpg'):
+        return Actualite.objects.create(
+            commune=self.commune, auteur=self.auteur, titre=slug, slug=slug, contenu='Contenu',
+            image_principale=SimpleUploadedFile(nom, contenu, 'image/jpeg'),
+        )
+
+    def test_contenu_identique_stocke_une_fois(self):
+        """Test même contenu uploadé dans plusieurs modèles : un seul fichier"""
+        premiere = self.creer_actualite('a', self.contenu)
+        seconde = self.creer_actualite('b', self.contenu, nom='LOGO.JPEG')
+        page = PageCMS.objects.create(
+            commune=self.commune, titre='Page', slug='page', contenu='Contenu',
+            image_bandeau=SimpleUploadedFile('bandeau.jpg', self.contenu, 'image/jpeg'),
+        )
+
+        empreinte = hashlib.sha256(self.contenu).hexdigest()
+        self.assertEqual(premiere.image_principale.name, f'contenu/{empreinte[:2]}/{empreinte}.jpg')
+        self.assertEqual(seconde.image_principale.name, premiere.image_principale.name)
+        self.assertEqual(page.image_bandeau.name, premiere.image_principale.name)
+        fichier = FichierStocke.objects.get()
+        self.assertEqual((fichier.empreinte, fichier.taille, fichier.references), (empreinte, len(self.contenu), 3))
+        with default_storage.open(fichier.nom) as lu:
+            self.assertEqual(lu.read(), self.contenu)
+
+    def test_empreinte_calculee_par_morceaux(self):
+        """Test empreinte d'un fichier plus grand qu'un morceau"""
+        contenu = bytes(range(256)) * 1024 * 5
+        document = DocumentOfficiel.objects.create(
+            commune=self.commune, titre='Arrêté', fichier=SimpleUploadedFile('arrete.pdf', contenu),
+        )
+        self.assertIn(hashlib.sha256(contenu).hexdigest(), document.fichier.name)
+        self.assertTrue(document.fichier.name.endswith('.pdf'))
+
+    def test_references_et_nettoyage(self):
+        """Test remplacement et suppression décrémentent, le nettoyage attend le délai"""
+        premiere = self.creer_actualite('a', self.contenu)
+        seconde = self.creer_actualite('b', self.contenu)
+        ancien = premiere.image_principale.name
+
+        premiere.image_principale = SimpleUploadedFile('autre.jpg', image_test(300, 300), 'image/jpeg')
+        premiere.save()
+        self.assertEqual(FichierStocke.objects.get(nom=ancien).references, 1)
+        seconde.delete()
+        self.assertEqual(FichierStocke.objects.get(nom=ancien).references, 0)
+        # Sans effet : le fichier partagé n'est supprimé que par le nettoyage
+        premiere.image_principale.storage.delete(ancien)
+        self.assertTrue(default_storage.exists(ancien))
+
+        call_command('nettoyer_medias', stdout=StringIO())
+        self.assertTrue(default_storage.exists(ancien))
+
+        out = StringIO()
+        call_command('nettoyer_medias', '--delai', '0', stdout=out)
+        self.assertIn('1 fichier(s) supprimé(s)', out.getvalue())
+        self.assertFalse(default_storage.exists(ancien))
+        self.assertFalse(FichierStocke.objects.filter(nom=ancien).exists())
+        self.assertTrue(default_storage.exists(premiere.image_principale.name))
+
+    def test_sauvegarde_partielle_sans_champ_fichier(self):
+        """Test sauvegarde sans champ fichier : ni lecture préalable ni compteur modifié"""
+        actualite = self.creer_actualite('a', self.contenu)
+        with self.assertNumQueries(1):
+            actualite.incrementer_vues()
+
+        actualite.image_principale = SimpleUploadedFile('autre.jpg', image_test(300, 300), 'image/jpeg')
+        actualite.save(update_fields=['image_principale'])
+        self.assertEqual(FichierStocke.objects.get(nom=actualite.image_principale.name).references, 1)
+        self.assertEqual(FichierStocke.objects.exclude(nom=actualite.image_principale.name).get().references, 0)
+
+    def test_upload_apres_nettoyage(self):
+        """Test contenu réuploadé après suppression : fichier réécrit"""
+        actualite = self.creer_actualite('a', self.contenu)
+        nom = actualite.image_principale.name
+        actualite.delete()
+        stockage.nettoyer(delai=0)
+
+        actualite = self.creer_actualite('b', self.contenu)
+        self.assertEqual(actualite.image_principale.name, nom)
+        self.assertTrue(default_storage.exists(nom))
+        self.assertEqual(FichierStocke.objects.get().references, 1)
+
+    def test_recompter(self):
+        """Test compteurs corrigés après une écriture sans signaux"""
+        actualite = self.creer_actualite('a', self.contenu)
+        nom = actualite.image_principale.name
+        Actualite.objects.filter(pk=actualite.pk).update(image_principale='')
+        self.assertEqual(FichierStocke.objects.get().references, 1)
+
+        self.assertEqual(stockage.recompter(), 1)
+        self.assertEqual(FichierStocke.objects.get(nom=nom).references, 0)
+        self.assertEqual(stockage.nettoyer(delai=0, simulation=True), (1, len(self.contenu)))
+
+
+@override_settings(TELEVERSEMENTS_TAILLE_FRAGMENT=1000)
+class TeleversementAPITest(MediasTestCase):
+    """Tests des téléversements fragmentés"""
+
+    def setUp(self):
+        super().setUp()
+        self.reglages_televersements = override_settings(TELEVERSEMENTS_ROOT=Path(self.dossier) / 'televersements')
+        self.reglages_televersements.enable()
+        region = Region.objects.create(nom='Centre', code='CE')
+        self.commune = Commune.objects.create(
+            nom='Test Commune', slug='test-commune',
+            departement=Departement.objects.create(region=region, nom='Mfoundi', code='MF'),
+        )
+        Utilisateur = get_user_model()
+        self.admin = Utilisateur.objects.create_user(
+            email='admin@test.cm', nom='Admin', password='pass123',
+            role=Utilisateur.Role.ADMIN_COMMUNE, commune=self.commune,
+        )
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.admin).access_token}')
+        self.contenu = b'%PDF-1.4 ' + bytes(range(256)) * 10
+
+    def tearDown(self):
+        self.reglages_televersements.disable()
+        super().tearDown()
+
+    def demarrer(self, contenu=None, empreinte=None):
+        contenu = self.contenu if contenu is None else contenu
+        response = self.client.post('/api/v1/televersements/', {
+            'nom_fichier': 'budget.pdf', 'taille': len(contenu),
+            'empreinte': empreinte or hashlib.sha256(contenu).hexdigest(),
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['taille_fragment'], 1000)
+        return response.data['id']
+
+    def envoyer(self, id_, debut, fin, contenu=None):
+        contenu = self.contenu if contenu is None else contenu
+        return self.client.put(
+            f'/api/v1/televersements/{id_}/fragment/', contenu[debut:fin + 1],
+            content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {debut}-{fin}/{len(contenu)}',
+        )
+
+    def test_reprise_apres_coupure(self):
+        """Test fragment interrompu puis reprise à la position reçue"""
+        id_ = self.demarrer()
+        self.assertEqual(self.envoyer(id_, 0, 999).data['recu'], 1000)
+
+        # Connexion coupée après 300 octets du deuxième fragment
+        televersement = Televersement.objects.get(pk=id_)
+        televersements.ecrire_fragment(televersement, 1000, 1000, io.BytesIO(self.contenu[1000:1300]))
+        self.assertEqual(self.client.get(f'/api/v1/televersements/{id_}/').data['recu'], 1300)
+
+        # Fragment à une autre position : refusé avec la position attendue
+        response = self.envoyer(id_, 1000, 1999)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data['recu'], 1300)
+
+        self.assertEqual(self.envoyer(id_, 1300, 2299).data['recu'], 2300)
+        self.assertEqual(self.envoyer(id_, 2300, len(self.contenu) - 1).data['recu'], len(self.contenu))
+        response = self.client.post(f'/api/v1/televersements/{id_}/terminer/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['statut'], Televersement.Statut.TERMINE)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/v1/deliberations/', {
+                'commune': self.commune.id, 'numero': 'D-2024-01', 'titre': 'Budget',
+                'date_seance': '2024-03-01', 'televersement': id_,
+            }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        deliberation = Deliberation.objects.get()
+        with deliberation.fichier.open('rb') as fichier:
+            self.assertEqual(fichier.read(), self.contenu)
+        self.assertFalse(Televersement.objects.exists())
+        self.assertFalse(televersements.chemin(televersement).exists())
+
+    def test_empreinte_incorrecte(self):
+        """Test fichier assemblé différent : refusé, à renvoyer depuis le début"""
+        id_ = self.demarrer(empreinte='0' * 64)
+        for debut in range(0, len(self.contenu), 1000):
+            self.envoyer(id_, debut, min(debut + 999, len(self.contenu) - 1))
+        response = self.client.post(f'/api/v1/televersements/{id_}/terminer/')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['recu'], 0)
+        self.assertEqual(Televersement.objects.get(pk=id_).statut, Televersement.Statut.EN_COURS)
+
+    def test_fragment_invalide(self):
+        """Test en-tête manquant, fragment trop grand, téléversement incomplet"""
+        id_ = self.demarrer()
+        response = self.client.put(
+            f'/api/v1/televersements/{id_}/fragment/', b'abc', content_type='application/octet-stream'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.envoyer(id_, 0, 1499).status_code, 409)
+        self.assertEqual(self.client.post(f'/api/v1/televersements/{id_}/terminer/').status_code, 400)
+
+    def test_document_budgetaire_et_proprietaire(self):
+        """Test rattachement à un document budgétaire, téléversement d'un autre compte refusé"""
+        id_ = self.demarrer()
+        for debut in range(0, len(self.contenu), 1000):
+            self.envoyer(id_, debut, min(debut + 999, len(self.contenu) - 1))
+        self.client.post(f'/api/v1/televersements/{id_}/terminer/')
+        donnees = {
+            'commune': self.commune.id, 'type_document': 'budget_primitif', 'titre': 'Budget 2024',
+            'annee': 2024, 'televersement': id_,
+        }
+
+        autre = get_user_model().objects.create_user(email='autre@test.cm', nom='Autre', password='pass123')
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(autre).access_token}')
+        self.assertEqual(client.get(f'/api/v1/televersements/{id_}/').status_code, 404)
+        response = client.post('/api/v1/documents-budgetaires/', donnees, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('televersement', response.data)
+
+        response = self.client.post('/api/v1/documents-budgetaires/', donnees, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertTrue(DocumentBudgetaire.objects.get().fichier.name.startswith('budgets/budget'))
+
+        # Sans fichier ni téléversement
+        del donnees['televersement']
+        self.assertEqual(self.client.post('/api/v1/documents-budgetaires/', donnees, format='json').status_code, 400)
+
+    def test_purge_televersements_abandonnes(self):
+        """Test suppression des téléversements sans activité"""
+        id_ = self.demarrer()
+        self.envoyer(id_, 0, 999)
+        televersement = Televersement.objects.get(pk=id_)
+        Televersement.objects.filter(pk=id_).update(date_modification=timezone.now() - timedelta(days=2))
+
+        out = StringIO()
+        call_command('nettoyer_medias', stdout=out)
+        self.assertIn('1 téléversement(s) abandonné(s)', out.getvalue())
+        self.assertFalse(Televersement.objects.exists())
+        self.assertFalse(televersements.chemin(televersement).exists())
+
+
+@skipUnless(settings.PYPDF_AVAILABLE, 'pypdf non installé')
+class TextePDFTest(MediasTestCase):
+    """Tests de l'extraction du texte des PDF et de la recherche par page"""
+
+    def setUp(self):
+        super().setUp()
+        region = Region.objects.create(nom='Centre', code='CE')
+        self.commune = Commune.objects.create(
+            nom='Test Commune', slug='test-commune',
+            departement=Departement.objects.create(region=region, nom='Mfoundi', code='MF'),
+            statut=Commune.Statut.ACTIVE,
+        )
+        self.pdf = pdf_test([
+            'Ordre du jour de la session ordinaire',
+            'Construction du forage de Nkolbisson pour 12 millions',
+            'Questions diverses',
+        ])
+
+    def creer_deliberation(self, numero, contenu):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Deliberation.objects.create(
+                commune=self.commune, numero=numero, titre=f'Délibération {numero}',
+                date_seance='2024-03-01', fichier=SimpleUploadedFile('deliberation.pdf', contenu),
+            )
+
+    def test_extraction_en_tache_et_recherche_par_page(self):
+        """Test texte extrait par le worker, résultat de recherche avec la page"""
+        deliberation = self.creer_deliberation('D-01', self.pdf)
+        self.assertFalse(FichierPDF.objects.exists())
+        self.assertTrue(Tache.objects.filter(nom='medias.extraire_texte_pdf').exists())
+
+        call_command('run_worker', '--une-fois', '--concurrence', '1', stdout=StringIO())
+        texte = TextePDF.objects.get()
+        self.assertEqual(len(texte.pages), 3)
+        self.assertIn('Nkolbisson', texte.texte)
+
+        response = APIClient().get('/api/v1/recherche/', {'q': 'forage Nkolbisson'})
+        self.assertEqual(response.status_code, 200)
+        resultat = response.data['results'][0]
+        self.assertEqual((resultat['type'], resultat['id']), ('deliberation', deliberation.id))
+        self.assertEqual(resultat['pages'][0]['page'], 2)
+        self.assertIn('forage de Nkolbisson', resultat['pages'][0]['extrait'])
+
+    def test_texte_extrait_une_fois_par_contenu(self):
+        """Test même PDF pour deux documents : une seule extraction"""
+        premiere = self.creer_deliberation('D-01', self.pdf)
+        extraction.extraire(premiere.fichier)
+        with self.captureOnCommitCallbacks(execute=True):
+            document = DocumentBudgetaire.objects.create(
+                commune=self.commune, type_document='budget_primitif', titre='Budget', annee=2024,
+                fichier=SimpleUploadedFile('budget.pdf', self.pdf),
+            )
+        extraction.extraire(document.fichier)
+        self.assertEqual(TextePDF.objects.count(), 1)
+        self.assertEqual(FichierPDF.objects.count(), 2)
+
+        # Fichier déjà connu : pas de nouvelle tâche
+        Tache.objects.all().delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.creer_deliberation('D-02', self.pdf)
+        self.assertFalse(Tache.objects.filter(nom='medias.extraire_texte_pdf').exists())
+
+    def test_pdf_illisible(self):
+        """Test fichier mal formé : texte vide et erreur enregistrée"""
+        deliberation = self.creer_deliberation('D-01', b'%PDF-1.4 tronque')
+        with self.assertLogs('pypdf', 'WARNING'), self.assertLogs('medias.extraction', 'WARNING'):
+            texte = extraction.extraire(deliberation.fichier)
+        self.assertEqual(texte.texte, '')
+        self.assertTrue(texte.erreur)
+
+    def test_sans_pypdf(self):
+        """Test sans pypdf : aucune tâche, documents indexés sans le texte"""
+        with override_settings(PYPDF_AVAILABLE=False):
+            deliberation = self.creer_deliberation('D-01', self.pdf)
+            self.assertIsNone(extraction.extraire(deliberation.fichier))
+        self.assertFalse(Tache.objects.filter(nom='medias.extraire_texte_pdf').exists())
+
+        out = StringIO()
+        call_command('extraire_textes_pdf', stdout=out)
+        self.assertIn('1 document(s) extrait(s)', out.getvalue())
+        self.assertEqual(
+            APIClient().get('/api/v1/recherche/', {'q': 'Nkolbisson'}).data['results'][0]['id'], deliberation.id
+        )
+
+
+class PhotosSignalementTest(MediasTestCase):
+    """Tests de la réduction des photos de signalement à la réception"""
+
+    GPS_YAOUNDE = {1: 'N', 2: (3.0, 52.0, 12.0), 3: 'E', 4: (11.0, 31.0, 3.6)}
+
+    def setUp(self):
+        super().setUp()
+        region = Region.objects.create(nom='Centre', code='CE')
+        self.commune = Commune.objects.create(
+            nom='Test Commune', slug='test-commune',
+            departement=Departement.objects.create(region=region, nom='Mfoundi', code='MF'),
+            statut=Commune.Statut.ACTIVE,
+        )
+        self.client = APIClient()
+
+    def _signaler(self, photo, **donnees):
+        donnees = {
+            'commune': self.commune.pk, 'titre': 'Nid de poule', 'description': 'Chaussée dégradée',
+            'photo': SimpleUploadedFile('IMG_0001.jpg', photo, 'image/jpeg'), **donnees,
+        }
+        return self.client.post('/api/v1/signalements/', donnees, format='multipart')
+
+    def test_reduction_sans_exif(self):
+        """Test la photo est réduite, redressée et réencodée en WebP sans EXIF"""
+        fichier = SimpleUploadedFile('IMG_0001.jpg', photo_test(4000, 3000, self.GPS_YAOUNDE, orientation=6))
+        with override_settings(PHOTOS_COTE_MAX=1600):
+            photo, gps = photos.reduire(fichier)
+
+        image = Image.open(photo)
+        self.assertEqual(photo.name, 'IMG_0001.webp')
+        self.assertEqual(image.format, 'WEBP')
+        # Orientation 6 : image tournée d'un quart de tour
+        self.assertEqual(image.size, (1200, 1600))
+        self.assertEqual(len(image.getexif()), 0)
+        self.assertNotIn('exif', image.info)
+        self.assertEqual(gps, (Decimal('3.870000'), Decimal('11.517667')))
+
+    def test_coordonnees_gps(self):
+        """Test hémisphères sud / ouest, position absente ou nulle"""
+        def exif(gps=None):
+            return Image.open(io.BytesIO(photo_test(10, 10, gps))).getexif()
+
+        self.assertEqual(
+            photos.coordonnees_gps(exif({1: 'S', 2: (4.0, 3.0, 0.0), 3: 'W', 4: (9.0, 42.0, 0.0)})),
+            (Decimal('-4.050000'), Decimal('-9.700000'))
+        )
+        self.assertIsNone(photos.coordonnees_gps(exif()))
+        self.assertIsNone(photos.coordonnees_gps(exif({1: 'N', 2: (0.0, 0.0, 0.0), 3: 'E', 4: (0.0, 0.0, 0.0)})))
+
+    def test_petite_photo_non_agrandie(self):
+        """Test une photo plus petite que PHOTOS_COTE_MAX garde sa taille"""
+        photo, gps = photos.reduire(SimpleUploadedFile('petite.png', image_test(300, 200, 'PNG', 'RGBA')))
+        image = Image.open(photo)
+        self.assertEqual((image.format, image.size, image.mode), ('WEBP', (300, 200), 'RGBA'))
+        self.assertIsNone(gps)
+
+    def test_signalement_anonyme_position_reprise(self):
+        """Test création anonyme : photo réduite, position GPS reprise"""
+        response = self._signaler(photo_test(3000, 2000, self.GPS_YAOUNDE))
+        self.assertEqual(response.status_code, 201)
+
+        signalement = Signalement.objects.get()
+        self.assertTrue(signalement.photo.name.endswith('.webp'))
+        self.assertEqual((signalement.latitude, signalement.longitude), (Decimal('3.870000'), Decimal('11.517667')))
+        with signalement.photo.open('rb') as fichier:
+            image = Image.open(fichier)
+            self.assertEqual(max(image.size), photos.cote_max())
+            self.assertEqual(len(image.getexif()), 0)
+
+    def test_position_saisie_conservee(self):
+        """Test la position saisie par le citoyen n'est pas remplacée"""
+        response = self._signaler(photo_test(800, 600, self.GPS_YAOUNDE), latitude='4.051000', longitude='9.767000')
+        self.assertEqual(response.status_code, 201)
+        signalement = Signalement.objects.get()
+        self.assertEqual((signalement.latitude, signalement.longitude), (Decimal('4.051000'), Decimal('9.767000')))
+
+    def test_photo_refusee(self):
+        """Test photo trop lourde, trop grande ou illisible refusée"""
+        with override_settings(PHOTOS_TAILLE_MAX=1000):
+            self.assertEqual(self._signaler(photo_test(800, 600)).status_code, 400)
+        with override_settings(PHOTOS_PIXELS_MAX=100_000):
+            self.assertEqual(self._signaler(photo_test(800, 600)).status_code, 400)
+        self.assertEqual(self._signaler(b'pas une image').status_code, 400)
+        self.assertFalse(Signalement.objects.exists())
+
+    def test_reception_saturee(self):
+        """Test 503 quand tous les créneaux de décodage sont occupés"""
+        creneaux = photos._semaphore()
+        occupes = 0
+        while creneaux.acquire(blocking=False):
+            occupes += 1
+        try:
+            with override_settings(PHOTOS_ATTENTE=0.01):
+                response = self._signaler(photo_test(800, 600))
+        finally:
+            for _ in range(occupes):
+                creneaux.release()
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(Signalement.objects.exists())
@@ -0,0 +1,23 @@
+"""Recherche - Administration Django"""
+from django.contrib import admin
+
+from .models import SearchDocument, SearchStats
+
+
+@admin.register(SearchDocument)
+class SearchDocumentAdmin(admin.ModelAdmin):
+    """Admin (lecture seule) des documents indexés"""
+    list_display = ['titre', 'type', 'commune', 'longueur', 'date', 'date_indexation']
+    list_filter = ['type', 'commune']
+    search_fields = ['titre']
+    readonly_fields = [f.name for f in SearchDocument._meta.fields]
+    
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(SearchStats)
+class SearchStatsAdmin(admin.ModelAdmin):
+    """Admin des statistiques de l'index"""
+    list_display = ['nombre_documents', 'longueur_totale']
+    readonly_fields = ['nombre_documents', 'longueur_totale']
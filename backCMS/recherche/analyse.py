@@ -0,0 +1,75 @@
+"""
+Recherche - Analyse du texte
+Normalisation, suppression des accents, mots vides et racinisation (français)
+"""
+import html
+import re
+import unicodedata
+
+
+BALISE_HTML = re.compile(r'<[^>]+>')
+MOT = re.compile(r'[a-z0-9]+')
+
+# Mots vides français (et quelques mots anglais courants)
+MOTS_VIDES = frozenset('''
+    a ai au aux avec ce ces dans de des du elle en et eux il ils je la le les
+    leur leurs lui ma mais me meme mes moi mon ne nos notre nous on ou par pas
+    pour qu que qui sa se ses son sur ta te tes toi ton tu un une vos votre vous
+    c d j l m n s t y ete etre est sont ont avoir fait comme plus tout tous
+    cette cet si sans sous entre vers chez ainsi donc or ni car
+    the of and to in is for on with at by an be this that from
+'''.split())
+
+# Suffixes retirés par la racinisation, du plus long au plus court
+SUFFIXES = (
+    'issements', 'issement', 'atrices', 'ateurs', 'ations', 'ements',
+    'atrice', 'ateur', 'ation', 'ement', 'ances', 'ences', 'ables', 'ismes',
+    'istes', 'euses', 'ance', 'ence', 'able', 'isme', 'iste', 'euse', 'ites',
+    'ives', 'ions', 'ite', 'ive', 'eux', 'ifs', 'ees', 'if', 'ee', 'es', 'er',
+    'ez', 'e',
+)
+
+LONGUEUR_RACINE_MIN = 3
+
+
+def normaliser(texte):
+    """Met en minuscules, retire le HTML et les accents"""
+    if not texte:
+        return ''
+    texte = html.unescape(BALISE_HTML.sub(' ', str(texte)))
+    texte = unicodedata.normalize('NFKD', texte.lower())
+    return ''.join(c for c in texte if not unicodedata.combining(c))
+
+
+def raciniser(mot):
+    """
+    Racinisation légère du français (pluriels et suffixes fréquents).
+    Ex: marchés -> march, inauguration -> inaugur
+    """
+    if len(mot) <= LONGUEUR_RACINE_MIN or mot.isdigit():
+        return mot
+
+    if mot.endswith('aux') and len(mot) > 4:
+        mot = mot[:-3] + 'al'
+    elif mot.endswith(('s', 'x')):
+        mot = mot[:-1]
+
+    for suffixe in SUFFIXES:
+        if mot.endswith(suffixe) and len(mot) - len(suffixe) >= LONGUEUR_RACINE_MIN:
+            mot = mot[:-len(suffixe)]
+            break
+
+    # Consonne finale doublée (ex: "personn" -> "person")
+    if len(mot) > LONGUEUR_RACINE_MIN and mot[-1] == mot[-2] and mot[-1] not in 'aeiouy':
+        mot = mot[:-1]
+
+    return mot
+
+
+def analyser(texte):
+    """Retourne la liste des termes indexables d'un texte"""
+    return [
+        raciniser(mot)
+        for mot in MOT.findall(normaliser(texte))
+        if len(mot) > 1 and mot not in MOTS_VIDES
+    ]
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class RechercheConfig(AppConfig):
+    name = 'recherche'
+
+    def ready(self):
+        from . import signals
+        signals.connecter()
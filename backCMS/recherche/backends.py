@@ -0,0 +1,324 @@
+"""
+Recherche - Backends plein texte
+- python     : index inversé en tables (SearchPosting) + BM25 calculé en Python
+- postgresql : colonne tsvector (index GIN) + SearchRank
+- sqlite     : table virtuelle FTS5 synchronisée par triggers + bm25()
+
+Le backend est choisi par le setting RECHERCHE_BACKEND ('auto' par défaut).
+Changer de backend nécessite de reconstruire l'index (reindexer_recherche).
+"""
+import heapq
+import math
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, F, FloatField, Q, Value
+from django.db.models.functions import Cast
+from django.db.models.expressions import RawSQL
+
+from .analyse import analyser, normaliser
+from .models import SearchDocument, SearchPosting, SearchStats
+
+
+# Table virtuelle FTS5 (SQLite), créée par la migration 0002
+TABLE_FTS = 'recherche_fts'
+
+# Poids des colonnes (titre, contenu) pour le classement
+POIDS_TITRE = 3.0
+POIDS_CONTENU = 1.0
+
+
+class BaseBackend:
+    """Interface commune des backends de recherche"""
+    nom = None
+
+    def indexer(self, document, frequences):
+        """Appelé après l'enregistrement d'un SearchDocument"""
+
+    def indexer_lot(self, documents_frequences):
+        """Indexe une liste de (document, frequences) ; par défaut document par document"""
+        for document, frequences in documents_frequences:
+            self.indexer(document, frequences)
+
+    def classer(self, requete, commune_id=None, types=None, limit=20, apres=None):
+        """
+        Retourne [(document_id, score), ...] triés par score décroissant puis id.
+        apres=(score, document_id) reprend le classement après cette position (curseur).
+        """
+        raise NotImplementedError
+
+    def correspondances(self, requete, types=None):
+        """
+        QuerySet des SearchDocument correspondant à la requête (mêmes
+        correspondances que classer(), sans classement ni limite)
+        """
+        raise NotImplementedError
+
+    def filtrer_queryset(self, queryset, search_fields, requete, identifiants=()):
+        """
+        Recherche sur un queryset arbitraire (search_fields d'un ViewSet) ;
+        `identifiants` : champs cherchés par sous-chaîne (numéro de suivi...).
+        Retourne None pour laisser le SearchFilter classique s'appliquer.
+        """
+        return None
+
+
+class PythonBackend(BaseBackend):
+    """Index inversé en base + BM25 calculé en Python"""
+    nom = 'python'
+
+    # Paramètres BM25 classiques
+    K1 = 1.2
+    B = 0.75
+
+    def indexer(self, document, frequences):
+        SearchPosting.objects.filter(document=document).delete()
+        SearchPosting.objects.bulk_create([
+            SearchPosting(
+                terme=terme,
+                document=document,
+                frequence=frequence,
+                type=document.type,
+                commune_id=document.commune_id,
+                longueur_document=document.longueur,
+            )
+            for terme, frequence in frequences.items()
+        ])
+
+    def indexer_lot(self, documents_frequences):
+        SearchPosting.objects.filter(
+            document__in=[document for document, _ in documents_frequences]
+        ).delete()
+        SearchPosting.objects.bulk_create([
+            SearchPosting(
+                terme=terme,
+                document=document,
+                frequence=frequence,
+                type=document.type,
+                commune_id=document.commune_id,
+                longueur_document=document.longueur,
+            )
+            for document, frequences in documents_frequences
+            for terme, frequence in frequences.items()
+        ], batch_size=1000)
+
+    @staticmethod
+    def idf(nombre_documents, frequence_documents):
+        return math.log(1 + (nombre_documents - frequence_documents + 0.5) / (frequence_documents + 0.5))
+
+    def scorer(self, termes, commune_id=None, types=None):
+        """
+        Calcule les scores BM25 des documents contenant au moins un des termes.
+        Le coût dépend du nombre de postings des termes, pas de la taille du corpus.
+        """
+        if not termes:
+            return {}
+
+        stats = SearchStats.get_instance()
+        nombre_documents = max(stats.nombre_documents, 1)
+        longueur_moyenne = stats.longueur_moyenne or 1
+
+        frequences_documents = dict(
+            SearchPosting.objects.filter(terme__in=termes)
+            .values_list('terme')
+            .annotate(n=Count('id'))
+        )
+        idf = {terme: self.idf(nombre_documents, n) for terme, n in frequences_documents.items()}
+
+        postings = SearchPosting.objects.filter(terme__in=idf.keys())
+        if commune_id is not None:
+            postings = postings.filter(commune_id=commune_id)
+        if types:
+            postings = postings.filter(type__in=types)
+
+        scores = defaultdict(float)
+        for terme, document_id, frequence, longueur in postings.values_list(
+            'terme', 'document_id', 'frequence', 'longueur_document'
+        ).iterator():
+            normalisation = self.K1 * (1 - self.B + self.B * longueur / longueur_moyenne)
+            scores[document_id] += idf[terme] * frequence * (self.K1 + 1) / (frequence + normalisation)
+        return scores
+
+    def classer(self, requete, commune_id=None, types=None, limit=20, apres=None):
+        termes = sorted(set(analyser(requete)))
+        scores = self.scorer(termes, commune_id=commune_id, types=types).items()
+        if apres is not None:
+            score_max, id_min = apres
+            scores = [
+                (document_id, score) for document_id, score in scores
+                if score < score_max or (score == score_max and document_id > id_min)
+            ]
+        return heapq.nlargest(limit, scores, key=lambda item: (item[1], -item[0]))
+
+    def correspondances(self, requete, types=None):
+        postings = SearchPosting.objects.filter(terme__in=set(analyser(requete)))
+        if types:
+            postings = postings.filter(type__in=types)
+        return SearchDocument.objects.filter(id__in=postings.values('document_id'))
+
+
+class PostgresBackend(BaseBackend):
+    """
+    Recherche native PostgreSQL : tsvector + index GIN + SearchRank.
+    Requête et textes sont comparés sans accents : normaliser() pour la
+    requête et les SearchDocument, unaccent() (extension créée par la
+    migration 0004) pour les colonnes des ViewSets. Le vecteur des ViewSets
+    est calculé à la volée, sans index : les champs identifiants
+    (search_identifiants) gardent une recherche par sous-chaîne.
+    """
+    nom = 'postgresql'
+    config = 'french'
+
+    def indexer(self, document, frequences):
+        from django.contrib.postgres.search import SearchVector
+        SearchDocument.objects.filter(pk=document.pk).update(
+            vecteur=(
+                SearchVector(Value(normaliser(document.titre)), weight='A', config=self.config)
+                + SearchVector(F('contenu'), weight='B', config=self.config)
+            )
+        )
+
+    def _requete(self, requete):
+        """SearchQuery des termes normalisés (sans accents), combinés en OU ; None sans terme"""
+        from django.contrib.postgres.search import SearchQuery
+        mots = [mot for mot in normaliser(requete).split() if mot]
+        if not mots:
+            return None
+        return reduce(or_, [SearchQuery(mot, config=self.config) for mot in mots])
+
+    def classer(self, requete, commune_id=None, types=None, limit=20, apres=None):
+        from django.contrib.postgres.search import SearchRank
+        query = self._requete(requete)
+        if query is None:
+            return []
+        documents = SearchDocument.objects.filter(vecteur=query)
+        if commune_id is not None:
+            documents = documents.filter(commune_id=commune_id)
+        if types:
+            documents = documents.filter(type__in=types)
+        # SearchRank est un real (float4) : converti en double precision pour que
+        # le score du curseur (float Python, via JSON) soit comparé à l'identique
+        documents = documents.annotate(rang=Cast(SearchRank(F('vecteur'), query), FloatField()))
+        if apres is not None:
+            score_max, id_min = apres
+            documents = documents.filter(Q(rang__lt=score_max) | Q(rang=score_max, id__gt=id_min))
+        return list(documents.order_by('-rang', 'id').values_list('id', 'rang')[:limit])
+
+    def correspondances(self, requete, types=None):
+        query = self._requete(requete)
+        if query is None:
+            return SearchDocument.objects.none()
+        documents = SearchDocument.objects.filter(vecteur=query)
+        if types:
+            documents = documents.filter(type__in=types)
+        return documents
+
+    def filtrer_queryset(self, queryset, search_fields, requete, identifiants=()):
+        from django.contrib.postgres.lookups import Unaccent
+        from django.contrib.postgres.search import SearchVector
+        conditions = [Q(**{f'{champ}__icontains': requete}) for champ in search_fields if champ in identifiants]
+        textes = [champ for champ in search_fields if champ not in identifiants]
+        query = self._requete(requete)
+        if textes and query is not None:
+            queryset = queryset.annotate(
+                recherche=SearchVector(*[Unaccent(champ) for champ in textes], config=self.config)
+            )
+            conditions.append(Q(recherche=query))
+        if not conditions:
+            return queryset.none()
+        return queryset.filter(reduce(or_, conditions))
+
+
+class SQLiteBackend(BaseBackend):
+    """Recherche native SQLite : table FTS5 synchronisée par triggers + bm25()"""
+    nom = 'sqlite'
+
+    @staticmethod
+    def expression_fts(requete):
+        """Construit une requête FTS5 : racines en préfixe, combinées en OU"""
+        racines = sorted(set(analyser(requete)))
+        return ' OR '.join(f'"{racine}"*' for racine in racines)
+
+    def classer(self, requete, commune_id=None, types=None, limit=20, apres=None):
+        expression = self.expression_fts(requete)
+        if not expression:
+            return []
+
+        conditions = [f'{TABLE_FTS} MATCH %s']
+        params = [expression]
+        if commune_id is not None:
+            conditions.append('d.commune_id = %s')
+            params.append(commune_id)
+        if types:
+            conditions.append(f"d.type IN ({', '.join(['%s'] * len(types))})")
+            params.extend(types)
+
+        sql = (
+            f'SELECT d.id, -bm25({TABLE_FTS}, {POIDS_TITRE}, {POIDS_CONTENU}) AS score '
+            f'FROM {TABLE_FTS} JOIN {SearchDocument._meta.db_table} d ON d.id = {TABLE_FTS}.rowid '
+            f"WHERE {' AND '.join(conditions)}"
+        )
+        if apres is not None:
+            sql = f'SELECT id, score FROM ({sql}) WHERE score < %s OR (score = %s AND id > %s)'
+            params.extend([apres[0], apres[0], apres[1]])
+        sql += ' ORDER BY score DESC, id LIMIT %s'
+        params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [(document_id, score) for document_id, score in cursor.fetchall()]
+
+    def correspondances(self, requete, types=None):
+        expression = self.expression_fts(requete)
+        if not expression:
+            return SearchDocument.objects.none()
+        documents = SearchDocument.objects.filter(
+            id__in=RawSQL(f'SELECT rowid FROM {TABLE_FTS} WHERE {TABLE_FTS} MATCH %s', [expression])
+        )
+        if types:
+            documents = documents.filter(type__in=types)
+        return documents
+
+    @staticmethod
+    def reconstruire():
+        """Reconstruit entièrement la table FTS depuis SearchDocument"""
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {TABLE_FTS}({TABLE_FTS}) VALUES('rebuild')")
+
+
+BACKENDS = {
+    PythonBackend.nom: PythonBackend,
+    PostgresBackend.nom: PostgresBackend,
+    SQLiteBackend.nom: SQLiteBackend,
+}
+
+_instances = {}
+
+
+def fts5_disponible():
+    """Vérifie que la table FTS5 a été créée par la migration"""
+    if 'fts5' not in _instances:
+        _instances['fts5'] = TABLE_FTS in connection.introspection.table_names()
+    return _instances['fts5']
+
+
+def nom_backend():
+    """Nom du backend actif selon RECHERCHE_BACKEND et la base de données"""
+    nom = getattr(settings, 'RECHERCHE_BACKEND', 'auto')
+    if nom != 'auto':
+        return nom
+    if connection.vendor == 'postgresql':
+        return PostgresBackend.nom
+    if connection.vendor == 'sqlite' and fts5_disponible():
+        return SQLiteBackend.nom
+    return PythonBackend.nom
+
+
+def get_backend():
+    """Retourne l'instance du backend de recherche actif"""
+    nom = nom_backend()
+    if nom not in _instances:
+        _instances[nom] = BACKENDS[nom]()
+    return _instances[nom]
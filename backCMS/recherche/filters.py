@@ -0,0 +1,40 @@
+"""
+Recherche - Filtre DRF passant par le backend de recherche
+"""
+from rest_framework import filters
+
+from .backends import get_backend
+from .indexation import type_pour_modele
+
+
+class RechercheFilter(filters.SearchFilter):
+    """
+    SearchFilter passant par le backend de recherche.
+    - Modèles indexés, requête publique : documents de l'index global
+      (mêmes correspondances que /recherche/), joints en base au queryset déjà
+      filtré (commune, type...) ; les résultats suivent l'ordre du ViewSet
+    - Sinon : recherche native du backend sur les search_fields
+      (ou icontains classique si le backend n'en propose pas) ; les champs de
+      `search_identifiants` de la vue (numéro de suivi, référence...) sont
+      cherchés par sous-chaîne
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        search_fields = self.get_search_fields(view, request)
+        requete = request.query_params.get(self.search_param, '').replace('\x00', '').strip()
+        if not search_fields or not requete:
+            return queryset
+
+        backend = get_backend()
+        config = type_pour_modele(queryset.model)
+        if config is not None and not request.user.is_authenticated:
+            # Sous-requête : toutes les correspondances, sans liste d'ids bornée
+            documents = backend.correspondances(requete, types=[config.type])
+            return queryset.filter(pk__in=documents.values('objet_id'))
+
+        champs = [champ.lstrip('^=@$') for champ in search_fields]
+        identifiants = getattr(view, 'search_identifiants', ())
+        resultat = backend.filtrer_queryset(queryset, champs, requete, identifiants=identifiants)
+        if resultat is None:
+            return super().filter_queryset(request, queryset, view)
+        return resultat
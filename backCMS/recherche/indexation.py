@@ -0,0 +1,357 @@
+"""
+Recherche - Indexation incrémentale
+Déclare les contenus indexables et maintient l'index inversé à jour
+"""
+from collections import Counter
+from dataclasses import dataclass, field
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from medias import extraction
+
+from . import suggestions
+from .analyse import BALISE_HTML, analyser, normaliser
+from .backends import get_backend
+from .models import SearchDocument, SearchStats
+
+
+LONGUEUR_EXTRAIT = 150
+
+
+@dataclass
+class TypeIndexable:
+    """Description d'un modèle indexé dans la recherche globale"""
+    type: str
+    modele: str
+    # Champs indexés et leur poids (le poids multiplie la fréquence du terme)
+    champs: dict = field(default_factory=dict)
+    champ_titre: str = 'titre'
+    champ_extrait: str = ''
+    champ_visible: str = ''
+    champ_date: str = 'date_creation'
+    url: str = ''
+    champ_url: str = 'slug'
+    # PDF dont le texte extrait (medias.extraction) est indexé avec le poids 1
+    champ_fichier: str = ''
+    # Champs lus par champ_date quand c'est une méthode
+    champs_date: tuple = ()
+
+    def get_modele(self):
+        return apps.get_model(self.modele)
+
+    def champs_lus(self):
+        """Champs du modèle dont dépend le document indexé (update_fields)"""
+        champs = set(self.champs) | {
+            self.champ_titre, self.champ_extrait, self.champ_visible, self.champ_date,
+            self.champ_url, self.champ_fichier, 'commune', 'commune_id',
+        } | set(self.champs_date)
+        champs.discard('')
+        return champs
+
+    def est_visible(self, instance):
+        return not self.champ_visible or bool(getattr(instance, self.champ_visible))
+
+    def get_date(self, instance):
+        valeur = getattr(instance, self.champ_date, None)
+        return valeur() if callable(valeur) else valeur
+
+    def get_url(self, instance):
+        return self.url.format(getattr(instance, self.champ_url))
+
+    def get_nom_fichier(self, instance):
+        return getattr(instance, self.champ_fichier).name or '' if self.champ_fichier else ''
+
+
+TYPES = {
+    SearchDocument.Type.ACTUALITE: TypeIndexable(
+        type=SearchDocument.Type.ACTUALITE,
+        modele='actualites.Actualite',
+        champs={'titre': 3, 'resume': 2, 'tags': 2, 'contenu': 1},
+        champ_extrait='resume',
+        champ_visible='est_publie',
+        champ_date='date_publication',
+        url='/api/v1/actualites/{}/',
+    ),
+    SearchDocument.Type.EVENEMENT: TypeIndexable(
+        type=SearchDocument.Type.EVENEMENT,
+        modele='evenements.Evenement',
+        champs={'nom': 3, 'lieu': 2, 'description': 1},
+        champ_titre='nom',
+        champ_extrait='description',
+        champ_visible='est_public',
+        champ_date='get_date_debut',
+        champs_date=('date', 'heure_debut'),
+        url='/api/v1/evenements/{}/',
+    ),
+    SearchDocument.Type.PAGE: TypeIndexable(
+        type=SearchDocument.Type.PAGE,
+        modele='actualites.PageCMS',
+        champs={'titre': 3, 'meta_description': 2, 'contenu': 1},
+        champ_extrait='contenu',
+        champ_visible='est_publie',
+        champ_date='date_modification',
+        url='/api/v1/pages/{}/',
+    ),
+    SearchDocument.Type.FAQ: TypeIndexable(
+        type=SearchDocument.Type.FAQ,
+        modele='actualites.FAQ',
+        champs={'question': 3, 'reponse': 1},
+        champ_titre='question',
+        champ_extrait='reponse',
+        champ_visible='est_active',
+        url='/api/v1/faqs/{}/',
+        champ_url='id',
+    ),
+    SearchDocument.Type.PROJET: TypeIndexable(
+        type=SearchDocument.Type.PROJET,
+        modele='transparence.Projet',
+        champs={'titre': 3, 'lieu': 2, 'description': 1},
+        champ_extrait='description',
+        champ_visible='est_public',
+        url='/api/v1/projets/{}/',
+    ),
+    SearchDocument.Type.DELIBERATION: TypeIndexable(
+        type=SearchDocument.Type.DELIBERATION,
+        modele='transparence.Deliberation',
+        champs={'titre': 3, 'numero': 3, 'resume': 2},
+        champ_extrait='resume',
+        champ_visible='est_publie',
+        url='/api/v1/deliberations/{}/',
+        champ_url='id',
+        champ_fichier='fichier',
+    ),
+    SearchDocument.Type.DOCUMENT_BUDGETAIRE: TypeIndexable(
+        type=SearchDocument.Type.DOCUMENT_BUDGETAIRE,
+        modele='transparence.DocumentBudgetaire',
+        champs={'titre': 3, 'description': 2},
+        champ_extrait='description',
+        champ_visible='est_publie',
+        url='/api/v1/documents-budgetaires/{}/',
+        champ_url='id',
+        champ_fichier='fichier',
+    ),
+    SearchDocument.Type.DOCUMENT_OFFICIEL: TypeIndexable(
+        type=SearchDocument.Type.DOCUMENT_OFFICIEL,
+        modele='transparence.DocumentOfficiel',
+        champs={'titre': 3, 'numero_reference': 2, 'description': 2},
+        champ_extrait='description',
+        champ_visible='est_public',
+        url='/api/v1/documents-officiels/{}/',
+        champ_url='id',
+        champ_fichier='fichier',
+    ),
+}
+
+
+def type_pour_modele(modele):
+    """Retourne la configuration d'indexation d'une classe de modèle (ou None)"""
+    label = modele._meta.label
+    for config in TYPES.values():
+        if config.modele == label:
+            return config
+    return None
+
+
+def calculer_frequences(config, instance, texte_fichier=''):
+    """Fréquences pondérées des termes d'une instance (et du texte de son PDF)"""
+    frequences = Counter()
+    for nom_champ, poids in config.champs.items():
+        for terme in analyser(getattr(instance, nom_champ, '')):
+            frequences[terme[:64]] += poids
+    for terme in analyser(texte_fichier):
+        frequences[terme[:64]] += 1
+    return frequences
+
+
+def _contenu(config, instance, texte_fichier=''):
+    """Texte normalisé des champs indexés, hors titre"""
+    parties = [
+        normaliser(getattr(instance, nom_champ, ''))
+        for nom_champ in config.champs
+        if nom_champ != config.champ_titre
+    ]
+    if texte_fichier:
+        parties.append(normaliser(texte_fichier))
+    return ' '.join(parties)
+
+
+def _extrait(config, instance):
+    texte = getattr(instance, config.champ_extrait, '') or ''
+    return BALISE_HTML.sub(' ', texte).strip()[:LONGUEUR_EXTRAIT]
+
+
+@transaction.atomic
+def indexer(instance, config=None):
+    """
+    Indexe (ou réindexe) une instance.
+    Une instance non visible est retirée de l'index.
+    """
+    config = config or type_pour_modele(type(instance))
+    if config is None:
+        return None
+
+    if not config.est_visible(instance):
+        desindexer(instance, config)
+        return None
+
+    nom_fichier = config.get_nom_fichier(instance)
+    texte_fichier = extraction.textes([nom_fichier]).get(nom_fichier, '') if nom_fichier else ''
+    frequences = calculer_frequences(config, instance, texte_fichier)
+    longueur = sum(frequences.values())
+
+    document = SearchDocument.objects.filter(type=config.type, objet_id=instance.pk).first()
+    ancienne_longueur = document.longueur if document else 0
+    est_nouveau = document is None
+
+    if est_nouveau:
+        document = SearchDocument(type=config.type, objet_id=instance.pk)
+    document.commune_id = getattr(instance, 'commune_id', None)
+    document.titre = str(getattr(instance, config.champ_titre, ''))[:500]
+    document.extrait = _extrait(config, instance)
+    document.contenu = _contenu(config, instance, texte_fichier)
+    document.url = config.get_url(instance)
+    document.date = config.get_date(instance)
+    document.longueur = longueur
+    document.save()
+
+    get_backend().indexer(document, frequences)
+
+    SearchStats.get_instance()
+    SearchStats.objects.filter(pk=1).update(
+        nombre_documents=F('nombre_documents') + (1 if est_nouveau else 0),
+        longueur_totale=F('longueur_totale') + longueur - ancienne_longueur,
+    )
+    return document
+
+
+@transaction.atomic
+def indexer_lot(instances, config=None):
+    """
+    Indexe une liste d'instances d'un même modèle en quelques requêtes
+    (chargement des documents existants, bulk_create / bulk_update, postings
+    en lot). Pour les écritures faites sans post_save (bulk_create...).
+    """
+    if not instances:
+        return []
+    config = config or type_pour_modele(type(instances[0]))
+    if config is None:
+        return []
+
+    existants = {
+        document.objet_id: document
+        for document in SearchDocument.objects.filter(
+            type=config.type, objet_id__in=[instance.pk for instance in instances]
+        )
+    }
+
+    invisibles = [
+        existants.pop(instance.pk) for instance in instances
+        if not config.est_visible(instance) and instance.pk in existants
+    ]
+    delta_documents = -len(invisibles)
+    delta_longueur = -sum(document.longueur for document in invisibles)
+    for document in invisibles:
+        document.delete()
+
+    textes_fichiers = extraction.textes([config.get_nom_fichier(instance) for instance in instances])
+    nouveaux, modifies, documents_frequences = [], [], []
+    for instance in instances:
+        if not config.est_visible(instance):
+            continue
+        texte_fichier = textes_fichiers.get(config.get_nom_fichier(instance), '')
+        frequences = calculer_frequences(config, instance, texte_fichier)
+        document = existants.get(instance.pk)
+        if document is None:
+            document = SearchDocument(type=config.type, objet_id=instance.pk, longueur=0)
+            nouveaux.append(document)
+        else:
+            modifies.append(document)
+        delta_longueur -= document.longueur
+        document.commune_id = getattr(instance, 'commune_id', None)
+        document.titre = str(getattr(instance, config.champ_titre, ''))[:500]
+        document.extrait = _extrait(config, instance)
+        document.contenu = _contenu(config, instance, texte_fichier)
+        document.url = config.get_url(instance)
+        document.date = config.get_date(instance)
+        document.longueur = sum(frequences.values())
+        delta_longueur += document.longueur
+        documents_frequences.append((document, frequences))
+
+    SearchDocument.objects.bulk_create(nouveaux, batch_size=500)
+    SearchDocument.objects.bulk_update(
+        modifies, ['commune_id', 'titre', 'extrait', 'contenu', 'url', 'date', 'longueur'], batch_size=500
+    )
+    delta_documents += len(nouveaux)
+    get_backend().indexer_lot(documents_frequences)
+
+    SearchStats.get_instance()
+    SearchStats.objects.filter(pk=1).update(
+        nombre_documents=F('nombre_documents') + delta_documents,
+        longueur_totale=F('longueur_totale') + delta_longueur,
+    )
+    # bulk_create / bulk_update n'émettent pas post_save
+    suggestions.documents_enregistres([document for document, _ in documents_frequences])
+    return [document for document, _ in documents_frequences]
+
+
+@transaction.atomic
+def desindexer(instance, config=None):
+    """Retire une instance de l'index"""
+    config = config or type_pour_modele(type(instance))
+    if config is None:
+        return
+
+    document = SearchDocument.objects.filter(type=config.type, objet_id=instance.pk).first()
+    if document is None:
+        return
+
+    longueur = document.longueur
+    document.delete()
+    SearchStats.objects.filter(pk=1).update(
+        nombre_documents=F('nombre_documents') - 1,
+        longueur_totale=F('longueur_totale') - longueur,
+    )
+
+
+def vider():
+    """Supprime tout l'index (documents, postings, statistiques)"""
+    with transaction.atomic():
+        SearchDocument.objects.all().delete()
+        SearchStats.objects.update(nombre_documents=0, longueur_totale=0)
+
+
+def recalculer_stats():
+    """Recalcule les statistiques du corpus depuis les documents indexés"""
+    totaux = SearchDocument.objects.aggregate(n=Count('id'), longueur=Sum('longueur'))
+    SearchStats.get_instance()
+    SearchStats.objects.filter(pk=1).update(
+        nombre_documents=totaux['n'],
+        longueur_totale=totaux['longueur'] or 0,
+    )
+
+
+def reindexer(types=None, taille_lot=500, stdout=None):
+    """
+    Reconstruit l'index pour les types donnés (tous par défaut).
+    Parcours par lots (pagination sur la clé primaire), un indexer_lot par lot.
+    """
+    total = 0
+    for type_contenu, config in TYPES.items():
+        if types and type_contenu not in types:
+            continue
+        queryset = config.get_modele().objects.order_by('pk')
+        dernier_pk = None
+        while True:
+            lot = queryset.filter(pk__gt=dernier_pk) if dernier_pk is not None else queryset
+            lot = list(lot[:taille_lot])
+            if not lot:
+                break
+            indexer_lot(lot, config)
+            total += len(lot)
+            dernier_pk = lot[-1].pk
+            if stdout:
+                stdout.write(f'  {type_contenu}: {total} objet(s) traité(s)')
+    recalculer_stats()
+    return total
@@ -0,0 +1,52 @@
+"""
+Commande pour reconstruire l'index de la recherche globale
+"""
+from django.core.management.base import BaseCommand
+
+from recherche.backends import SQLiteBackend, get_backend
+from recherche.indexation import TYPES, reindexer, vider
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index de recherche globale (actualités, événements, pages, FAQ, projets, délibérations, documents)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--type',
+            action='append',
+            choices=list(TYPES.keys()),
+            help='Type de contenu à réindexer (répétable, tous par défaut)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=500,
+            help='Nombre d\'objets indexés par transaction (défaut: 500)',
+        )
+        parser.add_argument(
+            '--vider',
+            action='store_true',
+            help='Supprime tout l\'index avant la reconstruction',
+        )
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        self.stdout.write(self.style.NOTICE(
+            f'🔎 Reconstruction de l\'index de recherche (backend: {backend.nom})...'
+        ))
+
+        if options['vider']:
+            vider()
+            self.stdout.write('  🗑️  Index vidé')
+
+        total = reindexer(
+            types=options['type'],
+            taille_lot=max(options['chunk_size'], 1),
+            stdout=self.stdout,
+        )
+
+        if isinstance(backend, SQLiteBackend):
+            backend.reconstruire()
+            self.stdout.write('  Table FTS5 reconstruite')
+
+        self.stdout.write(self.style.SUCCESS(f'✅ {total} objet(s) indexé(s)'))
@@ -0,0 +1,65 @@
+# Generated by Django 4.2.30 on 2026-10-19 11:32
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('communes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(choices=[('actualite', 'Actualité'), ('evenement', 'Événement'), ('page', 'Page CMS'), ('faq', 'FAQ'), ('projet', 'Projet')], max_length=20, verbose_name='Type')),
+                ('objet_id', models.PositiveBigIntegerField(verbose_name='ID objet')),
+                ('titre', models.CharField(max_length=500, verbose_name='Titre')),
+                ('extrait', models.TextField(blank=True, verbose_name='Extrait')),
+                ('url', models.CharField(max_length=500, verbose_name='URL')),
+                ('date', models.DateTimeField(blank=True, null=True, verbose_name='Date')),
+                ('longueur', models.PositiveIntegerField(default=0, verbose_name='Nombre de termes')),
+                ('date_indexation', models.DateTimeField(auto_now=True, verbose_name='Date indexation')),
+                ('commune', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='documents_recherche', to='communes.commune')),
+            ],
+            options={
+                'verbose_name': 'Document indexé',
+                'verbose_name_plural': 'Documents indexés',
+                'unique_together': {('type', 'objet_id')},
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre_documents', models.PositiveIntegerField(default=0, verbose_name='Nombre de documents')),
+                ('longueur_totale', models.PositiveBigIntegerField(default=0, verbose_name='Longueur totale')),
+            ],
+            options={
+                'verbose_name': 'Statistiques de l index',
+                'verbose_name_plural': 'Statistiques de l index',
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('terme', models.CharField(max_length=64, verbose_name='Terme')),
+                ('frequence', models.PositiveIntegerField(default=1, verbose_name='Fréquence')),
+                ('type', models.CharField(choices=[('actualite', 'Actualité'), ('evenement', 'Événement'), ('page', 'Page CMS'), ('faq', 'FAQ'), ('projet', 'Projet')], max_length=20, verbose_name='Type')),
+                ('commune_id', models.BigIntegerField(blank=True, null=True, verbose_name='ID commune')),
+                ('longueur_document', models.PositiveIntegerField(default=0, verbose_name='Longueur document')),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='postings', to='recherche.searchdocument')),
+            ],
+            options={
+                'verbose_name': 'Posting',
+                'verbose_name_plural': 'Postings',
+                'indexes': [models.Index(fields=['terme', 'type'], name='recherche_terme_type_idx'), models.Index(fields=['terme', 'commune_id'], name='recherche_terme_commune_idx')],
+            },
+        ),
+    ]
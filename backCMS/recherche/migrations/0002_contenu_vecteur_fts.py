@@ -0,0 +1,90 @@
+# Generated by Django 4.2.30 on 2026-10-19 11:38
+
+import django.contrib.postgres.search
+from django.db import OperationalError, migrations, models
+
+
+# Index plein texte natif selon la base de données :
+# - PostgreSQL : index GIN sur la colonne tsvector
+# - SQLite : table virtuelle FTS5 (contenu externe) synchronisée par triggers
+SQL_FTS5 = [
+    """
+    CREATE VIRTUAL TABLE recherche_fts USING fts5(
+        titre, contenu,
+        content='recherche_searchdocument', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER recherche_fts_ai AFTER INSERT ON recherche_searchdocument BEGIN
+        INSERT INTO recherche_fts(rowid, titre, contenu) VALUES (new.id, new.titre, new.contenu);
+    END
+    """,
+    """
+    CREATE TRIGGER recherche_fts_ad AFTER DELETE ON recherche_searchdocument BEGIN
+        INSERT INTO recherche_fts(recherche_fts, rowid, titre, contenu)
+        VALUES ('delete', old.id, old.titre, old.contenu);
+    END
+    """,
+    """
+    CREATE TRIGGER recherche_fts_au AFTER UPDATE ON recherche_searchdocument BEGIN
+        INSERT INTO recherche_fts(recherche_fts, rowid, titre, contenu)
+        VALUES ('delete', old.id, old.titre, old.contenu);
+        INSERT INTO recherche_fts(rowid, titre, contenu) VALUES (new.id, new.titre, new.contenu);
+    END
+    """,
+    "INSERT INTO recherche_fts(recherche_fts) VALUES ('rebuild')",
+]
+
+SQL_FTS5_SUPPRESSION = [
+    'DROP TRIGGER IF EXISTS recherche_fts_ai',
+    'DROP TRIGGER IF EXISTS recherche_fts_ad',
+    'DROP TRIGGER IF EXISTS recherche_fts_au',
+    'DROP TABLE IF EXISTS recherche_fts',
+]
+
+
+def creer_index_natif(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX recherche_vecteur_gin ON recherche_searchdocument USING gin (vecteur)'
+        )
+    elif vendor == 'sqlite':
+        try:
+            for sql in SQL_FTS5:
+                schema_editor.execute(sql)
+        except OperationalError:
+            # SQLite compilé sans FTS5 : le backend Python sera utilisé
+            for sql in SQL_FTS5_SUPPRESSION:
+                schema_editor.execute(sql)
+
+
+def supprimer_index_natif(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS recherche_vecteur_gin')
+    elif vendor == 'sqlite':
+        for sql in SQL_FTS5_SUPPRESSION:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recherche', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='searchdocument',
+            name='contenu',
+            field=models.TextField(blank=True, verbose_name='Contenu indexé'),
+        ),
+        migrations.AddField(
+            model_name='searchdocument',
+            name='vecteur',
+            field=django.contrib.postgres.search.SearchVectorField(blank=True, null=True, verbose_name='Vecteur de recherche'),
+        ),
+        migrations.RunPython(creer_index_natif, supprimer_index_natif),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recherche', '0002_contenu_vecteur_fts'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='searchdocument',
+            name='type',
+            field=models.CharField(choices=[('actualite', 'Actualité'), ('evenement', 'Événement'), ('page', 'Page CMS'), ('faq', 'FAQ'), ('projet', 'Projet'), ('deliberation', 'Délibération'), ('document_budgetaire', 'Document budgétaire'), ('document_officiel', 'Document officiel')], max_length=20, verbose_name='Type'),
+        ),
+        migrations.AlterField(
+            model_name='searchposting',
+            name='type',
+            field=models.CharField(choices=[('actualite', 'Actualité'), ('evenement', 'Événement'), ('page', 'Page CMS'), ('faq', 'FAQ'), ('projet', 'Projet'), ('deliberation', 'Délibération'), ('document_budgetaire', 'Document budgétaire'), ('document_officiel', 'Document officiel')], max_length=20, verbose_name='Type'),
+        ),
+    ]
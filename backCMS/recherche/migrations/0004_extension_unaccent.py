@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+# Recherche des ViewSets (PostgresBackend.filtrer_queryset) : colonnes
+# comparées sans accents, comme la requête normalisée
+def creer_extension(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS unaccent')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recherche', '0003_types_documents'),
+    ]
+
+    operations = [
+        migrations.RunPython(creer_extension, migrations.RunPython.noop),
+    ]
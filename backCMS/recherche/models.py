@@ -0,0 +1,104 @@
+"""
+Recherche - Index inversé du contenu public
+"""
+from django.contrib.postgres.search import SearchVectorField
+from django.db import models
+
+
+class SearchDocument(models.Model):
+    """Document indexé (une actualité, un événement, une page, une FAQ, un projet, un PDF...)"""
+
+    class Type(models.TextChoices):
+        ACTUALITE = 'actualite', 'Actualité'
+        EVENEMENT = 'evenement', 'Événement'
+        PAGE = 'page', 'Page CMS'
+        FAQ = 'faq', 'FAQ'
+        PROJET = 'projet', 'Projet'
+        DELIBERATION = 'deliberation', 'Délibération'
+        DOCUMENT_BUDGETAIRE = 'document_budgetaire', 'Document budgétaire'
+        DOCUMENT_OFFICIEL = 'document_officiel', 'Document officiel'
+
+    type = models.CharField('Type', max_length=20, choices=Type.choices)
+    objet_id = models.PositiveBigIntegerField('ID objet')
+    commune = models.ForeignKey(
+        'communes.Commune',
+        on_delete=models.CASCADE,
+        null=True, blank=True,
+        related_name='documents_recherche'
+    )
+
+    titre = models.CharField('Titre', max_length=500)
+    extrait = models.TextField('Extrait', blank=True)
+    url = models.CharField('URL', max_length=500)
+    date = models.DateTimeField('Date', null=True, blank=True)
+
+    # Texte normalisé (hors titre) pour les backends natifs (FTS5, tsvector)
+    contenu = models.TextField('Contenu indexé', blank=True)
+    # Utilisé uniquement sur PostgreSQL (index GIN créé par la migration 0002)
+    vecteur = SearchVectorField('Vecteur de recherche', null=True, blank=True)
+
+    longueur = models.PositiveIntegerField('Nombre de termes', default=0)
+    date_indexation = models.DateTimeField('Date indexation', auto_now=True)
+
+    # Sur SQLite, la table FTS5 recherche_fts est synchronisée par des triggers
+    # (migration 0002) : une migration qui reconstruit cette table doit les recréer.
+
+    class Meta:
+        verbose_name = 'Document indexé'
+        verbose_name_plural = 'Documents indexés'
+        unique_together = ['type', 'objet_id']
+
+    def __str__(self):
+        return f"{self.get_type_display()} #{self.objet_id} - {self.titre}"
+
+
+class SearchPosting(models.Model):
+    """
+    Entrée de l'index inversé : un terme présent dans un document.
+    Le type, la commune et la longueur du document sont dénormalisés
+    pour filtrer et scorer sans jointure.
+    """
+
+    terme = models.CharField('Terme', max_length=64)
+    document = models.ForeignKey(SearchDocument, on_delete=models.CASCADE, related_name='postings')
+    frequence = models.PositiveIntegerField('Fréquence', default=1)
+
+    type = models.CharField('Type', max_length=20, choices=SearchDocument.Type.choices)
+    commune_id = models.BigIntegerField('ID commune', null=True, blank=True)
+    longueur_document = models.PositiveIntegerField('Longueur document', default=0)
+
+    class Meta:
+        verbose_name = 'Posting'
+        verbose_name_plural = 'Postings'
+        indexes = [
+            models.Index(fields=['terme', 'type'], name='recherche_terme_type_idx'),
+            models.Index(fields=['terme', 'commune_id'], name='recherche_terme_commune_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.terme} -> {self.document_id} ({self.frequence})"
+
+
+class SearchStats(models.Model):
+    """Statistiques globales du corpus (singleton) utilisées par BM25"""
+
+    nombre_documents = models.PositiveIntegerField('Nombre de documents', default=0)
+    longueur_totale = models.PositiveBigIntegerField('Longueur totale', default=0)
+
+    class Meta:
+        verbose_name = 'Statistiques de l index'
+        verbose_name_plural = 'Statistiques de l index'
+
+    def __str__(self):
+        return f"{self.nombre_documents} documents"
+
+    @classmethod
+    def get_instance(cls):
+        instance, _ = cls.objects.get_or_create(pk=1)
+        return instance
+
+    @property
+    def longueur_moyenne(self):
+        if not self.nombre_documents:
+            return 0
+        return self.longueur_totale / self.nombre_documents
@@ -0,0 +1,116 @@
+"""
+Recherche - Point d'entrée des requêtes
+Délègue le classement au backend actif (voir backends.py)
+
+Les scores du backend partagent une même échelle pour tous les types (IDF et
+longueur moyenne calculés sur tout le corpus) : chaque type est classé
+séparément puis les flux sont fusionnés (k-way merge) par score décroissant.
+La pagination se fait par curseur (score, id) du dernier résultat renvoyé.
+"""
+import base64
+import heapq
+import json
+from collections import defaultdict
+from dataclasses import dataclass
+
+from medias.extraction import pages_correspondantes
+
+from .backends import get_backend
+from .indexation import TYPES
+from .models import SearchDocument
+
+
+# Borne haute du nombre de résultats par page
+LIMITE_MAX = 50
+
+
+class CurseurInvalide(ValueError):
+    """Curseur de pagination illisible"""
+
+
+@dataclass
+class Resultat:
+    """Un document trouvé et son score"""
+    document: SearchDocument
+    score: float
+
+
+def encoder_curseur(score, document_id):
+    donnees = json.dumps([score, document_id]).encode()
+    return base64.urlsafe_b64encode(donnees).decode().rstrip('=')
+
+
+def decoder_curseur(curseur):
+    try:
+        donnees = base64.urlsafe_b64decode(curseur + '=' * (-len(curseur) % 4))
+        score, document_id = json.loads(donnees)
+        return float(score), int(document_id)
+    except (ValueError, TypeError):
+        raise CurseurInvalide(curseur)
+
+
+def classer(requete, commune_id=None, types=None, limit=20, apres=None):
+    """
+    Fusionne les classements par type (chacun limité à `limit`) et
+    retourne les `limit` meilleurs [(document_id, score), ...].
+    """
+    backend = get_backend()
+    flux = [
+        backend.classer(requete, commune_id=commune_id, types=[type_contenu], limit=limit, apres=apres)
+        for type_contenu in (types or SearchDocument.Type.values)
+    ]
+    fusion = heapq.merge(*flux, key=lambda item: (-item[1], item[0]))
+    return [item for _, item in zip(range(limit), fusion)]
+
+
+def rechercher_page(requete, commune_id=None, types=None, limit=20, curseur=None):
+    """
+    Une page de résultats classés par pertinence.
+    Retourne (liste de Resultat triée par score décroissant, curseur de la page suivante ou None).
+    Seuls les documents de la page demandée sont chargés.
+    """
+    limit = max(1, min(limit, LIMITE_MAX))
+    apres = decoder_curseur(curseur) if curseur else None
+
+    # Un élément de plus pour savoir s'il existe une page suivante
+    meilleurs = classer(requete, commune_id=commune_id, types=types, limit=limit + 1, apres=apres)
+    suivant = None
+    if len(meilleurs) > limit:
+        meilleurs = meilleurs[:limit]
+        suivant = encoder_curseur(meilleurs[-1][1], meilleurs[-1][0])
+
+    documents = SearchDocument.objects.select_related('commune').in_bulk(
+        [document_id for document_id, _ in meilleurs]
+    )
+    resultats = [
+        Resultat(document=documents[document_id], score=score)
+        for document_id, score in meilleurs
+        if document_id in documents
+    ]
+    return resultats, suivant
+
+
+def rechercher(requete, commune_id=None, types=None, limit=20):
+    """Recherche plein texte classée par pertinence (première page)"""
+    resultats, _ = rechercher_page(requete, commune_id=commune_id, types=types, limit=limit)
+    return resultats
+
+
+def pages_pdf(resultats, requete):
+    """
+    Pages correspondant à la requête dans les PDF des résultats :
+    {(type, objet_id): [{'page': n, 'extrait': ...}, ...]}
+    """
+    par_type = defaultdict(list)
+    for resultat in resultats:
+        if TYPES[resultat.document.type].champ_fichier:
+            par_type[resultat.document.type].append(resultat.document.objet_id)
+
+    pages = {}
+    for type_contenu, objet_ids in par_type.items():
+        config = TYPES[type_contenu]
+        fichiers = config.get_modele().objects.filter(pk__in=objet_ids).values_list('pk', config.champ_fichier)
+        for objet_id, nom in fichiers:
+            if nom:
+                pages[(type_contenu, objet_id)] = pages_correspondantes(nom, requete)
+    return pages
@@ -0,0 +1,56 @@
+"""
+Recherche - Mise à jour incrémentale de l'index via les signaux des modèles
+"""
+from django.apps import apps
+from django.db.models.signals import post_save, post_delete
+
+from . import suggestions
+from .indexation import TYPES, indexer, desindexer, type_pour_modele
+from .models import SearchDocument
+
+
+def _apres_sauvegarde(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    config = type_pour_modele(sender)
+    # Sauvegarde partielle sans champ indexé (compteur de vues...) : document inchangé
+    if update_fields is not None and not set(update_fields) & config.champs_lus():
+        return
+    indexer(instance, config)
+
+
+def _apres_suppression(sender, instance, **kwargs):
+    desindexer(instance)
+
+
+def connecter():
+    """Connecte les signaux pour chaque modèle indexé"""
+    for type_contenu, config in TYPES.items():
+        modele = config.get_modele()
+        post_save.connect(
+            _apres_sauvegarde, sender=modele,
+            dispatch_uid=f'recherche_indexer_{type_contenu}'
+        )
+        post_delete.connect(
+            _apres_suppression, sender=modele,
+            dispatch_uid=f'recherche_desindexer_{type_contenu}'
+        )
+
+    # Index de suggestions en mémoire
+    post_save.connect(
+        suggestions.document_enregistre, sender=SearchDocument,
+        dispatch_uid='recherche_suggestions_document'
+    )
+    post_delete.connect(
+        suggestions.document_supprime, sender=SearchDocument,
+        dispatch_uid='recherche_suggestions_document_suppression'
+    )
+    commune = apps.get_model('communes.Commune')
+    post_save.connect(
+        suggestions.commune_enregistree, sender=commune,
+        dispatch_uid='recherche_suggestions_commune'
+    )
+    post_delete.connect(
+        suggestions.commune_supprimee, sender=commune,
+        dispatch_uid='recherche_suggestions_commune_suppression'
+    )
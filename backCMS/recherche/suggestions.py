@@ -0,0 +1,435 @@
+"""
+Recherche - Suggestions (autocomplétion) sur un index de préfixes en mémoire
+
+Chaque worker garde un tableau trié d'entrées (mot normalisé, score, type,
+id, position du mot dans le titre) : une recherche de préfixe est une
+bisection sur le premier mot suivie d'un court balayage, sans requête en
+base ; les mots suivants d'une requête sont vérifiés sur les mots du titre.
+Les mots sont partagés (sys.intern) : la mémoire croît avec le nombre de
+mots des titres, pas avec leurs suffixes.
+
+L'index est chargé dans un thread au premier appel (suggestions vides le
+temps de ce premier chargement), puis mis à jour incrémentalement par les
+signaux (SearchDocument, Commune). Chaque écriture incrémente la génération
+partagée en cache et y note les suggestions modifiées : les autres workers
+relisent seulement ces suggestions en base (une requête par type), et ne
+rechargent tout l'index que si la liste est incomplète (expirée, plus de
+MODIFICATIONS_MAX générations de retard) ou après SUGGESTIONS_TTL : ce
+rechargement se fait lui aussi en arrière-plan, l'index précédent restant
+servi jusqu'à son remplacement.
+"""
+import heapq
+import logging
+import sys
+import threading
+import time
+from bisect import bisect_left, insort
+from dataclasses import dataclass
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .analyse import normaliser
+from .models import SearchDocument
+
+
+logger = logging.getLogger(__name__)
+
+# Type propre aux suggestions (les communes ne sont pas dans SearchDocument)
+TYPE_COMMUNE = 'commune'
+
+# Types proposés en suggestion et poids de base du classement
+POIDS_TYPES = {
+    TYPE_COMMUNE: 4.0,
+    SearchDocument.Type.ACTUALITE: 2.0,
+    SearchDocument.Type.EVENEMENT: 2.0,
+    SearchDocument.Type.PROJET: 1.5,
+    SearchDocument.Type.FAQ: 1.0,
+}
+
+# Bonus si le préfixe est le début du titre (et non un mot au milieu)
+BONUS_DEBUT = 2.0
+# Bonus de fraîcheur, décroissant sur cette durée (jours)
+FRAICHEUR_JOURS = 90
+BONUS_FRAICHEUR = 1.0
+
+LONGUEUR_MIN = 2
+# Nombre maximal de clés examinées par requête (préfixes très courts)
+LIMITE_BALAYAGE = 2000
+# Intervalle minimal entre deux vérifications de la génération partagée (s)
+INTERVALLE_VERIFICATION = 1.0
+SUGGESTIONS_TTL = 300
+
+CLE_GENERATION = 'recherche:suggestions:generation'
+# Suggestions (type, id) modifiées par une génération
+CLE_MODIFICATIONS = 'recherche:suggestions:modifications:{}'
+# Retard au-delà duquel un rechargement complet coûte moins que les mises à jour
+MODIFICATIONS_MAX = 200
+
+
+@dataclass(frozen=True)
+class Suggestion:
+    """Une entrée proposée à l'autocomplétion"""
+    type: str
+    id: int
+    libelle: str
+    url: str
+    commune_id: int = None
+    score: float = 0.0
+
+
+def _score(type_contenu, date):
+    score = POIDS_TYPES[type_contenu]
+    if date:
+        age = (timezone.now() - date).days
+        if 0 <= age < FRAICHEUR_JOURS:
+            score += BONUS_FRAICHEUR * (1 - age / FRAICHEUR_JOURS)
+    return score
+
+
+def _mots(libelle):
+    """Mots normalisés du libellé (chaînes partagées entre les titres)"""
+    return tuple(sys.intern(mot) for mot in normaliser(libelle).split())
+
+
+def _suite_correspond(mots, suite):
+    """Les mots du titre qui suivent commencent par `suite` (dernier mot en préfixe)"""
+    if len(mots) < len(suite):
+        return False
+    return mots[:len(suite) - 1] == tuple(suite[:-1]) and mots[len(suite) - 1].startswith(suite[-1])
+
+
+class IndexSuggestions:
+    """
+    Tableau trié de (mot, -score, type, id, position) + dictionnaires des
+    suggestions et de leurs mots
+    """
+
+    def __init__(self):
+        self._verrou = threading.RLock()
+        self._entrees = []
+        self._suggestions = {}
+        self._mots = {}
+        self._communes = {}
+        self._chargement = None
+        self.charge = False
+        self.generation = None
+        self.date_chargement = 0.0
+        self.derniere_verification = 0.0
+        self.derniere_tentative = float('-inf')
+
+    def __len__(self):
+        return len(self._suggestions)
+
+    # --- Construction ---
+
+    def charger(self):
+        """(Re)construit entièrement l'index depuis la base"""
+        from communes.models import Commune
+
+        # Lue avant la base : une écriture pendant le chargement sera relue
+        generation = cache.get(CLE_GENERATION)
+        suggestions = []
+        for id_, nom, slug in Commune.objects.filter(
+            statut=Commune.Statut.ACTIVE
+        ).values_list('id', 'nom', 'slug').iterator():
+            suggestions.append(self._suggestion_commune(id_, nom, slug))
+        for type_contenu, objet_id, titre, url, commune_id, date in SearchDocument.objects.filter(
+            type__in=list(POIDS_TYPES)
+        ).values_list('type', 'objet_id', 'titre', 'url', 'commune_id', 'date').iterator():
+            suggestions.append(Suggestion(
+                type=type_contenu, id=objet_id, libelle=titre, url=url,
+                commune_id=commune_id, score=_score(type_contenu, date),
+            ))
+
+        entrees, mots = [], {}
+        for suggestion in suggestions:
+            mots[(suggestion.type, suggestion.id)] = _mots(suggestion.libelle)
+            entrees.extend(self._entrees_pour(suggestion, mots[(suggestion.type, suggestion.id)]))
+        entrees.sort()
+
+        with self._verrou:
+            self._entrees = entrees
+            self._suggestions = {(s.type, s.id): s for s in suggestions}
+            self._mots = mots
+            self._communes = {
+                s.url: s.id for s in suggestions if s.type == TYPE_COMMUNE
+            }
+            self.charge = True
+            self.generation = generation
+            self.date_chargement = self.derniere_verification = time.monotonic()
+
+    def charger_en_arriere_plan(self):
+        """
+        Lance charger() dans un thread (un seul à la fois, au plus une tentative
+        par INTERVALLE_VERIFICATION) ; l'index courant reste servi en attendant.
+        Retourne le thread lancé, ou None.
+        """
+        with self._verrou:
+            maintenant = time.monotonic()
+            if self._chargement is not None and self._chargement.is_alive():
+                return None
+            if maintenant - self.derniere_tentative < INTERVALLE_VERIFICATION:
+                return None
+            self.derniere_tentative = maintenant
+            self._chargement = threading.Thread(
+                target=self._charger_thread, name='recherche-suggestions', daemon=True
+            )
+            self._chargement.start()
+            return self._chargement
+
+    def _charger_thread(self):
+        try:
+            self.charger()
+        except Exception:
+            logger.exception("Chargement de l'index de suggestions impossible")
+        finally:
+            # Connexion propre au thread
+            connection.close()
+
+    @staticmethod
+    def _suggestion_commune(id_, nom, slug):
+        return Suggestion(
+            type=TYPE_COMMUNE, id=id_, libelle=nom,
+            url=f'/api/v1/communes/{slug}/', commune_id=id_, score=_score(TYPE_COMMUNE, None),
+        )
+
+    @staticmethod
+    def _entrees_pour(suggestion, mots):
+        return [
+            (mot, -(suggestion.score + (BONUS_DEBUT if position == 0 else 0)), suggestion.type, suggestion.id, position)
+            for position, mot in enumerate(mots)
+        ]
+
+    def _inserer(self, suggestion):
+        """Enregistre la suggestion ; retourne ses entrées (à insérer dans le tableau)"""
+        cle_suggestion = (suggestion.type, suggestion.id)
+        mots = self._mots[cle_suggestion] = _mots(suggestion.libelle)
+        self._suggestions[cle_suggestion] = suggestion
+        if suggestion.type == TYPE_COMMUNE:
+            self._communes[suggestion.url] = suggestion.id
+        return self._entrees_pour(suggestion, mots)
+
+    # --- Mises à jour incrémentales ---
+
+    def ajouter(self, suggestion):
+        with self._verrou:
+            if not self.charge:
+                return
+            self._retirer((suggestion.type, suggestion.id))
+            for entree in self._inserer(suggestion):
+                insort(self._entrees, entree)
+
+    def ajouter_lot(self, suggestions, retirees=()):
+        """Ajout groupé (et retrait des clés `retirees`) : un seul tri au lieu d'une insertion par entrée"""
+        with self._verrou:
+            if not self.charge:
+                return
+            # Retraits d'abord : _retirer suppose le tableau trié
+            for cle_suggestion in retirees:
+                self._retirer(cle_suggestion)
+            for suggestion in suggestions:
+                self._retirer((suggestion.type, suggestion.id))
+            for suggestion in suggestions:
+                self._entrees.extend(self._inserer(suggestion))
+            self._entrees.sort()
+
+    def actualiser(self, cles_suggestions):
+        """Relit en base les suggestions (type, id) modifiées par un autre worker"""
+        from communes.models import Commune
+
+        par_type = {}
+        for type_contenu, objet_id in cles_suggestions:
+            par_type.setdefault(type_contenu, set()).add(objet_id)
+        suggestions = []
+        for type_contenu, ids in par_type.items():
+            if type_contenu == TYPE_COMMUNE:
+                suggestions.extend(
+                    self._suggestion_commune(id_, nom, slug)
+                    for id_, nom, slug in Commune.objects.filter(
+                        id__in=ids, statut=Commune.Statut.ACTIVE
+                    ).values_list('id', 'nom', 'slug')
+                )
+            else:
+                suggestions.extend(
+                    Suggestion(
+                        type=type_contenu, id=objet_id, libelle=titre, url=url,
+                        commune_id=commune_id, score=_score(type_contenu, date),
+                    )
+                    for objet_id, titre, url, commune_id, date in SearchDocument.objects.filter(
+                        type=type_contenu, objet_id__in=ids
+                    ).values_list('objet_id', 'titre', 'url', 'commune_id', 'date')
+                )
+        presentes = {(suggestion.type, suggestion.id) for suggestion in suggestions}
+        self.ajouter_lot(suggestions, retirees=set(cles_suggestions) - presentes)
+
+    def retirer(self, type_contenu, objet_id):
+        with self._verrou:
+            if self.charge:
+                self._retirer((type_contenu, objet_id))
+
+    def _retirer(self, cle_suggestion):
+        suggestion = self._suggestions.pop(cle_suggestion, None)
+        if suggestion is None:
+            return
+        for entree in self._entrees_pour(suggestion, self._mots.pop(cle_suggestion)):
+            position = bisect_left(self._entrees, entree)
+            if position < len(self._entrees) and self._entrees[position] == entree:
+                del self._entrees[position]
+        if suggestion.type == TYPE_COMMUNE:
+            self._communes.pop(suggestion.url, None)
+
+    # --- Requêtes ---
+
+    def commune_id(self, slug):
+        """Résout un slug de commune sans requête en base"""
+        return self._communes.get(f'/api/v1/communes/{slug}/')
+
+    def suggerer(self, prefixe, limit=8, commune_id=None, types=None):
+        """
+        Suggestions dont un mot commence par le préfixe, classées par score ;
+        un préfixe de plusieurs mots doit correspondre à des mots consécutifs
+        """
+        mots_requete = normaliser(prefixe).split()
+        if len(' '.join(mots_requete)) < LONGUEUR_MIN:
+            return []
+        premier, suite = mots_requete[0], mots_requete[1:]
+
+        with self._verrou:
+            entrees = self._entrees
+            suggestions = self._suggestions
+            meilleures = {}
+            position = bisect_left(entrees, (premier,))
+            fin = min(position + LIMITE_BALAYAGE, len(entrees))
+            while position < fin:
+                mot, score, type_contenu, objet_id, rang = entrees[position]
+                # Suivi d'autres mots, le premier doit être un mot entier (entrées contiguës)
+                if not mot.startswith(premier) or (suite and mot != premier):
+                    break
+                position += 1
+                if types and type_contenu not in types:
+                    continue
+                if suite and not _suite_correspond(self._mots[(type_contenu, objet_id)][rang + 1:], suite):
+                    continue
+                suggestion = suggestions[(type_contenu, objet_id)]
+                if commune_id is not None and (
+                    type_contenu == TYPE_COMMUNE or suggestion.commune_id != commune_id
+                ):
+                    continue
+                # Un titre peut correspondre par plusieurs mots : garder le meilleur score
+                if score < meilleures.get((type_contenu, objet_id), (0,))[0]:
+                    meilleures[(type_contenu, objet_id)] = (score, suggestion)
+
+        return [
+            suggestion for _, suggestion in heapq.nsmallest(
+                limit, meilleures.values(), key=lambda item: (item[0], item[1].libelle)
+            )
+        ]
+
+
+index = IndexSuggestions()
+
+
+def invalider(cles_suggestions):
+    """Signale aux autres workers les suggestions (type, id) à relire"""
+    try:
+        generation = cache.incr(CLE_GENERATION)
+    except ValueError:
+        generation = 1
+        cache.set(CLE_GENERATION, generation, None)
+    cache.set(CLE_MODIFICATIONS.format(generation), list(cles_suggestions), SUGGESTIONS_TTL)
+    with index._verrou:
+        # Déjà appliquée ici ; les générations intermédiaires (autres workers) restent à lire
+        if generation == (index.generation or 0) + 1:
+            index.generation = generation
+
+
+def invalider_tout():
+    """Fait recharger entièrement l'index de chaque worker (suppressions sans signaux)"""
+    cache.delete(CLE_GENERATION)
+
+
+def _synchroniser(generation):
+    """Applique les modifications des générations manquantes ; False si un rechargement complet s'impose"""
+    depuis = index.generation or 0
+    if not depuis < generation <= depuis + MODIFICATIONS_MAX:
+        return False
+    cles = [CLE_MODIFICATIONS.format(numero) for numero in range(depuis + 1, generation + 1)]
+    modifications = cache.get_many(cles)
+    if len(modifications) < len(cles):
+        return False
+    index.actualiser({tuple(cle) for liste in modifications.values() for cle in liste})
+    with index._verrou:
+        index.generation = max(index.generation or 0, generation)
+    return True
+
+
+def get_index():
+    """
+    Index du worker courant, mis à jour si nécessaire ; les chargements
+    complets se font en arrière-plan (jamais dans la requête)
+    """
+    maintenant = time.monotonic()
+    if not index.charge or maintenant - index.date_chargement > SUGGESTIONS_TTL:
+        index.charger_en_arriere_plan()
+    elif maintenant - index.derniere_verification > INTERVALLE_VERIFICATION:
+        index.derniere_verification = maintenant
+        generation = cache.get(CLE_GENERATION)
+        if generation != index.generation and not (generation and _synchroniser(generation)):
+            index.charger_en_arriere_plan()
+    return index
+
+
+# --- Signaux (appliqués après commit pour ne jamais exposer un rollback) ---
+
+def _apres_commit(cles_suggestions, fonction, *args):
+    def appliquer():
+        fonction(*args)
+        invalider(cles_suggestions)
+    transaction.on_commit(appliquer)
+
+
+def document_enregistre(sender, instance, raw=False, **kwargs):
+    if raw or instance.type not in POIDS_TYPES:
+        return
+    _apres_commit([(instance.type, instance.objet_id)], index.ajouter, Suggestion(
+        type=instance.type, id=instance.objet_id, libelle=instance.titre, url=instance.url,
+        commune_id=instance.commune_id, score=_score(instance.type, instance.date),
+    ))
+
+
+def documents_enregistres(documents):
+    """Équivalent de document_enregistre pour des documents écrits en lot"""
+    ajouts = [
+        Suggestion(
+            type=document.type, id=document.objet_id, libelle=document.titre, url=document.url,
+            commune_id=document.commune_id, score=_score(document.type, document.date),
+        )
+        for document in documents if document.type in POIDS_TYPES
+    ]
+    if ajouts:
+        _apres_commit([(ajout.type, ajout.id) for ajout in ajouts], index.ajouter_lot, ajouts)
+
+
+def document_supprime(sender, instance, **kwargs):
+    if instance.type not in POIDS_TYPES:
+        return
+    _apres_commit([(instance.type, instance.objet_id)], index.retirer, instance.type, instance.objet_id)
+
+
+def commune_enregistree(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    cles_suggestions = [(TYPE_COMMUNE, instance.id)]
+    if instance.is_active():
+        _apres_commit(
+            cles_suggestions, index.ajouter,
+            IndexSuggestions._suggestion_commune(instance.id, instance.nom, instance.slug),
+        )
+    else:
+        _apres_commit(cles_suggestions, index.retirer, TYPE_COMMUNE, instance.id)
+
+
+def commune_supprimee(sender, instance, **kwargs):
+    _apres_commit([(TYPE_COMMUNE, instance.id)], index.retirer, TYPE_COMMUNE, instance.id)
@@ -0,0 +1,462 @@
+"""
+Tests pour le module Recherche - Index inversé, BM25 et backends natifs
+"""
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework import status
+
+from communes.models import Region, Departement, Commune
+from actualites.models import Actualite, FAQ
+from transparence.models import Projet
+from recherche import suggestions
+from recherche.analyse import analyser, normaliser, raciniser
+from recherche.backends import TABLE_FTS, PostgresBackend, SQLiteBackend, get_backend
+from recherche.indexation import indexer_lot, reindexer
+from recherche.models import SearchDocument, SearchPosting, SearchStats
+from recherche.moteur import LIMITE_MAX, rechercher, rechercher_page
+
+
+class AnalyseTest(TestCase):
+    """Tests pour l'analyse du texte"""
+
+    def test_normaliser_retire_accents_et_html(self):
+        """Test suppression des accents et balises"""
+        self.assertEqual(normaliser('<p>Marché <b>Élégant</b></p>').split(), ['marche', 'elegant'])
+
+    def test_raciniser_pluriels(self):
+        """Test racinisation des pluriels et suffixes"""
+        self.assertEqual(raciniser('marches'), raciniser('marche'))
+        self.assertEqual(raciniser('inauguration'), raciniser('inaugure'))
+
+    def test_analyser_mots_vides(self):
+        """Test suppression des mots vides et élisions"""
+        termes = analyser("L'école de la commune")
+        self.assertEqual(termes, [raciniser('ecole'), raciniser('commune')])
+
+
+class ExAequoMixin:
+    """Pagination par curseur à travers des scores ex aequo (tous les backends)"""
+
+    def test_ex_aequo_en_limite_de_page(self):
+        """Test ex aequo de part et d'autre d'une fin de page : ni perdus ni répétés"""
+        FAQ.objects.create(commune=self.commune, question='Marché marché', reponse='Le marché')
+        for i in range(5):
+            FAQ.objects.create(commune=self.commune, question='Marché', reponse=f'Réponse {i}')
+        vus, curseur = [], None
+        while True:
+            resultats, curseur = rechercher_page('marché', limit=2, curseur=curseur)
+            vus += [r.document.objet_id for r in resultats]
+            if curseur is None:
+                break
+        self.assertEqual(sorted(vus), sorted(FAQ.objects.values_list('id', flat=True)))
+
+
+@override_settings(RECHERCHE_BACKEND='python')
+class IndexationTest(ExAequoMixin, TestCase):
+    """Tests pour l'indexation incrémentale (backend Python)"""
+
+    def setUp(self):
+        self.commune = Commune.objects.create(nom='Yaoundé 1er', slug='yaounde-1', statut=Commune.Statut.ACTIVE)
+        self.autre = Commune.objects.create(nom='Douala 3ème', slug='douala-3', statut=Commune.Statut.ACTIVE)
+
+    def creer_actualite(self, commune, titre, contenu, **kwargs):
+        return Actualite.objects.create(
+            commune=commune,
+            titre=titre,
+            contenu=contenu,
+            est_publie=kwargs.pop('est_publie', True),
+            date_publication=timezone.now(),
+            **kwargs
+        )
+
+    def test_indexation_a_la_creation(self):
+        """Test qu'une actualité publiée est indexée via les signaux"""
+        actu = self.creer_actualite(self.commune, 'Nouveau marché', 'Inauguration du marché central')
+        document = SearchDocument.objects.get(type=SearchDocument.Type.ACTUALITE, objet_id=actu.id)
+        self.assertEqual(document.commune, self.commune)
+        self.assertTrue(SearchPosting.objects.filter(document=document, terme=raciniser('marche')).exists())
+        self.assertEqual(SearchStats.get_instance().nombre_documents, 1)
+
+    def test_compteur_de_vues_sans_reindexation(self):
+        """Test qu'une sauvegarde partielle sans champ indexé ne touche pas l'index"""
+        actu = self.creer_actualite(self.commune, 'Marché', 'Contenu')
+        # Seul l'UPDATE du compteur : ni index ni lecture des fichiers
+        with CaptureQueriesContext(connection) as requetes:
+            actu.incrementer_vues()
+        self.assertEqual(len(requetes.captured_queries), 1)
+        tables = ' '.join(requete['sql'] for requete in requetes.captured_queries)
+        self.assertNotIn('recherche_', tables)
+
+        actu.titre = 'Marché central'
+        actu.save(update_fields=['titre'])
+        self.assertEqual(SearchDocument.objects.get(objet_id=actu.id).titre, 'Marché central')
+
+    def test_brouillon_non_indexe(self):
+        """Test qu'un contenu non publié n'est pas indexé"""
+        self.creer_actualite(self.commune, 'Brouillon', 'Texte secret', est_publie=False)
+        self.assertFalse(SearchDocument.objects.exists())
+
+    def test_depublication_desindexe(self):
+        """Test que la dépublication retire le document de l'index"""
+        actu = self.creer_actualite(self.commune, 'Marché', 'Contenu')
+        actu.est_publie = False
+        actu.save()
+        self.assertFalse(SearchDocument.objects.exists())
+        self.assertEqual(SearchStats.get_instance().nombre_documents, 0)
+
+    def test_suppression_desindexe(self):
+        """Test que la suppression retire le document et ses postings"""
+        actu = self.creer_actualite(self.commune, 'Marché', 'Contenu')
+        actu.delete()
+        self.assertFalse(SearchDocument.objects.exists())
+        self.assertFalse(SearchPosting.objects.exists())
+
+    def test_modification_reindexe(self):
+        """Test que la modification met à jour les termes"""
+        actu = self.creer_actualite(self.commune, 'Marché', 'Contenu')
+        actu.titre = 'Stade municipal'
+        actu.save()
+        self.assertEqual(rechercher('marché'), [])
+        self.assertEqual(len(rechercher('stade')), 1)
+        self.assertEqual(SearchStats.get_instance().nombre_documents, 1)
+
+    def test_classement_bm25(self):
+        """Test que le document le plus pertinent arrive en tête"""
+        self.creer_actualite(self.commune, 'Vie municipale', 'Le conseil a parlé du marché.')
+        pertinent = self.creer_actualite(self.commune, 'Marché central', 'Le marché et les marchés du quartier.')
+        resultats = rechercher('marchés')
+        self.assertEqual(len(resultats), 2)
+        self.assertEqual(resultats[0].document.objet_id, pertinent.id)
+        self.assertGreater(resultats[0].score, resultats[1].score)
+
+    def test_filtres_commune_et_type(self):
+        """Test des filtres tenant et type"""
+        self.creer_actualite(self.commune, 'Marché', 'Contenu')
+        self.creer_actualite(self.autre, 'Marché', 'Contenu')
+        FAQ.objects.create(commune=self.commune, question='Où est le marché ?', reponse='Au centre')
+
+        self.assertEqual(len(rechercher('marché')), 3)
+        self.assertEqual(len(rechercher('marché', commune_id=self.autre.id)), 1)
+        resultats = rechercher('marché', commune_id=self.commune.id, types=[SearchDocument.Type.FAQ])
+        self.assertEqual([r.document.type for r in resultats], [SearchDocument.Type.FAQ])
+
+    def test_pagination_par_curseur(self):
+        """Test parcours complet par curseur, ex aequo compris, sur plusieurs types"""
+        attendus = set()
+        for i in range(4):
+            attendus.add(('actualite', self.creer_actualite(self.commune, 'Marché', 'Contenu', slug=f'marche-{i}').id))
+            attendus.add(('faq', FAQ.objects.create(commune=self.commune, question='Marché ?', reponse='Oui').id))
+        vus, scores, curseur = [], [], None
+        while True:
+            resultats, curseur = rechercher_page('marché', limit=3, curseur=curseur)
+            vus += [(r.document.type, r.document.objet_id) for r in resultats]
+            scores += [r.score for r in resultats]
+            if curseur is None:
+                break
+        self.assertEqual(len(vus), 8)
+        self.assertEqual(set(vus), attendus)
+        self.assertEqual(scores, sorted(scores, reverse=True))
+
+    def test_limite_bornee(self):
+        """Test que la taille de page est bornée"""
+        for i in range(LIMITE_MAX + 5):
+            FAQ.objects.create(commune=self.commune, question=f'Marché {i}', reponse='Oui')
+        resultats, curseur = rechercher_page('marché', limit=10 ** 9)
+        self.assertEqual(len(resultats), LIMITE_MAX)
+        self.assertIsNotNone(curseur)
+
+    def test_reindexer(self):
+        """Test reconstruction complète de l'index"""
+        self.creer_actualite(self.commune, 'Marché', 'Contenu')
+        SearchDocument.objects.all().delete()
+        SearchStats.objects.all().delete()
+        self.assertEqual(reindexer(), 1)
+        self.assertEqual(len(rechercher('marché')), 1)
+        self.assertEqual(SearchStats.get_instance().nombre_documents, 1)
+
+    def test_indexer_lot(self):
+        """Test indexation groupée : création, mise à jour, retrait et statistiques"""
+        actus = Actualite.objects.bulk_create([
+            Actualite(commune=self.commune, titre=f'Marché {i}', slug=f'marche-{i}',
+                      contenu='Contenu', est_publie=True)
+            for i in range(3)
+        ])
+        indexer_lot(actus)
+        self.assertEqual(len(rechercher('marché')), 3)
+
+        actus[0].titre = 'Forage du quartier'
+        actus[1].est_publie = False
+        indexer_lot(actus)
+        self.assertEqual(
+            [r.document.objet_id for r in rechercher('marché')], [actus[2].id]
+        )
+        self.assertEqual(len(rechercher('forage')), 1)
+        stats = SearchStats.get_instance()
+        self.assertEqual(stats.nombre_documents, 2)
+        self.assertEqual(
+            stats.longueur_totale, sum(SearchDocument.objects.values_list('longueur', flat=True))
+        )
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Backend FTS5 propre à SQLite')
+@override_settings(RECHERCHE_BACKEND='sqlite')
+class IndexationSQLiteTest(IndexationTest):
+    """Mêmes scénarios avec le backend FTS5 de SQLite"""
+
+    def test_indexation_a_la_creation(self):
+        """Test que les triggers alimentent la table FTS5 (sans postings)"""
+        self.assertIsInstance(get_backend(), SQLiteBackend)
+        actu = self.creer_actualite(self.commune, 'Nouveau marché', 'Inauguration du marché central')
+        document = SearchDocument.objects.get(type=SearchDocument.Type.ACTUALITE, objet_id=actu.id)
+        self.assertFalse(SearchPosting.objects.exists())
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT rowid FROM {TABLE_FTS} WHERE {TABLE_FTS} MATCH %s', ['marche'])
+            self.assertEqual(cursor.fetchall(), [(document.id,)])
+
+    def test_expression_fts(self):
+        """Test construction de la requête FTS5 (racines en préfixe, sans syntaxe injectée)"""
+        self.assertEqual(SQLiteBackend.expression_fts('Les marchés'), '"march"*')
+        self.assertEqual(SQLiteBackend.expression_fts('" OR NEAR('), '"near"*')
+        self.assertEqual(SQLiteBackend.expression_fts('le de'), '')
+
+    def test_commande_reindexer(self):
+        """Test de la commande de reconstruction par lots"""
+        for i in range(5):
+            self.creer_actualite(self.commune, f'Marché {i}', 'Contenu')
+        sortie = StringIO()
+        call_command('reindexer_recherche', '--vider', '--chunk-size', '2', stdout=sortie)
+        self.assertIn('5 objet(s) indexé(s)', sortie.getvalue())
+        self.assertEqual(SearchStats.get_instance().nombre_documents, 5)
+        self.assertEqual(len(rechercher('marché')), 5)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Recherche native PostgreSQL')
+@override_settings(RECHERCHE_BACKEND='postgresql')
+class PaginationPostgresTest(ExAequoMixin, TestCase):
+    """Curseur sur SearchRank (real) : scores comparés en double precision"""
+
+    def setUp(self):
+        self.commune = Commune.objects.create(nom='Yaoundé 1er', slug='yaounde-1', statut=Commune.Statut.ACTIVE)
+
+
+class RechercheFilterTest(APITestCase):
+    """Tests pour le filtre ?search= des ViewSets branché sur l'index"""
+
+    def setUp(self):
+        self.commune = Commune.objects.create(nom='Test', slug='test', statut=Commune.Statut.ACTIVE)
+        FAQ.objects.create(commune=self.commune, question='Horaires du marché', reponse='De 7h à 18h')
+        FAQ.objects.create(commune=self.commune, question='Acte de naissance', reponse='À la mairie')
+
+    def test_recherche_anonyme_par_index(self):
+        """Test recherche sans accents ni pluriel via l'index"""
+        response = self.client.get('/api/v1/faqs/?search=marches')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([faq['question'] for faq in response.data['results']], ['Horaires du marché'])
+
+    def test_recherche_anonyme_combinee_aux_filtres(self):
+        """Test correspondances de l'index jointes en base aux autres filtres (tous les backends)"""
+        autre = Commune.objects.create(nom='Autre', slug='autre', statut=Commune.Statut.ACTIVE)
+        for i in range(5):
+            FAQ.objects.create(commune=autre, question=f'Marché marché {i}', reponse='Le marché du marché')
+        for backend in ('python', 'sqlite', 'auto'):
+            with self.subTest(backend=backend), override_settings(RECHERCHE_BACKEND=backend):
+                reindexer()
+                response = self.client.get(f'/api/v1/faqs/?search=marche&commune={self.commune.id}')
+                self.assertEqual(response.data['count'], 1)
+                self.assertEqual(response.data['results'][0]['question'], 'Horaires du marché')
+                response = self.client.get('/api/v1/faqs/?search=marche')
+                self.assertEqual(response.data['count'], 6)
+
+    def test_recherche_authentifiee_sur_champs(self):
+        """Test recherche sur les search_fields pour un utilisateur connecté"""
+        user = get_user_model().objects.create_user(email='agent@test.cm', nom='Agent', password='x')
+        self.client.force_authenticate(user)
+        response = self.client.get('/api/v1/faqs/?search=naissance')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+
+    @skipUnless(connection.vendor == 'postgresql', 'Recherche native PostgreSQL (unaccent)')
+    def test_postgres_sans_accents_et_identifiants(self):
+        """Test colonnes comparées sans accents ; identifiants cherchés par sous-chaîne"""
+        backend = PostgresBackend()
+        resultat = backend.filtrer_queryset(FAQ.objects.all(), ['question', 'reponse'], 'marche')
+        self.assertEqual([faq.question for faq in resultat], ['Horaires du marché'])
+        resultat = backend.filtrer_queryset(FAQ.objects.all(), ['question', 'reponse'], 'Marché')
+        self.assertEqual([faq.question for faq in resultat], ['Horaires du marché'])
+
+        resultat = backend.filtrer_queryset(FAQ.objects.all(), ['question', 'reponse'], 'naiss', identifiants=['question'])
+        self.assertEqual([faq.question for faq in resultat], ['Acte de naissance'])
+
+
+class RechercheAPITest(APITestCase):
+    """Tests pour l'endpoint de recherche globale"""
+
+    def setUp(self):
+        region = Region.objects.create(nom='Centre', code='CE')
+        departement = Departement.objects.create(region=region, nom='Mfoundi', code='MF')
+        self.commune = Commune.objects.create(
+            nom='Test Commune', slug='test-commune',
+            departement=departement, statut=Commune.Statut.ACTIVE
+        )
+        Projet.objects.create(
+            commune=self.commune, titre='Construction école', slug='construction-ecole',
+            description='Nouvelle école primaire', budget=1000,
+            date_debut=timezone.now().date(), date_fin=timezone.now().date(),
+        )
+
+    def test_recherche_sans_accents(self):
+        """Test que la recherche ignore les accents"""
+        response = self.client.get('/api/v1/recherche/?q=ECOLES')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(response.data['results'][0]['type'], 'projet')
+        self.assertEqual(response.data['results'][0]['commune'], 'Test Commune')
+
+    def test_recherche_filtre_type(self):
+        """Test filtre par type"""
+        response = self.client.get('/api/v1/recherche/?q=école&type=faq')
+        self.assertEqual(response.data['count'], 0)
+
+    def test_recherche_page_suivante(self):
+        """Test lien de page suivante et curseur invalide"""
+        FAQ.objects.create(commune=self.commune, question='Inscription à l\'école', reponse='En mairie')
+        response = self.client.get('/api/v1/recherche/?q=ecole&limit=1')
+        self.assertEqual(response.data['count'], 1)
+        self.assertIn('cursor=', response.data['next'])
+        response = self.client.get(response.data['next'])
+        self.assertEqual(response.data['count'], 1)
+        self.assertIsNone(response.data['next'])
+
+        response = self.client.get('/api/v1/recherche/?q=ecole&cursor=%%%')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SuggestionsTest(APITestCase):
+    """Tests pour l'autocomplétion sur l'index de préfixes en mémoire"""
+
+    def setUp(self):
+        suggestions.index.charge = False
+        self.commune = Commune.objects.create(nom='Yaoundé 1er', slug='yaounde-1', statut=Commune.Statut.ACTIVE)
+        self.autre = Commune.objects.create(nom='Douala 3ème', slug='douala-3', statut=Commune.Statut.ACTIVE)
+        self.actu = Actualite.objects.create(
+            commune=self.commune, titre='Nouveau marché de Yaoundé', contenu='Texte',
+            est_publie=True, date_publication=timezone.now(),
+        )
+        FAQ.objects.create(commune=self.autre, question='Horaires du marché', reponse='7h')
+        suggestions.index.charger()
+
+    def test_prefixe_et_classement(self):
+        """Test préfixe sur n'importe quel mot, communes en tête"""
+        index = suggestions.get_index()
+        resultats = index.suggerer('YAOU')
+        self.assertEqual([s.type for s in resultats], ['commune', 'actualite'])
+        self.assertEqual([s.type for s in index.suggerer('marc')], ['actualite', 'faq'])
+        self.assertEqual(index.suggerer('m'), [])
+
+    def test_prefixe_de_plusieurs_mots(self):
+        """Test mots consécutifs du titre, dernier mot en préfixe"""
+        index = suggestions.get_index()
+        self.assertEqual([s.type for s in index.suggerer('marche de yao')], ['actualite'])
+        self.assertEqual([s.type for s in index.suggerer('Nouveau Marché')], ['actualite'])
+        self.assertEqual(index.suggerer('marc de'), [])
+        self.assertEqual(index.suggerer('marche yaounde'), [])
+        self.assertEqual(index.suggerer('yaounde de'), [])
+
+    def test_sans_requete_en_base(self):
+        """Test qu'une suggestion ne touche pas la base une fois l'index chargé"""
+        index = suggestions.get_index()
+        with self.assertNumQueries(0):
+            self.assertEqual(len(index.suggerer('marche', commune_id=self.autre.id)), 1)
+
+    def test_mise_a_jour_incrementale(self):
+        """Test ajout et retrait sans rechargement complet"""
+        index = suggestions.get_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            Actualite.objects.create(
+                commune=self.commune, titre='Stade municipal', contenu='Texte',
+                est_publie=True, date_publication=timezone.now(),
+            )
+        self.assertEqual(len(index.suggerer('stade')), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.actu.delete()
+        self.assertEqual([s.type for s in index.suggerer('nouveau')], [])
+
+    def test_synchronisation_entre_workers(self):
+        """Test un autre worker relit seulement les suggestions modifiées, sans recharger l'index"""
+        index = suggestions.get_index()
+        autre_worker = suggestions.IndexSuggestions()
+        autre_worker.charger()
+        with self.captureOnCommitCallbacks(execute=True):
+            Actualite.objects.create(
+                commune=self.commune, titre='Stade municipal', contenu='Texte',
+                est_publie=True, date_publication=timezone.now(),
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.actu.delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.autre.nom = 'Douala 5ème'
+            self.autre.save()
+
+        # Index de l'autre worker à la place de celui de ce processus
+        suggestions.index, courant = autre_worker, index
+        try:
+            autre_worker.derniere_verification = 0
+            chargement = autre_worker.date_chargement
+            with self.assertNumQueries(2):
+                self.assertIs(suggestions.get_index(), autre_worker)
+        finally:
+            suggestions.index = courant
+        self.assertEqual(autre_worker.date_chargement, chargement)
+        self.assertEqual(autre_worker.generation, index.generation)
+        self.assertEqual(len(autre_worker.suggerer('stade')), 1)
+        self.assertEqual(autre_worker.suggerer('nouveau'), [])
+        self.assertEqual([s.libelle for s in autre_worker.suggerer('douala')], ['Douala 5ème'])
+        self.assertEqual(autre_worker.commune_id('douala-3'), self.autre.id)
+
+    def test_endpoint(self):
+        """Test de l'endpoint /recherche/suggestions/"""
+        response = self.client.get('/api/v1/recherche/suggestions/?q=mar&commune=douala-3&limit=500')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['libelle'] for r in response.data['results']], ['Horaires du marché'])
+        self.assertEqual(response.data['results'][0]['url'], '/api/v1/faqs/{}/'.format(
+            FAQ.objects.get().id
+        ))
+
+
+class SuggestionsArrierePlanTest(TransactionTestCase):
+    """Tests du chargement de l'index de suggestions hors des requêtes"""
+
+    def setUp(self):
+        commune = Commune.objects.create(nom='Yaoundé 1er', slug='yaounde-1', statut=Commune.Statut.ACTIVE)
+        self.faq = FAQ.objects.create(commune=commune, question='Horaires du marché', reponse='7h')
+        self.index, courant = suggestions.IndexSuggestions(), suggestions.index
+        suggestions.index = self.index
+        self.addCleanup(setattr, suggestions, 'index', courant)
+
+    def test_chargement_en_arriere_plan(self):
+        """Test premier chargement et rechargement dans un thread, l'index courant restant servi"""
+        with self.assertNumQueries(0):
+            self.assertIs(suggestions.get_index(), self.index)
+        self.index._chargement.join(5)
+        self.assertEqual([s.libelle for s in self.index.suggerer('marche')], ['Horaires du marché'])
+
+        # Écriture sans signaux : visible après le rechargement périodique
+        SearchDocument.objects.filter(objet_id=self.faq.id).update(titre='Marché de nuit')
+        self.index.date_chargement -= suggestions.SUGGESTIONS_TTL + 1
+        self.index.derniere_tentative = float('-inf')
+        with self.assertNumQueries(0):
+            self.assertIs(suggestions.get_index(), self.index)
+        self.index._chargement.join(5)
+        self.assertEqual([s.libelle for s in self.index.suggerer('nuit')], ['Marché de nuit'])
+        # Une seule tentative par intervalle
+        self.index.date_chargement -= suggestions.SUGGESTIONS_TTL + 1
+        suggestions.get_index()
+        self.assertIsNone(self.index.charger_en_arriere_plan())
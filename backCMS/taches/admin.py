@@ -0,0 +1,26 @@
+"""Tâches - Administration Django"""
+from django.contrib import admin
+from django.utils import timezone
+
+from .models import Tache
+
+
+@admin.register(Tache)
+class TacheAdmin(admin.ModelAdmin):
+    """Suivi de la file de tâches"""
+    list_display = ['nom', 'statut', 'priorite', 'tentatives', 'executer_apres', 'date_creation', 'date_fin']
+    list_filter = ['statut', 'nom', 'priorite']
+    search_fields = ['nom', 'cle']
+    readonly_fields = [f.name for f in Tache._meta.fields]
+    actions = ['relancer']
+
+    def has_add_permission(self, request):
+        return False
+
+    @admin.action(description='Relancer les tâches sélectionnées')
+    def relancer(self, request, queryset):
+        nombre = queryset.exclude(statut=Tache.Statut.EN_COURS).update(
+            statut=Tache.Statut.EN_ATTENTE, tentatives=0, executer_apres=timezone.now(),
+            derniere_erreur='', date_fin=None,
+        )
+        self.message_user(request, f'{nombre} tâche(s) remise(s) en file.')
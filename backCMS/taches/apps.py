@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class TachesConfig(AppConfig):
+    name = 'taches'
+    verbose_name = 'Tâches de fond'
+
+    def ready(self):
+        # Charge les modules <app>/taches.py qui déclarent les tâches
+        from django.utils.module_loading import autodiscover_modules
+        autodiscover_modules('taches')
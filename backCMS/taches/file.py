@@ -0,0 +1,231 @@
+"""
+Tâches - Mise en file, réservation et exécution
+
+Réservation :
+- PostgreSQL / MySQL : SELECT ... FOR UPDATE SKIP LOCKED, plusieurs workers
+  se partagent la file sans attendre les verrous les uns des autres ;
+- SQLite (pas de verrou de ligne, écritures sérialisées) : réservation
+  optimiste, UPDATE ... WHERE statut = 'en_attente' ligne par ligne, seul
+  le worker dont l'UPDATE modifie la ligne l'obtient.
+
+Une tâche en échec est replanifiée avec un délai exponentiel (avec gigue)
+jusqu'à max_tentatives, puis marquée échouée.
+
+Une tâche restée « en cours » plus de TACHES_DELAI_VERROU secondes est
+considérée orpheline et remise en file : une longue tâche appelle
+prolonger() régulièrement pour renouveler son verrou.
+"""
+import json
+import logging
+import random
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, OperationalError, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Tache
+from .registre import get_tache
+
+
+logger = logging.getLogger(__name__)
+
+# Candidats examinés par tâche à réserver (réservation optimiste SQLite)
+FACTEUR_CANDIDATS = 4
+
+# Nouvelles tentatives d'une écriture refusée pour verrou (SQLite, plusieurs threads)
+TENTATIVES_VERROU = 5
+# Insertions rejouées quand la tâche active d'une clé se termine pendant enfiler()
+TENTATIVES_CLE = 3
+
+
+# Tâche exécutée par le thread (prolonger)
+_courante = threading.local()
+
+
+class TacheInconnue(Exception):
+    """Aucune fonction enregistrée sous ce nom : échec définitif"""
+
+
+class VerrouPerdu(Exception):
+    """La tâche en cours a été remise en file (verrou expiré) : elle doit s'arrêter"""
+
+
+def delai_reessai(tentatives):
+    """Délai avant la tentative suivante : exponentiel, plafonné, avec ±20 % de gigue"""
+    base = getattr(settings, 'TACHES_DELAI_REESSAI', 30)
+    plafond = getattr(settings, 'TACHES_DELAI_REESSAI_MAX', 3600)
+    delai = min(base * 2 ** max(tentatives - 1, 0), plafond)
+    return timedelta(seconds=delai * random.uniform(0.8, 1.2))
+
+
+def _mettre_a_jour(requete, **valeurs):
+    """UPDATE qui patiente quand SQLite refuse l'écriture (table verrouillée)"""
+    for essai in range(TENTATIVES_VERROU):
+        try:
+            return requete.update(**valeurs)
+        except OperationalError as exc:
+            if 'locked' not in str(exc) or essai == TENTATIVES_VERROU - 1:
+                raise
+            time.sleep(0.05 * (essai + 1))
+
+
+def enfiler(nom, arguments=None, cle='', priorite=Tache.Priorite.NORMALE,
+            executer_apres=None, max_tentatives=5):
+    """
+    Enregistre une tâche. Dans une transaction, elle n'est visible des
+    workers qu'après le commit (et disparaît avec un rollback).
+    Avec une clé, retourne la tâche active existante au lieu d'en créer une
+    (nouvel essai si elle s'est terminée entre l'INSERT refusé et sa lecture).
+    """
+    valeurs = dict(
+        nom=nom, arguments=arguments or {}, cle=cle, priorite=priorite,
+        executer_apres=executer_apres or timezone.now(), max_tentatives=max_tentatives,
+    )
+    for essai in range(TENTATIVES_CLE):
+        try:
+            with transaction.atomic():
+                tache = Tache.objects.create(**valeurs)
+            break
+        except IntegrityError:
+            if not cle:
+                raise
+            existante = Tache.objects.filter(
+                cle=cle, statut__in=[Tache.Statut.EN_ATTENTE, Tache.Statut.EN_COURS]
+            ).first()
+            if existante is not None:
+                return existante
+            if essai == TENTATIVES_CLE - 1:
+                raise
+
+    if getattr(settings, 'TACHES_SYNCHRONE', False):
+        # Mode développement / tests : exécution immédiate, sans worker
+        Tache.objects.filter(pk=tache.pk).update(
+            statut=Tache.Statut.EN_COURS, verrouille_par='synchrone',
+            date_verrouillage=timezone.now(), tentatives=1,
+        )
+        tache.refresh_from_db()
+        executer(tache)
+        tache.refresh_from_db()
+    return tache
+
+
+def _disponibles(maintenant):
+    return Tache.objects.filter(
+        statut=Tache.Statut.EN_ATTENTE, executer_apres__lte=maintenant
+    ).order_by('-priorite', 'executer_apres', 'id')
+
+
+def reserver(worker, nombre=1):
+    """Réserve jusqu'à `nombre` tâches prêtes pour `worker` et les retourne"""
+    maintenant = timezone.now()
+    prises = dict(
+        statut=Tache.Statut.EN_COURS, verrouille_par=worker,
+        date_verrouillage=maintenant, tentatives=F('tentatives') + 1,
+    )
+    connexion = connections[Tache.objects.db]
+
+    if connexion.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(
+                _disponibles(maintenant).select_for_update(skip_locked=True)
+                .values_list('id', flat=True)[:nombre]
+            )
+            Tache.objects.filter(id__in=ids).update(**prises)
+    else:
+        ids = []
+        candidats = list(_disponibles(maintenant).values_list('id', flat=True)[:nombre * FACTEUR_CANDIDATS])
+        for candidat in candidats:
+            if _mettre_a_jour(Tache.objects.filter(id=candidat, statut=Tache.Statut.EN_ATTENTE), **prises):
+                ids.append(candidat)
+                if len(ids) == nombre:
+                    break
+
+    return list(Tache.objects.filter(id__in=ids).order_by('-priorite', 'executer_apres', 'id'))
+
+
+def _resultat_json(resultat):
+    try:
+        json.dumps(resultat, cls=DjangoJSONEncoder)
+        return resultat
+    except (TypeError, ValueError):
+        return str(resultat)
+
+
+def executer(tache):
+    """Exécute une tâche réservée et enregistre son issue"""
+    definition = get_tache(tache.nom)
+    precedente, _courante.tache = getattr(_courante, 'tache', None), tache
+    try:
+        if definition is None:
+            raise TacheInconnue(tache.nom)
+        resultat = definition.fonction(**tache.arguments)
+    except Exception as exc:
+        _echec(tache, exc)
+        return False
+    finally:
+        _courante.tache = precedente
+
+    _mettre_a_jour(
+        Tache.objects.filter(pk=tache.pk, verrouille_par=tache.verrouille_par),
+        statut=Tache.Statut.TERMINEE, resultat=_resultat_json(resultat),
+        derniere_erreur='', date_fin=timezone.now(),
+    )
+    return True
+
+
+def _echec(tache, exc):
+    erreur = ''.join(traceback.format_exception(exc))[-5000:]
+    definitif = isinstance(exc, TacheInconnue) or tache.tentatives >= tache.max_tentatives
+    if definitif:
+        logger.error('Tâche %s #%s échouée définitivement : %s', tache.nom, tache.pk, exc)
+        valeurs = dict(statut=Tache.Statut.ECHOUEE, date_fin=timezone.now())
+    else:
+        logger.warning('Tâche %s #%s en échec (tentative %s) : %s', tache.nom, tache.pk, tache.tentatives, exc)
+        valeurs = dict(
+            statut=Tache.Statut.EN_ATTENTE,
+            executer_apres=timezone.now() + delai_reessai(tache.tentatives),
+        )
+    _mettre_a_jour(
+        Tache.objects.filter(pk=tache.pk, verrouille_par=tache.verrouille_par),
+        derniere_erreur=erreur, verrouille_par='', **valeurs
+    )
+
+
+def prolonger():
+    """
+    Renouvelle le verrou de la tâche exécutée par le thread, pour qu'une
+    longue exécution ne soit pas remise en file comme orpheline. Lève
+    VerrouPerdu si elle l'a déjà été ; sans effet hors d'une tâche.
+    """
+    tache = getattr(_courante, 'tache', None)
+    if tache is None:
+        return
+    renouvele = _mettre_a_jour(
+        Tache.objects.filter(pk=tache.pk, statut=Tache.Statut.EN_COURS, verrouille_par=tache.verrouille_par),
+        date_verrouillage=timezone.now(),
+    )
+    if not renouvele:
+        raise VerrouPerdu(f'Tâche {tache.nom} #{tache.pk} remise en file pendant son exécution')
+
+
+def recuperer_orphelines(delai=None):
+    """
+    Remet en file les tâches restées « en cours » trop longtemps (worker
+    arrêté brutalement). Retourne le nombre de tâches remises en file.
+    """
+    delai = delai or getattr(settings, 'TACHES_DELAI_VERROU', 900)
+    limite = timezone.now() - timedelta(seconds=delai)
+    orphelines = Tache.objects.filter(statut=Tache.Statut.EN_COURS, date_verrouillage__lt=limite)
+    orphelines.filter(tentatives__gte=F('max_tentatives')).update(
+        statut=Tache.Statut.ECHOUEE, date_fin=timezone.now(),
+        derniere_erreur='Worker interrompu pendant l\'exécution',
+    )
+    return orphelines.update(
+        statut=Tache.Statut.EN_ATTENTE, verrouille_par='', executer_apres=timezone.now(),
+    )
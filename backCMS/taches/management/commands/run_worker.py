@@ -0,0 +1,55 @@
+"""
+Commande du worker de tâches de fond
+En continu (service dédié, voir docker-compose.yml) :
+    python manage.py run_worker --concurrence 4
+Ou vidage ponctuel de la file (cron) :
+    * * * * * cd /app && python manage.py run_worker --une-fois
+"""
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from taches.registre import REGISTRE
+from taches.worker import Worker
+
+
+class Command(BaseCommand):
+    help = 'Exécute les tâches de fond enregistrées en base (emails, création de sites, newsletters...)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrence', type=int, default=getattr(settings, 'TACHES_CONCURRENCE', 1),
+            help='Nombre de tâches exécutées en parallèle (threads)',
+        )
+        parser.add_argument(
+            '--intervalle', type=float, default=1.0,
+            help='Attente (s) entre deux consultations d\'une file vide',
+        )
+        parser.add_argument('--une-fois', action='store_true', help='S\'arrête quand la file est vide')
+        parser.add_argument('--max-taches', type=int, help='S\'arrête après ce nombre de tâches')
+
+    def handle(self, *args, **options):
+        worker = Worker(
+            concurrence=options['concurrence'],
+            intervalle=options['intervalle'],
+            une_fois=options['une_fois'],
+            max_taches=options['max_taches'],
+            stdout=self.stdout,
+        )
+
+        def arreter(signum, frame):
+            self.stdout.write(self.style.WARNING('⏹️  Arrêt demandé, fin des tâches en cours...'))
+            worker.arreter()
+
+        signal.signal(signal.SIGINT, arreter)
+        signal.signal(signal.SIGTERM, arreter)
+
+        self.stdout.write(self.style.NOTICE(
+            f"⚙️  Worker {worker.nom} : {worker.concurrence} thread(s), "
+            f"{len(REGISTRE)} tâche(s) déclarée(s)"
+        ))
+        traitees = worker.demarrer()
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {traitees} tâche(s) traitée(s), {worker.reussies} réussie(s)'
+        ))
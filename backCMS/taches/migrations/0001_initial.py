@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-19 12:34
+
+import django.core.serializers.json
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nom', models.CharField(max_length=100, verbose_name='Tâche')),
+                ('arguments', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Arguments')),
+                ('cle', models.CharField(blank=True, max_length=200, verbose_name='Clé')),
+                ('statut', models.CharField(choices=[('en_attente', 'En attente'), ('en_cours', 'En cours'), ('terminee', 'Terminée'), ('echouee', 'Échouée')], default='en_attente', max_length=20, verbose_name='Statut')),
+                ('priorite', models.SmallIntegerField(choices=[(0, 'Basse'), (5, 'Normale'), (10, 'Haute')], default=5, verbose_name='Priorité')),
+                ('executer_apres', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Exécuter après')),
+                ('tentatives', models.PositiveSmallIntegerField(default=0, verbose_name='Tentatives')),
+                ('max_tentatives', models.PositiveSmallIntegerField(default=5, verbose_name='Tentatives max')),
+                ('derniere_erreur', models.TextField(blank=True, verbose_name='Dernière erreur')),
+                ('resultat', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True, verbose_name='Résultat')),
+                ('verrouille_par', models.CharField(blank=True, max_length=200, verbose_name='Worker')),
+                ('date_verrouillage', models.DateTimeField(blank=True, null=True, verbose_name="Début d'exécution")),
+                ('date_creation', models.DateTimeField(auto_now_add=True, verbose_name='Date création')),
+                ('date_fin', models.DateTimeField(blank=True, null=True, verbose_name='Date fin')),
+            ],
+            options={
+                'verbose_name': 'Tâche',
+                'verbose_name_plural': 'Tâches',
+                'ordering': ['-date_creation'],
+                'indexes': [models.Index(condition=models.Q(('statut', 'en_attente')), fields=['-priorite', 'executer_apres', 'id'], name='tache_file_idx'), models.Index(condition=models.Q(('statut', 'en_cours')), fields=['date_verrouillage'], name='tache_en_cours_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='tache',
+            constraint=models.UniqueConstraint(condition=models.Q(('statut__in', ['en_attente', 'en_cours']), models.Q(('cle', ''), _negated=True)), fields=('cle',), name='tache_cle_active_unique'),
+        ),
+    ]
@@ -0,0 +1,72 @@
+"""
+Tâches - File de tâches en base de données
+Les traitements lents sont enregistrés ici par les vues puis exécutés par
+`manage.py run_worker`, sans broker externe.
+"""
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+
+class Tache(models.Model):
+    """Une exécution différée d'une fonction déclarée avec @tache"""
+
+    class Statut(models.TextChoices):
+        EN_ATTENTE = 'en_attente', 'En attente'
+        EN_COURS = 'en_cours', 'En cours'
+        TERMINEE = 'terminee', 'Terminée'
+        ECHOUEE = 'echouee', 'Échouée'
+
+    class Priorite(models.IntegerChoices):
+        BASSE = 0, 'Basse'
+        NORMALE = 5, 'Normale'
+        HAUTE = 10, 'Haute'
+
+    nom = models.CharField('Tâche', max_length=100)
+    arguments = models.JSONField('Arguments', default=dict, encoder=DjangoJSONEncoder)
+    # Clé d'unicité optionnelle : une seule tâche active (en attente / en cours) par clé
+    cle = models.CharField('Clé', max_length=200, blank=True)
+
+    statut = models.CharField('Statut', max_length=20, choices=Statut.choices, default=Statut.EN_ATTENTE)
+    priorite = models.SmallIntegerField('Priorité', choices=Priorite.choices, default=Priorite.NORMALE)
+    executer_apres = models.DateTimeField('Exécuter après', default=timezone.now)
+
+    tentatives = models.PositiveSmallIntegerField('Tentatives', default=0)
+    max_tentatives = models.PositiveSmallIntegerField('Tentatives max', default=5)
+    derniere_erreur = models.TextField('Dernière erreur', blank=True)
+    resultat = models.JSONField('Résultat', null=True, blank=True, encoder=DjangoJSONEncoder)
+
+    verrouille_par = models.CharField('Worker', max_length=200, blank=True)
+    date_verrouillage = models.DateTimeField('Début d\'exécution', null=True, blank=True)
+    date_creation = models.DateTimeField('Date création', auto_now_add=True)
+    date_fin = models.DateTimeField('Date fin', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Tâche'
+        verbose_name_plural = 'Tâches'
+        ordering = ['-date_creation']
+        indexes = [
+            # Réservation : tâches prêtes par priorité puis ancienneté
+            models.Index(
+                fields=['-priorite', 'executer_apres', 'id'],
+                condition=Q(statut='en_attente'),
+                name='tache_file_idx',
+            ),
+            # Récupération des tâches d'un worker arrêté brutalement
+            models.Index(
+                fields=['date_verrouillage'],
+                condition=Q(statut='en_cours'),
+                name='tache_en_cours_idx',
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['cle'],
+                condition=Q(statut__in=['en_attente', 'en_cours']) & ~Q(cle=''),
+                name='tache_cle_active_unique',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.nom} #{self.pk} ({self.get_statut_display()})"
@@ -0,0 +1,57 @@
+"""
+Tâches - Déclaration des tâches
+
+    from taches.registre import tache
+
+    @tache('communes.creer_site', max_tentatives=3)
+    def creer_site(demande_id):
+        ...
+
+    creer_site.differer(demande_id=42)   # mise en file
+    creer_site(demande_id=42)            # appel direct
+
+Les arguments doivent être sérialisables en JSON (identifiants plutôt
+qu'instances de modèles).
+"""
+from .models import Tache
+
+
+REGISTRE = {}
+
+
+class DefinitionTache:
+    """Fonction enregistrée comme tâche et ses options par défaut"""
+
+    def __init__(self, nom, fonction, priorite=Tache.Priorite.NORMALE, max_tentatives=5):
+        self.nom = nom
+        self.fonction = fonction
+        self.priorite = priorite
+        self.max_tentatives = max_tentatives
+        self.__doc__ = fonction.__doc__
+
+    def __call__(self, *args, **kwargs):
+        return self.fonction(*args, **kwargs)
+
+    def differer(self, cle='', priorite=None, executer_apres=None, **arguments):
+        """Met la tâche en file ; retourne la Tache (existante si `cle` est déjà active)"""
+        from .file import enfiler
+        return enfiler(
+            self.nom, arguments, cle=cle,
+            priorite=self.priorite if priorite is None else priorite,
+            executer_apres=executer_apres,
+            max_tentatives=self.max_tentatives,
+        )
+
+
+def tache(nom, **options):
+    """Décorateur : enregistre une fonction sous `nom`"""
+    def enregistrer(fonction):
+        if nom in REGISTRE and REGISTRE[nom].fonction is not fonction:
+            raise ValueError(f'Tâche déjà déclarée : {nom}')
+        REGISTRE[nom] = DefinitionTache(nom, fonction, **options)
+        return REGISTRE[nom]
+    return enregistrer
+
+
+def get_tache(nom):
+    return REGISTRE.get(nom)
@@ -0,0 +1,203 @@
+"""
+Tests pour le module Tâches - File de tâches de fond
+"""
+from datetime import timedelta
+from io import StringIO
+
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from communes.models import Commune, Departement, DemandeCreationSite, Region
+from communes.taches import creer_site
+from core.models import TokenVerification
+
+from .file import delai_reessai, enfiler, executer, recuperer_orphelines, reserver
+from .models import Tache
+from .registre import tache
+
+
+APPELS = []
+
+
+@tache('tests.ajouter')
+def ajouter(a, b):
+    APPELS.append((a, b))
+    return a + b
+
+
+@tache('tests.echouer', max_tentatives=2)
+def echouer():
+    raise RuntimeError('service indisponible')
+
+
+class FileTest(TestCase):
+    """Tests de mise en file, réservation et exécution"""
+
+    def setUp(self):
+        APPELS.clear()
+
+    def test_differer_et_executer(self):
+        """Test mise en file puis exécution par un worker"""
+        tache_ = ajouter.differer(a=2, b=3)
+        self.assertEqual(tache_.statut, Tache.Statut.EN_ATTENTE)
+        self.assertEqual(APPELS, [])
+
+        reservees = reserver('test')
+        self.assertEqual([t.pk for t in reservees], [tache_.pk])
+        self.assertEqual(reservees[0].statut, Tache.Statut.EN_COURS)
+        self.assertEqual(reservees[0].tentatives, 1)
+        self.assertEqual(reserver('autre'), [])
+
+        self.assertTrue(executer(reservees[0]))
+        tache_.refresh_from_db()
+        self.assertEqual(tache_.statut, Tache.Statut.TERMINEE)
+        self.assertEqual(tache_.resultat, 5)
+        self.assertEqual(APPELS, [(2, 3)])
+
+    def test_cle_deduplique(self):
+        """Test une clé active ne crée qu'une tâche"""
+        premiere = ajouter.differer(cle='unique', a=1, b=1)
+        seconde = ajouter.differer(cle='unique', a=1, b=1)
+        self.assertEqual(premiere.pk, seconde.pk)
+        self.assertEqual(Tache.objects.count(), 1)
+
+        # Une fois terminée, la clé peut être réutilisée
+        executer(reserver('test')[0])
+        troisieme = ajouter.differer(cle='unique', a=1, b=1)
+        self.assertNotEqual(troisieme.pk, premiere.pk)
+
+    def test_cle_terminee_pendant_la_mise_en_file(self):
+        """Test tâche active terminée entre l'INSERT refusé et sa lecture : nouvel essai"""
+        premiere = ajouter.differer(cle='unique', a=1, b=1)
+        lectures = []
+
+        def terminer_avant_lecture(execute, sql, params, many, context):
+            if not lectures and sql.startswith('SELECT') and Tache._meta.db_table in sql:
+                lectures.append(sql)
+                Tache.objects.filter(pk=premiere.pk).update(statut=Tache.Statut.TERMINEE)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(terminer_avant_lecture):
+            seconde = ajouter.differer(cle='unique', a=1, b=1)
+        self.assertEqual(len(lectures), 1)
+        self.assertNotEqual(seconde.pk, premiere.pk)
+        self.assertEqual(seconde.statut, Tache.Statut.EN_ATTENTE)
+
+    def test_priorite_et_planification(self):
+        """Test ordre de réservation : priorité puis date"""
+        basse = ajouter.differer(priorite=Tache.Priorite.BASSE, a=0, b=0)
+        haute = ajouter.differer(priorite=Tache.Priorite.HAUTE, a=0, b=0)
+        ajouter.differer(executer_apres=timezone.now() + timedelta(hours=1), a=0, b=0)
+
+        self.assertEqual([t.pk for t in reserver('test', nombre=5)], [haute.pk, basse.pk])
+
+    def test_reessai_avec_delai(self):
+        """Test échec replanifié puis échec définitif"""
+        tache_ = echouer.differer()
+        avant = timezone.now()
+        self.assertFalse(executer(reserver('test')[0]))
+        tache_.refresh_from_db()
+        self.assertEqual(tache_.statut, Tache.Statut.EN_ATTENTE)
+        self.assertIn('service indisponible', tache_.derniere_erreur)
+        self.assertGreater(tache_.executer_apres, avant)
+        self.assertEqual(reserver('test'), [])
+
+        Tache.objects.filter(pk=tache_.pk).update(executer_apres=timezone.now())
+        self.assertFalse(executer(reserver('test')[0]))
+        tache_.refresh_from_db()
+        self.assertEqual(tache_.statut, Tache.Statut.ECHOUEE)
+        self.assertEqual(tache_.tentatives, 2)
+
+    def test_delai_exponentiel_plafonne(self):
+        """Test délai de réessai"""
+        with override_settings(TACHES_DELAI_REESSAI=10, TACHES_DELAI_REESSAI_MAX=100):
+            self.assertLessEqual(delai_reessai(1).total_seconds(), 12)
+            self.assertGreaterEqual(delai_reessai(3).total_seconds(), 32)
+            self.assertLessEqual(delai_reessai(10).total_seconds(), 120)
+
+    def test_tache_inconnue(self):
+        """Test une tâche sans fonction échoue sans réessai"""
+        tache_ = enfiler('tests.inexistante')
+        self.assertFalse(executer(reserver('test')[0]))
+        tache_.refresh_from_db()
+        self.assertEqual(tache_.statut, Tache.Statut.ECHOUEE)
+
+    def test_recuperer_orphelines(self):
+        """Test remise en file des tâches d'un worker interrompu"""
+        tache_ = ajouter.differer(a=1, b=2)
+        reserver('test')
+        Tache.objects.filter(pk=tache_.pk).update(
+            date_verrouillage=timezone.now() - timedelta(hours=1)
+        )
+        self.assertEqual(recuperer_orphelines(delai=60), 1)
+        tache_.refresh_from_db()
+        self.assertEqual(tache_.statut, Tache.Statut.EN_ATTENTE)
+
+    @override_settings(TACHES_SYNCHRONE=True)
+    def test_mode_synchrone(self):
+        """Test exécution immédiate sans worker"""
+        tache_ = ajouter.differer(a=4, b=4)
+        self.assertEqual(tache_.statut, Tache.Statut.TERMINEE)
+        self.assertEqual(APPELS, [(4, 4)])
+
+    def test_commande_run_worker(self):
+        """Test run_worker --une-fois vide la file"""
+        for i in range(3):
+            ajouter.differer(a=i, b=i)
+        out = StringIO()
+        call_command('run_worker', '--une-fois', '--concurrence', '1', stdout=out)
+        self.assertIn('3 tâche(s) traitée(s)', out.getvalue())
+        self.assertEqual(Tache.objects.filter(statut=Tache.Statut.TERMINEE).count(), 3)
+
+
+class WorkerConcurrentTest(TransactionTestCase):
+    """Tests de réservation concurrente"""
+
+    def test_aucune_tache_executee_deux_fois(self):
+        """Test plusieurs threads se partagent la file sans doublon"""
+        APPELS.clear()
+        for i in range(20):
+            ajouter.differer(a=i, b=0)
+        call_command('run_worker', '--une-fois', '--concurrence', '4', stdout=StringIO())
+
+        self.assertEqual(Tache.objects.filter(statut=Tache.Statut.TERMINEE).count(), 20)
+        self.assertEqual(sorted(a for a, _ in APPELS), list(range(20)))
+
+
+class CreationSiteTacheTest(TestCase):
+    """Tests de la création de site en tâche de fond"""
+
+    def setUp(self):
+        region = Region.objects.create(nom='Centre', code='CE')
+        self.demande = DemandeCreationSite.objects.create(
+            nom_commune='Obala',
+            departement=Departement.objects.create(region=region, nom='Lekié', code='LK'),
+            adresse='Mairie',
+            nom_referent='Referent',
+            fonction_referent='Maire',
+            email_referent='maire@obala.cm',
+            telephone_referent='+237 600 000 000',
+            accepte_charte=True,
+            accepte_confidentialite=True,
+        )
+
+    def test_creer_site_envoie_lien_acces(self):
+        """Test création du site puis email de premier accès"""
+        creer_site.differer(demande_id=self.demande.id)
+        call_command('run_worker', '--une-fois', '--concurrence', '1', stdout=StringIO())
+        call_command('envoyer_emails', '--une-fois', stdout=StringIO())
+
+        self.demande.refresh_from_db()
+        self.assertEqual(self.demande.statut, DemandeCreationSite.Statut.VALIDEE)
+        self.assertTrue(Commune.objects.filter(nom='Obala').exists())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['maire@obala.cm'])
+        token = TokenVerification.objects.get(utilisateur__email='maire@obala.cm')
+        self.assertIn(f'/reset-password?token={token.token}', mail.outbox[0].body)
+        self.assertFalse(Tache.objects.exclude(statut=Tache.Statut.TERMINEE).exists())
+
+        # Nouvelle exécution (réessai) sans effet
+        self.assertTrue(creer_site(demande_id=self.demande.id)['deja_traitee'])
@@ -0,0 +1,111 @@
+"""
+Tâches - Worker : exécute les tâches de la file avec N threads
+Chaque thread réserve une tâche à la fois (et sa propre connexion à la base).
+"""
+import os
+import random
+import socket
+import threading
+import time
+
+from django.db import OperationalError, close_old_connections, connection
+
+from .file import executer, recuperer_orphelines, reserver
+
+
+# Intervalle entre deux récupérations des tâches orphelines (s)
+INTERVALLE_RECUPERATION = 60
+
+
+class Worker:
+    """Boucle de traitement de la file, arrêtable proprement via `arreter()`"""
+
+    def __init__(self, concurrence=1, intervalle=1.0, une_fois=False, max_taches=None, stdout=None):
+        self.concurrence = max(1, concurrence)
+        self.intervalle = intervalle
+        self.une_fois = une_fois
+        self.max_taches = max_taches
+        self.stdout = stdout
+        self.nom = f'{socket.gethostname()}:{os.getpid()}'
+        self.arret = threading.Event()
+        self._verrou = threading.Lock()
+        self.traitees = 0
+        self.reussies = 0
+        self._derniere_recuperation = 0.0
+
+    def arreter(self):
+        """Termine les tâches en cours puis s'arrête"""
+        self.arret.set()
+
+    def demarrer(self):
+        """Traite la file jusqu'à l'arrêt (ou file vide avec une_fois) ; retourne le nombre de tâches traitées"""
+        self._recuperer()
+        if self.concurrence == 1:
+            self._boucle(0)
+        else:
+            threads = [
+                threading.Thread(target=self._boucle, args=(numero,), name=f'worker-{numero}')
+                for numero in range(self.concurrence)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        return self.traitees
+
+    def _recuperer(self):
+        with self._verrou:
+            if time.monotonic() - self._derniere_recuperation < INTERVALLE_RECUPERATION:
+                return
+            self._derniere_recuperation = time.monotonic()
+        recuperees = recuperer_orphelines()
+        if recuperees and self.stdout:
+            self.stdout.write(f'  {recuperees} tâche(s) orpheline(s) remise(s) en file')
+
+    def _reserver_place(self):
+        """Compte une tâche de plus ; False si max_taches est atteint"""
+        with self._verrou:
+            if self.max_taches is not None and self.traitees >= self.max_taches:
+                return False
+            self.traitees += 1
+            return True
+
+    def _boucle(self, numero):
+        nom = f'{self.nom}:{numero}'
+        try:
+            while not self.arret.is_set():
+                close_old_connections()
+                if not self._reserver_place():
+                    self.arret.set()
+                    break
+                try:
+                    taches = reserver(nom)
+                except OperationalError:
+                    # Base occupée par un autre worker (SQLite) : on réessaie
+                    with self._verrou:
+                        self.traitees -= 1
+                    self.arret.wait(random.uniform(0.01, 0.1))
+                    continue
+                if not taches:
+                    with self._verrou:
+                        self.traitees -= 1
+                    if self.une_fois:
+                        break
+                    self._recuperer()
+                    self.arret.wait(self.intervalle)
+                    continue
+
+                tache = taches[0]
+                debut = time.monotonic()
+                reussie = executer(tache)
+                with self._verrou:
+                    self.reussies += int(reussie)
+                if self.stdout:
+                    self.stdout.write(
+                        f"  {'✓' if reussie else '✗'} {tache.nom} #{tache.pk} "
+                        f"({time.monotonic() - debut:.2f}s, tentative {tache.tentatives}/{tache.max_tentatives})"
+                    )
+        finally:
+            if numero or self.concurrence > 1:
+                # Connexion propre au thread
+                connection.close()
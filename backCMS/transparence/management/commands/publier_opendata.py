@@ -0,0 +1,36 @@
+"""
+Commande pour publier les jeux de données ouvertes de la transparence
+À planifier (cron), par exemple toutes les heures :
+    0 * * * * cd /app && python manage.py publier_opendata
+"""
+from django.core.management.base import BaseCommand
+
+from transparence.opendata import get_racine, parquet_disponible, publier
+
+
+class Command(BaseCommand):
+    help = 'Publie les instantanés open data (par commune et national) des données de transparence'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--commune',
+            action='append',
+            help='Slug de commune à recalculer (répétable, toutes par défaut)',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help='Régénère les fichiers même si le contenu n\'a pas changé',
+        )
+
+    def handle(self, *args, **options):
+        formats = 'CSV, NDJSON' + (', Parquet' if parquet_disponible() else '')
+        self.stdout.write(self.style.NOTICE(f'📦 Publication open data ({formats}) dans {get_racine()}...'))
+        regeneres, inchanges = publier(
+            communes=options['commune'],
+            force=options['force'],
+            stdout=self.stdout if options['verbosity'] > 1 else None,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ {regeneres} jeu(x) régénéré(s), {inchanges} inchangé(s)'
+        ))
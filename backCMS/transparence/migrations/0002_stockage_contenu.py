@@ -0,0 +1,24 @@
+# Generated by Django 4.2.30 on 2026-10-19 13:01
+
+from django.db import migrations, models
+import medias.stockage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transparence', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='deliberation',
+            name='fichier',
+            field=models.FileField(storage=medias.stockage.stockage_contenu, upload_to='deliberations/', verbose_name='Fichier PDF'),
+        ),
+        migrations.AlterField(
+            model_name='documentofficiel',
+            name='fichier',
+            field=models.FileField(storage=medias.stockage.stockage_contenu, upload_to='documents/', verbose_name='Fichier'),
+        ),
+    ]
@@ -6,6 +6,8 @@ from django.conf import settings
 from django.utils.text import slugify
 from decimal import Decimal
 
+from medias.stockage import stockage_contenu
+
 
 class Projet(models.Model):
     """Projets municipaux avec suivi budget et avancement"""
@@ -85,7 +87,7 @@ class Deliberation(models.Model):
     resume = models.TextField('Resume', blank=True)
     
     date_seance = models.DateField('Date de seance')
-    fichier = models.FileField('Fichier PDF', upload_to='deliberations/')
+    fichier = models.FileField('Fichier PDF', upload_to='deliberations/', storage=stockage_contenu)
     
     est_publie = models.BooleanField('Publie', default=True)
     date_creation = models.DateTimeField('Date creation', auto_now_add=True)
@@ -148,7 +150,7 @@ class DocumentOfficiel(models.Model):
     titre = models.CharField('Titre', max_length=255)
     type_document = models.CharField('Type', max_length=50, choices=TypeDocument.choices, default=TypeDocument.AUTRE)
     description = models.TextField('Description', blank=True)
-    fichier = models.FileField('Fichier', upload_to='documents/')
+    fichier = models.FileField('Fichier', upload_to='documents/', storage=stockage_contenu)
     
     categorie = models.CharField('Categorie', max_length=100, blank=True)
     numero_reference = models.CharField('Numero de reference', max_length=100, blank=True)
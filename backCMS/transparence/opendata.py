@@ -0,0 +1,332 @@
+"""
+Transparence - Publication des jeux de données ouvertes (open data)
+
+Instantanés par commune et national des projets, délibérations, documents
+budgétaires et documents officiels publics, en CSV et NDJSON compressés
+(gzip), et en Parquet si pyarrow est installé.
+
+Chaque jeu est identifié par l'empreinte SHA-256 de son contenu : les
+fichiers portent cette empreinte dans leur nom (cache immuable) et ne sont
+régénérés que si les lignes ont changé. Le manifeste index.json décrit les
+fichiers courants ; il est servi avec les médias, sans passer par l'API.
+"""
+import csv
+import gzip
+import hashlib
+import io
+import json
+import os
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.conf import settings
+from django.utils import timezone
+
+from communes.models import Commune
+from .models import Projet, Deliberation, DocumentBudgetaire, DocumentOfficiel
+
+
+# Incrémenter pour forcer la régénération si le format des fichiers change
+VERSION_FORMAT = 1
+
+PERIMETRE_NATIONAL = 'national'
+NOM_MANIFESTE = 'index.json'
+TAILLE_LOT = 2000
+
+
+@dataclass
+class JeuDeDonnees:
+    """Un jeu de données publié (un modèle, des colonnes, un filtre de visibilité)"""
+    nom: str
+    modele: type
+    champs: list
+    filtre: dict = field(default_factory=dict)
+    # Champs fichier : publiés sous forme d'URL
+    champs_fichier: tuple = ()
+
+    def queryset(self, commune_id=None):
+        queryset = self.modele.objects.filter(commune__statut=Commune.Statut.ACTIVE, **self.filtre)
+        if commune_id is not None:
+            queryset = queryset.filter(commune_id=commune_id)
+        return queryset.order_by('commune_id', 'pk')
+
+    def lignes(self, commune_id=None):
+        """Lignes sérialisées (valeurs JSON) lues par lots"""
+        for ligne in self.queryset(commune_id).values_list(*self.champs).iterator(chunk_size=TAILLE_LOT):
+            yield [self._valeur(champ, valeur) for champ, valeur in zip(self.champs, ligne)]
+
+    def _valeur(self, champ, valeur):
+        if champ in self.champs_fichier:
+            return f'{settings.MEDIA_URL}{valeur}' if valeur else None
+        if isinstance(valeur, Decimal):
+            return str(valeur)
+        if hasattr(valeur, 'isoformat'):
+            return valeur.isoformat()
+        return valeur
+
+
+JEUX = [
+    JeuDeDonnees(
+        nom='projets',
+        modele=Projet,
+        champs=[
+            'id', 'commune_id', 'commune__slug', 'titre', 'description', 'categorie', 'statut',
+            'budget', 'budget_depense', 'avancement', 'date_debut', 'date_fin', 'date_fin_reelle',
+            'lieu', 'latitude', 'longitude', 'date_creation',
+        ],
+        filtre={'est_public': True},
+    ),
+    JeuDeDonnees(
+        nom='deliberations',
+        modele=Deliberation,
+        champs=['id', 'commune_id', 'commune__slug', 'numero', 'titre', 'resume', 'date_seance', 'fichier'],
+        filtre={'est_publie': True},
+        champs_fichier=('fichier',),
+    ),
+    JeuDeDonnees(
+        nom='documents_budgetaires',
+        modele=DocumentBudgetaire,
+        champs=[
+            'id', 'commune_id', 'commune__slug', 'type_document', 'titre', 'annee',
+            'description', 'montant_total', 'fichier',
+        ],
+        filtre={'est_publie': True},
+        champs_fichier=('fichier',),
+    ),
+    JeuDeDonnees(
+        nom='documents_officiels',
+        modele=DocumentOfficiel,
+        champs=[
+            'id', 'commune_id', 'commune__slug', 'titre', 'type_document', 'categorie',
+            'numero_reference', 'date_document', 'description', 'fichier',
+        ],
+        filtre={'est_public': True},
+        champs_fichier=('fichier',),
+    ),
+]
+
+
+def get_racine():
+    return str(getattr(settings, 'OPENDATA_ROOT', os.path.join(settings.MEDIA_ROOT, 'opendata')))
+
+
+def get_url_racine():
+    return getattr(settings, 'OPENDATA_URL', f'{settings.MEDIA_URL}opendata/')
+
+
+def parquet_disponible():
+    return getattr(settings, 'PYARROW_AVAILABLE', False)
+
+
+def empreinte(jeu, commune_id=None):
+    """SHA-256 du contenu du jeu (colonnes + lignes), sans écrire de fichier"""
+    sha = hashlib.sha256(json.dumps([VERSION_FORMAT, jeu.champs]).encode())
+    nombre = 0
+    for ligne in jeu.lignes(commune_id):
+        sha.update(json.dumps(ligne, ensure_ascii=False).encode())
+        sha.update(b'\n')
+        nombre += 1
+    return sha.hexdigest(), nombre
+
+
+def _ouvrir_gzip(chemin):
+    # mtime=0 : un même contenu donne un fichier identique octet pour octet
+    brut = open(chemin, 'wb')
+    return io.TextIOWrapper(
+        gzip.GzipFile(filename='', mode='wb', fileobj=brut, mtime=0),
+        encoding='utf-8', newline='',
+    ), brut
+
+
+def _ecrire(chemin, ecrire_lignes):
+    """Écrit dans un fichier temporaire puis le renomme (jamais de fichier partiel servi)"""
+    temporaire = f'{chemin}.tmp'
+    sortie, brut = _ouvrir_gzip(temporaire)
+    try:
+        ecrire_lignes(sortie)
+    finally:
+        sortie.close()
+        brut.close()
+    os.replace(temporaire, chemin)
+
+
+def ecrire_csv(chemin, jeu, lignes):
+    def ecrire_lignes(sortie):
+        writer = csv.writer(sortie)
+        writer.writerow(jeu.champs)
+        writer.writerows(('' if valeur is None else valeur for valeur in ligne) for ligne in lignes)
+    _ecrire(chemin, ecrire_lignes)
+
+
+def ecrire_ndjson(chemin, jeu, lignes):
+    def ecrire_lignes(sortie):
+        for ligne in lignes:
+            sortie.write(json.dumps(dict(zip(jeu.champs, ligne)), ensure_ascii=False))
+            sortie.write('\n')
+    _ecrire(chemin, ecrire_lignes)
+
+
+def ecrire_parquet(chemin, jeu, lignes):
+    """Parquet (colonnes texte), écrit par groupes de lignes"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([(champ, pa.string()) for champ in jeu.champs])
+    temporaire = f'{chemin}.tmp'
+    with pq.ParquetWriter(temporaire, schema, compression='zstd') as writer:
+        lot = []
+        for ligne in lignes:
+            lot.append(ligne)
+            if len(lot) >= TAILLE_LOT:
+                writer.write_table(_table(pa, schema, lot))
+                lot = []
+        if lot:
+            writer.write_table(_table(pa, schema, lot))
+    os.replace(temporaire, chemin)
+
+
+def _table(pa, schema, lot):
+    colonnes = list(zip(*lot))
+    return pa.table(
+        [[None if valeur is None else str(valeur) for valeur in colonne] for colonne in colonnes],
+        schema=schema,
+    )
+
+
+FORMATS = {
+    'csv': ('csv.gz', ecrire_csv),
+    'ndjson': ('ndjson.gz', ecrire_ndjson),
+    'parquet': ('parquet', ecrire_parquet),
+}
+
+
+def lire_manifeste():
+    chemin = os.path.join(get_racine(), NOM_MANIFESTE)
+    try:
+        with open(chemin, encoding='utf-8') as fichier:
+            return json.load(fichier)
+    except (OSError, ValueError):
+        return {'perimetres': {}}
+
+
+def ecrire_manifeste(manifeste):
+    chemin = os.path.join(get_racine(), NOM_MANIFESTE)
+    temporaire = f'{chemin}.tmp'
+    with open(temporaire, 'w', encoding='utf-8') as fichier:
+        json.dump(manifeste, fichier, ensure_ascii=False, indent=2)
+    os.replace(temporaire, chemin)
+
+
+def _publier_jeu(perimetre, jeu, hash_contenu, nombre, precedent, commune_id, force, formats):
+    """Écrit les fichiers d'un jeu si son contenu a changé ; retourne (entrée, regénéré)"""
+    dossier = os.path.join(get_racine(), perimetre)
+    if not force and precedent and precedent.get('sha256') == hash_contenu \
+            and set(precedent.get('fichiers', {})) == set(formats) \
+            and all(
+                os.path.exists(os.path.join(dossier, fichier['url'].rsplit('/', 1)[-1]))
+                for fichier in precedent['fichiers'].values()
+            ):
+        return precedent, False
+
+    os.makedirs(dossier, exist_ok=True)
+    fichiers = {}
+    for nom_format in formats:
+        extension, ecrire = FORMATS[nom_format]
+        nom_fichier = f'{jeu.nom}.{hash_contenu[:16]}.{extension}'
+        chemin = os.path.join(dossier, nom_fichier)
+        if force or not os.path.exists(chemin):
+            ecrire(chemin, jeu, jeu.lignes(commune_id))
+        fichiers[nom_format] = {
+            'url': f'{get_url_racine()}{perimetre}/{nom_fichier}',
+            'taille': os.path.getsize(chemin),
+        }
+    return {
+        'sha256': hash_contenu,
+        'lignes': nombre,
+        'colonnes': jeu.champs,
+        'date_generation': timezone.now().isoformat(),
+        'fichiers': fichiers,
+    }, True
+
+
+def publier(communes=None, force=False, stdout=None):
+    """
+    Publie les instantanés par commune puis nationaux.
+    Retourne (nombre de jeux régénérés, nombre de jeux inchangés).
+    """
+    formats = ['csv', 'ndjson'] + (['parquet'] if parquet_disponible() else [])
+    os.makedirs(get_racine(), exist_ok=True)
+    manifeste = lire_manifeste()
+    anciens = manifeste.get('perimetres', {})
+    perimetres = {}
+    regeneres = inchanges = 0
+
+    queryset = Commune.objects.filter(statut=Commune.Statut.ACTIVE).order_by('id')
+    liste_communes = list(queryset.values_list('id', 'slug'))
+    selection = set(communes) if communes else None
+
+    empreintes_nationales = {jeu.nom: hashlib.sha256() for jeu in JEUX}
+    lignes_nationales = dict.fromkeys(empreintes_nationales, 0)
+
+    for commune_id, slug in liste_communes:
+        perimetres[slug] = {}
+        for jeu in JEUX:
+            precedent = anciens.get(slug, {}).get(jeu.nom)
+            if selection is not None and slug not in selection and precedent:
+                # Commune hors sélection : on reprend l'empreinte connue
+                entree, regenere = precedent, False
+            else:
+                hash_contenu, nombre = empreinte(jeu, commune_id)
+                entree, regenere = _publier_jeu(
+                    slug, jeu, hash_contenu, nombre, precedent, commune_id, force, formats
+                )
+            perimetres[slug][jeu.nom] = entree
+            regeneres += regenere
+            inchanges += not regenere
+            empreintes_nationales[jeu.nom].update(entree['sha256'].encode())
+            lignes_nationales[jeu.nom] += entree['lignes']
+        if stdout:
+            stdout.write(f'  {slug}: ok')
+
+    # National : l'empreinte combine celles des communes (aucune relecture si rien n'a changé)
+    perimetres[PERIMETRE_NATIONAL] = {}
+    for jeu in JEUX:
+        hash_contenu = hashlib.sha256(
+            f'{VERSION_FORMAT}:{empreintes_nationales[jeu.nom].hexdigest()}'.encode()
+        ).hexdigest()
+        precedent = anciens.get(PERIMETRE_NATIONAL, {}).get(jeu.nom)
+        entree, regenere = _publier_jeu(
+            PERIMETRE_NATIONAL, jeu, hash_contenu, lignes_nationales[jeu.nom],
+            precedent, None, force, formats
+        )
+        perimetres[PERIMETRE_NATIONAL][jeu.nom] = entree
+        regeneres += regenere
+        inchanges += not regenere
+
+    ecrire_manifeste({
+        'version': VERSION_FORMAT,
+        'date_publication': timezone.now().isoformat(),
+        'perimetres': perimetres,
+    })
+    nettoyer(perimetres)
+    return regeneres, inchanges
+
+
+def nettoyer(perimetres):
+    """Supprime les fichiers qui ne sont plus référencés par le manifeste"""
+    racine = get_racine()
+    references = {
+        (nom_perimetre, fichier['url'].rsplit('/', 1)[-1])
+        for nom_perimetre, perimetre in perimetres.items()
+        for entree in perimetre.values()
+        for fichier in entree['fichiers'].values()
+    }
+    for dossier in os.listdir(racine):
+        chemin_dossier = os.path.join(racine, dossier)
+        if not os.path.isdir(chemin_dossier):
+            continue
+        for nom_fichier in os.listdir(chemin_dossier):
+            if (dossier, nom_fichier) not in references:
+                os.remove(os.path.join(chemin_dossier, nom_fichier))
+        if not os.listdir(chemin_dossier):
+            os.rmdir(chemin_dossier)
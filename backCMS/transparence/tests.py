@@ -1,7 +1,16 @@
 """
 Tests pour le module Transparence (Projets, Délibérations, Budget)
 """
-from django.test import TestCase
+import csv
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
 from django.utils import timezone
 from django.contrib.auth import get_user_model
 from rest_framework.test import APITestCase, APIClient
@@ -12,6 +21,7 @@ from datetime import timedelta
 
 from communes.models import Region, Departement, Commune
 from transparence.models import Projet, Deliberation, DocumentBudgetaire, DocumentOfficiel
+from transparence.opendata import lire_manifeste, publier
 
 Utilisateur = get_user_model()
 
@@ -267,3 +277,77 @@ class DeliberationAPITest(APITestCase):
         response = self.client.get('/api/v1/deliberations/')
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data['results']), 1)
+
+
+class OpenDataTest(TestCase):
+    """Tests pour la publication des jeux de données ouvertes"""
+    
+    def setUp(self):
+        self.racine = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.racine)
+        reglages = override_settings(OPENDATA_ROOT=self.racine, PYARROW_AVAILABLE=False)
+        reglages.enable()
+        self.addCleanup(reglages.disable)
+        
+        self.commune = Commune.objects.create(nom='Yaoundé 1er', slug='yaounde-1', statut=Commune.Statut.ACTIVE)
+        self.autre = Commune.objects.create(nom='Douala 3ème', slug='douala-3', statut=Commune.Statut.ACTIVE)
+        self.projet = self.creer_projet(self.commune, 'Route')
+        self.creer_projet(self.autre, 'Marché')
+        self.creer_projet(self.commune, 'Projet interne', est_public=False)
+    
+    def creer_projet(self, commune, titre, est_public=True):
+        return Projet.objects.create(
+            commune=commune, titre=titre, slug=titre.lower(), description='Description',
+            budget=Decimal('1000.50'), date_debut=timezone.now().date(),
+            date_fin=timezone.now().date(), est_public=est_public
+        )
+    
+    def fichier(self, manifeste, perimetre, jeu, format_fichier):
+        url = manifeste['perimetres'][perimetre][jeu]['fichiers'][format_fichier]['url']
+        return os.path.join(self.racine, perimetre, url.rsplit('/', 1)[-1])
+    
+    def test_publication_initiale(self):
+        """Test génération des instantanés par commune et national"""
+        regeneres, inchanges = publier()
+        self.assertEqual((regeneres, inchanges), (12, 0))
+        manifeste = lire_manifeste()
+        self.assertEqual(manifeste['perimetres']['yaounde-1']['projets']['lignes'], 1)
+        self.assertEqual(manifeste['perimetres']['national']['projets']['lignes'], 2)
+        
+        with gzip.open(self.fichier(manifeste, 'national', 'projets', 'csv'), 'rt', encoding='utf-8') as f:
+            lignes = list(csv.DictReader(f))
+        self.assertEqual([ligne['titre'] for ligne in lignes], ['Route', 'Marché'])
+        self.assertEqual(lignes[0]['budget'], '1000.50')
+        
+        with gzip.open(self.fichier(manifeste, 'douala-3', 'projets', 'ndjson'), 'rt', encoding='utf-8') as f:
+            self.assertEqual(json.loads(f.readline())['commune__slug'], 'douala-3')
+    
+    def test_regeneration_uniquement_si_changement(self):
+        """Test qu'un contenu inchangé n'est pas réécrit et qu'un changement ne touche que son périmètre"""
+        publier()
+        ancien = lire_manifeste()
+        self.assertEqual(publier(), (0, 12))
+        
+        self.projet.avancement = 80
+        self.projet.save()
+        self.assertEqual(publier(), (2, 10))
+        
+        manifeste = lire_manifeste()
+        for perimetre in ('yaounde-1', 'national'):
+            self.assertNotEqual(
+                manifeste['perimetres'][perimetre]['projets']['sha256'],
+                ancien['perimetres'][perimetre]['projets']['sha256']
+            )
+            self.assertFalse(os.path.exists(self.fichier(ancien, perimetre, 'projets', 'csv')))
+            self.assertTrue(os.path.exists(self.fichier(manifeste, perimetre, 'projets', 'csv')))
+        self.assertEqual(
+            manifeste['perimetres']['douala-3']['projets'],
+            ancien['perimetres']['douala-3']['projets']
+        )
+    
+    def test_commande(self):
+        """Test de la commande publier_opendata"""
+        sortie = StringIO()
+        call_command('publier_opendata', stdout=sortie)
+        self.assertIn('12 jeu(x) régénéré(s)', sortie.getvalue())
+        self.assertTrue(os.path.exists(os.path.join(self.racine, 'index.json')))